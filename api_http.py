@@ -0,0 +1,482 @@
+# api_http.py
+# Mavi.IA 5.0 - API HTTP Local (sem interface)
+# Cálculo puro em POST /metrics; relatório e extração num pool limitado, com pedidos idênticos em voo coalescidos
+#
+# Uso:
+#   python api_http.py [--porta 8765] [--trabalhadores 4] [--fila-max 64] [--llm-fake --latencia-fake-ms 800]
+#
+# Rotas:
+#   POST /metrics  {"bloco_1", "bloco_2", "bloco_3"} ou {"cenarios": [...]} -> métricas (sem LLM)
+#   POST /report   {"bloco_1", "bloco_2", "bloco_3"}                      -> relatório executivo
+#   POST /extract  {"texto": "...", "parametros": {...}}                  -> parâmetros extraídos do texto
+#   GET  /stats    fila, trabalhadores, coalescência e latência por rota (JSON)
+#   GET  /metrics  telemetria no formato do Prometheus
+#   GET  /health
+
+import argparse
+import asyncio
+import hashlib
+import json
+import sys
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+import calc_batch
+import calc_logic
+import config_mavi
+import provedor_custos
+import renderizador_relatorio
+import telemetria
+import transporte_resiliente
+
+BLOCOS = ("bloco_1", "bloco_2", "bloco_3")
+AMOSTRAS_LATENCIA = 2000   # Janela por rota para os percentis de /stats
+
+
+class ErroRequisicao(Exception):
+    """Pedido inválido: vira uma resposta HTTP com `status` e {"erro": mensagem}."""
+
+    def __init__(self, status: int, mensagem: str):
+        super().__init__(mensagem)
+        self.status = status
+
+
+class FilaCheia(Exception):
+    """Todos os trabalhadores ocupados e a fila no limite (HTTP 503 com Retry-After)."""
+
+
+def _percentis_ms(amostras_s: List[float]) -> Dict[str, float]:
+    if not amostras_s:
+        return {"p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0}
+    ordenadas = sorted(amostras_s)
+    return {f"p{p}_ms": round(1000 * ordenadas[min(len(ordenadas) - 1, int(p / 100 * len(ordenadas)))], 3)
+            for p in (50, 95, 99)}
+
+
+# ==========================================
+# 1. COALESCÊNCIA E POOL DE TRABALHO
+# ==========================================
+
+class SingleFlight:
+    """
+    Pedidos com a mesma chave enquanto o primeiro ainda está em voo esperam o mesmo
+    resultado (uma única chamada ao LLM). A execução é blindada: se quem a disparou
+    desistir, os demais continuam esperando. Terminada, a chave sai do mapa; a repetição
+    posterior cai no cache de relatórios.
+    """
+
+    def __init__(self):
+        self._em_voo: Dict[Hashable, asyncio.Future] = {}
+        self.coalescidas = 0
+
+    def __len__(self) -> int:
+        return len(self._em_voo)
+
+    def _concluir(self, chave: Hashable, tarefa: asyncio.Future) -> None:
+        self._em_voo.pop(chave, None)
+        if not tarefa.cancelled():
+            tarefa.exception()  # Consome o erro mesmo que ninguém mais espere
+
+    async def executar(self, chave: Hashable, iniciar: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Retorna (resultado, coalescido)."""
+        tarefa = self._em_voo.get(chave)
+        coalescido = tarefa is not None
+        if coalescido:
+            self.coalescidas += 1
+        else:
+            tarefa = asyncio.ensure_future(iniciar())
+            self._em_voo[chave] = tarefa
+            tarefa.add_done_callback(lambda t: self._concluir(chave, t))
+        return await asyncio.shield(tarefa), coalescido
+
+
+class PoolTrabalho:
+    """
+    `trabalhadores` tarefas consumindo uma fila de até `fila_max` pedidos. `submeter` não
+    espera vaga: com a fila cheia levanta FilaCheia na hora (contrapressão para o cliente).
+    """
+
+    def __init__(self, trabalhadores: int = config_mavi.API_TRABALHADORES, fila_max: int = config_mavi.API_FILA_MAX):
+        self.trabalhadores = trabalhadores
+        self.fila_max = fila_max
+        self.ocupados = 0
+        self.concluidos = 0
+        self.rejeitados = 0
+        self._esperas: Deque[float] = deque(maxlen=AMOSTRAS_LATENCIA)
+        self._fila: Optional[asyncio.Queue] = None
+        self._tarefas: List[asyncio.Task] = []
+
+    def iniciar(self) -> None:
+        self._fila = asyncio.Queue(self.fila_max)
+        self._tarefas = [asyncio.create_task(self._trabalhar()) for _ in range(self.trabalhadores)]
+
+    async def parar(self) -> None:
+        for tarefa in self._tarefas:
+            tarefa.cancel()
+        await asyncio.gather(*self._tarefas, return_exceptions=True)
+
+    def submeter(self, iniciar: Callable[[], Awaitable[Any]]) -> asyncio.Future:
+        futuro = asyncio.get_running_loop().create_future()
+        try:
+            self._fila.put_nowait((iniciar, futuro, time.perf_counter()))
+        except asyncio.QueueFull:
+            self.rejeitados += 1
+            raise FilaCheia(f"{self.fila_max} pedido(s) na fila e {self.trabalhadores} em execução") from None
+        return futuro
+
+    async def _trabalhar(self) -> None:
+        while True:
+            iniciar, futuro, enfileirado = await self._fila.get()
+            if futuro.cancelled():
+                continue
+            self._esperas.append(time.perf_counter() - enfileirado)
+            self.ocupados += 1
+            try:
+                resultado = await iniciar()
+            except Exception as e:
+                if not futuro.done():
+                    futuro.set_exception(e)
+            else:
+                if not futuro.done():
+                    futuro.set_result(resultado)
+            finally:
+                self.ocupados -= 1
+                self.concluidos += 1
+
+    def estado(self) -> Dict[str, Any]:
+        return {"trabalhadores": self.trabalhadores, "ocupados": self.ocupados,
+                "profundidade_fila": self._fila.qsize() if self._fila is not None else 0,
+                "fila_max": self.fila_max, "concluidos": self.concluidos, "rejeitados": self.rejeitados,
+                "espera_fila": _percentis_ms(list(self._esperas))}
+
+
+class EstatisticasRotas:
+    """Contagem por status e percentis de latência (janela recente) de cada rota."""
+
+    def __init__(self):
+        self._duracoes: Dict[str, Deque[float]] = {}
+        self._status: Dict[str, Dict[int, int]] = {}
+
+    def registrar(self, rota: str, status: int, duracao_s: float) -> None:
+        self._duracoes.setdefault(rota, deque(maxlen=AMOSTRAS_LATENCIA)).append(duracao_s)
+        contagem = self._status.setdefault(rota, {})
+        contagem[status] = contagem.get(status, 0) + 1
+
+    def resumo(self) -> Dict[str, Any]:
+        return {rota: {"requisicoes": sum(self._status[rota].values()), "status": dict(self._status[rota]),
+                       **_percentis_ms(list(duracoes))}
+                for rota, duracoes in sorted(self._duracoes.items())}
+
+
+# ==========================================
+# 2. ROTAS
+# ==========================================
+
+def _chave(rota: str, conteudo: Any) -> Tuple[str, str]:
+    texto = json.dumps(conteudo, sort_keys=True, ensure_ascii=False, default=str)
+    return rota, hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+def _payload(dados: Any, indice: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Aceita só o formato do app: os três blocos como objetos, com os campos numéricos
+    convertidos e os defaults de calc_logic (calc_batch.validar_payload). Em lote, o erro
+    400 aponta o índice do cenário inválido.
+    """
+    prefixo = "" if indice is None else f"cenarios[{indice}]: "
+    if not isinstance(dados, dict) or not all(isinstance(dados.get(bloco), dict) for bloco in BLOCOS):
+        raise ErroRequisicao(400, prefixo + "payload deve ter os objetos bloco_1, bloco_2 e bloco_3")
+    try:
+        return calc_batch.validar_payload(dados)
+    except ValueError as e:
+        raise ErroRequisicao(400, prefixo + str(e)) from None
+
+
+def metricas_por_cenario(colunar: Mapping[str, Mapping[str, np.ndarray]], n: int) -> List[Dict[str, Any]]:
+    """Resultado de calc_batch (um array por métrica) de volta para um dicionário por cenário."""
+    listas = {secao: {campo: np.broadcast_to(valores, (n,)).tolist() for campo, valores in campos.items()}
+              for secao, campos in colunar.items()}
+    return [{secao: {campo: valores[i] for campo, valores in campos.items()} for secao, campos in listas.items()}
+            for i in range(n)]
+
+
+class APIMavi:
+    """Rotas da API; `chain` e `extrator` substituem o pipeline de relatório e o extrator (testes/carga)."""
+
+    def __init__(self, pool: Optional[PoolTrabalho] = None, chain=None, extrator=None,
+                 max_cenarios_lote: int = config_mavi.API_MAX_CENARIOS_LOTE):
+        self.pool = pool or PoolTrabalho()
+        self.voo = SingleFlight()
+        self.estatisticas = EstatisticasRotas()
+        self.max_cenarios_lote = max_cenarios_lote
+        self._chain = chain
+        self._extrator = extrator
+        self.rotas: Dict[Tuple[str, str], Callable[[Any], Awaitable[Any]]] = {
+            ("POST", "/metrics"): self.metricas,
+            ("POST", "/report"): self.relatorio,
+            ("POST", "/extract"): self.extracao,
+            ("GET", "/stats"): self.stats,
+            ("GET", "/metrics"): self.prometheus,
+            ("GET", "/health"): self.saude,
+        }
+
+    # --- Cálculo (puro, no próprio loop) ---
+
+    async def metricas(self, dados: Any) -> Dict[str, Any]:
+        tabela = provedor_custos.obter_tabela_custos()
+        if isinstance(dados, dict) and "cenarios" in dados:
+            cenarios = dados["cenarios"]
+            if not isinstance(cenarios, list):
+                raise ErroRequisicao(400, "cenarios deve ser uma lista de payloads")
+            if len(cenarios) > self.max_cenarios_lote:
+                raise ErroRequisicao(413, f"no máximo {self.max_cenarios_lote} cenários por chamada")
+            payloads = [_payload(cenario, i) for i, cenario in enumerate(cenarios)]
+            if not payloads:
+                return {"versao_custos": tabela["versao"], "metricas": []}
+            colunar = calc_batch.calcula_metricas_batch(calc_batch.payloads_para_colunas(payloads), tabela)
+            return {"versao_custos": tabela["versao"], "metricas": metricas_por_cenario(colunar, len(payloads))}
+        payload = _payload(dados)
+        return {"versao_custos": tabela["versao"],
+                "metricas": calc_logic.calcula_metricas_genai(payload["bloco_1"], payload["bloco_2"],
+                                                              payload["bloco_3"], tabela)}
+
+    # --- LLM (pool limitado + coalescência) ---
+
+    async def _no_pool(self, iniciar: Callable[[], Awaitable[Any]]) -> Any:
+        return await self.pool.submeter(iniciar)
+
+    async def _gerar_relatorio(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        from langchain_agent import pipeline_relatorio, texto_do_chunk  # Import tardio: /metrics não paga pelo LLM
+        chain = self._chain or pipeline_relatorio()
+        relatorio = texto_do_chunk(await chain.ainvoke(payload, telemetria.config_execucao("api")))
+        return {"relatorio": relatorio, "saida_local": renderizador_relatorio.AVISO_INDISPONIVEL in relatorio}
+
+    async def relatorio(self, dados: Any) -> Dict[str, Any]:
+        payload = _payload(dados)
+        resultado, coalescido = await self.voo.executar(
+            _chave("relatorio", payload), lambda: self._no_pool(lambda: self._gerar_relatorio(payload)))
+        return {**resultado, "coalescido": coalescido}
+
+    async def _extrair(self, texto: str, parametros: Any) -> Dict[str, Any]:
+        from extrator_incremental import ExtratorIncremental
+        extrator = ExtratorIncremental(self._extrator)
+        extrator.aplicar(parametros)
+        estado = await extrator.aextrair(texto)
+        return {"parametros": estado.model_dump(exclude_none=True), "proveniencia": extrator.tabela_proveniencia(),
+                "chamadas_llm": extrator.chamadas_llm, "falhas_llm": extrator.falhas_llm}
+
+    async def extracao(self, dados: Any) -> Dict[str, Any]:
+        from schema_mavi import MaviParametersDelta
+        if not isinstance(dados, dict) or not isinstance(dados.get("texto"), str):
+            raise ErroRequisicao(400, "informe o texto a extrair em \"texto\"")
+        try:
+            parametros = MaviParametersDelta(**(dados.get("parametros") or {}))
+        except (TypeError, ValueError) as e:
+            raise ErroRequisicao(400, f"parametros inválidos: {e}") from None
+        texto = dados["texto"]
+        resultado, coalescido = await self.voo.executar(
+            _chave("extracao", {"texto": texto, "parametros": parametros.model_dump()}),
+            lambda: self._no_pool(lambda: self._extrair(texto, parametros)))
+        return {**resultado, "coalescido": coalescido}
+
+    # --- Observabilidade ---
+
+    async def stats(self, _dados: Any) -> Dict[str, Any]:
+        return {"pool": self.pool.estado(),
+                "singleflight": {"em_voo": len(self.voo), "coalescidas": self.voo.coalescidas},
+                "rotas": self.estatisticas.resumo(),
+                "disjuntor": transporte_resiliente.disjuntor_padrao().estado}
+
+    async def prometheus(self, _dados: Any) -> str:
+        return telemetria.metricas_padrao().prometheus()
+
+    async def saude(self, _dados: Any) -> Dict[str, Any]:
+        return {"ok": True}
+
+    async def despachar(self, metodo: str, caminho: str, corpo: bytes) -> Tuple[int, Any, Dict[str, str]]:
+        """(status, conteúdo, cabeçalhos extras) de um pedido; nunca levanta."""
+        inicio = time.perf_counter()
+        rota = self.rotas.get((metodo, caminho))
+        extras: Dict[str, str] = {}
+        try:
+            if rota is None:
+                metodos = [m for m, c in self.rotas if c == caminho]
+                raise ErroRequisicao(405 if metodos else 404, f"{metodo} {caminho} não existe")
+            try:
+                dados = json.loads(corpo) if corpo else None
+            except ValueError:
+                raise ErroRequisicao(400, "corpo não é JSON válido") from None
+            status, conteudo = 200, await rota(dados)
+        except ErroRequisicao as e:
+            status, conteudo = e.status, {"erro": str(e)}
+        except FilaCheia as e:
+            status, conteudo = 503, {"erro": str(e)}
+            extras["Retry-After"] = "1"
+        except Exception as e:
+            status, conteudo = 500, {"erro": f"{type(e).__name__}: {e}"}
+        duracao = time.perf_counter() - inicio
+        self.estatisticas.registrar(f"{metodo} {caminho}" if rota else "outras", status, duracao)
+        if telemetria.ativa():
+            telemetria.metricas_padrao().contar("api", rota=caminho if rota else "outras", status=str(status))
+        return status, conteudo, extras
+
+
+# ==========================================
+# 3. SERVIDOR HTTP (ASYNCIO)
+# ==========================================
+
+_MOTIVOS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+def _resposta(status: int, conteudo: Any, manter_conexao: bool, extras: Mapping[str, str]) -> bytes:
+    if isinstance(conteudo, str):
+        corpo, tipo = conteudo.encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8"
+    else:
+        corpo, tipo = json.dumps(conteudo, ensure_ascii=False).encode("utf-8"), "application/json; charset=utf-8"
+    cabecalhos = [f"HTTP/1.1 {status} {_MOTIVOS.get(status, '')}", f"Content-Type: {tipo}",
+                  f"Content-Length: {len(corpo)}", f"Connection: {'keep-alive' if manter_conexao else 'close'}",
+                  *(f"{nome}: {valor}" for nome, valor in extras.items())]
+    return ("\r\n".join(cabecalhos) + "\r\n\r\n").encode("latin-1") + corpo
+
+
+class ServidorAPI:
+    """
+    HTTP/1.1 mínimo (Content-Length, keep-alive) sobre asyncio.start_server: um único loop
+    atende todas as conexões; só relatório e extração ocupam trabalhadores do pool.
+    """
+
+    def __init__(self, api: Optional[APIMavi] = None, host: str = config_mavi.API_HOST,
+                 porta: int = config_mavi.API_PORTA, max_corpo_bytes: int = config_mavi.API_MAX_CORPO_BYTES):
+        self.api = api or APIMavi()
+        self.host = host
+        self.porta = porta
+        self.max_corpo_bytes = max_corpo_bytes
+        self._servidor: Optional[asyncio.AbstractServer] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.porta}"
+
+    async def iniciar(self) -> "ServidorAPI":
+        self._servidor = await asyncio.start_server(self._atender, self.host, self.porta)
+        self.porta = self._servidor.sockets[0].getsockname()[1]
+        self.api.pool.iniciar()
+        return self
+
+    async def fechar(self) -> None:
+        self._servidor.close()
+        await self._servidor.wait_closed()
+        await self.api.pool.parar()
+
+    async def _atender(self, leitor: asyncio.StreamReader, escritor: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    bruto = await leitor.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                    return
+                linhas = bruto.decode("latin-1").split("\r\n")
+                partes = linhas[0].split(" ")
+                if len(partes) != 3:
+                    escritor.write(_resposta(400, {"erro": "linha de requisição inválida"}, False, {}))
+                    return
+                metodo, alvo, versao = partes
+                cabecalhos = {nome.strip().lower(): valor.strip()
+                              for nome, _, valor in (linha.partition(":") for linha in linhas[1:] if linha)}
+                try:
+                    tamanho = int(cabecalhos.get("content-length") or 0)
+                except ValueError:
+                    tamanho = -1
+                if tamanho < 0:
+                    escritor.write(_resposta(400, {"erro": "Content-Length inválido"}, False, {}))
+                    return
+                if tamanho > self.max_corpo_bytes:
+                    escritor.write(_resposta(413, {"erro": f"corpo acima de {self.max_corpo_bytes} bytes"}, False, {}))
+                    return
+                corpo = await leitor.readexactly(tamanho) if tamanho else b""
+                manter = versao == "HTTP/1.1" and cabecalhos.get("connection", "").lower() != "close"
+                status, conteudo, extras = await self.api.despachar(metodo, alvo.split("?")[0], corpo)
+                escritor.write(_resposta(status, conteudo, manter, extras))
+                await escritor.drain()
+                if not manter:
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass  # Cliente foi embora
+        finally:
+            escritor.close()
+
+    async def servir(self) -> None:
+        await self.iniciar()
+        async with self._servidor:
+            await self._servidor.serve_forever()
+
+    # --- Em segundo plano (testes de carga e benchmarks) ---
+
+    def iniciar_em_segundo_plano(self) -> "ServidorAPI":
+        pronto = threading.Event()
+        falha: List[BaseException] = []
+
+        def rodar():
+            self._loop = asyncio.new_event_loop()
+            try:
+                self._loop.run_until_complete(self.iniciar())
+            except BaseException as e:
+                falha.append(e)
+                pronto.set()
+                return
+            pronto.set()
+            self._loop.run_forever()
+
+        threading.Thread(target=rodar, name="mavi-api", daemon=True).start()
+        pronto.wait()
+        if falha:
+            raise falha[0]
+        return self
+
+    def parar(self) -> None:
+        asyncio.run_coroutine_threadsafe(self.fechar(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+    def __enter__(self) -> "ServidorAPI":
+        return self.iniciar_em_segundo_plano()
+
+    def __exit__(self, *exc) -> None:
+        self.parar()
+
+
+# ==========================================
+# 4. LINHA DE COMANDO
+# ==========================================
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="API HTTP local do Mavi 5.0 (métricas, relatório e extração).")
+    parser.add_argument("--host", default=config_mavi.API_HOST)
+    parser.add_argument("--porta", type=int, default=config_mavi.API_PORTA)
+    parser.add_argument("--trabalhadores", type=int, default=config_mavi.API_TRABALHADORES)
+    parser.add_argument("--fila-max", type=int, default=config_mavi.API_FILA_MAX)
+    parser.add_argument("--llm-fake", action="store_true", help="Usa o LLM local de llm_fake (testes de carga)")
+    parser.add_argument("--latencia-fake-ms", type=float, default=800.0, help="Primeiro token do LLM fake")
+    args = parser.parse_args(argv)
+
+    if args.llm_fake:
+        import llm_fake
+        import registro_llm
+        registro_llm.configurar_fabrica_cliente(llm_fake.fabrica_fake(
+            latencia_primeiro_token_s=args.latencia_fake_ms / 1000, latencia_por_chunk_s=0.002))
+    servidor = ServidorAPI(APIMavi(PoolTrabalho(args.trabalhadores, args.fila_max)), args.host, args.porta)
+    print(f"Mavi API em http://{args.host}:{args.porta} (Ctrl+C para sair)", file=sys.stderr)
+    try:
+        asyncio.run(servidor.servir())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
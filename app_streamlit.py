@@ -4,9 +4,45 @@
 
 import streamlit as st
 import time
+from concurrent.futures import Future, ThreadPoolExecutor
 
-# Importa as funções do backend 5.0
-from langchain_agent import criar_agente_extrator, extrair_dados_conversa, gerar_relatorio_tecnico
+# Importa as funções do backend 5.0 (langchain_agent é carregado em segundo plano, ver seção 0)
+from orquestrador_chat import orquestrador_padrao
+from extrator_incremental import ExtratorIncremental, falas_usuario
+from memoria_chat import MemoriaChat
+from provedor_custos import obter_tabela_custos
+from calc_logic import calcula_metricas_genai
+from solver_breakeven import resolve_limiares, descreve_limiar
+from otimizador_modelos import otimiza_modelos
+from repositorio_cenarios import ORDENACOES, FiltroCenarios, repositorio_padrao
+import estimador_tokens
+import telemetria
+import transporte_resiliente
+
+# --- 0. AQUECIMENTO DO BACKEND DE IA ---
+def _aquecer_backend():
+    """Importa a stack de LLM e constrói pipeline, agente e extrator (uma vez por processo)."""
+    import langchain_agent
+    from schema_mavi import MaviParametersDelta
+    langchain_agent.pipeline_relatorio()
+    langchain_agent.criar_agente_extrator()
+    langchain_agent._extrator_estruturado(MaviParametersDelta)
+    return langchain_agent
+
+@st.cache_resource(show_spinner=False)
+def aquecimento_backend() -> Future:
+    """Dispara o aquecimento em uma thread: o formulário é desenhado sem esperar pelo LLM."""
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="mavi-aquecimento").submit(_aquecer_backend)
+
+def backend():
+    """Módulo langchain_agent pronto para uso; só bloqueia se o aquecimento ainda não terminou."""
+    futuro = aquecimento_backend()
+    if not futuro.done():
+        with st.spinner("Inicializando Motor Mavi 5.0..."):
+            futuro.exception()
+    if futuro.exception() is not None:
+        aquecimento_backend.clear()  # Permite nova tentativa (ex: .env corrigido)
+    return futuro.result()
 
 # --- 1. GESTÃO DE ESTADO (SESSION STATE) ---
 def inicializar_session_state():
@@ -43,10 +79,195 @@ def inicializar_session_state():
         if key not in st.session_state:
             st.session_state[key] = value
 
-    # Carrega o Pipeline Principal (apenas uma vez)
-    if 'mavi_pipeline' not in st.session_state:
-        with st.spinner("Inicializando Motor Mavi 5.0..."):
-            st.session_state.mavi_pipeline = gerar_relatorio_tecnico()
+    # Pipeline Principal: construído uma vez por processo, em segundo plano, e compartilhado entre sessões
+    aquecimento_backend()
+
+    # Estado da extração incremental (um por sessão de chat)
+    if 'extrator_incremental' not in st.session_state:
+        st.session_state.extrator_incremental = ExtratorIncremental()
+
+    # Memória limitada do chat (janela íntegra + resumo em segundo plano)
+    if 'memoria_chat' not in st.session_state:
+        st.session_state.memoria_chat = MemoriaChat()
+
+def montar_inputs_totais() -> dict:
+    """Monta o payload completo (Blocos 1, 2 e 3) a partir do session_state."""
+    return {
+        "bloco_1": {
+            "tipo_projeto": st.session_state["tipo_projeto"],
+            "volume_mensal": st.session_state["volume_mensal"],
+            "tempo_por_unidade_min": st.session_state["tempo_por_unidade_min"],
+            "salario_hora_brl": st.session_state["salario_hora_brl"],
+            "custo_por_ticket_brl": st.session_state["custo_por_ticket_brl"],
+        },
+        "bloco_2": {
+            "modelo_llm": st.session_state["modelo_llm"],
+            "tokens_input_por_unidade": st.session_state["tokens_input_por_unidade"],
+            "tokens_output_por_unidade": st.session_state["tokens_output_por_unidade"],
+            "custo_infra_mensal_brl": st.session_state["custo_infra_mensal_brl"],
+            "custo_implementacao_capex_brl": st.session_state["custo_implementacao_capex_brl"]
+        },
+        "bloco_3": {
+            "taxa_revisao_percentual": st.session_state.get("taxa_revisao_percentual", 0),
+            "tempo_revisao_min": st.session_state.get("tempo_revisao_min", 0),
+            "taxa_retencao_ia_percentual": st.session_state.get("taxa_retencao_ia_percentual", 0)
+        }
+    }
+
+def calcular_dicas_breakeven() -> dict:
+    """Break-even e elasticidade de cada campo, para exibir no help de cada widget."""
+    inputs = montar_inputs_totais()
+    global_cost_data = obter_tabela_custos()
+    limiares = resolve_limiares(inputs["bloco_1"], inputs["bloco_2"], inputs["bloco_3"], global_cost_data)
+    dicas = {campo: descreve_limiar(info) for campo, info in limiares.items()}
+
+    # CAPEX não mexe no ROI mensal; o limiar útil é o CAPEX máximo para Payback em 12 meses
+    limiares_payback = resolve_limiares(inputs["bloco_1"], inputs["bloco_2"], inputs["bloco_3"], global_cost_data,
+                                        payback_alvo_meses=12)
+    dicas["custo_implementacao_capex_brl"] = "Payback ≤ 12 meses: " + descreve_limiar(limiares_payback["custo_implementacao_capex_brl"])
+    return dicas
+
+@st.cache_data(max_entries=512, show_spinner=False)
+def metricas_previa(chave_inputs: tuple, versao_custos: str) -> dict:
+    """Motor financeiro local, memoizado pela tupla de inputs (reruns sem mudança não recalculam)."""
+    inputs = {bloco: dict(campos) for bloco, campos in chave_inputs}
+    return calcula_metricas_genai(inputs["bloco_1"], inputs["bloco_2"], inputs["bloco_3"], obter_tabela_custos())
+
+def exibir_previa_kpis():
+    """Prévia dos KPIs recalculada a cada alteração do formulário (sem LLM)."""
+    inicio = time.perf_counter()
+    inputs = montar_inputs_totais()
+    chave = tuple((bloco, tuple(sorted(campos.items()))) for bloco, campos in sorted(inputs.items()))
+    metricas = metricas_previa(chave, obter_tabela_custos()["versao"])
+    as_is, to_be, resultado = metricas["as_is"], metricas["to_be"], metricas["resultado"]
+
+    st.markdown("**📊 Prévia dos KPIs** (cálculo local, atualiza a cada ajuste)")
+    k1, k2, k3, k4, k5 = st.columns(5)
+    k1.metric("Custo AS-IS", f"R$ {as_is['custo_total']:,.0f}")
+    k2.metric("Custo TO-BE", f"R$ {to_be['total_ia']:,.0f}",
+              delta=f"R$ {to_be['total_ia'] - as_is['custo_total']:,.0f}", delta_color="inverse")
+    k3.metric("Saving Líquido", f"R$ {resultado['saving_liquido']:,.0f}")
+    k4.metric("ROI", f"{resultado['roi']:,.1f}%")
+    k5.metric("Payback", f"{resultado['payback']:,.1f} meses")
+    # Spec Vega-Lite com os dados embutidos: ~4 ms por rerun, contra ~70 ms do st.bar_chart (DataFrame)
+    custos = [("AS-IS", "Trabalho manual", as_is["custo_total"]), ("TO-BE", "Infra", to_be["infra"]),
+              ("TO-BE", "Tokens", to_be["tokens"]), ("TO-BE", "Revisão humana", to_be["humano_hitl"])]
+    st.vega_lite_chart({
+        "data": {"values": [{"cenario": c, "componente": n, "valor": v} for c, n, v in custos]},
+        "mark": {"type": "bar"},
+        "height": 110,
+        "encoding": {
+            "y": {"field": "cenario", "type": "nominal", "title": None},
+            "x": {"field": "valor", "type": "quantitative", "stack": "zero", "title": "R$/mês"},
+            "color": {"field": "componente", "type": "nominal", "title": None},
+        },
+    }, use_container_width=True)
+    st.caption(f"{resultado['label_kpi_horas']}: {resultado['horas_liberadas']:,.1f} · "
+               f"TO-BE = infra R$ {to_be['infra']:,.0f} + tokens R$ {to_be['tokens']:,.0f} + "
+               f"revisão humana R$ {to_be['humano_hitl']:,.0f} · prévia em {1000 * (time.perf_counter() - inicio):.0f} ms")
+
+def exibir_painel_latencia():
+    """Tempo por etapa do último relatório e p50/p95 acumulados do processo (telemetria.py)."""
+    metricas = telemetria.metricas_padrao()
+    resumo = metricas.resumo_etapas()
+    if not resumo:
+        return
+    with st.expander("⏱️ Latência por Etapa"):
+        ultimo = metricas.ultimo_trace("relatorio")
+        if ultimo:
+            st.markdown("**Último relatório**")
+            st.dataframe([{"etapa": s.etapa, "ms": round(1000 * s.duracao_s, 1),
+                           "ttft_ms": round(1000 * s.ttft_s, 1) if s.ttft_s is not None else None,
+                           "tokens_entrada": s.tokens_entrada, "tokens_saida": s.tokens_saida, "ok": s.ok}
+                          for s in ultimo], use_container_width=True, hide_index=True)
+        st.markdown("**Acumulado do processo**")
+        st.dataframe(resumo, use_container_width=True, hide_index=True)
+        contadores = metricas.contadores()
+        if contadores:
+            st.caption(" · ".join(f"{nome}: {valor:g}" for nome, valor in contadores.items()))
+        st.caption(f"Disjuntor do LLM: {transporte_resiliente.disjuntor_padrao().estado}")
+
+OPCOES_MODO = ["Automação (Backoffice/FTE)", "FAQ/Agente (Frontoffice/Deflexão)"]
+TAMANHO_PAGINA_HISTORICO = 25
+TODOS = "(todos)"
+
+def carregar_cenario(cenario_id: int):
+    """Callback: copia as entradas de um cenário salvo para o formulário (antes dos widgets existirem)."""
+    cenario = repositorio_padrao().obter(cenario_id)
+    if cenario is None:
+        return
+    for bloco in cenario["entradas"].values():
+        for campo, valor in bloco.items():
+            if campo in st.session_state and valor is not None:
+                st.session_state[campo] = valor
+    st.session_state.pop("modo_radio_ui", None)  # O seletor de modo renasce a partir de tipo_projeto
+
+def estimar_tokens_amostras():
+    """Callback: mede as pastas de amostras e grava o percentil escolhido nos campos de tokens do bloco_2."""
+    try:
+        pasta_saidas = st.session_state.get("estimador_pasta_saidas")
+        entrada = estimador_tokens.estimar_pasta(st.session_state["estimador_pasta"],
+                                                 st.session_state["estimador_unidade"],
+                                                 cache=estimador_tokens.cache_padrao())
+        saida = (estimador_tokens.estimar_pasta(pasta_saidas, st.session_state["estimador_unidade"],
+                                                cache=estimador_tokens.cache_padrao()) if pasta_saidas else None)
+    except ValueError as e:
+        st.session_state["estimativa_tokens"] = {"erro": str(e)}
+        return
+    bloco_2 = estimador_tokens.aplicar_no_bloco_2({}, entrada, saida, st.session_state["estimador_percentil"])
+    # Respeita o mínimo dos campos do formulário
+    if "tokens_input_por_unidade" in bloco_2:
+        st.session_state["tokens_input_por_unidade"] = max(100, bloco_2["tokens_input_por_unidade"])
+    if "tokens_output_por_unidade" in bloco_2:
+        st.session_state["tokens_output_por_unidade"] = max(10, bloco_2["tokens_output_por_unidade"])
+    st.session_state["estimativa_tokens"] = {"entrada": entrada, "saida": saida}
+
+def exibir_historico_cenarios():
+    """Cenários salvos (interface e lote) com filtros, paginação por cursor e agregados do portfólio."""
+    repositorio = repositorio_padrao()
+    with st.expander("📚 Histórico & Portfólio de Cenários"):
+        c1, c2, c3, c4, c5 = st.columns(5)
+        tipo = c1.selectbox("Tipo", [TODOS] + repositorio.valores_distintos("tipo_projeto"), key="hist_tipo")
+        modelo = c2.selectbox("Modelo", [TODOS] + repositorio.valores_distintos("modelo_llm"), key="hist_modelo")
+        payback_max = c3.number_input("Payback menor que (meses)", min_value=0.0, value=None, step=1.0, key="hist_payback")
+        roi_min = c4.number_input("ROI mínimo (%)", value=None, step=50.0, key="hist_roi")
+        ordem = c5.selectbox("Ordenar por", list(ORDENACOES), key="hist_ordem")
+        filtro = FiltroCenarios(tipo_projeto=None if tipo == TODOS else tipo,
+                                modelo_llm=None if modelo == TODOS else modelo,
+                                payback_max=payback_max, roi_min=roi_min)
+
+        # Cursores das páginas já vistas; filtro ou ordem novos voltam para a primeira
+        if st.session_state.get("hist_consulta") != (filtro, ordem):
+            st.session_state["hist_consulta"] = (filtro, ordem)
+            st.session_state["hist_cursores"] = [None]
+        cursores = st.session_state["hist_cursores"]
+        pagina = repositorio.consultar(filtro, ordem, decrescente=ordem != "payback",
+                                       limite=TAMANHO_PAGINA_HISTORICO, apos=cursores[-1])
+        if not pagina.itens:
+            st.caption("Nenhum cenário salvo com esses filtros. Os relatórios gerados (aqui ou em lote) entram no histórico.")
+            return
+
+        st.caption(f"{repositorio.contar(filtro)} cenário(s) · página {len(cursores)}")
+        st.dataframe([{**item, "criado_em": time.strftime("%d/%m/%Y %H:%M", time.localtime(item["criado_em"])),
+                       "tem_relatorio": bool(item["tem_relatorio"]),
+                       "veredito_alterado": bool(item["veredito_alterado"])} for item in pagina.itens],
+                     use_container_width=True, hide_index=True)
+        n1, n2, n3 = st.columns([1, 1, 3])
+        n1.button("◀ Anterior", disabled=len(cursores) == 1, key="hist_anterior",
+                  on_click=lambda: cursores.pop())
+        n2.button("Próxima ▶", disabled=pagina.proximo is None, key="hist_proxima",
+                  on_click=lambda: cursores.append(pagina.proximo))
+
+        escolhido = n3.selectbox("Cenário", [item["id"] for item in pagina.itens], key="hist_escolhido",
+                                 format_func=lambda i: f"#{i}")
+        n3.button("↩️ Carregar no formulário", key="hist_carregar", on_click=carregar_cenario, args=(escolhido,))
+        cenario = repositorio.obter(escolhido)
+        if cenario and cenario["relatorio"]:
+            with st.popover("📄 Relatório salvo"):
+                st.markdown(cenario["relatorio"])
+
+        st.markdown("**Portfólio (filtros aplicados)**")
+        st.dataframe(repositorio.resumo_portfolio(filtro), use_container_width=True, hide_index=True)
 
 # --- 2. APLICAÇÃO PRINCIPAL ---
 
@@ -74,25 +295,61 @@ def main():
             for msg in st.session_state.messages:
                 st.chat_message(msg["role"]).write(msg["content"])
 
+        # Quem definiu cada parâmetro (turno e origem), segundo a extração incremental
+        extrator_sessao = st.session_state.extrator_incremental
+        proveniencia = extrator_sessao.tabela_proveniencia()
+        if proveniencia:
+            with st.expander("🧾 Origem dos Parâmetros"):
+                st.dataframe(proveniencia, use_container_width=True, hide_index=True)
+                total_trechos = extrator_sessao.trechos_locais + extrator_sessao.chamadas_llm
+                st.caption(f"Extração local (sem LLM): {extrator_sessao.trechos_locais} de {total_trechos} trechos"
+                           + (f" · {extrator_sessao.falhas_llm} sem resposta do LLM" if extrator_sessao.falhas_llm else ""))
+
+        uso_memoria = st.session_state.memoria_chat.ultimo_uso
+        if uso_memoria:
+            st.caption(f"🧠 Contexto do último turno: ~{uso_memoria['tokens']} tokens "
+                       f"({uso_memoria['mensagens_integrais']} mensagens na íntegra, "
+                       f"{uso_memoria['mensagens_resumidas']} resumidas)")
+
         # Input do Usuário
         if prompt := st.chat_input("Ex: 'Quero um FAQ para RH' ou 'Ler 500 contratos'"):
             st.session_state.messages.append({"role": "user", "content": prompt})
             with container_chat:
                 st.chat_message("user").write(prompt)
 
+            # Mensagem nova invalida o turno anterior (resposta/extração ainda em voo)
+            if turno_anterior := st.session_state.pop("turno_chat", None):
+                turno_anterior.cancelar()
+
+            # 1. Resposta em streaming e extração incremental (só o turno novo + estado) em paralelo
+            inicio_construcao = time.perf_counter()
+            agente_chat = backend().criar_agente_extrator()
+            construcao_s = time.perf_counter() - inicio_construcao
+            extrator = st.session_state.extrator_incremental
+            memoria = st.session_state.memoria_chat
+            # Histórico limitado: a mensagem atual vai em "input", não no histórico
+            historico = memoria.historico(st.session_state.messages[:-1], extrator.resumo_estado())
+            # Trecho inclui mensagens de turnos cancelados que ainda não foram extraídas
+            trecho, extrair_turno = extrator.preparar_turno(st.session_state.messages)
+            turno = orquestrador_padrao().iniciar_turno(
+                agente_chat, {"input": prompt, "chat_history": historico}, trecho,
+                extrator=extrair_turno, extrator_reconciliacao=extrator.aextrair_resposta,
+                referencia_numeros=falas_usuario(st.session_state.messages),
+            )
+            st.session_state["turno_chat"] = turno
+            with container_chat:
+                with st.chat_message("assistant"):
+                    resposta_texto = st.write_stream(turno.chunks())
+            st.session_state.messages.append({"role": "assistant", "content": resposta_texto})
+            st.session_state["latencia_chat"] = {**turno.metricas, "construcao_s": construcao_s,
+                                                 "tokens_historico": memoria.ultimo_uso["tokens"]}
+            memoria.agendar_resumo(st.session_state.messages)  # Fora do caminho do próximo turno
+
             # Processamento da IA
             with st.spinner("Mavi analisando requisitos..."):
-                # 1. Gera resposta conversacional
-                agente_chat = criar_agente_extrator()
-                historico_str = "\n".join([f"{m['role']}: {m['content']}" for m in st.session_state.messages])
-                resposta_ai = agente_chat.invoke({"input": prompt, "chat_history": st.session_state.messages})
-                
-                st.session_state.messages.append({"role": "assistant", "content": resposta_ai.content})
-                with container_chat:
-                    st.chat_message("assistant").write(resposta_ai.content)
-
-                # 2. Extração de Dados e Detecção de Modo (Automação vs FAQ)
-                novos_dados = extrair_dados_conversa(historico_str + f"\nAI: {resposta_ai.content}")
+                # 2. Extração de Dados e Detecção de Modo (Automação vs FAQ), já reconciliada com a resposta
+                novos_dados = turno.extracao()
+                st.session_state.pop("turno_chat", None)
                 
                 if novos_dados:
                     dados_dict = novos_dados.dict()
@@ -126,7 +383,7 @@ def main():
         # Nota: removida a atribuição direta que causava erro, o key lida com o session_state
         modo_label = st.radio(
             "Qual o objetivo do projeto?",
-            ["Automação (Backoffice/FTE)", "FAQ/Agente (Frontoffice/Deflexão)"],
+            OPCOES_MODO,
             index=0 if st.session_state["tipo_projeto"] == "automacao" else 1,
             horizontal=True,
             key="modo_radio_ui"
@@ -137,6 +394,12 @@ def main():
             st.session_state["tipo_projeto"] = novo_tipo
             st.rerun()
 
+        # Limiares de break-even (solver local, sem LLM) exibidos no help de cada campo
+        dicas = calcular_dicas_breakeven()
+
+        # KPIs ao vivo acima das abas; preenchidos depois delas para o formulário aparecer primeiro
+        area_previa = st.container(border=True)
+
         # Abas reorganizadas
         tab1, tab2, tab3 = st.tabs(["💰 Drivers de Valor (ROI)", "🏗️ Arquitetura & Custos", "🛡️ Risco (HITL)"])
 
@@ -144,30 +407,63 @@ def main():
         with tab1:
             c1, c2 = st.columns(2)
             # CORREÇÃO: Removida atribuição st.session_state[...] = widget(...)
-            c1.number_input("Volume Mensal (Total):", min_value=1, key="volume_mensal")
+            c1.number_input("Volume Mensal (Total):", min_value=1, key="volume_mensal", help=dicas["volume_mensal"])
             
             if st.session_state["tipo_projeto"] == "automacao":
                 st.info("📉 **Modo Eficiência:** Foco em reduzir horas humanas (FTE).")
-                c1.number_input("Tempo Humano por Tarefa (min):", min_value=0.1, key="tempo_por_unidade_min")
-                c2.number_input("Custo Hora Equipe (BRL):", min_value=1.0, key="salario_hora_brl")
+                c1.number_input("Tempo Humano por Tarefa (min):", min_value=0.1, key="tempo_por_unidade_min", help=dicas["tempo_por_unidade_min"])
+                c2.number_input("Custo Hora Equipe (BRL):", min_value=1.0, key="salario_hora_brl", help=dicas["salario_hora_brl"])
             else:
                 st.info("🛡️ **Modo Deflexão:** Foco em evitar abertura de chamados.")
-                c1.number_input("Custo Unitário do Ticket (BRL):", min_value=1.0, key="custo_por_ticket_brl")
-                c2.slider("% Retenção Esperada (IA resolve):", 0, 100, key="taxa_retencao_ia_percentual")
+                c1.number_input("Custo Unitário do Ticket (BRL):", min_value=1.0, key="custo_por_ticket_brl", help=dicas["custo_por_ticket_brl"])
+                c2.slider("% Retenção Esperada (IA resolve):", 0, 100, key="taxa_retencao_ia_percentual", help=dicas["taxa_retencao_ia_percentual"])
 
         # --- ABA 2: QUANTO VAI CUSTAR? ---
         with tab2:
             c1, c2 = st.columns(2)
             c1.selectbox("Modelo LLM:", ["gemini-2.5-flash", "gemini-1.5-flash", "gemini-1.5-pro", "gpt-4o", "gpt-4o-mini"], key="modelo_llm")
-            c2.number_input("Custo Fixo Infra (n8n/Vector DB):", min_value=0.0, key="custo_infra_mensal_brl", help="Custo mensal de servidores, licenças n8n ou banco vetorial.")
+            c2.number_input("Custo Fixo Infra (n8n/Vector DB):", min_value=0.0, key="custo_infra_mensal_brl", help="Custo mensal de servidores, licenças n8n ou banco vetorial.\n\n" + dicas["custo_infra_mensal_brl"])
             
-            c1.number_input("CAPEX (Implementação R$):", min_value=0.0, key="custo_implementacao_capex_brl", help="Custo único de desenvolvimento para cálculo de Payback.")
+            c1.number_input("CAPEX (Implementação R$):", min_value=0.0, key="custo_implementacao_capex_brl", help="Custo único de desenvolvimento para cálculo de Payback.\n\n" + dicas["custo_implementacao_capex_brl"])
             
             st.markdown("---")
             st.caption("Estimativa de Consumo (Tokenomics)")
+            with st.expander("📂 Estimar tokens a partir de documentos de amostra"):
+                st.text_input("Pasta com amostras de entrada (contratos, tickets):", key="estimador_pasta")
+                st.text_input("Pasta com amostras de saída (opcional):", key="estimador_pasta_saidas")
+                e1, e2 = st.columns(2)
+                e1.selectbox("Unidade:", estimador_tokens.UNIDADES, key="estimador_unidade",
+                             help="documento: cada arquivo é uma unidade · linha: cada linha é uma unidade (exportação de tickets)")
+                e2.radio("Usar:", estimador_tokens.PERCENTIS, key="estimador_percentil", horizontal=True)
+                st.button("Medir amostras", key="estimador_medir", on_click=estimar_tokens_amostras)
+                estimativa = st.session_state.get("estimativa_tokens")
+                if estimativa and "erro" in estimativa:
+                    st.warning(estimativa["erro"])
+                elif estimativa:
+                    for nome, dist in (("Entrada", estimativa["entrada"]), ("Saída", estimativa["saida"])):
+                        if dist is not None:
+                            st.caption(f"{nome}: {dist.unidades} unidades em {dist.arquivos} arquivos "
+                                       f"({dist.arquivos_em_cache} do cache, {dist.duracao_s}s) · "
+                                       f"p50 {dist.p50} · p95 {dist.p95} · máx. {dist.maximo} tokens")
             cc1, cc2 = st.columns(2)
-            cc1.number_input("Tokens Input (Contexto):", min_value=100, key="tokens_input_por_unidade")
-            cc2.number_input("Tokens Output (Geração):", min_value=10, key="tokens_output_por_unidade")
+            cc1.number_input("Tokens Input (Contexto):", min_value=100, key="tokens_input_por_unidade", help=dicas["tokens_input_por_unidade"])
+            cc2.number_input("Tokens Output (Geração):", min_value=10, key="tokens_output_por_unidade", help=dicas["tokens_output_por_unidade"])
+
+            # Comparação de todos os modelos da tabela de preços numa única varredura
+            with st.expander("🔎 Comparar Modelos (Fronteira de Pareto)"):
+                roi_alvo = st.number_input("ROI mínimo desejado (%):", value=100.0, step=50.0, key="otimizador_roi_alvo")
+                inputs = montar_inputs_totais()
+                otimizacao = otimiza_modelos(inputs["bloco_1"], inputs["bloco_2"], inputs["bloco_3"],
+                                             obter_tabela_custos(), roi_alvo=roi_alvo)
+                rec = otimizacao["recomendacao"]
+                if rec:
+                    st.success(f"Configuração mais barata com ROI ≥ {roi_alvo:.0f}%: **{rec['modelo_llm']}**, "
+                               f"revisão {rec['taxa_revisao_percentual']:.0f}%, {rec['tokens_input_por_unidade']:.0f}/"
+                               f"{rec['tokens_output_por_unidade']:.0f} tokens → R$ {rec['custo_total_ia']:,.2f}/mês (ROI {rec['roi']}%)")
+                else:
+                    st.warning("Nenhuma configuração atinge o ROI desejado.")
+                st.caption(f"Fronteira de Pareto (custo x ROI x horas de revisão) entre {otimizacao['n_configuracoes']} combinações:")
+                st.dataframe(otimizacao["fronteira"], use_container_width=True, hide_index=True)
 
         # --- ABA 3: QUAL O CUSTO DA FALHA? ---
         with tab3:
@@ -175,50 +471,50 @@ def main():
             c1, c2 = st.columns(2)
             
             if st.session_state["tipo_projeto"] == "automacao":
-                c1.slider("% de Auditoria/Revisão Humana:", 0, 100, key="taxa_revisao_percentual")
-                c2.number_input("Tempo para Revisar (min):", min_value=0.1, key="tempo_revisao_min")
+                c1.slider("% de Auditoria/Revisão Humana:", 0, 100, key="taxa_revisao_percentual", help=dicas["taxa_revisao_percentual"])
+                c2.number_input("Tempo para Revisar (min):", min_value=0.1, key="tempo_revisao_min", help=dicas["tempo_revisao_min"])
             else:
                 st.warning("No modo FAQ, o 'erro' é considerado como um chamado não deflexionado (já calculado na taxa de retenção).")
                 st.caption("Ajuste a % de Retenção na Aba 1 para simular a qualidade da IA.")
 
+        # KPIs ao vivo: o relatório (LLM) fica só para a narrativa
+        with area_previa:
+            exibir_previa_kpis()
+
         # --- BOTÃO DE AÇÃO ---
         st.markdown("---")
+        if not aquecimento_backend().done():
+            st.caption("⏳ Motor de IA carregando em segundo plano; o relatório fica disponível em instantes.")
         if st.button("🚀 Gerar Relatório Executivo & ROI", type="primary", use_container_width=True):
             
             # Montagem do Payload Completo
-            inputs_totais = {
-                "bloco_1": {
-                    "tipo_projeto": st.session_state["tipo_projeto"],
-                    "volume_mensal": st.session_state["volume_mensal"],
-                    "tempo_por_unidade_min": st.session_state["tempo_por_unidade_min"],
-                    "salario_hora_brl": st.session_state["salario_hora_brl"],
-                    "custo_por_ticket_brl": st.session_state["custo_por_ticket_brl"],
-                },
-                "bloco_2": {
-                    "modelo_llm": st.session_state["modelo_llm"],
-                    "tokens_input_por_unidade": st.session_state["tokens_input_por_unidade"],
-                    "tokens_output_por_unidade": st.session_state["tokens_output_por_unidade"],
-                    "custo_infra_mensal_brl": st.session_state["custo_infra_mensal_brl"],
-                    "custo_implementacao_capex_brl": st.session_state["custo_implementacao_capex_brl"]
-                },
-                "bloco_3": {
-                    "taxa_revisao_percentual": st.session_state.get("taxa_revisao_percentual", 0),
-                    "tempo_revisao_min": st.session_state.get("tempo_revisao_min", 0),
-                    "taxa_retencao_ia_percentual": st.session_state.get("taxa_retencao_ia_percentual", 0)
-                }
-            }
+            inputs_totais = montar_inputs_totais()
             
-            with st.spinner("Mavi 5.0 analisando viabilidade econômica e gerando relatório..."):
-                try:
-                    resultado = st.session_state.mavi_pipeline.invoke(inputs_totais)
-                    st.success("✅ Relatório Executivo Gerado!")
+            metricas_relatorio = {}
+            try:
+                # Exibe o relatório em um container com borda para destacar o formato "Papel"
+                # O texto chega em streaming; o cache de relatórios devolve tudo de uma vez
+                with st.container(border=True):
+                    mavi = backend()
+                    relatorio = st.write_stream(mavi.stream_texto(mavi.pipeline_relatorio(), inputs_totais, metricas_relatorio))
+                st.success("✅ Relatório Executivo Gerado!")
+                tabela = obter_tabela_custos()
+                cenario_id = repositorio_padrao().salvar(
+                    inputs_totais,
+                    calcula_metricas_genai(inputs_totais["bloco_1"], inputs_totais["bloco_2"], inputs_totais["bloco_3"], tabela),
+                    tabela["versao"], relatorio if isinstance(relatorio, str) else None, tabela_custos=tabela)
+                st.caption(f"💾 Salvo no histórico como cenário #{cenario_id}")
+                st.caption(f"⏱️ Primeiro trecho em {metricas_relatorio['ttft_s']:.2f}s · "
+                           f"relatório completo em {metricas_relatorio['total_s']:.2f}s")
+                st.session_state["latencia_relatorio"] = metricas_relatorio
                     
-                    # Exibe o relatório em um container com borda para destacar o formato "Papel"
-                    with st.container(border=True):
-                        st.markdown(resultado.content)
-                        
-                except Exception as e:
-                    st.error(f"Erro na execução da análise: {e}")
+            except Exception as e:
+                st.error(f"Erro na execução da análise: {e}")
+
+        if telemetria.ativa():
+            exibir_painel_latencia()
+
+    exibir_historico_cenarios()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,342 @@
+# batch_relatorios.py
+# Mavi.IA 5.0 - Geração de Relatórios em Lote (Linha de Comando)
+# Lê um portfólio (CSV/JSONL), gera os relatórios com concorrência limitada e retoma de onde parou
+#
+# Uso:
+#   python batch_relatorios.py propostas.csv -o relatorios.jsonl --max-concorrencia 4 --rps 1.5
+#   (rodar de novo com o mesmo -o pula as propostas já concluídas)
+#   Os relatórios concluídos também vão para o repositório de cenários (--sem-repositorio desliga)
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Set, Tuple
+
+import calc_batch
+import calc_logic
+import config_mavi
+import provedor_custos
+import renderizador_relatorio
+import repositorio_cenarios
+import telemetria
+import transporte_resiliente
+
+MAX_CONCORRENCIA_PADRAO = 4
+RPS_PADRAO = 1.0
+TENTATIVAS_PADRAO = 4
+BACKOFF_BASE_S = 1.0
+BACKOFF_MAX_S = 30.0
+
+
+# ==========================================
+# 1. LEITURA DO PORTFÓLIO
+# ==========================================
+
+def _valor_csv(bruto: str) -> Any:
+    """Células vazias viram None; números viram float (ou int se inteiros)."""
+    bruto = (bruto or "").strip()
+    if not bruto:
+        return None
+    try:
+        numero = float(bruto)
+    except ValueError:
+        return bruto
+    return int(numero) if numero.is_integer() else numero
+
+
+def _payload_de_linha(linha: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Aceita o formato aninhado do app ou colunas planas com os nomes dos campos.
+    tipo_projeto/modelo_llm vazios recebem os defaults de calc_logic; a validação numérica
+    fica para _processar, para que uma linha ruim vire só um registro com erro.
+    """
+    if "bloco_1" in linha:
+        return calc_batch.payload_com_padroes(linha)
+    return calc_batch.payload_com_padroes(
+        {bloco: {campo: linha[campo] for campo in campos if linha.get(campo) is not None}
+         for bloco, campos in calc_batch.CAMPOS_BLOCOS.items()})
+
+
+def ler_portfolio(caminho: str) -> Iterator[Dict[str, Any]]:
+    """Gera {"id", "payload"}; sem coluna `id`, usa o número da linha."""
+    with open(caminho, encoding="utf-8", newline="") as f:
+        if caminho.lower().endswith(".csv"):
+            linhas = ({k: _valor_csv(v) for k, v in linha.items()} for linha in csv.DictReader(f))
+        else:
+            linhas = (json.loads(texto) for texto in f if texto.strip())
+        for numero, linha in enumerate(linhas, start=1):
+            identificador = linha.get("id")
+            yield {"id": str(identificador if identificador is not None else f"linha-{numero}"),
+                   "payload": _payload_de_linha(linha)}
+
+
+# ==========================================
+# 2. CONTROLE DE VAZÃO
+# ==========================================
+
+class BaldeTokens:
+    """Token bucket assíncrono: até `capacidade` chamadas de rajada, reposição a `taxa` por segundo."""
+
+    def __init__(self, taxa: float, capacidade: Optional[float] = None):
+        if not taxa > 0:
+            raise ValueError(f"Taxa do token bucket deve ser positiva (recebido {taxa})")
+        if capacidade is not None and not capacidade >= 1:
+            raise ValueError(f"Rajada do token bucket deve ser pelo menos 1 (recebido {capacidade})")
+        self.taxa = taxa
+        self.capacidade = capacidade if capacidade is not None else max(1.0, taxa)
+        self._tokens = self.capacidade
+        self._ultimo = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def adquirir(self) -> None:
+        async with self._lock:
+            while True:
+                agora = time.monotonic()
+                self._tokens = min(self.capacidade, self._tokens + (agora - self._ultimo) * self.taxa)
+                self._ultimo = agora
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.taxa)
+
+
+def espera_backoff(tentativa: int, base_s: float = BACKOFF_BASE_S, maximo_s: float = BACKOFF_MAX_S) -> float:
+    """Backoff exponencial com jitter completo: U(0, min(max, base * 2^tentativa))."""
+    return transporte_resiliente.espera_backoff(tentativa, base_s, maximo_s)
+
+
+# ==========================================
+# 3. CHECKPOINT E SAÍDA
+# ==========================================
+
+def caminho_checkpoint(caminho_saida: str) -> str:
+    return caminho_saida + ".checkpoint"
+
+
+def ler_checkpoint(caminho: str) -> Set[str]:
+    if not os.path.exists(caminho):
+        return set()
+    with open(caminho, encoding="utf-8") as f:
+        return {linha.rstrip("\n") for linha in f if linha.strip()}
+
+
+class Gravador:
+    """
+    Anexa cada resultado ao JSONL de saída assim que fica pronto e, só depois, registra
+    o id no checkpoint (com flush + fsync). Falhas vão para a saída, mas não para o
+    checkpoint: uma nova execução tenta de novo.
+    """
+
+    def __init__(self, caminho_saida: str):
+        self._saida = open(caminho_saida, "a", encoding="utf-8")
+        self._checkpoint = open(caminho_checkpoint(caminho_saida), "a", encoding="utf-8")
+
+    def gravar(self, registro: Dict[str, Any]) -> None:
+        self._saida.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        self._saida.flush()
+        if registro["status"] == "ok":
+            os.fsync(self._saida.fileno())
+            self._checkpoint.write(registro["id"] + "\n")
+            self._checkpoint.flush()
+            os.fsync(self._checkpoint.fileno())
+
+    def fechar(self) -> None:
+        self._saida.close()
+        self._checkpoint.close()
+
+
+# ==========================================
+# 4. EXECUÇÃO
+# ==========================================
+
+async def _processar(chain, item: Dict[str, Any], semaforo: asyncio.Semaphore, balde: BaldeTokens,
+                     tentativas: int, backoff_base_s: float
+                     ) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Retorna o registro da saída JSONL, as métricas completas e o payload validado (os dois
+    últimos vão para o repositório de cenários). Entrada inválida vira registro com erro, sem
+    chamar o LLM; erros de programação (ERROS_NAO_RETENTAVEIS) não são repetidos.
+    """
+    from langchain_agent import texto_do_chunk
+    inicio = time.perf_counter()
+    try:
+        payload = calc_batch.validar_payload(item["payload"])
+        metricas = calc_logic.calcula_metricas_genai(
+            payload["bloco_1"], payload["bloco_2"], payload["bloco_3"], provedor_custos.obter_tabela_custos()
+        )
+    except (ValueError,) + transporte_resiliente.ERROS_NAO_RETENTAVEIS as e:
+        return {"id": item["id"], "status": "erro", "tentativas": 0,
+                "duracao_s": round(time.perf_counter() - inicio, 3), "resultado": None,
+                "erro": f"{type(e).__name__}: {e}"}, None, item["payload"]
+    resultado = metricas["resultado"]
+    erro = None
+    feitas = 0
+    for tentativa in range(tentativas):
+        if tentativa:
+            if telemetria.ativa():
+                telemetria.metricas_padrao().contar("retries", pipeline="lote", etapa="relatorio")
+            await asyncio.sleep(espera_backoff(tentativa - 1, backoff_base_s))
+        feitas = tentativa + 1
+        async with semaforo:
+            await balde.adquirir()
+            try:
+                relatorio = texto_do_chunk(await chain.ainvoke(payload, telemetria.config_execucao("lote")))
+            except transporte_resiliente.ERROS_NAO_RETENTAVEIS as e:
+                erro = f"{type(e).__name__}: {e}"
+                break
+            except Exception as e:
+                erro = f"{type(e).__name__}: {e}"
+                continue
+        if renderizador_relatorio.AVISO_INDISPONIVEL in relatorio:
+            # Relatório saiu só com as seções locais: não entra no checkpoint, tenta de novo
+            erro = "ErroTransporte: " + renderizador_relatorio.AVISO_INDISPONIVEL
+            continue
+        return {"id": item["id"], "status": "ok", "tentativas": tentativa + 1,
+                "duracao_s": round(time.perf_counter() - inicio, 3),
+                "resultado": resultado, "relatorio": relatorio}, metricas, payload
+    return {"id": item["id"], "status": "erro", "tentativas": feitas,
+            "duracao_s": round(time.perf_counter() - inicio, 3), "resultado": resultado, "erro": erro}, metricas, payload
+
+
+def _reconciliar_repositorio(itens: List[Dict[str, Any]], concluidos: Set[str], caminho_saida: str,
+                             repositorio: repositorio_cenarios.RepositorioCenarios,
+                             tabela_custos: Mapping[str, Any]) -> int:
+    """
+    Ids do checkpoint sem linha no repositório (execução interrompida antes de gravar o lote)
+    voltam para lá com o relatório já salvo na saída, sem nova chamada ao LLM. Retorna quantos.
+    """
+    faltando = concluidos - repositorio.ids_externos("lote", concluidos)
+    if not faltando or not os.path.exists(caminho_saida):
+        return 0
+    relatorios: Dict[str, str] = {}
+    with open(caminho_saida, encoding="utf-8") as f:
+        for texto in f:
+            try:
+                registro = json.loads(texto)
+            except ValueError:
+                continue  # Linha truncada pela interrupção
+            if registro.get("status") == "ok" and registro.get("id") in faltando:
+                relatorios[registro["id"]] = registro["relatorio"]
+    registros = []
+    for item in itens:
+        if item["id"] not in relatorios:
+            continue
+        payload = calc_batch.validar_payload(item["payload"])
+        metricas = calc_logic.calcula_metricas_genai(payload["bloco_1"], payload["bloco_2"], payload["bloco_3"],
+                                                     tabela_custos)
+        registros.append(repositorio_cenarios.registro_cenario(
+            payload, metricas, relatorio=relatorios[item["id"]], origem="lote", id_externo=item["id"],
+            tabela_custos=tabela_custos))
+    for inicio in range(0, len(registros), config_mavi.REPOSITORIO_TAMANHO_LOTE):
+        repositorio.salvar_lote(registros[inicio:inicio + config_mavi.REPOSITORIO_TAMANHO_LOTE])
+    return len(registros)
+
+
+async def executar_lote(itens: List[Dict[str, Any]],
+                        caminho_saida: str,
+                        chain=None,
+                        max_concorrencia: int = MAX_CONCORRENCIA_PADRAO,
+                        rps: float = RPS_PADRAO,
+                        rajada: Optional[float] = None,
+                        tentativas: int = TENTATIVAS_PADRAO,
+                        backoff_base_s: float = BACKOFF_BASE_S,
+                        repositorio: Optional[repositorio_cenarios.RepositorioCenarios] = None) -> Dict[str, Any]:
+    """
+    Gera os relatórios pendentes (ids fora do checkpoint) e devolve o resumo da execução.
+    `max_concorrencia` limita chamadas simultâneas; `rps`/`rajada` limitam a vazão média e de pico.
+    Com `repositorio`, os concluídos também são gravados lá, em transações de
+    `config_mavi.REPOSITORIO_TAMANHO_LOTE` cenários (upsert por id). Ids do checkpoint que
+    uma interrupção deixou fora do repositório são regravados antes de começar.
+    """
+    if chain is None:
+        from langchain_agent import pipeline_relatorio  # Import tardio: `--help` e a leitura do portfólio não pagam pelo LLM
+        chain = pipeline_relatorio()
+    concluidos = ler_checkpoint(caminho_checkpoint(caminho_saida))
+    pendentes = [item for item in itens if item["id"] not in concluidos]
+    tabela_custos = provedor_custos.obter_tabela_custos()
+    reconciliados = 0
+    if repositorio is not None and concluidos:
+        reconciliados = _reconciliar_repositorio(itens, concluidos, caminho_saida, repositorio, tabela_custos)
+
+    semaforo = asyncio.Semaphore(max_concorrencia)
+    balde = BaldeTokens(rps, rajada)
+    gravador = Gravador(caminho_saida)
+    contagem = {"ok": 0, "erro": 0}
+    para_repositorio: List[Dict[str, Any]] = []
+    inicio = time.perf_counter()
+    tarefas: List[asyncio.Task] = []
+    try:
+        tarefas = [asyncio.create_task(_processar(chain, item, semaforo, balde, tentativas, backoff_base_s))
+                   for item in pendentes]
+        for concluida in asyncio.as_completed(tarefas):
+            registro, metricas, payload = await concluida
+            gravador.gravar(registro)
+            contagem[registro["status"]] += 1
+            if repositorio is not None and registro["status"] == "ok":
+                para_repositorio.append(repositorio_cenarios.registro_cenario(
+                    payload, metricas, relatorio=registro["relatorio"],
+                    origem="lote", id_externo=registro["id"], tabela_custos=tabela_custos))
+                if len(para_repositorio) >= config_mavi.REPOSITORIO_TAMANHO_LOTE:
+                    repositorio.salvar_lote(para_repositorio)
+                    para_repositorio.clear()
+            print(f"[{contagem['ok'] + contagem['erro']}/{len(pendentes)}] {registro['id']}: {registro['status']} "
+                  f"({registro['duracao_s']}s, {registro['tentativas']} tentativa(s))", file=sys.stderr)
+    finally:
+        for tarefa in tarefas:
+            tarefa.cancel()
+        gravador.fechar()
+        if para_repositorio:
+            repositorio.salvar_lote(para_repositorio)
+
+    duracao = time.perf_counter() - inicio
+    return {
+        "total": len(itens),
+        "pulados_checkpoint": len(itens) - len(pendentes),
+        "reconciliados_repositorio": reconciliados,
+        "ok": contagem["ok"],
+        "erros": contagem["erro"],
+        "duracao_s": round(duracao, 2),
+        "relatorios_por_min": round(60 * contagem["ok"] / duracao, 2) if duracao > 0 else 0.0,
+    }
+
+
+def _positivo(texto: str) -> float:
+    """Tipo do argparse para --rps: recusa zero e negativos antes de qualquer chamada."""
+    valor = float(texto)
+    if not valor > 0:
+        raise argparse.ArgumentTypeError(f"deve ser maior que zero: {texto}")
+    return valor
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Gera relatórios Mavi 5.0 em lote a partir de um CSV/JSONL.")
+    parser.add_argument("entrada", help="CSV (colunas planas) ou JSONL (aninhado bloco_1/2/3 ou plano)")
+    parser.add_argument("-o", "--saida", required=True, help="JSONL de saída (o checkpoint fica em <saida>.checkpoint)")
+    parser.add_argument("--max-concorrencia", type=int, default=MAX_CONCORRENCIA_PADRAO)
+    parser.add_argument("--rps", type=_positivo, default=RPS_PADRAO, help="Chamadas ao LLM por segundo (média)")
+    parser.add_argument("--rajada", type=float, default=None, help="Tamanho máximo da rajada do token bucket")
+    parser.add_argument("--tentativas", type=int, default=TENTATIVAS_PADRAO)
+    parser.add_argument("--backoff", type=float, default=BACKOFF_BASE_S, help="Base do backoff exponencial (s)")
+    parser.add_argument("--sem-repositorio", action="store_true", help="Não grava os cenários no repositório")
+    args = parser.parse_args(argv)
+
+    itens = list(ler_portfolio(args.entrada))
+    resumo = asyncio.run(executar_lote(
+        itens, args.saida,
+        max_concorrencia=args.max_concorrencia, rps=args.rps, rajada=args.rajada,
+        tentativas=args.tentativas, backoff_base_s=args.backoff,
+        repositorio=None if args.sem_repositorio else repositorio_cenarios.repositorio_padrao(),
+    ))
+    print(f"\nConcluídos: {resumo['ok']} | Erros: {resumo['erros']} | Já feitos (checkpoint): {resumo['pulados_checkpoint']}")
+    if resumo["reconciliados_repositorio"]:
+        print(f"Regravados no repositório (interrupção anterior): {resumo['reconciliados_repositorio']}")
+    print(f"Tempo: {resumo['duracao_s']}s | Vazão: {resumo['relatorios_por_min']} relatórios/min")
+    return 1 if resumo["erros"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,226 @@
+# bench_api.py
+# Mavi.IA 5.0 - Teste de Carga da API HTTP Local (api_http.py)
+# Sobe a API e um ServidorLLMFake; mede POST /metrics (unitário e em lote), rajadas de relatórios
+# idênticos (coalescência) e carga de relatórios distintos acima da capacidade do pool (fila e 503)
+#
+# Uso:
+#   python benchmarks/bench_api.py --requisicoes 2000 --conexoes 16 [--json api.json]
+# Sai com código 1 se /metrics passar de 1 ms por cenário no servidor, se uma rajada idêntica
+# custar mais de uma chamada ao LLM ou se a fila passar do limite.
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["MAVI_CACHE_DIR"] = tempfile.mkdtemp(prefix="mavi-bench-")  # Cache de relatórios descartável
+
+import api_http  # noqa: E402
+import llm_fake  # noqa: E402
+import registro_llm  # noqa: E402
+from bench_hot_paths import PAYLOAD  # noqa: E402
+
+ORCAMENTO_POR_CENARIO_MS = 1.0   # p95 do servidor em /metrics, dividido pelo tamanho do lote
+
+
+# ==========================================
+# 1. CLIENTE HTTP (KEEP-ALIVE, ASYNCIO)
+# ==========================================
+
+class Conexao:
+    """Uma conexão HTTP/1.1 persistente; pedidos em sequência (como um cliente real)."""
+
+    def __init__(self, host: str, porta: int):
+        self.host, self.porta = host, porta
+        self._leitor: Optional[asyncio.StreamReader] = None
+        self._escritor: Optional[asyncio.StreamWriter] = None
+
+    async def pedir(self, metodo: str, caminho: str, corpo: Any = None) -> Tuple[int, Any]:
+        if self._escritor is None:
+            self._leitor, self._escritor = await asyncio.open_connection(self.host, self.porta)
+        dados = b"" if corpo is None else json.dumps(corpo).encode("utf-8")
+        self._escritor.write(f"{metodo} {caminho} HTTP/1.1\r\nHost: {self.host}\r\n"
+                             f"Content-Type: application/json\r\nContent-Length: {len(dados)}\r\n\r\n".encode("ascii")
+                             + dados)
+        await self._escritor.drain()
+        cabecalho = (await self._leitor.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")
+        status = int(cabecalho[0].split(" ")[1])
+        tamanho = next(int(l.split(":", 1)[1]) for l in cabecalho if l.lower().startswith("content-length"))
+        return status, json.loads(await self._leitor.readexactly(tamanho))
+
+    def fechar(self) -> None:
+        if self._escritor is not None:
+            self._escritor.close()
+
+
+async def disparar(servidor: api_http.ServidorAPI, pedidos: List[Tuple[str, str, Any]],
+                   conexoes: int) -> List[Tuple[float, int, Any]]:
+    """Distribui os pedidos entre `conexoes` conexões simultâneas; devolve (duração, status, corpo)."""
+    fila = list(enumerate(pedidos))
+    resultados: List[Optional[Tuple[float, int, Any]]] = [None] * len(pedidos)
+
+    async def cliente():
+        conexao = Conexao(servidor.host, servidor.porta)
+        try:
+            while fila:
+                i, (metodo, caminho, corpo) = fila.pop()
+                inicio = time.perf_counter()
+                status, resposta = await conexao.pedir(metodo, caminho, corpo)
+                resultados[i] = (time.perf_counter() - inicio, status, resposta)
+        finally:
+            conexao.fechar()
+
+    await asyncio.gather(*(cliente() for _ in range(conexoes)))
+    return resultados
+
+
+def percentis_ms(amostras_s: List[float]) -> Dict[str, float]:
+    quantis = statistics.quantiles(amostras_s, n=100, method="inclusive")
+    return {"p50_ms": round(1000 * quantis[49], 3), "p95_ms": round(1000 * quantis[94], 3),
+            "p99_ms": round(1000 * quantis[98], 3)}
+
+
+def _variante(i: int) -> Dict[str, Any]:
+    return {**PAYLOAD, "bloco_1": {**PAYLOAD["bloco_1"], "volume_mensal": 1000 + i}}
+
+
+# ==========================================
+# 2. CENÁRIOS
+# ==========================================
+
+async def cenario_metricas(servidor, args) -> Dict[str, Any]:
+    saida = {}
+    for nome, corpo, cenarios in (("unitario", PAYLOAD, 1),
+                                  ("lote", {"cenarios": [_variante(i) for i in range(args.lote)]}, args.lote)):
+        servidor.api.estatisticas = api_http.EstatisticasRotas()  # Janela do servidor só com esta fase
+        quantidade = args.requisicoes if cenarios == 1 else max(20, args.requisicoes // 50)
+        inicio = time.perf_counter()
+        resultados = await disparar(servidor, [("POST", "/metrics", corpo)] * quantidade, args.conexoes)
+        duracao = time.perf_counter() - inicio
+        saida[nome] = {"cenarios_por_pedido": cenarios, "pedidos": quantidade,
+                       "erros": sum(status != 200 for _, status, _ in resultados),
+                       "pedidos_por_s": round(quantidade / duracao), "cenarios_por_s": round(quantidade * cenarios / duracao),
+                       "cliente": percentis_ms([d for d, _, _ in resultados])}
+        # Tempo no servidor (parse do corpo + cálculo), sem rede nem o JSON do cliente
+        estatisticas = (await disparar(servidor, [("GET", "/stats", None)], 1))[0][2]
+        servidor_ms = estatisticas["rotas"]["POST /metrics"]
+        saida[nome]["servidor"] = servidor_ms
+        saida[nome]["servidor_p95_por_cenario_ms"] = round(servidor_ms["p95_ms"] / cenarios, 4)
+    return saida
+
+
+async def cenario_rajada(servidor, llm: llm_fake.ServidorLLMFake, args) -> Dict[str, Any]:
+    """`rajada` cliques simultâneos no mesmo relatório, repetido para `grupos` payloads diferentes."""
+    antes = llm.contagem["requisicoes"]
+    coalescidos = 0
+    for grupo in range(args.grupos):
+        payload = _variante(10_000 + grupo)
+        resultados = await disparar(servidor, [("POST", "/report", payload)] * args.rajada, args.rajada)
+        coalescidos += sum(corpo.get("coalescido", False) for _, status, corpo in resultados if status == 200)
+    return {"grupos": args.grupos, "pedidos": args.grupos * args.rajada, "coalescidos": coalescidos,
+            "chamadas_llm": llm.contagem["requisicoes"] - antes}
+
+
+async def cenario_sobrecarga(servidor, args) -> Dict[str, Any]:
+    """Relatórios distintos com mais conexões do que trabalhadores + fila: parte recebe 503."""
+    pedidos = [("POST", "/report", _variante(20_000 + i)) for i in range(args.distintos)]
+    amostras_fila: List[int] = []
+    parar = asyncio.Event()
+
+    async def observar():
+        conexao = Conexao(servidor.host, servidor.porta)
+        while not parar.is_set():
+            _, estado = await conexao.pedir("GET", "/stats")
+            amostras_fila.append(estado["pool"]["profundidade_fila"])
+            await asyncio.sleep(0.01)
+        conexao.fechar()
+
+    observador = asyncio.create_task(observar())
+    inicio = time.perf_counter()
+    resultados = await disparar(servidor, pedidos, args.distintos)
+    duracao = time.perf_counter() - inicio
+    parar.set()
+    await observador
+    ok = [d for d, status, _ in resultados if status == 200]
+    return {"pedidos": len(pedidos), "ok": len(ok), "rejeitados_503": sum(s == 503 for _, s, _ in resultados),
+            "outros_erros": sum(s not in (200, 503) for _, s, _ in resultados),
+            "duracao_s": round(duracao, 2), "fila_max_observada": max(amostras_fila, default=0),
+            "ok_latencia": percentis_ms(ok) if len(ok) > 1 else {}}
+
+
+# ==========================================
+# 3. EXECUÇÃO
+# ==========================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga da API HTTP local (Mavi 5.0).")
+    parser.add_argument("--requisicoes", type=int, default=2000, help="Pedidos unitários a POST /metrics")
+    parser.add_argument("--lote", type=int, default=1000, help="Cenários por pedido no /metrics em lote")
+    parser.add_argument("--conexoes", type=int, default=16)
+    parser.add_argument("--rajada", type=int, default=20, help="Cliques simultâneos no mesmo relatório")
+    parser.add_argument("--grupos", type=int, default=5)
+    parser.add_argument("--distintos", type=int, default=60, help="Relatórios distintos simultâneos")
+    parser.add_argument("--trabalhadores", type=int, default=4)
+    parser.add_argument("--fila-max", type=int, default=16)
+    parser.add_argument("--latencia-llm-ms", type=float, default=300.0)
+    parser.add_argument("--json", help="Grava o resultado neste arquivo")
+    args = parser.parse_args()
+
+    with llm_fake.ServidorLLMFake(latencia_primeiro_token_s=args.latencia_llm_ms / 1000) as llm:
+        registro_llm.configurar_fabrica_cliente(llm_fake.fabrica_http_fake(llm.url))
+        api = api_http.APIMavi(api_http.PoolTrabalho(args.trabalhadores, args.fila_max))
+        with api_http.ServidorAPI(api, porta=0) as servidor:
+            resultado = {"metricas": asyncio.run(cenario_metricas(servidor, args)),
+                         "rajada": asyncio.run(cenario_rajada(servidor, llm, args)),
+                         "sobrecarga": asyncio.run(cenario_sobrecarga(servidor, args))}
+
+    m = resultado["metricas"]
+    print(f"{'/metrics':10} {'pedidos/s':>10} {'cenários/s':>12} {'p50':>10} {'p99':>10}  (cliente)")
+    for nome in ("unitario", "lote"):
+        r = m[nome]
+        print(f"{nome:10} {r['pedidos_por_s']:>10} {r['cenarios_por_s']:>12} "
+              f"{r['cliente']['p50_ms']:>8.2f}ms {r['cliente']['p99_ms']:>8.2f}ms")
+    for nome in ("unitario", "lote"):
+        print(f"servidor {nome}: p50 {m[nome]['servidor']['p50_ms']}ms · p95 {m[nome]['servidor']['p95_ms']}ms "
+              f"por pedido · {m[nome]['servidor_p95_por_cenario_ms']}ms por cenário")
+    r = resultado["rajada"]
+    print(f"\nRajadas: {r['pedidos']} pedidos em {r['grupos']} grupos -> {r['chamadas_llm']} chamada(s) ao LLM "
+          f"({r['coalescidos']} coalescidos)")
+    r = resultado["sobrecarga"]
+    print(f"Sobrecarga: {r['ok']} ok · {r['rejeitados_503']} com 503 · fila máx. observada "
+          f"{r['fila_max_observada']}/{args.fila_max} · {r['duracao_s']}s")
+
+    falhas = []
+    unitario, lote = m["unitario"], m["lote"]
+    if unitario["erros"] or lote["erros"]:
+        falhas.append(f"/metrics com erros: {unitario['erros']} unitário, {lote['erros']} lote")
+    por_cenario_ms = max(unitario["servidor_p95_por_cenario_ms"], lote["servidor_p95_por_cenario_ms"])
+    if por_cenario_ms > ORCAMENTO_POR_CENARIO_MS:
+        falhas.append(f"/metrics a {por_cenario_ms:.3f}ms por cenário (> {ORCAMENTO_POR_CENARIO_MS}ms)")
+    if resultado["rajada"]["chamadas_llm"] != args.grupos:
+        falhas.append(f"{args.grupos} rajadas custaram {resultado['rajada']['chamadas_llm']} chamadas ao LLM")
+    sobrecarga = resultado["sobrecarga"]
+    if sobrecarga["outros_erros"] or sobrecarga["fila_max_observada"] > args.fila_max:
+        falhas.append(f"sobrecarga fora do contrato: {sobrecarga}")
+    if args.distintos > args.trabalhadores + args.fila_max and not sobrecarga["rejeitados_503"]:
+        falhas.append("sobrecarga sem nenhuma rejeição (fila sem limite?)")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, ensure_ascii=False, indent=2)
+    if falhas:
+        print("\nFalhas:")
+        for falha in falhas:
+            print(f"  - {falha}")
+        sys.exit(1)
+    print("\nOK")
+
+
+if __name__ == "__main__":
+    main()
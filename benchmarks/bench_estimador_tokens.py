@@ -0,0 +1,142 @@
+# bench_estimador_tokens.py
+# Mavi.IA 5.0 - Benchmark do Estimador de Tokens por Amostras (estimador_tokens.py)
+# Gera um corpus sintético (contratos em arquivos + exportação de tickets, uma linha por ticket), mede
+# a contagem a frio (mmap + pool) e a quente (cache por hash) e compara com a leitura ingênua em Python
+#
+# Uso:
+#   python benchmarks/bench_estimador_tokens.py --mib 1024 [--processos 8] [--json estimador.json]
+# Sai com código 1 se a contagem divergir de memoria_chat.estimar_tokens ou se a segunda passada reler arquivos.
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["MAVI_CACHE_DIR"] = tempfile.mkdtemp(prefix="mavi-bench-")  # Cache de contagens descartável
+
+import numpy as np  # noqa: E402
+
+import estimador_tokens  # noqa: E402
+from memoria_chat import estimar_tokens  # noqa: E402
+
+VOCABULARIO = ("contrato prestação serviços cláusula rescisão multa vigência partes contratante contratada "
+               "obrigações pagamento parcela reajuste índice IPCA confidencialidade foro comarca São Paulo "
+               "responsabilidade solidária garantia aditivo anexo técnico nível serviço SLA chamado atendimento "
+               "usuário senha acesso sistema erro boleto segunda via cancelamento reembolso").split()
+
+
+def _texto(sorteio: random.Random, palavras: int) -> str:
+    linhas, atual = [], []
+    for _ in range(palavras):
+        atual.append(sorteio.choice(VOCABULARIO))
+        if sorteio.random() < 0.08:
+            linhas.append(" ".join(atual) + ".")
+            atual = []
+    linhas.append(" ".join(atual))
+    return "\n".join(linhas)
+
+
+def gerar_corpus(pasta: str, mib: int, semente: int) -> Dict[str, str]:
+    """Metade em contratos (um por arquivo, tamanho lognormal) e metade numa exportação de tickets."""
+    sorteio = random.Random(semente)
+    contratos = os.path.join(pasta, "contratos")
+    tickets = os.path.join(pasta, "tickets")
+    os.makedirs(contratos)
+    os.makedirs(tickets)
+    metade = mib * 2**20 // 2
+    escritos, i = 0, 0
+    modelos = [_texto(sorteio, int(sorteio.lognormvariate(7.5, 0.6))) for _ in range(200)]
+    while escritos < metade:
+        with open(os.path.join(contratos, f"contrato_{i:06d}.txt"), "w", encoding="utf-8") as f:
+            escritos += f.write(modelos[i % len(modelos)] + f"\nContrato nº {i}.\n")
+        i += 1
+    linhas = [_texto(sorteio, int(sorteio.lognormvariate(4.5, 0.7))).replace("\n", " ") for _ in range(500)]
+    with open(os.path.join(tickets, "exportacao.csv"), "w", encoding="utf-8", newline="") as f:
+        escritos, j = 0, 0
+        while escritos < metade:
+            escritos += f.write(f"{j};{linhas[j % len(linhas)]}\r\n")
+            j += 1
+    return {"documento": contratos, "linha": tickets}
+
+
+def ingenuo(pasta: str, unidade: str, limite_bytes: int) -> Dict[str, Any]:
+    """Leitura em Python puro (decode + estimar_tokens por unidade) sobre os primeiros `limite_bytes`."""
+    inicio, lidos, tokens = time.perf_counter(), 0, []
+    for caminho in estimador_tokens.listar_amostras(pasta):
+        with open(caminho, encoding="utf-8") as f:
+            if unidade == "documento":
+                texto = f.read()
+                lidos += len(texto.encode("utf-8"))
+                tokens.append(estimar_tokens(texto))
+            else:
+                for linha in f:
+                    lidos += len(linha.encode("utf-8"))
+                    linha = linha.rstrip("\n")
+                    if linha.split():
+                        tokens.append(estimar_tokens(linha))
+                    if lidos >= limite_bytes:
+                        break
+        if lidos >= limite_bytes:
+            break
+    return {"tokens": tokens, "mib_por_s": round(lidos / 2**20 / (time.perf_counter() - inicio), 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do estimador de tokens por amostras (Mavi 5.0).")
+    parser.add_argument("--mib", type=int, default=512, help="Tamanho total do corpus sintético")
+    parser.add_argument("--processos", type=int, default=None)
+    parser.add_argument("--amostra-ingenua-mib", type=int, default=32, help="Bytes lidos pelo caminho ingênuo")
+    parser.add_argument("--semente", type=int, default=11)
+    parser.add_argument("--json", help="Grava o resultado neste arquivo")
+    args = parser.parse_args()
+
+    pastas = gerar_corpus(tempfile.mkdtemp(prefix="mavi-bench-"), args.mib, args.semente)
+    cache = estimador_tokens.cache_padrao()
+    resultado: Dict[str, Any] = {"mib": args.mib}
+    falhas: List[str] = []
+    for unidade, pasta in pastas.items():
+        frio = estimador_tokens.estimar_pasta(pasta, unidade, cache=cache, processos=args.processos)
+        quente = estimador_tokens.estimar_pasta(pasta, unidade, cache=cache, processos=args.processos)
+        base = ingenuo(pasta, unidade, args.amostra_ingenua_mib * 2**20)
+        # Mesmas unidades, na mesma ordem: as primeiras contagens do estimador batem com o ingênuo
+        caracteres, palavras, _ = estimador_tokens.contar_arquivos(estimador_tokens.listar_amostras(pasta), unidade, cache)
+        vetor = estimador_tokens.tokens_de_contagens(caracteres, palavras)[:len(base["tokens"])]
+        divergentes = int(np.count_nonzero(vetor != np.array(base["tokens"])))
+        resultado[unidade] = {
+            "unidades": frio.unidades, "arquivos": frio.arquivos, "p50": frio.p50, "p95": frio.p95,
+            "frio_s": frio.duracao_s, "frio_mib_por_s": round(frio.bytes / 2**20 / max(frio.duracao_s, 1e-9), 1),
+            "quente_s": quente.duracao_s, "quente_em_cache": quente.arquivos_em_cache,
+            "ingenuo_mib_por_s": base["mib_por_s"], "conferidas": len(base["tokens"]), "divergentes": divergentes,
+        }
+        if divergentes:
+            falhas.append(f"{unidade}: {divergentes} de {len(base['tokens'])} unidades divergem de estimar_tokens")
+        if quente.arquivos_em_cache != quente.arquivos:
+            falhas.append(f"{unidade}: segunda passada releu {quente.arquivos - quente.arquivos_em_cache} arquivo(s)")
+        if (frio.p50, frio.p95) != (quente.p50, quente.p95):
+            falhas.append(f"{unidade}: cache mudou a distribuição")
+
+    print(f"Corpus de {args.mib} MiB")
+    print(f"{'unidade':10} {'unidades':>9} {'p50':>6} {'p95':>6} {'frio':>9} {'MiB/s':>8} {'quente':>8} {'ingênuo':>9}")
+    for unidade in pastas:
+        r = resultado[unidade]
+        print(f"{unidade:10} {r['unidades']:>9} {r['p50']:>6} {r['p95']:>6} {r['frio_s']:>8.2f}s "
+              f"{r['frio_mib_por_s']:>8.1f} {r['quente_s']:>7.3f}s {r['ingenuo_mib_por_s']:>6.1f}MiB/s")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, ensure_ascii=False, indent=2)
+    if falhas:
+        print("\nFalhas:")
+        for falha in falhas:
+            print(f"  - {falha}")
+        sys.exit(1)
+    print("\nOK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# bench_extracao_regras.py
+# Mavi.IA 5.0 - Benchmark do Extrator por Regras
+# Precisão/recall por campo no corpus rotulado e % de turnos atendidos sem chamar o LLM
+#
+# Uso: python benchmarks/bench_extracao_regras.py [--corpus ARQ] [--limiar 0.8] [--json SAIDA]
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extrator_regras import LIMIAR_CONFIANCA, extrair_regras  # noqa: E402
+
+CORPUS_PADRAO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus_extracao.jsonl")
+
+
+def _iguais(a, b) -> bool:
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)):
+        return abs(a - b) <= 1e-6 * max(1.0, abs(b))
+    return a == b
+
+
+def avaliar(corpus, limiar: float):
+    contagem = defaultdict(lambda: {"vp": 0, "fp": 0, "fn": 0})
+    sem_llm = corretos_sem_llm = 0
+    erros = []
+
+    inicio = time.perf_counter()
+    resultados = [extrair_regras(item["texto"], limiar) for item in corpus]
+    duracao = time.perf_counter() - inicio
+
+    for item, r in zip(corpus, resultados):
+        esperado, obtido = item["esperado"], r.aceitos
+        for campo in set(esperado) | set(obtido):
+            if campo in obtido and campo in esperado and _iguais(obtido[campo], esperado[campo]):
+                contagem[campo]["vp"] += 1
+                continue
+            if campo in obtido:
+                contagem[campo]["fp"] += 1
+            if campo in esperado:
+                contagem[campo]["fn"] += 1
+        exato = set(obtido) == set(esperado) and all(_iguais(obtido[c], esperado[c]) for c in esperado)
+        if not r.precisa_llm:
+            sem_llm += 1
+            corretos_sem_llm += exato
+            if not exato:
+                erros.append({"texto": item["texto"], "esperado": esperado, "obtido": obtido})
+
+    def taxas(c):
+        precisao = c["vp"] / (c["vp"] + c["fp"]) if c["vp"] + c["fp"] else 1.0
+        recall = c["vp"] / (c["vp"] + c["fn"]) if c["vp"] + c["fn"] else 1.0
+        return round(precisao, 4), round(recall, 4)
+
+    total = {k: sum(c[k] for c in contagem.values()) for k in ("vp", "fp", "fn")}
+    precisao, recall = taxas(total)
+    return {
+        "turnos": len(corpus),
+        "limiar": limiar,
+        "precisao": precisao,
+        "recall": recall,
+        "turnos_sem_llm": sem_llm,
+        "pct_turnos_sem_llm": round(100 * sem_llm / len(corpus), 1),
+        "pct_corretos_entre_sem_llm": round(100 * corretos_sem_llm / sem_llm, 1) if sem_llm else 0.0,
+        "us_por_turno": round(1e6 * duracao / len(corpus), 1),
+        "por_campo": {campo: dict(zip(("precisao", "recall"), taxas(c))) | c for campo, c in sorted(contagem.items())},
+        "erros_sem_llm": erros,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--corpus", default=CORPUS_PADRAO)
+    parser.add_argument("--limiar", type=float, default=LIMIAR_CONFIANCA)
+    parser.add_argument("--json", help="Grava o resultado completo neste arquivo")
+    args = parser.parse_args()
+
+    with open(args.corpus, encoding="utf-8") as f:
+        corpus = [json.loads(linha) for linha in f if linha.strip()]
+    r = avaliar(corpus, args.limiar)
+
+    print(f"Turnos: {r['turnos']} | limiar de confiança: {r['limiar']}")
+    print(f"Precisão: {r['precisao']:.1%} | Recall: {r['recall']:.1%}")
+    print(f"Atendidos sem LLM: {r['turnos_sem_llm']} ({r['pct_turnos_sem_llm']}%), "
+          f"corretos entre eles: {r['pct_corretos_entre_sem_llm']}%")
+    print(f"Custo local: {r['us_por_turno']} µs/turno\n")
+    print(f"{'campo':32} {'prec':>6} {'rec':>6} {'vp':>4} {'fp':>4} {'fn':>4}")
+    for campo, c in r["por_campo"].items():
+        print(f"{campo:32} {c['precisao']:>6.2f} {c['recall']:>6.2f} {c['vp']:>4} {c['fp']:>4} {c['fn']:>4}")
+    for erro in r["erros_sem_llm"]:
+        print(f"\n[erro sem LLM] {erro['texto']}\n  esperado={erro['esperado']}\n  obtido={erro['obtido']}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(r, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+# bench_hot_paths.py
+# Mavi.IA 5.0 - Benchmark dos Caminhos Quentes (cálculo, formatação e chain completa)
+# Micro: calcula_metricas_genai, formatar_dados_para_prompt, lookup_dynamic_costs
+# Ponta a ponta: pipeline de relatório com o ChatFake (llm_fake.py), latência configurável
+#
+# Uso:
+#   python benchmarks/bench_hot_paths.py --json base.json
+#   python benchmarks/bench_hot_paths.py --json novo.json --comparar base.json [--tolerancia 10]
+# Com --comparar, sai com código 1 se algum p50/p95 piorar mais que a tolerância (%).
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["MAVI_CACHE_DIR"] = tempfile.mkdtemp(prefix="mavi-bench-")  # Cache de relatórios descartável
+
+import calc_logic  # noqa: E402
+import langchain_agent  # noqa: E402
+import llm_fake  # noqa: E402
+import provedor_custos  # noqa: E402
+import registro_llm  # noqa: E402
+
+PAYLOAD = {
+    "bloco_1": {"tipo_projeto": "automacao", "volume_mensal": 5000, "tempo_por_unidade_min": 5.0,
+                "salario_hora_brl": 45.0, "custo_por_ticket_brl": 25.0},
+    "bloco_2": {"modelo_llm": "gemini-2.5-flash", "tokens_input_por_unidade": 2000, "tokens_output_por_unidade": 500,
+                "custo_infra_mensal_brl": 200.0, "custo_implementacao_capex_brl": 10000.0},
+    "bloco_3": {"taxa_revisao_percentual": 20, "tempo_revisao_min": 1.0, "taxa_retencao_ia_percentual": 30.0},
+}
+
+
+def _variante(i: int) -> Dict[str, Any]:
+    """Payload com volume diferente a cada iteração: força miss no cache de relatórios."""
+    return {**PAYLOAD, "bloco_1": {**PAYLOAD["bloco_1"], "volume_mensal": 5000 + i}}
+
+
+# ==========================================
+# 1. MEDIÇÃO
+# ==========================================
+
+def percentis(amostras_us: List[float]) -> Dict[str, float]:
+    quantis = statistics.quantiles(amostras_us, n=100, method="inclusive")
+    return {
+        "n": len(amostras_us),
+        "p50_us": round(quantis[49], 2),
+        "p95_us": round(quantis[94], 2),
+        "p99_us": round(quantis[98], 2),
+        "media_us": round(statistics.fmean(amostras_us), 2),
+    }
+
+
+def medir_tempo(funcao: Callable[[int], Any], iteracoes: int, aquecimento: int) -> List[float]:
+    for i in range(aquecimento):
+        funcao(-1 - i)
+    amostras = []
+    for i in range(iteracoes):
+        inicio = time.perf_counter_ns()
+        funcao(i)
+        amostras.append((time.perf_counter_ns() - inicio) / 1000)
+    return amostras
+
+
+def medir_alocacoes(funcao: Callable[[int], Any], iteracoes: int) -> Dict[str, float]:
+    """Pico de memória alocada e bytes retidos por chamada (tracemalloc, em passada separada)."""
+    picos, retidos = [], []
+    tracemalloc.start()
+    try:
+        for i in range(iteracoes):
+            antes = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            funcao(10_000_000 + i)
+            atual, pico = tracemalloc.get_traced_memory()
+            picos.append(pico - antes)
+            retidos.append(atual - antes)
+    finally:
+        tracemalloc.stop()
+    return {"pico_alocacao_bytes": int(statistics.median(picos)), "retido_bytes": int(statistics.median(retidos))}
+
+
+# ==========================================
+# 2. CENÁRIOS
+# ==========================================
+
+def cenarios_micro() -> Dict[str, Callable[[int], Any]]:
+    tabela = provedor_custos.obter_tabela_custos()
+    contexto = langchain_agent.lookup_dynamic_costs(PAYLOAD)
+    metricas = calc_logic.calcula_metricas_genai(PAYLOAD["bloco_1"], PAYLOAD["bloco_2"], PAYLOAD["bloco_3"], tabela)
+    entrada_formatacao = {"metrics": metricas, "original_context": contexto}
+    return {
+        "calcula_metricas_genai": lambda _: calc_logic.calcula_metricas_genai(
+            PAYLOAD["bloco_1"], PAYLOAD["bloco_2"], PAYLOAD["bloco_3"], tabela),
+        "formatar_dados_para_prompt": lambda _: langchain_agent.formatar_dados_para_prompt(entrada_formatacao),
+        "lookup_dynamic_costs": lambda _: langchain_agent.lookup_dynamic_costs(PAYLOAD),
+    }
+
+
+def cenarios_chain(metricas_stream: Dict[str, List[float]]) -> Dict[str, Callable[[int], Any]]:
+    chain = langchain_agent.pipeline_relatorio()
+
+    def stream_miss(i: int) -> None:
+        metricas: Dict[str, float] = {}
+        for _ in langchain_agent.stream_texto(chain, _variante(i), metricas):
+            pass
+        metricas_stream.setdefault("chain_stream_cache_miss", []).append(metricas["ttft_s"] * 1e6)
+
+    def astream_miss(i: int) -> None:
+        async def consumir():
+            async for _ in langchain_agent.astream_texto(chain, _variante(20_000_000 + i)):
+                pass
+        asyncio.run(consumir())
+
+    return {
+        "chain_invoke_cache_miss": lambda i: chain.invoke(_variante(30_000_000 + i)),
+        "chain_stream_cache_miss": stream_miss,
+        "chain_astream_cache_miss": astream_miss,
+        "chain_invoke_cache_hit": lambda _: chain.invoke(PAYLOAD),
+    }
+
+
+def executar(args) -> Dict[str, Any]:
+    registro_llm.configurar_fabrica_cliente(llm_fake.fabrica_fake(
+        latencia_primeiro_token_s=args.latencia_primeiro_ms / 1000,
+        latencia_por_chunk_s=args.latencia_chunk_ms / 1000,
+    ))
+    resultados: Dict[str, Any] = {}
+
+    for nome, funcao in cenarios_micro().items():
+        resultados[nome] = percentis(medir_tempo(funcao, args.iteracoes, aquecimento=100))
+        resultados[nome].update(medir_alocacoes(funcao, min(args.iteracoes, 200)))
+
+    ttft: Dict[str, List[float]] = {}
+    aquecimento_chain = 2
+    for nome, funcao in cenarios_chain(ttft).items():
+        resultados[nome] = percentis(medir_tempo(funcao, args.iteracoes_chain, aquecimento_chain))
+        if nome in ttft:  # Tempo até o primeiro trecho, só da passada de tempo (sem o aquecimento)
+            resultados[nome]["ttft"] = percentis(ttft.pop(nome)[aquecimento_chain:])
+        resultados[nome].update(medir_alocacoes(funcao, min(args.iteracoes_chain, 10)))
+        ttft.clear()
+    return {
+        "meta": {
+            "data": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "iteracoes": args.iteracoes,
+            "iteracoes_chain": args.iteracoes_chain,
+            "latencia_primeiro_ms": args.latencia_primeiro_ms,
+            "latencia_chunk_ms": args.latencia_chunk_ms,
+        },
+        "resultados": resultados,
+    }
+
+
+# ==========================================
+# 3. COMPARAÇÃO ENTRE EXECUÇÕES
+# ==========================================
+
+def comparar(base: Dict[str, Any], atual: Dict[str, Any], tolerancia_pct: float) -> List[str]:
+    """Imprime a variação de p50/p95 por cenário; devolve as regressões acima da tolerância."""
+    regressoes = []
+    print(f"\n{'cenário':28} {'métrica':8} {'base':>12} {'atual':>12} {'Δ%':>8}")
+    for nome, r in atual["resultados"].items():
+        anterior = base["resultados"].get(nome)
+        if anterior is None:
+            continue
+        for metrica in ("p50_us", "p95_us"):
+            delta = 100 * (r[metrica] - anterior[metrica]) / anterior[metrica] if anterior[metrica] else 0.0
+            marca = " ✗" if delta > tolerancia_pct else ""
+            print(f"{nome:28} {metrica[:3]:8} {anterior[metrica]:>12.1f} {r[metrica]:>12.1f} {delta:>+7.1f}%{marca}")
+            if marca:
+                regressoes.append(f"{nome} {metrica[:3]}: {delta:+.1f}%")
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dos caminhos quentes do Mavi 5.0.")
+    parser.add_argument("--iteracoes", type=int, default=2000, help="Iterações dos microbenchmarks")
+    parser.add_argument("--iteracoes-chain", type=int, default=30, help="Iterações da chain ponta a ponta")
+    parser.add_argument("--latencia-primeiro-ms", type=float, default=20.0, help="TTFT do modelo fake")
+    parser.add_argument("--latencia-chunk-ms", type=float, default=2.0, help="Intervalo entre chunks do modelo fake")
+    parser.add_argument("--json", help="Grava o resultado neste arquivo")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior para comparar")
+    parser.add_argument("--tolerancia", type=float, default=10.0, help="Piora máxima aceita em p50/p95 (%%)")
+    args = parser.parse_args()
+
+    resultado = executar(args)
+    print(f"{'cenário':28} {'p50':>11} {'p95':>11} {'p99':>11} {'pico alloc':>11} {'retido':>9}")
+    for nome, r in resultado["resultados"].items():
+        print(f"{nome:28} {r['p50_us']:>9.1f}µs {r['p95_us']:>9.1f}µs {r['p99_us']:>9.1f}µs "
+              f"{r['pico_alocacao_bytes']:>10}B {r['retido_bytes']:>8}B")
+        if "ttft" in r:
+            t = r["ttft"]
+            print(f"{'  └ primeiro trecho':28} {t['p50_us']:>9.1f}µs {t['p95_us']:>9.1f}µs {t['p99_us']:>9.1f}µs")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, ensure_ascii=False, indent=2)
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            regressoes = comparar(json.load(f), resultado, args.tolerancia)
+        if regressoes:
+            print("\nRegressões:")
+            for regressao in regressoes:
+                print(f"  - {regressao}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
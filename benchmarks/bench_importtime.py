@@ -0,0 +1,127 @@
+# bench_importtime.py
+# Mavi.IA 5.0 - Tempo de Importação dos Módulos (python -X importtime)
+# Mede cada módulo num processo novo e falha se o motor financeiro voltar a puxar a stack de LLM
+#
+# Uso: python benchmarks/bench_importtime.py [--repeticoes 3] [--folga 1.5] [--json SAIDA]
+# Sai com código 1 em caso de regressão (import proibido ou orçamento de tempo estourado).
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Pacotes que só podem ser carregados sob demanda (primeiro uso do LLM)
+# (google.protobuf fica de fora: o próprio streamlit o carrega)
+PACOTES_LLM = ("langchain", "langchain_core", "langchain_google_genai", "google.genai", "google.ai",
+               "google.generativeai", "google.api_core", "dotenv")
+
+# módulo -> (pacotes proibidos, orçamento em ms do import cumulativo)
+# Orçamentos com margem larga para máquinas lentas; `--folga` escala todos.
+MODULOS = {
+    "config_mavi": (PACOTES_LLM + ("pydantic", "numpy"), 30),
+    "calc_logic": (PACOTES_LLM + ("pydantic",), 40),
+    "calc_batch": (PACOTES_LLM + ("pydantic",), 300),
+    "solver_breakeven": (PACOTES_LLM + ("pydantic",), 300),
+    "otimizador_modelos": (PACOTES_LLM + ("pydantic",), 300),
+    "simulacao_monte_carlo": (PACOTES_LLM + ("pydantic",), 300),
+    "projecao_fluxo_caixa": (PACOTES_LLM + ("pydantic",), 300),
+    "provedor_custos": (PACOTES_LLM + ("pydantic", "urllib.request"), 60),
+    "renderizador_relatorio": (PACOTES_LLM + ("pydantic",), 40),
+    "extrator_regras": (PACOTES_LLM + ("pydantic",), 120),
+    "cache_relatorios": (PACOTES_LLM + ("pydantic",), 60),
+    "registro_llm": (PACOTES_LLM + ("pydantic",), 30),
+    "telemetria": (PACOTES_LLM + ("pydantic",), 60),
+    "memoria_chat": (PACOTES_LLM + ("pydantic",), 30),
+    "transporte_resiliente": (PACOTES_LLM + ("pydantic",), 150),
+    "repositorio_cenarios": (PACOTES_LLM + ("pydantic",), 60),
+    "recalculo_portfolio": (PACOTES_LLM + ("pydantic",), 300),
+    "api_http": (PACOTES_LLM + ("pydantic",), 300),
+    "estimador_tokens": (PACOTES_LLM + ("pydantic",), 300),
+    "batch_relatorios": (PACOTES_LLM + ("pydantic",), 450),
+    "orquestrador_chat": (PACOTES_LLM + ("pydantic",), 150),
+    "schema_mavi": (PACOTES_LLM, 400),
+    "extrator_incremental": (PACOTES_LLM, 450),
+    # Primeira pintura da interface: streamlit + motor financeiro, sem LLM
+    "app_streamlit": (PACOTES_LLM, 1500),
+    # Referência: o módulo pesado, sem restrição de pacotes (só orçamento)
+    "langchain_agent": ((), 4000),
+}
+
+RE_LINHA = re.compile(r"^import time:\s*(\d+)\s*\|\s*(\d+)\s*\|(\s*)(\S+)\s*$")
+
+
+def medir(modulo: str):
+    """Importa `modulo` num processo novo; retorna (ms cumulativo, módulos carregados)."""
+    env = {**os.environ, "PYTHONPATH": RAIZ, "GOOGLE_API_KEY": os.environ.get("GOOGLE_API_KEY", "chave-ficticia")}
+    processo = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+                              cwd=RAIZ, env=env, capture_output=True, text=True)
+    if processo.returncode != 0:
+        raise RuntimeError(f"falha ao importar {modulo}:\n{processo.stderr[-2000:]}")
+    carregados, total_us = set(), None
+    for linha in processo.stderr.splitlines():
+        m = RE_LINHA.match(linha)
+        if m is None:
+            continue
+        nome = m.group(4)
+        carregados.add(nome)
+        if nome == modulo:
+            total_us = int(m.group(2))
+    return (total_us or 0) / 1000, carregados
+
+
+def proibidos_carregados(carregados, proibidos):
+    return sorted(nome for nome in carregados
+                  if any(nome == p or nome.startswith(p + ".") for p in proibidos))
+
+
+def avaliar(repeticoes: int, folga: float):
+    resultados, falhas = {}, []
+    for modulo, (proibidos, orcamento_ms) in MODULOS.items():
+        tempos, carregados = [], set()
+        for _ in range(repeticoes):
+            ms, carregados = medir(modulo)
+            tempos.append(ms)
+        mediana = statistics.median(tempos)
+        indevidos = proibidos_carregados(carregados, proibidos)
+        limite = orcamento_ms * folga
+        resultados[modulo] = {"mediana_ms": round(mediana, 1), "orcamento_ms": round(limite, 1),
+                              "modulos_carregados": len(carregados), "proibidos": indevidos}
+        if indevidos:
+            falhas.append(f"{modulo}: importa {', '.join(indevidos[:5])}{' ...' if len(indevidos) > 5 else ''}")
+        if mediana > limite:
+            falhas.append(f"{modulo}: {mediana:.1f} ms > orçamento de {limite:.0f} ms")
+    return resultados, falhas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tempo de importação e isolamento da stack de LLM.")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--folga", type=float, default=1.0, help="Multiplica todos os orçamentos de tempo")
+    parser.add_argument("--json", help="Grava o resultado completo neste arquivo")
+    args = parser.parse_args()
+
+    resultados, falhas = avaliar(args.repeticoes, args.folga)
+    print(f"{'módulo':26} {'mediana':>10} {'orçamento':>10} {'módulos':>8}")
+    for modulo, r in resultados.items():
+        marca = " ✗" if r["proibidos"] or r["mediana_ms"] > r["orcamento_ms"] else ""
+        print(f"{modulo:26} {r['mediana_ms']:>8.1f}ms {r['orcamento_ms']:>8.0f}ms {r['modulos_carregados']:>8}{marca}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"resultados": resultados, "falhas": falhas}, f, ensure_ascii=False, indent=2)
+
+    if falhas:
+        print("\nRegressões:")
+        for falha in falhas:
+            print(f"  - {falha}")
+        sys.exit(1)
+    print("\nOK: motor financeiro sem stack de LLM e dentro dos orçamentos.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+# bench_recalculo.py
+# Mavi.IA 5.0 - Benchmark do Recálculo Incremental do Portfólio (recalculo_portfolio.py)
+# Carrega N cenários, muda o preço de um modelo e depois o câmbio, e compara o recálculo incremental
+# com o recálculo completo; confere os números contra o calc_logic e refaz a narrativa só dos vereditos alterados
+#
+# Uso:
+#   python benchmarks/bench_recalculo.py --cenarios 100000 [--json recalculo.json]
+# Sai com código 1 se o recálculo tocar cenários não afetados, divergir do cálculo escalar
+# ou se a regeneração pedir relatório de cenário sem veredito alterado.
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Mapping
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["MAVI_CACHE_DIR"] = tempfile.mkdtemp(prefix="mavi-bench-")  # Cache de relatórios descartável
+
+import calc_logic  # noqa: E402
+import llm_fake  # noqa: E402
+import provedor_custos  # noqa: E402
+import recalculo_portfolio  # noqa: E402
+import registro_llm  # noqa: E402
+import repositorio_cenarios  # noqa: E402
+from bench_repositorio import gerar_registros  # noqa: E402
+
+AMOSTRA_CONFERENCIA = 200   # Cenários conferidos contra calc_logic após cada recálculo
+
+
+def tabela_com(tabela: Mapping[str, Any], versao: str, modelo: str = None, fator_preco: float = 1.0,
+               cambio: float = None) -> Dict[str, Any]:
+    """Cópia da tabela de custos com o preço de `modelo` multiplicado e/ou outro câmbio."""
+    custos = {nome: dict(precos) for nome, precos in tabela["CUSTOS_API_USD"].items()}
+    if modelo is not None:
+        custos[modelo] = {"input": custos[modelo]["input"] * fator_preco,
+                          "output": custos[modelo]["output"] * fator_preco}
+    return {**tabela, "versao": versao, "CUSTOS_API_USD": custos,
+            "TAXA_CONVERSAO_BRL_USD": cambio if cambio is not None else tabela["TAXA_CONVERSAO_BRL_USD"]}
+
+
+def outros_modelos(repositorio, modelo: str) -> List[Dict[str, Any]]:
+    """Agregados do portfólio fora do `modelo` (não podem mudar quando só o preço dele muda)."""
+    return sorted((g for g in repositorio.resumo_portfolio() if g["modelo_llm"] != modelo),
+                  key=lambda g: (g["tipo_projeto"], g["modelo_llm"]))
+
+
+def conferir(repositorio, tabela: Mapping[str, Any], ids: List[int]) -> int:
+    """Quantos cenários da amostra divergem do cálculo escalar com a tabela nova."""
+    divergentes = 0
+    for cenario_id in ids:
+        cenario = repositorio.obter(cenario_id)
+        entradas = cenario["entradas"]
+        esperado = calc_logic.calcula_metricas_genai(entradas["bloco_1"], entradas["bloco_2"], entradas["bloco_3"], tabela)
+        for secao in recalculo_portfolio.SECOES_METRICAS:
+            for campo, valor in esperado[secao].items():
+                if isinstance(valor, float) and cenario["metricas"][secao][campo] != valor:
+                    divergentes += 1
+                    break
+        divergentes += (cenario["roi"], cenario["payback"]) != (esperado["resultado"]["roi"],
+                                                                esperado["resultado"]["payback"])
+    return divergentes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do recálculo incremental do portfólio (Mavi 5.0).")
+    parser.add_argument("--cenarios", type=int, default=100_000)
+    parser.add_argument("--modelo", default="gpt-4o", help="Modelo cujo preço muda")
+    parser.add_argument("--fator-preco", type=float, default=20.0)
+    parser.add_argument("--cambio", type=float, default=7.5, help="Novo câmbio (afeta todos os cenários)")
+    parser.add_argument("--max-regenerar", type=int, default=50, help="Teto de relatórios refeitos (LLM fake)")
+    parser.add_argument("--semente", type=int, default=5)
+    parser.add_argument("--json", help="Grava o resultado neste arquivo")
+    args = parser.parse_args()
+
+    caminho = os.path.join(tempfile.mkdtemp(prefix="mavi-bench-"), "cenarios.sqlite")
+    repositorio = repositorio_cenarios.RepositorioCenarios(caminho)
+    registros = gerar_registros(args.cenarios, args.semente)
+    for i in range(0, len(registros), 2000):
+        repositorio.salvar_lote(registros[i:i + 2000])
+    del registros
+
+    base = provedor_custos.obter_tabela_custos()
+    do_modelo = repositorio.contar(repositorio_cenarios.FiltroCenarios(modelo_llm=args.modelo))
+    sorteio = random.Random(args.semente)
+    falhas = []
+    resultado: Dict[str, Any] = {"cenarios": args.cenarios, "cenarios_do_modelo": do_modelo}
+
+    # 1. Preço de um modelo: só os cenários dele são lidos e regravados
+    preco = tabela_com(base, "bench-preco", args.modelo, args.fator_preco)
+    intocados_antes = outros_modelos(repositorio, args.modelo)
+    resumo = recalculo_portfolio.recalcular_portfolio(repositorio, preco)
+    resultado["preco_modelo"] = {"recalculados": resumo.recalculados, "duracao_s": resumo.duracao_s,
+                                 "vereditos_alterados": len(resumo.vereditos_alterados)}
+    if resumo.recalculados != do_modelo:
+        falhas.append(f"mudança de preço recalculou {resumo.recalculados} cenários; {do_modelo} dependem do modelo")
+    if outros_modelos(repositorio, args.modelo) != intocados_antes:
+        falhas.append("agregados de modelos não afetados mudaram")
+    alterados_preco = set(resumo.vereditos_alterados)
+
+    # 2. Mesma tabela de novo: nada a fazer
+    repetido = recalculo_portfolio.recalcular_portfolio(repositorio, preco)
+    resultado["repetido"] = {"recalculados": repetido.recalculados, "duracao_s": repetido.duracao_s}
+    if repetido.recalculados:
+        falhas.append(f"segunda passada com a mesma tabela recalculou {repetido.recalculados} cenários")
+
+    # 3. Câmbio: todo o portfólio depende dele (referência do recálculo completo)
+    cambio = tabela_com(preco, "bench-cambio", cambio=args.cambio)
+    completo = recalculo_portfolio.recalcular_portfolio(repositorio, cambio)
+    resultado["cambio"] = {"recalculados": completo.recalculados, "duracao_s": completo.duracao_s,
+                           "vereditos_alterados": len(completo.vereditos_alterados),
+                           "cenarios_por_s": round(completo.recalculados / max(completo.duracao_s, 1e-9))}
+    if completo.recalculados != args.cenarios:
+        falhas.append(f"mudança de câmbio recalculou {completo.recalculados} de {args.cenarios} cenários")
+    amostra = sorteio.sample(range(1, args.cenarios + 1), min(AMOSTRA_CONFERENCIA, args.cenarios))
+    divergentes = conferir(repositorio, cambio, amostra)
+    resultado["divergentes_amostra"] = divergentes
+    if divergentes:
+        falhas.append(f"{divergentes} de {len(amostra)} cenários divergem do calc_logic")
+
+    # 4. Narrativas: só os marcados (preço ou câmbio) vão ao LLM
+    marcados = repositorio.vereditos_alterados()
+    esperados = alterados_preco | set(completo.vereditos_alterados)
+    if set(marcados) != esperados:
+        falhas.append(f"{len(marcados)} cenários marcados; {len(esperados)} vereditos alterados")
+    registro_llm.configurar_fabrica_cliente(llm_fake.fabrica_fake(latencia_primeiro_token_s=0.0,
+                                                                  latencia_por_chunk_s=0.0))
+    alvo = marcados[:args.max_regenerar]
+    inicio = time.perf_counter()
+    contagem = asyncio.run(recalculo_portfolio.regenerar_relatorios(repositorio, alvo))
+    resultado["regeneracao"] = {"marcados": len(marcados), "refeitos": contagem["ok"], "erros": contagem["erro"],
+                                "duracao_s": round(time.perf_counter() - inicio, 3),
+                                "fracao_do_portfolio": round(len(marcados) / args.cenarios, 4)}
+    if contagem["ok"] != len(alvo) or set(repositorio.vereditos_alterados()) & set(alvo):
+        falhas.append(f"regeneração: {contagem} para {len(alvo)} cenários marcados")
+
+    print(f"{args.cenarios} cenários · {do_modelo} com {args.modelo}")
+    print(f"{'passada':22} {'recalculados':>12} {'tempo':>9} {'vereditos':>10}")
+    for nome in ("preco_modelo", "repetido", "cambio"):
+        r = resultado[nome]
+        print(f"{nome:22} {r['recalculados']:>12} {r['duracao_s']:>8.2f}s {r.get('vereditos_alterados', 0):>10}")
+    r = resultado["regeneracao"]
+    print(f"\nNarrativas a refazer: {r['marcados']} ({r['fracao_do_portfolio']:.2%} do portfólio); "
+          f"refeitas {r['refeitos']} (amostra) em {r['duracao_s']}s")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, ensure_ascii=False, indent=2)
+    if falhas:
+        print("\nFalhas:")
+        for falha in falhas:
+            print(f"  - {falha}")
+        sys.exit(1)
+    print("\nOK")
+
+
+if __name__ == "__main__":
+    main()
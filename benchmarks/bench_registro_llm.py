@@ -0,0 +1,74 @@
+# bench_registro_llm.py
+# Mavi.IA 5.0 - Custo de Construção por Turno (com e sem o registro de clientes)
+# Simula N turnos de chat (agente + extrator) e o pipeline de relatório de várias sessões
+#
+# Uso: python benchmarks/bench_registro_llm.py [--turnos 20] [--sessoes 16]
+# Não chama a API: só constrói os objetos (uma GOOGLE_API_KEY fictícia basta).
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GOOGLE_API_KEY", "chave-ficticia-benchmark")
+
+import langchain_agent  # noqa: E402
+import registro_llm  # noqa: E402
+from schema_mavi import MaviParametersDelta  # noqa: E402
+
+
+def _turno() -> float:
+    """Custo de montar o que um turno de chat usa: agente conversacional + extrator estruturado."""
+    inicio = time.perf_counter()
+    langchain_agent.criar_agente_extrator()
+    langchain_agent._extrator_estruturado(MaviParametersDelta)
+    return time.perf_counter() - inicio
+
+
+def medir_turnos(turnos: int, compartilhado: bool):
+    tempos = []
+    for _ in range(turnos):
+        if not compartilhado:
+            registro_llm.registro_padrao().limpar()  # Equivale ao comportamento antigo: tudo do zero
+        tempos.append(_turno())
+    return tempos
+
+
+def medir_sessoes(sessoes: int) -> float:
+    """Várias sessões pedindo o pipeline de relatório ao mesmo tempo: deve construir uma vez só."""
+    registro_llm.registro_padrao().limpar()
+    with ThreadPoolExecutor(max_workers=sessoes) as executor:
+        pipelines = list(executor.map(lambda _: langchain_agent.pipeline_relatorio(), range(sessoes)))
+    assert all(p is pipelines[0] for p in pipelines)
+    return registro_llm.registro_padrao().estatisticas()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turnos", type=int, default=20)
+    parser.add_argument("--sessoes", type=int, default=16)
+    args = parser.parse_args()
+
+    _turno()  # Aquece imports e caches de pydantic
+    sem = medir_turnos(args.turnos, compartilhado=False)
+    registro_llm.registro_padrao().limpar()
+    com = medir_turnos(args.turnos, compartilhado=True)
+
+    def resumo(tempos):
+        return f"1º turno {tempos[0] * 1e3:8.2f} ms | mediana demais turnos {statistics.median(tempos[1:]) * 1e3:8.3f} ms"
+
+    print(f"Construção por turno ({args.turnos} turnos)")
+    print(f"  sem registro: {resumo(sem)}")
+    print(f"  com registro: {resumo(com)}")
+
+    print(f"\n{args.sessoes} sessões concorrentes pedindo o pipeline de relatório:")
+    for chave, stats in medir_sessoes(args.sessoes).items():
+        print(f"  {chave:70} construções={stats['construcoes']:.0f} acessos={stats['acessos']:.0f} "
+              f"tempo={stats['tempo_construcao_s'] * 1e3:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
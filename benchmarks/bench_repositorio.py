@@ -0,0 +1,165 @@
+# bench_repositorio.py
+# Mavi.IA 5.0 - Benchmark do Repositório de Cenários (repositorio_cenarios.py)
+# Gera N cenários sintéticos (métricas reais do calc_logic), grava com salvar_lote e mede as consultas de portfólio
+#
+# Uso:
+#   python benchmarks/bench_repositorio.py --cenarios 100000 [--json repositorio.json]
+# Sai com código 1 se alguma consulta paginada passar do orçamento ou não usar índice.
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import calc_logic  # noqa: E402
+import provedor_custos  # noqa: E402
+import repositorio_cenarios  # noqa: E402
+from bench_hot_paths import PAYLOAD  # noqa: E402
+from repositorio_cenarios import FiltroCenarios  # noqa: E402
+
+ORCAMENTO_PAGINA_MS = 20.0    # p95 de uma página (qualquer profundidade)
+ORCAMENTO_AGREGADO_MS = 250.0  # p95 de contagem/agregados sobre o histórico inteiro
+
+
+def gerar_registros(n: int, semente: int) -> List[Dict[str, Any]]:
+    sorteio = random.Random(semente)
+    tabela = provedor_custos.obter_tabela_custos()
+    modelos = sorted(tabela["CUSTOS_API_USD"])
+    registros = []
+    for i in range(n):
+        tipo = "faq" if sorteio.random() < 0.4 else "automacao"
+        payload = {
+            "bloco_1": {**PAYLOAD["bloco_1"], "tipo_projeto": tipo, "volume_mensal": sorteio.randint(100, 200_000),
+                        "tempo_por_unidade_min": round(sorteio.uniform(0.5, 30), 1),
+                        "custo_por_ticket_brl": round(sorteio.uniform(5, 80), 2)},
+            "bloco_2": {**PAYLOAD["bloco_2"], "modelo_llm": sorteio.choice(modelos),
+                        "custo_implementacao_capex_brl": round(sorteio.uniform(5_000, 500_000), 2)},
+            "bloco_3": {**PAYLOAD["bloco_3"], "taxa_retencao_ia_percentual": sorteio.randint(5, 70)},
+        }
+        metricas = calc_logic.calcula_metricas_genai(payload["bloco_1"], payload["bloco_2"], payload["bloco_3"], tabela)
+        registros.append(repositorio_cenarios.registro_cenario(payload, metricas, origem="lote", id_externo=str(i),
+                                                               tabela_custos=tabela))
+    return registros
+
+
+def medir(funcao: Callable[[], Any], repeticoes: int) -> Dict[str, float]:
+    amostras = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        amostras.append(1000 * (time.perf_counter() - inicio))
+    quantis = statistics.quantiles(amostras, n=100, method="inclusive")
+    return {"p50_ms": round(quantis[49], 3), "p95_ms": round(quantis[94], 3)}
+
+
+def cursor_profundo(repositorio, filtro: FiltroCenarios, ordem: str, decrescente: bool, paginas: int, limite: int):
+    """Caminha `paginas` páginas e devolve o cursor da seguinte (para medir uma página funda)."""
+    cursor = None
+    for _ in range(paginas):
+        pagina = repositorio.consultar(filtro, ordem, decrescente, limite, cursor)
+        if pagina.proximo is None:
+            break
+        cursor = pagina.proximo
+    return cursor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do repositório de cenários (Mavi 5.0).")
+    parser.add_argument("--cenarios", type=int, default=100_000)
+    parser.add_argument("--tamanho-lote", type=int, default=2000, help="Cenários por transação na carga")
+    parser.add_argument("--repeticoes", type=int, default=50)
+    parser.add_argument("--limite", type=int, default=25, help="Linhas por página")
+    parser.add_argument("--semente", type=int, default=3)
+    parser.add_argument("--json", help="Grava o resultado neste arquivo")
+    args = parser.parse_args()
+
+    caminho = os.path.join(tempfile.mkdtemp(prefix="mavi-bench-"), "cenarios.sqlite")
+    repositorio = repositorio_cenarios.RepositorioCenarios(caminho)
+
+    inicio = time.perf_counter()
+    registros = gerar_registros(args.cenarios, args.semente)
+    geracao_s = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    for i in range(0, len(registros), args.tamanho_lote):
+        repositorio.salvar_lote(registros[i:i + args.tamanho_lote])
+    carga_s = time.perf_counter() - inicio
+    del registros
+
+    limite = args.limite
+    faq_rapido = FiltroCenarios(tipo_projeto="faq", payback_max=6)
+    por_modelo = FiltroCenarios(modelo_llm="gpt-4o-mini", roi_min=100)
+    consultas = {
+        "recentes_pagina_1": lambda: repositorio.consultar(limite=limite),
+        "faq_payback_lt_6": lambda: repositorio.consultar(faq_rapido, "payback", False, limite),
+        "modelo_roi_desc": lambda: repositorio.consultar(por_modelo, "roi", True, limite),
+        "roi_desc_pagina_1": lambda: repositorio.consultar(ordenar_por="roi", limite=limite),
+    }
+    for nome, filtro, ordem, decrescente in (("recentes_pagina_200", FiltroCenarios(), "recentes", True),
+                                             ("roi_desc_pagina_200", FiltroCenarios(), "roi", True),
+                                             ("faq_payback_pagina_200", faq_rapido, "payback", False)):
+        cursor = cursor_profundo(repositorio, filtro, ordem, decrescente, 199, limite)
+        consultas[nome] = (lambda f=filtro, o=ordem, d=decrescente, c=cursor:
+                           repositorio.consultar(f, o, d, limite, c))
+    agregados = {
+        "contar_faq_payback_lt_6": lambda: repositorio.contar(faq_rapido),
+        "resumo_portfolio": lambda: repositorio.resumo_portfolio(),
+        "obter_cenario": lambda: repositorio.obter(args.cenarios // 2),
+    }
+
+    resultado: Dict[str, Any] = {"cenarios": args.cenarios, "geracao_s": round(geracao_s, 2),
+                                 "carga_s": round(carga_s, 2),
+                                 "insercoes_por_s": round(args.cenarios / carga_s),
+                                 "tamanho_bytes": os.path.getsize(caminho), "consultas": {}}
+    for nome, funcao in {**consultas, **agregados}.items():
+        resultado["consultas"][nome] = medir(funcao, args.repeticoes)
+
+    # Planos: as consultas paginadas não podem varrer a tabela sem índice nem ordenar em memória
+    planos = {
+        "faq_payback_lt_6": repositorio.plano_consulta(
+            "SELECT id FROM cenarios WHERE tipo_projeto = ? AND payback < ? ORDER BY payback, id LIMIT 25", ("faq", 6)),
+        "modelo_roi_desc": repositorio.plano_consulta(
+            "SELECT id FROM cenarios WHERE modelo_llm = ? AND roi >= ? ORDER BY roi DESC, id DESC LIMIT 25",
+            ("gpt-4o-mini", 100)),
+        "roi_desc_cursor": repositorio.plano_consulta(
+            "SELECT id FROM cenarios WHERE (roi, id) < (?, ?) ORDER BY roi DESC, id DESC LIMIT 25", (500, 10)),
+    }
+    resultado["planos"] = planos
+
+    print(f"{args.cenarios} cenários: geração {geracao_s:.1f}s · carga {carga_s:.1f}s "
+          f"({resultado['insercoes_por_s']} inserções/s) · {resultado['tamanho_bytes'] / 2**20:.1f} MiB")
+    print(f"\n{'consulta':28} {'p50':>10} {'p95':>10}")
+    for nome, r in resultado["consultas"].items():
+        print(f"{nome:28} {r['p50_ms']:>8.2f}ms {r['p95_ms']:>8.2f}ms")
+    print()
+    for nome, plano in planos.items():
+        print(f"plano {nome}: {' | '.join(plano)}")
+
+    falhas = []
+    for nome, r in resultado["consultas"].items():
+        orcamento = ORCAMENTO_PAGINA_MS if nome in consultas else ORCAMENTO_AGREGADO_MS
+        if r["p95_ms"] > orcamento:
+            falhas.append(f"{nome}: p95 {r['p95_ms']}ms > {orcamento}ms")
+    for nome, plano in planos.items():
+        if any("TEMP B-TREE" in passo or passo.strip() == "SCAN cenarios" for passo in plano):
+            falhas.append(f"{nome}: plano sem índice ({' | '.join(plano)})")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, ensure_ascii=False, indent=2)
+    if falhas:
+        print("\nFalhas:")
+        for falha in falhas:
+            print(f"  - {falha}")
+        sys.exit(1)
+    print("\nOK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+# bench_transporte.py
+# Mavi.IA 5.0 - Benchmark da Política de Transporte do LLM (transporte_resiliente.py)
+# Mesmo tráfego contra o ServidorLLMFake (llm_fake.py) com erros 503, cauda lenta e travamentos injetados:
+# cliente cru x cliente com prazos/retries/hedge; depois provedor fora do ar (disjuntor + saída local)
+#
+# Uso:
+#   python benchmarks/bench_transporte.py --chamadas 200 --concorrencia 8 [--json transporte.json]
+# Sai com código 1 se a política não melhorar taxa de sucesso e p99, se o disjuntor não falhar rápido
+# ou se algum contrato do transporte (sonda cancelada, queda no meio do stream) for violado.
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["MAVI_CACHE_DIR"] = tempfile.mkdtemp(prefix="mavi-bench-")  # Cache de relatórios descartável
+
+import langchain_agent  # noqa: E402
+import llm_fake  # noqa: E402
+import registro_llm  # noqa: E402
+import renderizador_relatorio  # noqa: E402
+import transporte_resiliente  # noqa: E402
+from bench_hot_paths import PAYLOAD  # noqa: E402
+from cliente_resiliente import ClienteResiliente  # noqa: E402
+
+# Política apertada para a escala do servidor fake (TTFT normal de dezenas de ms)
+POLITICA_BENCH = transporte_resiliente.PoliticaTransporte(
+    prazo_total_s=3.0, timeout_primeiro_chunk_s=0.6, timeout_inatividade_s=0.5,
+    tentativas=3, backoff_base_s=0.02, backoff_max_s=0.2, hedge_apos_s=0.15, max_concorrencia=16,
+)
+SUCESSO_MINIMO = 0.99          # Com política
+FALHA_RAPIDA_MAX_MS = 10.0     # p95 com o disjuntor aberto
+
+
+# ==========================================
+# 1. MEDIÇÃO
+# ==========================================
+
+def percentis_ms(amostras_s: List[float]) -> Dict[str, float]:
+    quantis = statistics.quantiles(amostras_s, n=100, method="inclusive")
+    return {"p50_ms": round(1000 * quantis[49], 1), "p95_ms": round(1000 * quantis[94], 1),
+            "p99_ms": round(1000 * quantis[98], 1), "max_ms": round(1000 * max(amostras_s), 1)}
+
+
+async def _chamada(cliente) -> Tuple[float, bool]:
+    inicio = time.perf_counter()
+    try:
+        texto = "".join([chunk.content async for chunk in cliente.astream("proposta")])
+        ok = texto.rstrip().endswith(llm_fake.NARRATIVA_PADRAO.rstrip()[-20:])
+    except Exception:
+        ok = False
+    return time.perf_counter() - inicio, ok
+
+
+async def rodar_trafego(cliente, chamadas: int, concorrencia: int) -> Dict[str, Any]:
+    semaforo = asyncio.Semaphore(concorrencia)
+
+    async def limitada():
+        async with semaforo:
+            return await _chamada(cliente)
+
+    resultados = await asyncio.gather(*(limitada() for _ in range(chamadas)))
+    duracoes = [d for d, _ in resultados]
+    sucesso = sum(ok for _, ok in resultados) / chamadas
+    return {"chamadas": chamadas, "sucesso": round(sucesso, 4), **percentis_ms(duracoes)}
+
+
+# ==========================================
+# 2. CENÁRIOS
+# ==========================================
+
+def _servidor(args, semente: int, **falhas) -> llm_fake.ServidorLLMFake:
+    return llm_fake.ServidorLLMFake(latencia_primeiro_token_s=args.latencia_primeiro_ms / 1000,
+                                    latencia_por_chunk_s=args.latencia_chunk_ms / 1000,
+                                    semente=semente, **falhas)
+
+
+def cenario_falhas(args) -> Dict[str, Any]:
+    """Mesmo sorteio de falhas (mesma semente) para o cliente cru e para o resiliente."""
+    falhas = {"taxa_erro": args.taxa_erro, "taxa_lentidao": args.taxa_lentidao, "lentidao_s": 1.5,
+              "taxa_travamento": args.taxa_travamento, "travamento_s": 4.0}
+    saida = {}
+    for nome in ("sem_politica", "com_politica"):
+        with _servidor(args, args.semente, **falhas) as servidor:
+            cliente = llm_fake.ChatHTTPFake(url=servidor.url, timeout_s=10.0)
+            if nome == "com_politica":
+                transporte = transporte_resiliente.Transporte(POLITICA_BENCH, transporte_resiliente.Disjuntor(), "bench")
+                cliente = ClienteResiliente(cliente, transporte)
+            saida[nome] = asyncio.run(rodar_trafego(cliente, args.chamadas, args.concorrencia))
+            saida[nome]["requisicoes_http"] = servidor.contagem["requisicoes"]
+    return saida
+
+
+def cenario_indisponivel(args) -> Dict[str, Any]:
+    """Provedor sempre em 503: o relatório sai com a narrativa local e, aberto o disjuntor, sem esperar a rede."""
+    with _servidor(args, args.semente, taxa_erro=1.0) as servidor:
+        registro_llm.configurar_fabrica_cliente(llm_fake.fabrica_http_fake(servidor.url))
+        disjuntor = transporte_resiliente.disjuntor_padrao()
+        disjuntor.registrar_sucesso()
+        chain = langchain_agent.pipeline_relatorio()
+        duracoes: List[float] = []
+        abertos: List[float] = []
+        locais = 0
+        for i in range(args.chamadas_indisponivel):
+            payload = {**PAYLOAD, "bloco_1": {**PAYLOAD["bloco_1"], "volume_mensal": 5000 + i}}
+            aberto = disjuntor.estado == "aberto"
+            inicio = time.perf_counter()
+            relatorio = chain.invoke(payload).content
+            (abertos if aberto else duracoes).append(time.perf_counter() - inicio)
+            locais += renderizador_relatorio.AVISO_INDISPONIVEL in relatorio
+        return {"relatorios": args.chamadas_indisponivel, "saida_local": locais,
+                "requisicoes_http": servidor.contagem["requisicoes"],
+                "antes_de_abrir": percentis_ms(duracoes) if len(duracoes) > 1 else {},
+                "disjuntor_aberto": percentis_ms(abertos) if len(abertos) > 1 else {}}
+
+
+def cenario_sonda_cancelada() -> Dict[str, Any]:
+    """Sonda do meio-aberto cancelada (ex: TurnoChat.cancelar): a próxima chamada saudável tem de passar."""
+    relogio = [0.0]
+    disjuntor = transporte_resiliente.Disjuntor(limiar_falhas=1, tempo_aberto_s=1.0, relogio=lambda: relogio[0])
+    transporte = transporte_resiliente.Transporte(POLITICA_BENCH, disjuntor, "bench_sonda")
+    disjuntor.registrar_falha()
+    relogio[0] = 2.0  # Meio-aberto
+
+    async def rodar() -> Dict[str, Any]:
+        travada = asyncio.ensure_future(transporte.executar(lambda: asyncio.sleep(10)))
+        await asyncio.sleep(0.01)
+        travada.cancel()
+        await asyncio.gather(travada, return_exceptions=True)
+        estado_apos_cancelar = disjuntor.estado
+        try:
+            resposta = await transporte.executar(lambda: asyncio.sleep(0, result="ok"))
+        except transporte_resiliente.ErroTransporte as e:
+            resposta = type(e).__name__
+        return {"estado_apos_cancelar": estado_apos_cancelar, "chamada_seguinte": resposta,
+                "estado_final": disjuntor.estado}
+
+    return asyncio.run(rodar())
+
+
+def cenario_queda_no_stream() -> Dict[str, Any]:
+    """Provedor cai depois dos primeiros chunks: ErroTransporte, falha no disjuntor e relatório marcado."""
+    disjuntor = transporte_resiliente.Disjuntor(limiar_falhas=100)
+    cliente = ClienteResiliente(llm_fake.ChatFake(falhar_apos_chunks=3),
+                                transporte_resiliente.Transporte(POLITICA_BENCH, disjuntor, "bench_queda"))
+
+    async def consumir() -> str:
+        try:
+            async for _ in cliente.astream("proposta"):
+                pass
+        except Exception as e:
+            return type(e).__name__
+        return "sem erro"
+
+    erro = asyncio.run(consumir())
+    registro_llm.configurar_fabrica_cliente(llm_fake.fabrica_fake(falhar_apos_chunks=3))
+    transporte_resiliente.disjuntor_padrao().registrar_sucesso()
+    payload = {**PAYLOAD, "bloco_1": {**PAYLOAD["bloco_1"], "volume_mensal": 7777}}
+    relatorio = langchain_agent.pipeline_relatorio().invoke(payload).content
+    transporte_resiliente.disjuntor_padrao().registrar_sucesso()
+    return {"erro": erro, "falhas_no_disjuntor": disjuntor._falhas,
+            "relatorio_marcado": renderizador_relatorio.AVISO_INDISPONIVEL in relatorio}
+
+
+def verificar(resultado: Dict[str, Any]) -> List[str]:
+    falhas = []
+    sem, com = resultado["falhas"]["sem_politica"], resultado["falhas"]["com_politica"]
+    if com["sucesso"] < SUCESSO_MINIMO:
+        falhas.append(f"sucesso com política {com['sucesso']:.2%} < {SUCESSO_MINIMO:.0%}")
+    if com["p99_ms"] >= sem["p99_ms"]:
+        falhas.append(f"p99 com política ({com['p99_ms']}ms) não é menor que sem ({sem['p99_ms']}ms)")
+    indisponivel = resultado["indisponivel"]
+    if indisponivel["saida_local"] != indisponivel["relatorios"]:
+        falhas.append(f"só {indisponivel['saida_local']} de {indisponivel['relatorios']} relatórios com saída local")
+    aberto = indisponivel["disjuntor_aberto"]
+    if not aberto or aberto["p95_ms"] > FALHA_RAPIDA_MAX_MS:
+        falhas.append(f"disjuntor aberto não falhou rápido: {aberto}")
+    sonda = resultado["sonda_cancelada"]
+    if sonda["chamada_seguinte"] != "ok" or sonda["estado_final"] != "fechado":
+        falhas.append(f"sonda cancelada prendeu o disjuntor: {sonda}")
+    queda = resultado["queda_no_stream"]
+    if queda["erro"] != "ErroTransporte" or queda["falhas_no_disjuntor"] != 1 or not queda["relatorio_marcado"]:
+        falhas.append(f"queda no meio do stream fora do contrato: {queda}")
+    return falhas
+
+
+# ==========================================
+# 3. EXECUÇÃO
+# ==========================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da política de transporte do LLM (Mavi 5.0).")
+    parser.add_argument("--chamadas", type=int, default=200)
+    parser.add_argument("--concorrencia", type=int, default=8)
+    parser.add_argument("--chamadas-indisponivel", type=int, default=30)
+    parser.add_argument("--latencia-primeiro-ms", type=float, default=30.0)
+    parser.add_argument("--latencia-chunk-ms", type=float, default=1.0)
+    parser.add_argument("--taxa-erro", type=float, default=0.05)
+    parser.add_argument("--taxa-lentidao", type=float, default=0.05)
+    parser.add_argument("--taxa-travamento", type=float, default=0.02)
+    parser.add_argument("--semente", type=int, default=7)
+    parser.add_argument("--json", help="Grava o resultado neste arquivo")
+    args = parser.parse_args()
+
+    resultado = {"falhas": cenario_falhas(args), "indisponivel": cenario_indisponivel(args),
+                 "sonda_cancelada": cenario_sonda_cancelada(), "queda_no_stream": cenario_queda_no_stream()}
+    print(f"{'cenário':16} {'sucesso':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'máx':>9} {'HTTP':>6}")
+    for nome, r in resultado["falhas"].items():
+        print(f"{nome:16} {r['sucesso']:>8.2%} {r['p50_ms']:>7.1f}ms {r['p95_ms']:>7.1f}ms "
+              f"{r['p99_ms']:>7.1f}ms {r['max_ms']:>7.1f}ms {r['requisicoes_http']:>6}")
+    indisponivel = resultado["indisponivel"]
+    print(f"\nProvedor fora do ar: {indisponivel['saida_local']}/{indisponivel['relatorios']} relatórios com saída local, "
+          f"{indisponivel['requisicoes_http']} requisições HTTP")
+    for nome in ("antes_de_abrir", "disjuntor_aberto"):
+        if indisponivel[nome]:
+            r = indisponivel[nome]
+            print(f"  {nome:18} p50 {r['p50_ms']:.1f}ms · p95 {r['p95_ms']:.1f}ms")
+    print(f"Sonda cancelada: {resultado['sonda_cancelada']}")
+    print(f"Queda no meio do stream: {resultado['queda_no_stream']}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, ensure_ascii=False, indent=2)
+
+    falhas = verificar(resultado)
+    if falhas:
+        print("\nFalhas:")
+        for falha in falhas:
+            print(f"  - {falha}")
+        sys.exit(1)
+    print("\nOK")
+
+
+if __name__ == "__main__":
+    main()
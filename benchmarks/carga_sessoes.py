@@ -0,0 +1,227 @@
+# carga_sessoes.py
+# Mavi.IA 5.0 - Carga de Sessões Simultâneas (chat -> extração -> relatório) sobre a Fita do LLM
+# Reproduz N sessões ao mesmo tempo com o mesmo caminho do app (orquestrador, memória, extrator
+# incremental, pipeline de relatório), com o LLM servido pela fita do transporte_replay
+#
+# Uso:
+#   python benchmarks/carga_sessoes.py --sessoes 50 [--fita fita_llm.jsonl] [--latencia lognormal --ttft-ms 800]
+#   Sem --fita, grava antes uma fita sintética (ChatFake) com uma sessão do roteiro.
+#   Para uma fita real: MAVI_LLM_MODO=gravar streamlit run app_streamlit.py, e depois --fita .mavi_dados/fita_llm.jsonl
+# Sai com código 1 se alguma sessão falhar ou se a fita não tiver resposta para algum prompt.
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["MAVI_CACHE_DIR"] = tempfile.mkdtemp(prefix="mavi-bench-")  # Relatórios sempre vão ao LLM (fita)
+
+import calc_batch  # noqa: E402
+import langchain_agent  # noqa: E402
+import llm_fake  # noqa: E402
+import registro_llm  # noqa: E402
+import transporte_replay  # noqa: E402
+from bench_hot_paths import PAYLOAD  # noqa: E402
+from extrator_incremental import ExtratorIncremental, falas_usuario  # noqa: E402
+from memoria_chat import MemoriaChat  # noqa: E402
+from orquestrador_chat import OrquestradorChat  # noqa: E402
+
+ETAPAS = ("chat_ttft", "chat_total", "turno_com_extracao", "relatorio_ttft", "relatorio_total", "sessao_total")
+
+# Extração da fita sintética (o ChatFake devolve isso em with_structured_output)
+ESTRUTURADO_SINTETICO = {"tipo_projeto": "automacao", "modelo_llm": "gemini-2.5-flash"}
+
+
+def roteiro(sessao: int, turnos: int) -> List[str]:
+    """Falas do usuário; os números mudam por sessão (prompts e relatórios distintos entre sessões)."""
+    volume = 1000 + sessao
+    falas = [
+        f"Quero automatizar a leitura de contratos no jurídico, uns {volume} por mês.",
+        f"Cada contrato leva {20 + sessao % 30} minutos de um analista que custa R$ {60 + sessao % 40} por hora.",
+        "Vamos usar o gemini-2.5-flash, com 3000 tokens de entrada e 600 de saída por contrato.",
+        f"A infraestrutura custa R$ 1500 por mês e a implementação R$ {40000 + 100 * sessao}.",
+        "Queremos revisar 10% dos contratos, uns 5 minutos cada revisão.",
+        "Isso fecha a conta para as 3 equipes do jurídico? Resuma o que já temos antes do relatório.",
+    ]
+    return [falas[i % len(falas)] for i in range(turnos)]
+
+
+def payload_da_sessao(sessao: int, valores: Dict[str, Any]) -> Dict[str, Any]:
+    """PAYLOAD de referência com os campos extraídos no chat por cima (volume único por sessão)."""
+    payload = {bloco: dict(campos) for bloco, campos in PAYLOAD.items()}
+    for bloco, campos in calc_batch.CAMPOS_BLOCOS.items():
+        for campo in campos:
+            if valores.get(campo) is not None:
+                payload[bloco][campo] = valores[campo]
+    payload["bloco_1"]["volume_mensal"] = 1000 + sessao
+    return payload
+
+
+def percentis_ms(amostras_s: List[float]) -> Dict[str, float]:
+    if len(amostras_s) < 2:
+        return {"p50_ms": round(1000 * amostras_s[0], 1), "p95_ms": round(1000 * amostras_s[0], 1),
+                "p99_ms": round(1000 * amostras_s[0], 1)} if amostras_s else {}
+    quantis = statistics.quantiles(amostras_s, n=100, method="inclusive")
+    return {"p50_ms": round(1000 * quantis[49], 1), "p95_ms": round(1000 * quantis[94], 1),
+            "p99_ms": round(1000 * quantis[98], 1)}
+
+
+# ==========================================
+# 1. UMA SESSÃO (MESMO CAMINHO DO APP)
+# ==========================================
+
+def executar_sessao(sessao: int, turnos: int, orquestrador: OrquestradorChat) -> Tuple[Dict[str, List[float]], Any]:
+    """Roda o roteiro e o relatório; devolve os tempos por etapa e o estado da sessão (para medir memória)."""
+    tempos: Dict[str, List[float]] = {etapa: [] for etapa in ETAPAS}
+    mensagens: List[Dict[str, str]] = []
+    memoria = MemoriaChat()
+    extrator = ExtratorIncremental()
+    inicio_sessao = time.perf_counter()
+    for fala in roteiro(sessao, turnos):
+        mensagens.append({"role": "user", "content": fala})
+        historico = memoria.historico(mensagens[:-1], extrator.resumo_estado())
+        inicio = time.perf_counter()
+        trecho, extrair_turno = extrator.preparar_turno(mensagens)
+        turno = orquestrador.iniciar_turno(
+            langchain_agent.criar_agente_extrator(), {"input": fala, "chat_history": historico},
+            trecho, extrator=extrair_turno, extrator_reconciliacao=extrator.aextrair_resposta,
+            referencia_numeros=falas_usuario(mensagens))
+        resposta = "".join(turno.chunks())
+        tempos["chat_total"].append(time.perf_counter() - inicio)
+        tempos["chat_ttft"].append(turno.metricas.get("ttft_s", tempos["chat_total"][-1]))
+        mensagens.append({"role": "assistant", "content": resposta})
+        memoria.agendar_resumo(mensagens)
+        turno.extracao()
+        tempos["turno_com_extracao"].append(time.perf_counter() - inicio)
+
+    metricas: Dict[str, float] = {}
+    relatorio = "".join(langchain_agent.stream_texto(langchain_agent.pipeline_relatorio(),
+                                                     payload_da_sessao(sessao, extrator.valores), metricas))
+    tempos["relatorio_ttft"].append(metricas["ttft_s"])
+    tempos["relatorio_total"].append(metricas["total_s"])
+    tempos["sessao_total"].append(time.perf_counter() - inicio_sessao)
+    return tempos, (mensagens, memoria, extrator, relatorio)
+
+
+# ==========================================
+# 2. GRAVAÇÃO SINTÉTICA E CARGA
+# ==========================================
+
+def gravar_fita_sintetica(caminho: str, args) -> int:
+    """Uma sessão do roteiro sobre o ChatFake, gravada pelo ChatGravador (fita de exemplo, sem rede)."""
+    fita = transporte_replay.FitaLLM(caminho)
+    registro_llm.configurar_fabrica_cliente(transporte_replay.fabrica_gravacao(fita, llm_fake.fabrica_fake(
+        estruturado=ESTRUTURADO_SINTETICO, latencia_primeiro_token_s=args.ttft_ms / 1000,
+        latencia_por_chunk_s=args.chunk_ms / 1000)))
+    executar_sessao(0, args.turnos, OrquestradorChat(max_concorrencia=args.max_concorrencia))
+    return len(fita)
+
+
+def carga(args, fita: transporte_replay.FitaLLM) -> Dict[str, Any]:
+    latencia = transporte_replay.LatenciaReplay(modo=args.latencia, fator=args.fator, ttft_s=args.ttft_ms / 1000,
+                                                sigma=args.sigma, por_chunk_s=args.chunk_ms / 1000)
+    registro_llm.configurar_fabrica_cliente(transporte_replay.fabrica_replay(fita, latencia, aproximado=True))
+    orquestrador = OrquestradorChat(max_concorrencia=args.max_concorrencia)
+    executar_sessao(-1, args.turnos, orquestrador)  # Aquecimento: imports e chains fora da medição
+    fita.contagem.update(exatas=0, aproximadas=0, ausentes=0)
+
+    tempos: Dict[str, List[float]] = {etapa: [] for etapa in ETAPAS}
+    estados, erros = [], []
+    lock = threading.Lock()
+
+    def rodar(sessao: int) -> None:
+        try:
+            tempos_sessao, estado = executar_sessao(sessao, args.turnos, orquestrador)
+        except Exception as e:
+            with lock:
+                erros.append(f"sessão {sessao}: {type(e).__name__}: {e}")
+            return
+        with lock:
+            for etapa, amostras in tempos_sessao.items():
+                tempos[etapa].extend(amostras)
+            estados.append(estado)
+
+    tracemalloc.start()
+    base, _ = tracemalloc.get_traced_memory()
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.sessoes) as executor:
+        list(executor.map(rodar, range(1, args.sessoes + 1)))
+    duracao = time.perf_counter() - inicio
+    atual, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    concluidas = len(estados)
+    return {
+        "sessoes": args.sessoes, "concluidas": concluidas, "erros": erros, "turnos_por_sessao": args.turnos,
+        "duracao_s": round(duracao, 2),
+        "sessoes_por_s": round(concluidas / duracao, 2),
+        "turnos_por_s": round(concluidas * args.turnos / duracao, 2),
+        "etapas": {etapa: percentis_ms(amostras) for etapa, amostras in tempos.items()},
+        "memoria_por_sessao_kib": {"retida": round((atual - base) / max(concluidas, 1) / 1024, 1),
+                                   "pico": round((pico - base) / max(args.sessoes, 1) / 1024, 1)},
+        "fita": {"interacoes": len(fita), **fita.contagem},
+    }
+
+
+# ==========================================
+# 3. EXECUÇÃO
+# ==========================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Carga de sessões simultâneas sobre a fita do LLM (Mavi 5.0).")
+    parser.add_argument("--sessoes", type=int, default=50)
+    parser.add_argument("--turnos", type=int, default=6, help="Falas do usuário por sessão (6 já aciona o resumo)")
+    parser.add_argument("--fita", help="Fita gravada (JSONL); sem ela, grava uma sintética antes")
+    parser.add_argument("--latencia", choices=("gravada", "lognormal", "fixa"), default="lognormal")
+    parser.add_argument("--fator", type=float, default=1.0, help="Multiplica os tempos gravados (--latencia gravada)")
+    parser.add_argument("--ttft-ms", type=float, default=400.0, help="Mediana (lognormal) ou valor (fixa)")
+    parser.add_argument("--sigma", type=float, default=0.5)
+    parser.add_argument("--chunk-ms", type=float, default=5.0)
+    parser.add_argument("--max-concorrencia", type=int, default=8, help="Chamadas simultâneas do orquestrador")
+    parser.add_argument("--semente", type=int, default=7)
+    parser.add_argument("--json", help="Grava o resultado neste arquivo")
+    args = parser.parse_args()
+
+    caminho = args.fita
+    if caminho is None:
+        caminho = os.path.join(tempfile.mkdtemp(prefix="mavi-bench-"), "fita_llm.jsonl")
+        print(f"Fita sintética: {gravar_fita_sintetica(caminho, args)} interações gravadas em {caminho}")
+    resultado = carga(args, transporte_replay.FitaLLM(caminho, semente=args.semente))
+
+    print(f"{resultado['concluidas']}/{args.sessoes} sessões x {args.turnos} turnos em {resultado['duracao_s']}s "
+          f"· {resultado['sessoes_por_s']} sessões/s · {resultado['turnos_por_s']} turnos/s "
+          f"(latência {args.latencia}, {args.max_concorrencia} chamadas simultâneas)")
+    print(f"{'etapa':20} {'p50':>10} {'p95':>10} {'p99':>10}")
+    for etapa, p in resultado["etapas"].items():
+        if p:
+            print(f"{etapa:20} {p['p50_ms']:>8.1f}ms {p['p95_ms']:>8.1f}ms {p['p99_ms']:>8.1f}ms")
+    memoria = resultado["memoria_por_sessao_kib"]
+    print(f"Memória por sessão: {memoria['retida']} KiB retida · {memoria['pico']} KiB no pico (tracemalloc)")
+    fita = resultado["fita"]
+    print(f"Fita: {fita['interacoes']} interações · {fita['exatas']} exatas · {fita['aproximadas']} aproximadas "
+          f"· {fita['ausentes']} ausentes")
+
+    falhas = list(resultado["erros"])
+    if fita["ausentes"]:
+        falhas.append(f"{fita['ausentes']} prompt(s) sem interação na fita")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, ensure_ascii=False, indent=2)
+    if falhas:
+        print("\nFalhas:")
+        for falha in falhas[:20]:
+            print(f"  - {falha}")
+        sys.exit(1)
+    print("\nOK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+# cache_relatorios.py
+# Mavi.IA 5.0 - Cache em Disco de Relatórios Gerados
+# Chave = hash estável das variáveis do prompt + modelo + temperatura + versão do SYSTEM_PROMPT
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import config_mavi
+
+
+def _hash_texto(texto: str) -> str:
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+class CacheRelatorios:
+    """
+    Cache LRU limitado por tamanho, persistido em SQLite.
+
+    Cada entrada guarda o texto do relatório; a eviction remove as entradas acessadas
+    há mais tempo até caber em `max_bytes` e `max_entradas`. Hits e misses são
+    contados por processo (ver `estatisticas`).
+    """
+
+    def __init__(self,
+                 caminho: str,
+                 max_bytes: int = config_mavi.CACHE_RELATORIOS_MAX_BYTES,
+                 max_entradas: int = config_mavi.CACHE_RELATORIOS_MAX_ENTRADAS):
+        self.caminho = caminho
+        self.max_bytes = max_bytes
+        self.max_entradas = max_entradas
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+        self._conn = sqlite3.connect(caminho, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS relatorios (
+                chave TEXT PRIMARY KEY,
+                conteudo TEXT NOT NULL,
+                tamanho INTEGER NOT NULL,
+                criado_em REAL NOT NULL,
+                acessado_em REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_relatorios_acesso ON relatorios (acessado_em)")
+        self._conn.commit()
+
+    @staticmethod
+    def chave(variaveis_prompt: Dict[str, Any], modelo: str, temperatura: float) -> str:
+        """Hash estável (independe da ordem das chaves) de tudo o que determina o relatório."""
+        variaveis = dict(variaveis_prompt)
+        # O texto integral do SYSTEM_PROMPT entra só como hash, junto com a versão declarada
+        prompt_system = variaveis.pop("prompt_system", "")
+        material = {
+            "variaveis": variaveis,
+            "modelo": modelo,
+            "temperatura": temperatura,
+            "versao_system_prompt": config_mavi.VERSAO_SYSTEM_PROMPT,
+            "hash_system_prompt": _hash_texto(prompt_system),
+        }
+        return _hash_texto(json.dumps(material, sort_keys=True, ensure_ascii=False, default=str))
+
+    def obter(self, chave: str) -> Optional[str]:
+        with self._lock:
+            linha = self._conn.execute("SELECT conteudo FROM relatorios WHERE chave = ?", (chave,)).fetchone()
+            if linha is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE relatorios SET acessado_em = ? WHERE chave = ?", (time.time(), chave))
+            self._conn.commit()
+            return linha[0]
+
+    def guardar(self, chave: str, conteudo: str) -> None:
+        agora = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO relatorios (chave, conteudo, tamanho, criado_em, acessado_em) VALUES (?, ?, ?, ?, ?)",
+                (chave, conteudo, len(conteudo.encode("utf-8")), agora, agora),
+            )
+            self._evictar()
+            self._conn.commit()
+
+    def _evictar(self) -> None:
+        """Remove as entradas menos recentemente usadas até respeitar os limites."""
+        total_bytes, total_entradas = self._conn.execute(
+            "SELECT COALESCE(SUM(tamanho), 0), COUNT(*) FROM relatorios").fetchone()
+        if total_bytes <= self.max_bytes and total_entradas <= self.max_entradas:
+            return
+        excesso_bytes = total_bytes - self.max_bytes
+        excesso_entradas = total_entradas - self.max_entradas
+        remover = []
+        for chave, tamanho in self._conn.execute("SELECT chave, tamanho FROM relatorios ORDER BY acessado_em"):
+            if excesso_bytes <= 0 and excesso_entradas <= 0:
+                break
+            remover.append((chave,))
+            excesso_bytes -= tamanho
+            excesso_entradas -= 1
+        self._conn.executemany("DELETE FROM relatorios WHERE chave = ?", remover)
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM relatorios")
+            self._conn.commit()
+
+    def estatisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            total_bytes, total_entradas = self._conn.execute(
+                "SELECT COALESCE(SUM(tamanho), 0), COUNT(*) FROM relatorios").fetchone()
+        consultas = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "taxa_hit": round(self.hits / consultas, 4) if consultas else 0.0,
+            "entradas": total_entradas,
+            "bytes": total_bytes,
+        }
+
+
+_cache_padrao: Optional[CacheRelatorios] = None
+_lock_cache = threading.Lock()
+
+
+def cache_padrao() -> CacheRelatorios:
+    """Cache único do processo, em `config_mavi.DIRETORIO_CACHE`."""
+    global _cache_padrao
+    with _lock_cache:
+        if _cache_padrao is None:
+            _cache_padrao = CacheRelatorios(os.path.join(config_mavi.DIRETORIO_CACHE, "relatorios.sqlite"))
+        return _cache_padrao
@@ -0,0 +1,309 @@
+# calc_batch.py
+# Mavi.IA 5.0 - Motor de Cálculo Vetorizado (Batch)
+# Avalia milhares de cenários em uma única passada NumPy, com os mesmos números de calc_logic
+
+from typing import Dict, Any, Mapping, Sequence, Tuple
+
+import numpy as np
+
+# ==========================================
+# 1. LAYOUT COLUNAR DOS BLOCOS
+# ==========================================
+
+# Mesmos campos lidos por calc_logic.calcula_metricas_genai, separados por bloco.
+CAMPOS_BLOCO_1 = ("tipo_projeto", "volume_mensal", "tempo_por_unidade_min", "salario_hora_brl", "custo_por_ticket_brl")
+CAMPOS_BLOCO_2 = ("modelo_llm", "tokens_input_por_unidade", "tokens_output_por_unidade",
+                  "custo_infra_mensal_brl", "custo_implementacao_capex_brl")
+CAMPOS_BLOCO_3 = ("taxa_revisao_percentual", "tempo_revisao_min", "taxa_retencao_ia_percentual")
+
+CAMPOS_BLOCOS = {"bloco_1": CAMPOS_BLOCO_1, "bloco_2": CAMPOS_BLOCO_2, "bloco_3": CAMPOS_BLOCO_3}
+CAMPOS_NUMERICOS = tuple(
+    c for c in CAMPOS_BLOCO_1 + CAMPOS_BLOCO_2 + CAMPOS_BLOCO_3 if c not in ("tipo_projeto", "modelo_llm")
+)
+
+# O câmbio vem da tabela de custos, mas entra no núcleo como qualquer outro campo numérico
+CAMPO_CAMBIO = "TAXA_CONVERSAO_BRL_USD"
+
+# Defaults idênticos aos de calc_logic quando o campo não existe
+TIPO_PADRAO = "automacao"
+MODELO_PADRAO = "gemini-2.5-flash"
+HORAS_POR_TICKET_ESTIMADO = 10 / 60
+
+
+def payloads_para_colunas(payloads: Sequence[Mapping[str, Any]]) -> Dict[str, list]:
+    """
+    Converte uma lista de payloads {"bloco_1", "bloco_2", "bloco_3"} (formato do app)
+    em um dicionário colunar aceito por calcula_metricas_batch.
+    """
+    colunas: Dict[str, list] = {}
+    for bloco, campos in CAMPOS_BLOCOS.items():
+        for campo in campos:
+            colunas[campo] = [(p.get(bloco) or {}).get(campo) for p in payloads]
+    return colunas
+
+
+def payload_com_padroes(payload: Mapping[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    Cópia do payload com os três blocos presentes e tipo_projeto/modelo_llm vazios
+    trocados pelos defaults de calc_logic (o prompt do relatório lê os dois diretamente).
+    """
+    normalizado = {bloco: dict(payload.get(bloco) or {}) for bloco in CAMPOS_BLOCOS}
+    for bloco, campo, padrao in (("bloco_1", "tipo_projeto", TIPO_PADRAO), ("bloco_2", "modelo_llm", MODELO_PADRAO)):
+        valor = normalizado[bloco].get(campo)
+        if valor is None or (isinstance(valor, str) and not valor.strip()):
+            normalizado[bloco][campo] = padrao
+    return normalizado
+
+
+def validar_payload(payload: Mapping[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    payload_com_padroes + campos numéricos convertidos para número (texto numérico é aceito,
+    texto vazio vira None). Levanta ValueError com o bloco e o campo do primeiro valor inválido.
+    """
+    normalizado = payload_com_padroes(payload)
+    for bloco, campos in CAMPOS_BLOCOS.items():
+        dados = normalizado[bloco]
+        for campo in campos:
+            if campo not in dados:
+                continue
+            valor = dados[campo]
+            if campo in ("tipo_projeto", "modelo_llm"):
+                if not isinstance(valor, str):
+                    raise ValueError(f"{bloco}.{campo}: esperado texto, recebido {valor!r}")
+                continue
+            if valor is None or isinstance(valor, (int, float)) and not isinstance(valor, bool):
+                numero = valor
+            elif isinstance(valor, str):
+                try:
+                    numero = float(valor) if valor.strip() else None
+                except ValueError:
+                    raise ValueError(f"{bloco}.{campo}: valor não numérico {valor!r}") from None
+            else:
+                raise ValueError(f"{bloco}.{campo}: valor não numérico {valor!r}")
+            if numero is not None and not np.isfinite(numero):
+                raise ValueError(f"{bloco}.{campo}: valor não finito {valor!r}")
+            dados[campo] = numero
+    return normalizado
+
+
+def _tamanho_lote(cenarios: Mapping[str, Any]) -> int:
+    """Descobre o número de linhas a partir das colunas não escalares."""
+    tamanhos = [len(cenarios[c]) for c in cenarios if np.ndim(cenarios[c]) > 0]
+    return max(tamanhos) if tamanhos else 1
+
+
+def _coluna_numerica(cenarios: Mapping[str, Any], campo: str, n: int) -> np.ndarray:
+    """Lê uma coluna como float, tratando None/NaN como 0 (mesma proteção do `or 0` escalar)."""
+    if campo not in cenarios:
+        return np.zeros(n)
+    valores = np.asarray(cenarios[campo], dtype=float)
+    return np.broadcast_to(np.nan_to_num(valores, nan=0.0), (n,))
+
+
+def _coluna_texto(cenarios: Mapping[str, Any], campo: str, padrao: str, n: int) -> np.ndarray:
+    if campo not in cenarios:
+        return np.full(n, padrao, dtype=object)
+    return np.broadcast_to(np.asarray(cenarios[campo], dtype=object), (n,))
+
+
+def precos_por_modelo(modelos: np.ndarray, custos_api: Mapping[str, Any]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Resolve o preço (USD / 1M tokens) de cada linha com um único lookup por modelo distinto.
+    Modelos fora da tabela custam 0.0, como no cálculo escalar.
+    """
+    unicos, inverso = np.unique(np.asarray(modelos).astype(str), return_inverse=True)
+    tabela_in = np.empty(len(unicos))
+    tabela_out = np.empty(len(unicos))
+    for i, modelo in enumerate(unicos):
+        custos = custos_api.get(modelo, {"input": 0.0, "output": 0.0})
+        tabela_in[i] = custos["input"]
+        tabela_out[i] = custos["output"]
+    return tabela_in[inverso], tabela_out[inverso]
+
+
+# ==========================================
+# 2. NÚCLEO VETORIZADO
+# ==========================================
+
+def metricas_vetorizadas(automacao: np.ndarray,
+                         volume: np.ndarray,
+                         tempo_unidade_min: np.ndarray,
+                         salario_hora: np.ndarray,
+                         custo_ticket: np.ndarray,
+                         retencao_pct: np.ndarray,
+                         preco_input_usd: np.ndarray,
+                         preco_output_usd: np.ndarray,
+                         tokens_input: np.ndarray,
+                         tokens_output: np.ndarray,
+                         infra_mensal: np.ndarray,
+                         capex: np.ndarray,
+                         revisao_pct: np.ndarray,
+                         tempo_revisao_min: np.ndarray,
+                         taxa_cambio: Any) -> Dict[str, np.ndarray]:
+    """
+    Fórmulas de calc_logic em forma de arrays (sem arredondamento).
+    Aceita qualquer combinação de shapes compatíveis via broadcasting, o que permite
+    reaproveitar o núcleo em simulações e grids de otimização.
+    A ordem das operações é a mesma do cálculo escalar para preservar os mesmos floats.
+    """
+    # Tokenomics
+    custo_token_unit_usd = ((tokens_input * preco_input_usd) + (tokens_output * preco_output_usd)) / 1_000_000
+    custo_tokens = (custo_token_unit_usd * volume) * taxa_cambio
+
+    # Modo 1: Automação
+    horas_as_is = (volume * tempo_unidade_min) / 60
+    horas_revisao = (volume * (revisao_pct / 100) * tempo_revisao_min) / 60
+
+    # Modo 2: FAQ / Deflexão
+    tickets_deflexionados = volume * (retencao_pct / 100)
+
+    custo_as_is = np.where(automacao, horas_as_is * salario_hora, volume * custo_ticket)
+    valor_gerado = np.where(automacao, custo_as_is, tickets_deflexionados * custo_ticket)
+    humano_hitl = np.where(automacao, horas_revisao * salario_hora, 0.0)
+    horas_liberadas = np.where(automacao, horas_as_is - horas_revisao,
+                               tickets_deflexionados * HORAS_POR_TICKET_ESTIMADO)
+
+    # Consolidação (ROI & Payback)
+    total_ia = infra_mensal + custo_tokens + humano_hitl
+    saving = valor_gerado - total_ia
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        roi = np.where(total_ia > 0, (saving / total_ia) * 100, np.where(saving <= 0, 0.0, 9999.0))
+        payback = np.where(saving > 0, capex / saving, 999.0)
+
+    return {
+        "custo_as_is": custo_as_is,
+        "horas_as_is": np.where(automacao, horas_as_is, 0.0),
+        "infra": np.broadcast_to(infra_mensal, np.shape(total_ia)),
+        "tokens": custo_tokens,
+        "humano_hitl": humano_hitl,
+        "horas_revisao": np.where(automacao, horas_revisao, 0.0),
+        "total_ia": total_ia,
+        "valor_gerado": valor_gerado,
+        "saving_liquido": saving,
+        "roi": roi,
+        "payback": payback,
+        "horas_liberadas": horas_liberadas,
+    }
+
+
+def valores_pontuais(inputs_bloco_1: Dict[str, Any],
+                     inputs_bloco_2: Dict[str, Any],
+                     inputs_bloco_3: Dict[str, Any],
+                     global_cost_data: Dict[str, Any]) -> Dict[str, float]:
+    """Valores numéricos de um único cenário (mesma proteção `or 0` do motor escalar) + câmbio."""
+    blocos = {"bloco_1": inputs_bloco_1, "bloco_2": inputs_bloco_2, "bloco_3": inputs_bloco_3}
+    valores = {
+        campo: float(blocos[nome_bloco].get(campo, 0) or 0)
+        for nome_bloco, campos in CAMPOS_BLOCOS.items()
+        for campo in campos if campo in CAMPOS_NUMERICOS
+    }
+    valores[CAMPO_CAMBIO] = float(global_cost_data.get(CAMPO_CAMBIO, 6.0) or 6.0)
+    return valores
+
+
+def metricas_de_valores(automacao: Any,
+                        preco_input_usd: Any,
+                        preco_output_usd: Any,
+                        valores: Mapping[str, Any]) -> Dict[str, np.ndarray]:
+    """Atalho para o núcleo a partir de um mapeamento campo -> escalar/array (chaves de valores_pontuais)."""
+    return metricas_vetorizadas(
+        automacao=automacao,
+        volume=valores["volume_mensal"],
+        tempo_unidade_min=valores["tempo_por_unidade_min"],
+        salario_hora=valores["salario_hora_brl"],
+        custo_ticket=valores["custo_por_ticket_brl"],
+        retencao_pct=valores["taxa_retencao_ia_percentual"],
+        preco_input_usd=preco_input_usd,
+        preco_output_usd=preco_output_usd,
+        tokens_input=valores["tokens_input_por_unidade"],
+        tokens_output=valores["tokens_output_por_unidade"],
+        infra_mensal=valores["custo_infra_mensal_brl"],
+        capex=valores["custo_implementacao_capex_brl"],
+        revisao_pct=valores["taxa_revisao_percentual"],
+        tempo_revisao_min=valores["tempo_revisao_min"],
+        taxa_cambio=valores[CAMPO_CAMBIO],
+    )
+
+
+# ==========================================
+# 3. API BATCH
+# ==========================================
+
+def arredonda(valores: np.ndarray, casas: int) -> np.ndarray:
+    """
+    Arredondamento idêntico ao `round()` do Python.
+    np.round escala por 10**casas e pode divergir em casos de empate; esses poucos
+    elementos (perto de .5 na casa de corte) são refeitos com o `round` nativo.
+    """
+    valores = np.asarray(valores, dtype=float)
+    arredondado = np.round(valores, casas)
+    escalado = valores * 10.0 ** casas
+    empate = np.abs(np.abs(escalado - np.floor(escalado)) - 0.5) < 1e-6
+    if empate.any():
+        arredondado = np.array(arredondado, copy=True)
+        arredondado[empate] = [round(float(v), casas) for v in valores[empate]]
+    return arredondado
+
+
+def calcula_metricas_batch(cenarios: Mapping[str, Any],
+                           global_cost_data: Dict[str, Any],
+                           arredondar: bool = True) -> Dict[str, Dict[str, np.ndarray]]:
+    """
+    Versão colunar de calc_logic.calcula_metricas_genai.
+
+    `cenarios` é um mapeamento campo -> array (dict de listas/arrays ou um pandas.DataFrame)
+    com os campos dos blocos 1, 2 e 3. Linhas 'automacao' e 'faq' podem vir misturadas.
+    Retorna o mesmo aninhamento as_is / to_be / resultado, com um array por métrica.
+    Os textos livres (`detalhe_humano`) não são gerados no modo batch.
+    """
+    n = _tamanho_lote(cenarios)
+
+    tipo = _coluna_texto(cenarios, "tipo_projeto", TIPO_PADRAO, n)
+    automacao = tipo == "automacao"
+    modelos = _coluna_texto(cenarios, "modelo_llm", MODELO_PADRAO, n)
+    preco_in, preco_out = precos_por_modelo(modelos, global_cost_data["CUSTOS_API_USD"])
+    taxa_cambio = global_cost_data.get(CAMPO_CAMBIO, 6.0) or 6.0
+
+    m = metricas_vetorizadas(
+        automacao=automacao,
+        volume=_coluna_numerica(cenarios, "volume_mensal", n),
+        tempo_unidade_min=_coluna_numerica(cenarios, "tempo_por_unidade_min", n),
+        salario_hora=_coluna_numerica(cenarios, "salario_hora_brl", n),
+        custo_ticket=_coluna_numerica(cenarios, "custo_por_ticket_brl", n),
+        retencao_pct=_coluna_numerica(cenarios, "taxa_retencao_ia_percentual", n),
+        preco_input_usd=preco_in,
+        preco_output_usd=preco_out,
+        tokens_input=_coluna_numerica(cenarios, "tokens_input_por_unidade", n),
+        tokens_output=_coluna_numerica(cenarios, "tokens_output_por_unidade", n),
+        infra_mensal=_coluna_numerica(cenarios, "custo_infra_mensal_brl", n),
+        capex=_coluna_numerica(cenarios, "custo_implementacao_capex_brl", n),
+        revisao_pct=_coluna_numerica(cenarios, "taxa_revisao_percentual", n),
+        tempo_revisao_min=_coluna_numerica(cenarios, "tempo_revisao_min", n),
+        taxa_cambio=taxa_cambio,
+    )
+
+    def r(valores: np.ndarray, casas: int) -> np.ndarray:
+        return arredonda(valores, casas) if arredondar else valores
+
+    return {
+        "as_is": {
+            "custo_total": r(m["custo_as_is"], 2),
+            "horas_total": r(m["horas_as_is"], 1),
+        },
+        "to_be": {
+            "infra": r(m["infra"], 2),
+            "tokens": r(m["tokens"], 2),
+            "humano_hitl": r(m["humano_hitl"], 2),
+            "total_ia": r(m["total_ia"], 2),
+        },
+        "resultado": {
+            "valor_gerado": r(m["valor_gerado"], 2),
+            "saving_liquido": r(m["saving_liquido"], 2),
+            "roi": r(m["roi"], 1),
+            "payback": r(m["payback"], 1),
+            "label_valor": np.where(automacao, "Economia de FTE", "Deflexão de Tickets"),
+            "horas_liberadas": r(m["horas_liberadas"], 1),
+            "label_kpi_horas": np.where(automacao, "Horas-Homem Liberadas", "Horas de Atendimento Evitadas"),
+        },
+    }
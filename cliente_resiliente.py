@@ -0,0 +1,72 @@
+# cliente_resiliente.py
+# Mavi.IA 5.0 - Cliente de Chat sob Política de Transporte
+# Runnable que envolve o cliente do registro e aplica transporte_resiliente em invoke/stream/astream
+
+import asyncio
+from typing import Any, AsyncIterator, Iterator, Optional
+
+from langchain_core.runnables import Runnable, RunnableConfig
+
+from transporte_resiliente import Transporte
+
+
+class ClienteResiliente(Runnable):
+    """
+    Mesmo contrato do cliente envolvido (entra em `prompt | llm` e em with_structured_output),
+    mas cada chamada passa pelo Transporte: prazos, retries, hedge, disjuntor e limite de
+    concorrência. Os caminhos síncronos rodam no loop de background do orquestrador, onde as
+    tentativas podem ser canceladas de verdade. O config é repassado intacto (telemetria).
+    """
+
+    def __init__(self, interno: Runnable, transporte: Transporte):
+        self.interno = interno
+        self.transporte = transporte
+
+    def get_name(self, suffix: Optional[str] = None, *, name: Optional[str] = None) -> str:
+        return self.interno.get_name(suffix, name=name)
+
+    def with_structured_output(self, schema: Any, **kwargs: Any) -> "ClienteResiliente":
+        return ClienteResiliente(self.interno.with_structured_output(schema, **kwargs), self.transporte)
+
+    # --- Assíncrono (caminho principal) ---
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        return await self.transporte.executar(lambda: self.interno.ainvoke(input, config, **kwargs))
+
+    async def astream(self, input: Any, config: Optional[RunnableConfig] = None,
+                      **kwargs: Optional[Any]) -> AsyncIterator[Any]:
+        fluxo = self.transporte.executar_stream(lambda: self.interno.astream(input, config, **kwargs))
+        try:
+            async for chunk in fluxo:
+                yield chunk
+        finally:
+            await fluxo.aclose()
+
+    # --- Síncrono (ponte para o loop de background) ---
+
+    @staticmethod
+    def _loop() -> asyncio.AbstractEventLoop:
+        from orquestrador_chat import loop_background
+        loop = loop_background()
+        try:
+            atual = asyncio.get_running_loop()
+        except RuntimeError:
+            atual = None
+        if atual is loop:
+            raise RuntimeError("Chamada síncrona ao LLM dentro do loop de background; use ainvoke/astream.")
+        return loop
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        return asyncio.run_coroutine_threadsafe(self.ainvoke(input, config, **kwargs), self._loop()).result()
+
+    def stream(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Optional[Any]) -> Iterator[Any]:
+        loop = self._loop()
+        fluxo = self.astream(input, config, **kwargs)
+        try:
+            while True:
+                try:
+                    yield asyncio.run_coroutine_threadsafe(fluxo.__anext__(), loop).result()
+                except StopAsyncIteration:
+                    return
+        finally:
+            asyncio.run_coroutine_threadsafe(fluxo.aclose(), loop).result()
@@ -2,6 +2,8 @@
 # Mavi.IA 5.0 - Configurações Globais e Template Executivo de Relatório
 # Atualizado com Matriz de Decisão de Ferramentas e Gráficos ASCII
 
+import os
+
 # --- 1. PARÂMETROS OPERACIONAIS FIXOS ---
 CUSTO_FTE_HORAS_MES = 160  # Base de cálculo para conversão de horas em FTE
 
@@ -20,8 +22,16 @@ CUSTO_DINAMICO_DUMMY = {
     }
 }
 
+# Fonte real dos preços/câmbio: snapshot versionado + buscador opcional (ver provedor_custos.py)
+CAMINHO_SNAPSHOT_CUSTOS = os.getenv("MAVI_CUSTOS_SNAPSHOT", os.path.join(os.path.dirname(os.path.abspath(__file__)), "custos_snapshot.json"))
+URL_CUSTOS = os.getenv("MAVI_CUSTOS_URL")  # Ex: http://localhost:8765/custos.json (stub local)
+TTL_CUSTOS_SEGUNDOS = 3600
+ESPERA_FALHA_CUSTOS_SEGUNDOS = 60  # Após uma revalidação falhar, nova tentativa só depois disso (limitado ao TTL)
+
 # --- 3. SYSTEM PROMPT (O CÉREBRO DA MAVI) ---
 # Este prompt força o LLM a seguir estritamente o layout do relatório executivo.
+# Incrementar VERSAO_SYSTEM_PROMPT a cada mudança no template (invalida o cache de relatórios).
+VERSAO_SYSTEM_PROMPT = "5.1.0"
 
 SYSTEM_PROMPT = """
 Você é a Mavi.IA 5.0, Arquiteta de Soluções Sênior e Consultora de Governança de IA.
@@ -102,3 +112,100 @@ Composição do OPEX mensal da solução proposta:
 ---
 *Relatório gerado por Mavi.IA Framework 5.0*
 """
+
+# --- 3.1 PROMPT DA NARRATIVA (RENDERIZAÇÃO HÍBRIDA) ---
+# Tabelas, gráfico ASCII e LaTeX do template acima são montados localmente (renderizador_relatorio.py).
+# O LLM escreve só as seções qualitativas, na ordem e com os marcadores abaixo.
+SYSTEM_PROMPT_NARRATIVA = """
+Você é a Mavi.IA 5.0, Arquiteta de Soluções Sênior e Consultora de Governança de IA.
+Os números do relatório (tabelas de KPIs e OPEX, gráfico e fórmulas) já foram calculados e
+formatados pelo motor financeiro; NÃO os reproduza. Escreva apenas as seções qualitativas abaixo,
+nesta ordem, cada uma começando pelo marcador em uma linha própria e sem nenhum texto fora delas:
+
+@@PROJETO@@
+[Nome sugerido do projeto, em uma linha]
+@@VEREDITO@@
+[Apenas uma palavra: APROVADO, REPROVADO ou ATENÇÃO]
+@@RESUMO@@
+[Parágrafo denso e persuasivo (máx 3 linhas) focado no ROI e no impacto estratégico]
+@@COMPLIANCE@@
+[Uma frase: como a padronização via IA reduz riscos de auditoria]
+@@FERRAMENTA@@
+[n8n Enterprise OU LangChain/Python]
+@@POR_QUE@@
+[Por que essa ferramenta: n8n para fluxos lineares/integrações, LangChain para agentes complexos/memória]
+@@MODELO@@
+[Uma frase justificando se o modelo informado é adequado para a tarefa]
+@@RISCOS@@
+* [Risco 1]
+* [Risco 2]
+* [Risco 3]
+
+Seja rigorosa e didática; cite o ROI e o payback informados quando útil.
+"""
+
+# --- 4. CACHE DE RELATÓRIOS ---
+DIRETORIO_CACHE = os.getenv("MAVI_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".mavi_cache"))
+CACHE_RELATORIOS_MAX_BYTES = 50 * 1024 * 1024
+CACHE_RELATORIOS_MAX_ENTRADAS = 5000
+
+# --- 5. TELEMETRIA DOS PIPELINES ---
+TELEMETRIA_ATIVA = os.getenv("MAVI_TELEMETRIA", "1") == "1"  # "0" desliga os callbacks (custo nulo)
+TELEMETRIA_JSONL = os.getenv("MAVI_TELEMETRIA_JSONL")  # Ex: logs/telemetria.jsonl (um span por linha)
+TELEMETRIA_PORTA_PROMETHEUS = int(os.getenv("MAVI_PROMETHEUS_PORTA", "0")) or None  # Ex: 9464 -> GET /metrics
+
+# --- 6. MEMÓRIA DO CHAT ---
+MEMORIA_TURNOS_VERBATIM = 4         # Trocas (usuário + Mavi) mais recentes enviadas na íntegra
+MEMORIA_ORCAMENTO_TOKENS = 2500     # Teto do chat_history (resumo + parâmetros + mensagens), estimativa local
+MEMORIA_MAX_TOKENS_RESUMO = 400
+MEMORIA_MIN_MENSAGENS_RESUMO = 4    # Só chama o resumidor quando houver ao menos isso fora da janela
+
+# --- 7. TRANSPORTE DO LLM (prazos, retries, hedge, disjuntor) ---
+# Campos de transporte_resiliente.PoliticaTransporte; o que faltar usa o padrão da classe.
+POLITICAS_TRANSPORTE = {
+    "chat": {"prazo_total_s": 45.0, "timeout_primeiro_chunk_s": 12.0, "timeout_inatividade_s": 15.0,
+             "tentativas": 3, "hedge_apos_s": 5.0},
+    "extracao": {"prazo_total_s": 30.0, "timeout_primeiro_chunk_s": 15.0, "tentativas": 3, "hedge_apos_s": 6.0},
+    "resumo": {"prazo_total_s": 60.0, "timeout_primeiro_chunk_s": 30.0, "tentativas": 2},
+    "relatorio": {"prazo_total_s": 120.0, "timeout_primeiro_chunk_s": 25.0, "timeout_inatividade_s": 20.0,
+                  "tentativas": 2, "hedge_apos_s": 10.0},
+}
+TRANSPORTE_MAX_CONCORRENCIA = 8     # Chamadas simultâneas por cliente (por loop de eventos)
+DISJUNTOR_LIMIAR_FALHAS = 5         # Tentativas seguidas com erro até abrir o circuito
+DISJUNTOR_TEMPO_ABERTO_S = 30.0     # Falha rápida para a saída local durante esse tempo
+
+# --- 8. REPOSITÓRIO DE CENÁRIOS (histórico e portfólio) ---
+CAMINHO_REPOSITORIO_CENARIOS = os.getenv(
+    "MAVI_REPOSITORIO", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".mavi_dados", "cenarios.sqlite"))
+REPOSITORIO_TAMANHO_LOTE = 200      # Cenários por transação ao gravar resultados do lote
+
+# --- 9. RECÁLCULO DO PORTFÓLIO (mudança de preços/câmbio) ---
+RECALCULO_TAMANHO_BLOCO = 5000      # Cenários por passada vetorizada (e por transação de UPDATE)
+RECALCULO_LIMIAR_PAYBACK_MESES = 12.0  # Payback cruzando esse limite conta como veredito alterado
+
+# --- 10. API HTTP LOCAL (api_http.py) ---
+API_HOST = os.getenv("MAVI_API_HOST", "127.0.0.1")
+API_PORTA = int(os.getenv("MAVI_API_PORTA", "8765"))
+API_TRABALHADORES = 4               # Relatórios/extrações simultâneos (chamadas ao LLM)
+API_FILA_MAX = 64                   # Pedidos aguardando trabalhador; acima disso responde 503
+API_MAX_CENARIOS_LOTE = 10_000      # Cenários por chamada a POST /metrics
+API_MAX_CORPO_BYTES = 8 * 2**20
+
+# --- 11. GRAVAÇÃO E REPRODUÇÃO DO LLM (transporte_replay.py) ---
+LLM_MODO = os.getenv("MAVI_LLM_MODO", "real")   # "real", "gravar" (real + fita) ou "reproduzir" (só a fita)
+LLM_FITA = os.getenv(
+    "MAVI_LLM_FITA", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".mavi_dados", "fita_llm.jsonl"))
+REPLAY_APROXIMADO = os.getenv("MAVI_REPLAY_APROXIMADO", "1") != "0"  # Prompt inédito reusa gravação da mesma família
+REPLAY_LATENCIA = {
+    "modo": os.getenv("MAVI_REPLAY_LATENCIA", "gravada"),  # "gravada" (x fator), "lognormal" ou "fixa"
+    "fator": 1.0,
+    "ttft_s": 0.8,       # Mediana (lognormal) ou valor (fixa) até o primeiro chunk
+    "sigma": 0.5,
+    "por_chunk_s": 0.02,
+}
+
+# --- 12. ESTIMADOR DE TOKENS POR AMOSTRAS (estimador_tokens.py) ---
+ESTIMADOR_EXTENSOES = (".txt", ".md", ".csv", ".json", ".jsonl", ".eml", ".html", ".xml", ".log")
+ESTIMADOR_BLOCO_BYTES = 32 * 2**20      # Trecho de arquivo por tarefa (arquivos grandes viram várias)
+ESTIMADOR_MIN_BYTES_POOL = 64 * 2**20   # Abaixo disso conta no próprio processo (subir o pool custa mais)
+ESTIMADOR_PROCESSOS = int(os.getenv("MAVI_ESTIMADOR_PROCESSOS", "0")) or None  # None = um por CPU
@@ -0,0 +1,356 @@
+# estimador_tokens.py
+# Mavi.IA 5.0 - Estimativa de Tokens por Unidade a partir de Documentos de Amostra
+# Lê uma pasta de amostras (contratos, tickets) via mmap e pool de processos; p50/p95 vão direto para o bloco_2
+#
+# Uso:
+#   python estimador_tokens.py amostras/contratos [--saidas amostras/respostas] [--unidade linha] [--percentil p95]
+#   (--payload cenario.json grava os tokens no bloco_2 do cenário; o cache por hash evita reler arquivos iguais)
+
+import argparse
+import hashlib
+import json
+import math
+import mmap
+import os
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+import config_mavi
+from memoria_chat import CARACTERES_POR_TOKEN
+
+UNIDADES = ("documento", "linha")   # Um arquivo por unidade, ou uma unidade por linha (exportação de tickets)
+PERCENTIS = ("p50", "p95")
+
+# Bytes que str.split() trata como separador (ASCII): espaço, \t, \n, \v, \f, \r e \x1c-\x1f
+_ESPACOS = np.zeros(256, dtype=bool)
+_ESPACOS[[0x20, 0x09, 0x0A, 0x0B, 0x0C, 0x0D, 0x1C, 0x1D, 0x1E, 0x1F]] = True
+_QUEBRA, _RETORNO = 0x0A, 0x0D
+
+
+# ==========================================
+# 1. CONTAGEM (MESMA APROXIMAÇÃO DE memoria_chat.estimar_tokens)
+# ==========================================
+
+def tokens_de_contagens(caracteres: np.ndarray, palavras: np.ndarray,
+                        caracteres_por_token: float = CARACTERES_POR_TOKEN) -> np.ndarray:
+    """Vetor de estimar_tokens: ~4 caracteres por token, nunca menos que o nº de palavras."""
+    return np.maximum(np.ceil(caracteres / caracteres_por_token), palavras).astype(np.int64)
+
+
+def _espacos(dados: np.ndarray) -> np.ndarray:
+    """Máscara de separadores. Caminho rápido (byte <= 0x20) quando não há outros controles."""
+    espaco = dados <= 0x20
+    if np.count_nonzero(dados < 0x09) or np.count_nonzero((dados - np.uint8(0x0E)) < 0x0E):
+        return _ESPACOS[dados]  # \x00-\x08 ou \x0e-\x1b presentes: tabela completa (mais lenta)
+    return espaco
+
+
+def _contar(dados: np.ndarray, anterior_espaco: bool, inicios: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Caracteres (bytes que não são continuação UTF-8) e palavras (não separador após separador)
+    de `dados`, por segmento a partir de `inicios` (padrão: um segmento só). Nada é decodificado.
+    """
+    espaco = _espacos(dados)
+    continuacao = (dados & 0xC0) == 0x80
+    primeira = bool(anterior_espaco and not espaco[0])
+    if inicios is None:
+        palavras = np.count_nonzero(~espaco[1:] & espaco[:-1]) + primeira
+        return (np.array([len(dados) - np.count_nonzero(continuacao)], dtype=np.int64),
+                np.array([palavras], dtype=np.int64))
+    # Vários segmentos: posições dos eventos, contadas por segmento com searchsorted
+    limites = np.append(inicios, len(dados))
+    posicoes_palavras = np.flatnonzero(~espaco[1:] & espaco[:-1]) + 1
+    if primeira:
+        posicoes_palavras = np.concatenate(([0], posicoes_palavras))
+    palavras = np.diff(np.searchsorted(posicoes_palavras, limites))
+    continuacoes = np.diff(np.searchsorted(np.flatnonzero(continuacao), limites))
+    return np.diff(limites) - continuacoes, palavras
+
+
+def _contar_trecho(tarefa: Tuple[str, int, int, str]) -> Tuple[bytes, np.ndarray, np.ndarray]:
+    """
+    Tarefa do pool: conta o trecho [inicio, fim) de um arquivo e devolve o hash do trecho
+    (sempre dos bytes brutos, para o hash do arquivo não depender da unidade). Na unidade
+    "linha", o trecho fica com as linhas que começam nele (a última pode passar de `fim`).
+    """
+    caminho, inicio, fim, unidade = tarefa
+    with open(caminho, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+        tamanho = len(mapa)
+        with memoryview(mapa) as visao:
+            resumo = hashlib.sha256(visao[inicio:fim]).digest()
+        if unidade == "documento":
+            anterior_espaco = inicio == 0 or bool(_ESPACOS[mapa[inicio - 1]])
+            dados = np.frombuffer(mapa, dtype=np.uint8, count=fim - inicio, offset=inicio)
+            caracteres, palavras = _contar(dados, anterior_espaco)
+            del dados  # Solta a referência ao mmap antes de fechá-lo
+            return resumo, caracteres, palavras
+
+        if inicio > 0 and mapa[inicio - 1] != _QUEBRA:
+            proxima = mapa.find(b"\n", inicio)
+            inicio = tamanho if proxima < 0 else proxima + 1
+        if fim < tamanho and mapa[fim - 1] != _QUEBRA:
+            proxima = mapa.find(b"\n", fim)
+            fim = tamanho if proxima < 0 else proxima + 1
+        if inicio >= fim:
+            return resumo, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        dados = np.frombuffer(mapa, dtype=np.uint8, count=fim - inicio, offset=inicio)
+        quebras = np.flatnonzero(dados == _QUEBRA)
+        inicios = np.concatenate(([0], quebras + 1))
+        inicios = inicios[inicios < len(dados)]
+        caracteres, palavras = _contar(dados, True, inicios)
+        # Tira o \n (e o \r de arquivos CRLF) do fim de cada linha, como `for linha in arquivo`
+        finais = np.append(inicios[1:], len(dados)) - 1
+        com_quebra = dados[finais] == _QUEBRA
+        caracteres -= com_quebra
+        caracteres -= com_quebra & (finais > inicios) & (dados[np.maximum(finais - 1, 0)] == _RETORNO)
+        del dados
+        preenchidas = palavras > 0  # Linhas em branco não são unidades
+        return resumo, caracteres[preenchidas], palavras[preenchidas]
+
+
+# ==========================================
+# 2. CACHE POR HASH DE CONTEÚDO
+# ==========================================
+
+class CacheTokens:
+    """
+    Contagens por arquivo, chaveadas pelo hash do conteúdo (e pela unidade), em SQLite.
+
+    Guarda caracteres e palavras por unidade (não tokens): mudar CARACTERES_POR_TOKEN
+    não invalida nada. Um índice (caminho, tamanho, mtime) -> hash evita reler arquivos
+    que não mudaram desde a última estimativa.
+    """
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+        self._conn = sqlite3.connect(caminho, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS contagens (
+                hash TEXT NOT NULL,
+                unidade TEXT NOT NULL,
+                caracteres BLOB NOT NULL,
+                palavras BLOB NOT NULL,
+                PRIMARY KEY (hash, unidade)
+            );
+            CREATE TABLE IF NOT EXISTS arquivos (
+                caminho TEXT PRIMARY KEY,
+                tamanho INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                hash TEXT NOT NULL
+            );
+        """)
+        self._conn.commit()
+
+    def obter(self, caminho: str, estado: os.stat_result, unidade: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        with self._lock:
+            linha = self._conn.execute(
+                "SELECT c.caracteres, c.palavras FROM arquivos a JOIN contagens c ON c.hash = a.hash "
+                "WHERE a.caminho = ? AND a.tamanho = ? AND a.mtime_ns = ? AND c.unidade = ?",
+                (caminho, estado.st_size, estado.st_mtime_ns, unidade)).fetchone()
+            if linha is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return np.frombuffer(linha[0], dtype=np.int64), np.frombuffer(linha[1], dtype=np.int64)
+
+    def guardar(self, itens: Iterable[Tuple[str, os.stat_result, str, str, np.ndarray, np.ndarray]]) -> None:
+        """Itens (caminho, stat, hash, unidade, caracteres, palavras), numa transação."""
+        with self._lock, self._conn:
+            for caminho, estado, resumo, unidade, caracteres, palavras in itens:
+                self._conn.execute("INSERT OR REPLACE INTO contagens VALUES (?, ?, ?, ?)",
+                                   (resumo, unidade, caracteres.astype(np.int64).tobytes(),
+                                    palavras.astype(np.int64).tobytes()))
+                self._conn.execute("INSERT OR REPLACE INTO arquivos VALUES (?, ?, ?, ?)",
+                                   (caminho, estado.st_size, estado.st_mtime_ns, resumo))
+
+
+_cache_padrao: Optional[CacheTokens] = None
+_lock_cache = threading.Lock()
+
+
+def cache_padrao() -> CacheTokens:
+    """Cache único do processo, em `config_mavi.DIRETORIO_CACHE`."""
+    global _cache_padrao
+    with _lock_cache:
+        if _cache_padrao is None:
+            _cache_padrao = CacheTokens(os.path.join(config_mavi.DIRETORIO_CACHE, "tokens_amostras.sqlite"))
+        return _cache_padrao
+
+
+# ==========================================
+# 3. ESTIMATIVA DE UMA PASTA
+# ==========================================
+
+@dataclass
+class DistribuicaoTokens:
+    unidades: int
+    arquivos: int
+    bytes: int
+    media: float
+    p50: int
+    p95: int
+    maximo: int
+    arquivos_em_cache: int = 0
+    duracao_s: float = 0.0
+
+
+def listar_amostras(pasta: str, extensoes: Tuple[str, ...] = config_mavi.ESTIMADOR_EXTENSOES) -> List[str]:
+    if not os.path.isdir(pasta):
+        raise ValueError(f"Pasta de amostras não encontrada: {pasta}")
+    arquivos = []
+    for raiz, _, nomes in os.walk(pasta):
+        arquivos.extend(os.path.join(raiz, nome) for nome in nomes if nome.lower().endswith(extensoes))
+    return sorted(os.path.abspath(caminho) for caminho in arquivos)
+
+
+def _tarefas(caminho: str, tamanho: int, unidade: str, bloco: int) -> List[Tuple[str, int, int, str]]:
+    return [(caminho, inicio, min(inicio + bloco, tamanho), unidade) for inicio in range(0, tamanho, bloco)]
+
+
+def contar_arquivos(arquivos: List[str], unidade: str = "documento", cache: Optional[CacheTokens] = None,
+                    processos: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, int]:
+    """
+    Caracteres e palavras por unidade de todos os `arquivos`, e quantos vieram do cache.
+    Arquivos grandes são divididos em trechos de ESTIMADOR_BLOCO_BYTES; acima de
+    ESTIMADOR_MIN_BYTES_POOL os trechos vão para um pool de `processos`.
+    """
+    if unidade not in UNIDADES:
+        raise ValueError(f"Unidade desconhecida: {unidade} (use {' ou '.join(UNIDADES)})")
+    caracteres: List[np.ndarray] = []
+    palavras: List[np.ndarray] = []
+    pendentes: List[Tuple[str, os.stat_result]] = []
+    em_cache = 0
+    for caminho in arquivos:
+        estado = os.stat(caminho)
+        if estado.st_size == 0:
+            continue
+        guardado = cache.obter(caminho, estado, unidade) if cache is not None else None
+        if guardado is None:
+            pendentes.append((caminho, estado))
+        else:
+            caracteres.append(guardado[0])
+            palavras.append(guardado[1])
+            em_cache += 1
+
+    tarefas = [t for caminho, estado in pendentes
+               for t in _tarefas(caminho, estado.st_size, unidade, config_mavi.ESTIMADOR_BLOCO_BYTES)]
+    if sum(estado.st_size for _, estado in pendentes) >= config_mavi.ESTIMADOR_MIN_BYTES_POOL and len(tarefas) > 1:
+        with ProcessPoolExecutor(max_workers=processos or config_mavi.ESTIMADOR_PROCESSOS) as pool:
+            resultados = list(pool.map(_contar_trecho, tarefas, chunksize=max(1, len(tarefas) // 64)))
+    else:
+        resultados = [_contar_trecho(tarefa) for tarefa in tarefas]
+
+    novos, posicao = [], 0
+    for caminho, estado in pendentes:
+        trechos = resultados[posicao:posicao + len(_tarefas(caminho, estado.st_size, unidade,
+                                                            config_mavi.ESTIMADOR_BLOCO_BYTES))]
+        posicao += len(trechos)
+        resumo = hashlib.sha256(b"".join(r[0] for r in trechos) + str(estado.st_size).encode()).hexdigest()
+        if unidade == "documento":  # Trechos do mesmo documento somam numa unidade só
+            car = np.array([sum(int(r[1].sum()) for r in trechos)], dtype=np.int64)
+            pal = np.array([sum(int(r[2].sum()) for r in trechos)], dtype=np.int64)
+        else:
+            car = np.concatenate([r[1] for r in trechos])
+            pal = np.concatenate([r[2] for r in trechos])
+        caracteres.append(car)
+        palavras.append(pal)
+        novos.append((caminho, estado, resumo, unidade, car, pal))
+    if cache is not None and novos:
+        cache.guardar(novos)
+    vazio = np.zeros(0, dtype=np.int64)
+    return (np.concatenate(caracteres) if caracteres else vazio,
+            np.concatenate(palavras) if palavras else vazio, em_cache)
+
+
+def distribuicao(tokens: np.ndarray, arquivos: int, tamanho: int) -> DistribuicaoTokens:
+    if not len(tokens):
+        raise ValueError("Nenhuma unidade com texto nas amostras")
+    p50, p95 = np.percentile(tokens, [50, 95])
+    return DistribuicaoTokens(unidades=int(len(tokens)), arquivos=arquivos, bytes=tamanho,
+                              media=round(float(tokens.mean()), 1), p50=int(math.ceil(p50)),
+                              p95=int(math.ceil(p95)), maximo=int(tokens.max()))
+
+
+def estimar_pasta(pasta: str, unidade: str = "documento", tokens_fixos: int = 0,
+                  cache: Optional[CacheTokens] = None, processos: Optional[int] = None) -> DistribuicaoTokens:
+    """
+    Distribuição de tokens por unidade das amostras em `pasta` (recursiva). `tokens_fixos`
+    soma a cada unidade o que vai em toda chamada (instruções, exemplos do prompt).
+    """
+    inicio = time.perf_counter()
+    arquivos = listar_amostras(pasta)
+    caracteres, palavras, em_cache = contar_arquivos(arquivos, unidade, cache, processos)
+    resultado = distribuicao(tokens_de_contagens(caracteres, palavras) + tokens_fixos, len(arquivos),
+                             sum(os.path.getsize(caminho) for caminho in arquivos))
+    resultado.arquivos_em_cache = em_cache
+    resultado.duracao_s = round(time.perf_counter() - inicio, 3)
+    return resultado
+
+
+def aplicar_no_bloco_2(bloco_2: Mapping[str, Any], entrada: Optional[DistribuicaoTokens] = None,
+                       saida: Optional[DistribuicaoTokens] = None, percentil: str = "p50") -> Dict[str, Any]:
+    """Cópia do bloco_2 com tokens_input/output_por_unidade no `percentil` das distribuições dadas."""
+    if percentil not in PERCENTIS:
+        raise ValueError(f"Percentil desconhecido: {percentil} (use {' ou '.join(PERCENTIS)})")
+    bloco = dict(bloco_2)
+    if entrada is not None:
+        bloco["tokens_input_por_unidade"] = getattr(entrada, percentil)
+    if saida is not None:
+        bloco["tokens_output_por_unidade"] = getattr(saida, percentil)
+    return bloco
+
+
+# ==========================================
+# 4. LINHA DE COMANDO
+# ==========================================
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Estima tokens por unidade a partir de documentos de amostra (Mavi 5.0).")
+    parser.add_argument("pasta", help="Amostras de entrada (contratos, tickets...)")
+    parser.add_argument("--saidas", help="Amostras de saída esperada (respostas, resumos) para tokens_output")
+    parser.add_argument("--unidade", choices=UNIDADES, default="documento")
+    parser.add_argument("--tokens-fixos", type=int, default=0, help="Tokens de instruções somados a cada entrada")
+    parser.add_argument("--percentil", choices=PERCENTIS, default="p50", help="Valor gravado no bloco_2")
+    parser.add_argument("--processos", type=int, default=None)
+    parser.add_argument("--sem-cache", action="store_true")
+    parser.add_argument("--payload", help="JSON de cenário cujo bloco_2 recebe os tokens estimados")
+    args = parser.parse_args(argv)
+
+    cache = None if args.sem_cache else cache_padrao()
+    try:
+        entrada = estimar_pasta(args.pasta, args.unidade, args.tokens_fixos, cache, args.processos)
+        saida = estimar_pasta(args.saidas, args.unidade, 0, cache, args.processos) if args.saidas else None
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    for nome, dist in (("entrada", entrada), ("saída", saida)):
+        if dist is not None:
+            print(f"{nome:8} {dist.unidades} unidades em {dist.arquivos} arquivos ({dist.bytes / 2**20:.1f} MiB, "
+                  f"{dist.arquivos_em_cache} do cache) em {dist.duracao_s}s · p50 {dist.p50} · p95 {dist.p95} "
+                  f"· média {dist.media} · máx. {dist.maximo} tokens")
+    if args.payload:
+        with open(args.payload, encoding="utf-8") as f:
+            payload = json.load(f)
+        payload["bloco_2"] = aplicar_no_bloco_2(payload.get("bloco_2") or {}, entrada, saida, args.percentil)
+        with open(args.payload, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, indent=2)
+        print(f"bloco_2 de {args.payload} atualizado com o {args.percentil}")
+    else:
+        print(json.dumps({"entrada": asdict(entrada), "saida": asdict(saida) if saida else None}, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,227 @@
+# extrator_incremental.py
+# Mavi.IA 5.0 - Extração Incremental de Parâmetros
+# Envia ao LLM só o turno novo + um resumo compacto do estado; custo por turno não cresce com o chat
+
+import threading
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import telemetria
+from schema_mavi import MaviParametersDelta
+from transporte_resiliente import ErroTransporte
+from extrator_regras import LIMIAR_CONFIANCA, ResultadoRegras, extrair_regras
+
+ORIGEM_USUARIO = "user"
+ORIGEM_ASSISTENTE = "assistant"
+MAX_CARACTERES_CONTEXTO = 600  # Última pergunta da Mavi enviada junto com a resposta do usuário
+PREFIXO_CONTEXTO = "AI (pergunta anterior): "
+
+
+def _prompt_incremental(resumo_estado: str, texto_novo: str, locais: Optional[Dict[str, Any]] = None) -> str:
+    dicas = ""
+    if locais:
+        dicas = "\n    --- JÁ EXTRAÍDO LOCALMENTE (confira; corrija se o trecho disser outra coisa) ---\n    " + \
+                "\n    ".join(f"{campo}={valor}" for campo, valor in locais.items()) + "\n"
+    return f"""
+    Você mantém os parâmetros de uma consultoria de ROI de IA.
+    Abaixo estão o ESTADO ATUAL (já extraído dos turnos anteriores) e o TRECHO NOVO da conversa.
+    Retorne APENAS os campos que o trecho novo define ou altera; NULL para todo o resto.
+    Se o trecho novo mudar o tipo do projeto (automacao ou faq), retorne tipo_projeto.
+
+    --- ESTADO ATUAL ---
+    {resumo_estado}
+    {dicas}
+    --- TRECHO NOVO ---
+    {texto_novo}
+    """
+
+
+def texto_turno(mensagens: List[Dict[str, str]], desde: Optional[int] = None) -> str:
+    """
+    Monta o trecho novo a partir do histórico do Streamlit: as mensagens do usuário a partir
+    do índice `desde` (sem `desde`, só a última) e, como contexto, a pergunta da Mavi que
+    elas respondem (truncada). Tamanho constante enquanto nenhum turno é cancelado.
+    """
+    if not mensagens:
+        return ""
+    inicio = len(mensagens) - 1 if desde is None else min(max(desde, 0), len(mensagens) - 1)
+    if desde is not None:
+        inicio = next((i for i in range(inicio, len(mensagens)) if mensagens[i]["role"] == ORIGEM_USUARIO), inicio)
+    partes = []
+    anterior = next((m["content"] for m in reversed(mensagens[:inicio]) if m["role"] == ORIGEM_ASSISTENTE), None)
+    if anterior:
+        partes.append(PREFIXO_CONTEXTO + anterior[-MAX_CARACTERES_CONTEXTO:])
+    partes.extend(f"user: {m['content']}" for m in mensagens[inicio:] if m["role"] == ORIGEM_USUARIO)
+    return "\n".join(partes)
+
+
+def falas_usuario(mensagens: List[Dict[str, str]]) -> str:
+    """Tudo o que o usuário disse na sessão (referência de números já citados para a reconciliação)."""
+    return "\n".join(m["content"] for m in mensagens if m["role"] == ORIGEM_USUARIO)
+
+
+class ExtratorIncremental:
+    """
+    Estado de extração de uma sessão de chat.
+
+    * `valores`: parâmetros consolidados até agora (campo -> valor);
+    * `proveniencia`: campo -> {"turno", "origem"} de quem definiu o valor atual.
+
+    Valores ditos pelo usuário prevalecem: um número sugerido pela Mavi só preenche
+    campos que o usuário ainda não definiu.
+
+    Cada trecho passa primeiro pelo extrator por regras (extrator_regras); o LLM só é
+    chamado quando sobra número sem campo, algum campo fica abaixo de `limiar` ou o
+    tipo do projeto ainda é desconhecido. `usar_regras=False` desliga o caminho rápido.
+
+    `mensagens_aplicadas` é o índice do chat até onde as mensagens do usuário já foram
+    extraídas; `preparar_turno` envia tudo o que veio depois dele, então um turno cancelado
+    (ou com o LLM fora do ar) é extraído de novo junto com o próximo.
+    """
+
+    def __init__(self, extrator=None, usar_regras: bool = True, limiar: float = LIMIAR_CONFIANCA):
+        self._extrator = extrator
+        self.usar_regras = usar_regras
+        self.limiar = limiar
+        self._lock = threading.Lock()
+        self.valores: Dict[str, Any] = {}
+        self.proveniencia: Dict[str, Dict[str, Any]] = {}
+        self.turno = 0
+        self.mensagens_aplicadas = 0
+        self.trechos_locais = 0  # Atendidos só pelas regras
+        self.chamadas_llm = 0
+        self.falhas_llm = 0      # Transporte desistiu: o trecho ficou só com as regras
+
+    @property
+    def extrator(self):
+        if self._extrator is None:
+            from langchain_agent import _extrator_estruturado  # Import tardio: só quando o LLM é necessário
+            self._extrator = _extrator_estruturado(MaviParametersDelta)
+        return self._extrator
+
+    def resumo_estado(self) -> str:
+        """Uma linha por campo preenchido (tamanho limitado pelo schema, não pelo chat)."""
+        with self._lock:
+            if not self.valores:
+                return "(vazio)"
+            return "\n".join(f"{campo}={valor}" for campo, valor in self.valores.items())
+
+    def estado(self) -> MaviParametersDelta:
+        with self._lock:
+            return MaviParametersDelta(**self.valores)
+
+    def aplicar(self, delta: Optional[MaviParametersDelta], origem: str = ORIGEM_USUARIO,
+                fontes: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """
+        Mescla um delta no estado; retorna apenas os campos que efetivamente mudaram.
+        `fontes` indica campo -> "regras"/"llm" (padrão "llm") para a proveniência.
+        """
+        if delta is None:
+            return {}
+        alterados = {}
+        with self._lock:
+            if origem == ORIGEM_USUARIO:
+                self.turno += 1
+            for campo, valor in delta.model_dump().items():
+                if valor is None or self.valores.get(campo) == valor:
+                    continue
+                dono = self.proveniencia.get(campo, {}).get("origem")
+                if origem == ORIGEM_ASSISTENTE and dono == ORIGEM_USUARIO:
+                    continue
+                self.valores[campo] = valor
+                self.proveniencia[campo] = {"turno": self.turno, "origem": origem,
+                                            "fonte": (fontes or {}).get(campo, "llm")}
+                alterados[campo] = valor
+        return alterados
+
+    # --- Caminho rápido (regras) e chamadas ao LLM ---
+
+    def _regras(self, texto_novo: str, origem: str) -> Optional[ResultadoRegras]:
+        """Roda as regras só sobre o que a origem disse (a pergunta de contexto é ignorada)."""
+        if not self.usar_regras:
+            return None
+        if origem == ORIGEM_USUARIO:
+            texto_novo = "\n".join(l for l in texto_novo.splitlines() if not l.startswith(PREFIXO_CONTEXTO))
+        return extrair_regras(texto_novo, self.limiar)
+
+    def _precisa_llm(self, regras: Optional[ResultadoRegras]) -> bool:
+        if regras is None or regras.precisa_llm:
+            return True
+        with self._lock:
+            tipo_conhecido = "tipo_projeto" in self.valores
+        return not tipo_conhecido and "tipo_projeto" not in regras.aceitos
+
+    def _consolidar(self, regras: Optional[ResultadoRegras], delta_llm: Optional[MaviParametersDelta],
+                    origem: str, ate_mensagem: Optional[int] = None) -> MaviParametersDelta:
+        """
+        Valores aceitos pelas regras + o que o LLM devolveu (o LLM vê o contexto e prevalece).
+        `ate_mensagem` (None quando o LLM falhou) avança `mensagens_aplicadas`.
+        """
+        locais = dict(regras.aceitos) if regras is not None else {}
+        do_llm = {}
+        if delta_llm is not None:
+            do_llm = {c: v for c, v in delta_llm.model_dump().items() if v is not None}
+        fontes = {campo: "regras" for campo in locais if campo not in do_llm}
+        self.aplicar(MaviParametersDelta(**{**locais, **do_llm}), origem, fontes)
+        if ate_mensagem is not None:
+            with self._lock:
+                self.mensagens_aplicadas = max(self.mensagens_aplicadas, ate_mensagem)
+        return self.estado()
+
+    def extrair(self, texto_novo: str, origem: str = ORIGEM_USUARIO,
+                ate_mensagem: Optional[int] = None) -> MaviParametersDelta:
+        regras = self._regras(texto_novo, origem)
+        delta = None
+        if self._precisa_llm(regras):
+            self.chamadas_llm += 1
+            dicas = regras.aceitos if regras else None
+            try:
+                delta = self.extrator.invoke(_prompt_incremental(self.resumo_estado(), texto_novo, dicas),
+                                             telemetria.config_execucao("extracao"))
+            except ErroTransporte:
+                self.falhas_llm += 1
+                ate_mensagem = None
+        else:
+            self.trechos_locais += 1
+        return self._consolidar(regras, delta, origem, ate_mensagem)
+
+    async def aextrair(self, texto_novo: str, origem: str = ORIGEM_USUARIO,
+                       ate_mensagem: Optional[int] = None) -> MaviParametersDelta:
+        regras = self._regras(texto_novo, origem)
+        delta = None
+        if self._precisa_llm(regras):
+            self.chamadas_llm += 1
+            dicas = regras.aceitos if regras else None
+            try:
+                delta = await self.extrator.ainvoke(_prompt_incremental(self.resumo_estado(), texto_novo, dicas),
+                                                    telemetria.config_execucao("extracao"))
+            except ErroTransporte:
+                self.falhas_llm += 1
+                ate_mensagem = None
+        else:
+            self.trechos_locais += 1
+        return self._consolidar(regras, delta, origem, ate_mensagem)
+
+    def preparar_turno(self, mensagens: List[Dict[str, str]]
+                       ) -> Tuple[str, Callable[[str], Awaitable[MaviParametersDelta]]]:
+        """
+        Trecho do turno (todas as mensagens do usuário depois de `mensagens_aplicadas`) e o
+        extrator que o orquestrador deve chamar: ao concluir, marca essas mensagens como aplicadas.
+        Se o turno for cancelado antes disso, o próximo turno as envia de novo.
+        """
+        ate = len(mensagens)
+
+        async def aextrair_turno(texto_novo: str) -> MaviParametersDelta:
+            return await self.aextrair(texto_novo, ate_mensagem=ate)
+
+        with self._lock:
+            desde = self.mensagens_aplicadas
+        return texto_turno(mensagens, desde), aextrair_turno
+
+    async def aextrair_resposta(self, texto_resposta: str) -> MaviParametersDelta:
+        """Passo de reconciliação sobre a resposta da Mavi (não sobrescreve o usuário)."""
+        return await self.aextrair(texto_resposta, origem=ORIGEM_ASSISTENTE)
+
+    def tabela_proveniencia(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [{"campo": campo, "valor": self.valores[campo], **info}
+                    for campo, info in self.proveniencia.items()]
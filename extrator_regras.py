@@ -0,0 +1,242 @@
+# extrator_regras.py
+# Mavi.IA 5.0 - Extração Local por Regras (Caminho Rápido)
+# Padrões compilados para números/moeda no formato brasileiro, unidades e âncoras por campo
+
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import config_mavi
+
+LIMIAR_CONFIANCA = 0.8   # Abaixo disso o campo é devolvido ao LLM
+HORAS_MES_CLT = 220      # Conversão de salário mensal para custo hora
+
+CAMPOS_INTEIROS = ("volume_mensal", "tokens_input_por_unidade", "tokens_output_por_unidade")
+CAMPOS_PERCENTUAIS = ("taxa_retencao_ia_percentual", "taxa_revisao_percentual", "taxa_erro_percentual")
+
+
+# ==========================================
+# 1. NÚMEROS NO FORMATO BRASILEIRO
+# ==========================================
+
+# "5.000", "1.234,56", "45,90", "2.5", "5 mil", "1,5 milhão", "10k"
+_NUM = (r"(?<![\w.,])(?P<num>\d{1,3}(?:\.\d{3})+(?:,\d+)?|\d+(?:[.,]\d+)?)"
+        r"(?:\s*(?P<mult>mil\b|k\b|milh(?:ao|oes)\b|mi\b))?")
+_MULTIPLICADORES = {"mil": 1e3, "k": 1e3, "milhao": 1e6, "milhoes": 1e6, "mi": 1e6}
+RE_NUMERO = re.compile(_NUM)
+
+
+def normalizar(texto: str) -> str:
+    """Minúsculas e sem acentos (as âncoras são escritas sem acento)."""
+    sem_acento = unicodedata.normalize("NFKD", texto or "").encode("ascii", "ignore").decode("ascii")
+    return sem_acento.lower()
+
+
+def numero_br(bruto: str, mult: Optional[str] = None) -> float:
+    """
+    Converte um número escrito em pt-BR para float.
+    Ponto seguido de exatamente 3 dígitos é separador de milhar ("5.000");
+    caso contrário é decimal ("2.5"). Vírgula é sempre decimal.
+    """
+    if "," in bruto:
+        valor = float(bruto.replace(".", "").replace(",", "."))
+    elif re.fullmatch(r"\d{1,3}(?:\.\d{3})+", bruto):
+        valor = float(bruto.replace(".", ""))
+    else:
+        valor = float(bruto)
+    return valor * _MULTIPLICADORES.get(mult or "", 1.0)
+
+
+# ==========================================
+# 2. REGRAS POR CAMPO
+# ==========================================
+
+@dataclass(frozen=True)
+class Regra:
+    campo: str
+    padrao: "re.Pattern[str]"
+    confianca: float
+    fator: float = 1.0
+
+
+def _regra(campo: str, padrao: str, confianca: float, fator: float = 1.0) -> Regra:
+    """`{NUM}` vira o padrão numérico; `{QTD}` é o mesmo, mas recusa valores em R$."""
+    padrao = padrao.replace("{QTD}", r"(?<!r\$)(?<!r\$\s)" + _NUM).replace("{NUM}", _NUM)
+    return Regra(campo, re.compile(padrao), confianca, fator)
+
+
+_MIN = r"(?:min\b|mins\b|minutos?\b)"
+_UNIDADES = (r"(?:contratos|documentos|docs|tickets|chamados|atendimentos|notas(?:\s+fiscais)?|faturas|"
+             r"e-?mails|pedidos|execucoes|processos|requisicoes|mensagens|conversas|boletos|curriculos|"
+             r"propostas|laudos|arquivos|pdfs|formularios|solicitacoes|contatos|interacoes)")
+_ANCORA_INFRA = r"(?:infra\w*|hosting|hospedagem|servidor\w*|n8n|vector\s*db|banco\s+vetorial|cloud|nuvem)"
+
+REGRAS: Tuple[Regra, ...] = (
+    # --- Bloco 1 ---
+    _regra("volume_mensal", r"{QTD}\s*(?:(?!reais\b|tokens?\b)\w+\s+){0,3}?(?:por|ao|/|no|todo)\s*mes", 0.95),
+    _regra("volume_mensal", r"{QTD}\s*" + _UNIDADES + r"\s*(?:mensais|mensalmente|/\s*mes)", 0.95),
+    _regra("volume_mensal", r"volume(?:\s+mensal)?\s*(?:de|e|:|=)?\s*(?:cerca\s+de|aprox\w*|~)?\s*{QTD}", 0.9),
+    _regra("volume_mensal", r"{QTD}\s*" + _UNIDADES, 0.7),
+
+    _regra("tempo_por_unidade_min", r"{NUM}\s*" + _MIN + r"\s*(?:cada(?!\s+revis)|por\s+(?:unidade|documento|contrato|item|execucao|nota|processo|pedido|arquivo))", 0.95),
+    _regra("tempo_por_unidade_min", r"(?:leva|levam|demora|demoram|gasta|gastam|gasto|tempo\s+manual|tempo\s+medio)\D{0,30}?{NUM}\s*" + _MIN, 0.85),
+    _regra("tempo_por_unidade_min", r"{NUM}\s*(?:h\b|horas?\b)\s*(?:cada|por\s+(?:unidade|documento|contrato|item|execucao|processo))", 0.9, 60.0),
+    _regra("tempo_por_unidade_min", r"{NUM}\s*" + _MIN, 0.55),
+
+    _regra("salario_hora_brl", r"r\$\s*{NUM}\s*(?:/|por|a)\s*(?:hora\b|h\b)", 0.95),
+    _regra("salario_hora_brl", r"{NUM}\s*reais\s*(?:/|por|a)\s*(?:hora\b|h\b)", 0.95),
+    _regra("salario_hora_brl", r"(?:custo|valor)\s+(?:da\s+|de\s+|por\s+)?hora\D{0,25}?{NUM}", 0.85),
+    _regra("salario_hora_brl", r"salario\D{0,30}?{NUM}\s*(?:reais\s*)?(?:/|por|ao)\s*mes", 0.8, 1.0 / HORAS_MES_CLT),
+    _regra("salario_hora_brl", r"salario\D{0,30}?{NUM}", 0.6),
+
+    _regra("custo_por_ticket_brl", r"r\$\s*{NUM}\s*(?:/|por)\s*(?:ticket|chamado|atendimento|contato)", 0.95),
+    _regra("custo_por_ticket_brl", r"(?:custo|custa|valor)\s+(?:medio\s+)?(?:de\s+|do\s+|por\s+)?(?:cada\s+)?(?:ticket|chamado|atendimento)\D{0,25}?{NUM}", 0.9),
+    _regra("custo_por_ticket_brl", r"(?:ticket|chamado|atendimento)\s+(?:custa|sai|fica)\D{0,20}?{NUM}", 0.9),
+
+    _regra("taxa_retencao_ia_percentual", r"(?:retencao|retem|reter|deflexao|deflet\w*|resolver|resolva|resolve|resolucao)\D{0,40}?{NUM}\s*%", 0.9),
+    _regra("taxa_retencao_ia_percentual", r"{NUM}\s*%\s*(?:\w+\s+){0,4}?(?:sem\s+humano|sozinha|resolvid|retid|deflet|de\s+retencao|de\s+deflexao)", 0.9),
+
+    # --- Bloco 2 ---
+    _regra("custo_infra_mensal_brl", _ANCORA_INFRA + r"\D{0,40}?r\$\s*{NUM}", 0.85),
+    _regra("custo_infra_mensal_brl", r"r\$\s*{NUM}\s*(?:/|por|ao)?\s*(?:mes\s*)?(?:de|com|em|para)\s*" + _ANCORA_INFRA, 0.9),
+    _regra("custo_infra_mensal_brl", r"{NUM}\s*reais\s*(?:/|por|ao)?\s*(?:mes\s*)?(?:de|com|em|para)\s*" + _ANCORA_INFRA, 0.9),
+
+    _regra("custo_implementacao_capex_brl", r"(?:implementa\w*|capex|desenvolvimento|setup|investimento|projeto\s+(?:custa|sai|fica))\D{0,40}?r\$\s*{NUM}", 0.9),
+    _regra("custo_implementacao_capex_brl", r"r\$\s*{NUM}\s*(?:de|para|na|no)\s+(?:implementa\w*|desenvolvimento|setup|capex)", 0.9),
+
+    _regra("tokens_input_por_unidade", r"{NUM}\s*tokens?\s*(?:de\s+)?(?:entrada|input|prompt)", 0.95),
+    _regra("tokens_input_por_unidade", r"(?:entrada|input|prompt)\D{0,20}?{NUM}\s*tokens?", 0.9),
+    _regra("tokens_input_por_unidade", r"tokens?\D{0,60}?{QTD}\s*(?:de\s+)?(?:entrada|input|prompt)", 0.9),
+    _regra("tokens_input_por_unidade", r"{QTD}\s*tokens?", 0.55),
+    _regra("tokens_output_por_unidade", r"{NUM}\s*tokens?\s*(?:de\s+)?(?:saida|output|resposta)", 0.95),
+    _regra("tokens_output_por_unidade", r"(?:saida|output|resposta)\D{0,20}?{NUM}\s*tokens?", 0.9),
+    _regra("tokens_output_por_unidade", r"tokens?\D{0,60}?{QTD}\s*(?:de\s+)?(?:saida|output|resposta)", 0.9),
+
+    # --- Bloco 3 ---
+    _regra("taxa_revisao_percentual", r"(?:revis\w*|audit\w*|confer\w*|checar|validar|validad\w*)\D{0,40}?{NUM}\s*%", 0.9),
+    _regra("taxa_revisao_percentual", r"{NUM}\s*%\s*(?:\w+\s+){0,4}?(?:revis|audit|conferid|validad|checad)", 0.9),
+    _regra("tempo_revisao_min", r"revis\w*\D{0,40}?{NUM}\s*" + _MIN, 0.9),
+    _regra("tempo_revisao_min", r"{NUM}\s*" + _MIN + r"\s*(?:para|de|na|pra|por)\s+(?:cada\s+)?revis", 0.9),
+    _regra("tempo_revisao_min", r"{NUM}\s*" + _MIN + r"\s*cada\s+revis", 0.95),
+    _regra("taxa_erro_percentual", r"(?:erro\w*|erra\w*|alucina\w*|falha\w*)\D{0,30}?{NUM}\s*%", 0.85),
+    _regra("taxa_erro_percentual", r"{NUM}\s*%\s*(?:de\s+)?(?:erro|alucina|falha)", 0.9),
+)
+
+# Apelidos de modelos além do nome canônico da tabela de custos
+APELIDOS_MODELOS = {
+    "gemini-2.5-flash": (r"gemini\s*flash",),
+    "gpt-4o-mini": (r"4o[\s-]?mini", r"gpt\s*mini"),
+}
+
+
+def _padroes_modelos() -> List[Tuple[str, "re.Pattern[str]"]]:
+    """Nomes mais longos primeiro, para 'gpt-4o-mini' não virar 'gpt-4o'."""
+    padroes = []
+    for nome in sorted(config_mavi.CUSTO_DINAMICO_DUMMY["CUSTOS_API_USD"], key=len, reverse=True):
+        canonico = re.escape(nome).replace(r"\-", r"[\s-]?").replace(r"\.", r"[.,]?")
+        alternativas = (canonico,) + APELIDOS_MODELOS.get(nome, ())
+        padroes.append((nome, re.compile(r"(?<![\w-])(?:" + "|".join(alternativas) + r")(?![\w-])")))
+    return padroes
+
+
+RE_MODELOS = _padroes_modelos()
+RE_FAQ = re.compile(r"\b(?:faq|chat\s?bot|atendimento|suporte|sac|duvidas|deflexao|central\s+de\s+ajuda|helpdesk|tickets?|chamados?)\b")
+RE_AUTOMACAO = re.compile(r"\b(?:automa\w*|backoffice|rpa|robo|extrair|extracao|ler|leitura|processar|processamento|planilhas?|contratos|notas\s+fiscais|documentos)\b")
+RE_TIPO_EXPLICITO = re.compile(r"\b(?:faq|chat\s?bot|automacao|automatizar)\b")
+
+
+# ==========================================
+# 3. EXTRAÇÃO
+# ==========================================
+
+@dataclass
+class ResultadoRegras:
+    """
+    * `valores` / `confianca`: campo -> valor e score (0-1) da melhor regra;
+    * `numeros_sem_campo`: números do texto que nenhuma regra confiável consumiu;
+    * `campos_duvidosos`: campos abaixo do limiar (valor tentativo, não aceito).
+    """
+    valores: Dict[str, Any] = field(default_factory=dict)
+    confianca: Dict[str, float] = field(default_factory=dict)
+    numeros_sem_campo: List[str] = field(default_factory=list)
+    limiar: float = LIMIAR_CONFIANCA
+
+    @property
+    def aceitos(self) -> Dict[str, Any]:
+        return {c: v for c, v in self.valores.items() if self.confianca[c] >= self.limiar}
+
+    @property
+    def campos_duvidosos(self) -> List[str]:
+        # tipo_projeto implícito (só palavras-chave) não dispara o LLM sozinho: quase todo
+        # turno cita "contratos" ou "chamados"; quem decide é o estado da conversa
+        return [c for c in self.valores if self.confianca[c] < self.limiar and c != "tipo_projeto"]
+
+    @property
+    def precisa_llm(self) -> bool:
+        """O LLM só é chamado se sobrou número sem dono ou algum campo ficou abaixo do limiar."""
+        return bool(self.numeros_sem_campo or self.campos_duvidosos)
+
+
+def _converte(campo: str, valor: float) -> Optional[Any]:
+    if campo in CAMPOS_PERCENTUAIS and not 0 <= valor <= 100:
+        return None
+    if campo in CAMPOS_INTEIROS:
+        return int(round(valor))
+    return round(valor, 2)
+
+
+def _classifica_tipo(texto: str) -> Tuple[Optional[str], float]:
+    faq = len(RE_FAQ.findall(texto))
+    automacao = len(RE_AUTOMACAO.findall(texto))
+    if faq == automacao:
+        return None, 0.0
+    tipo = "faq" if faq > automacao else "automacao"
+    explicito = any(("automa" in m) == (tipo == "automacao") for m in RE_TIPO_EXPLICITO.findall(texto))
+    return tipo, 0.9 if explicito else 0.6
+
+
+def extrair_regras(texto: str, limiar: float = LIMIAR_CONFIANCA) -> ResultadoRegras:
+    """
+    Roda todas as regras sobre o texto e resolve conflitos de forma gulosa:
+    maior confiança primeiro (empate: menção mais recente), cada número alimenta
+    no máximo um campo e cada campo recebe no máximo um número.
+    """
+    norm = normalizar(texto)
+    resultado = ResultadoRegras(limiar=limiar)
+
+    candidatos = []
+    for regra in REGRAS:
+        for m in regra.padrao.finditer(norm):
+            valor = _converte(regra.campo, numero_br(m.group("num"), m.group("mult")) * regra.fator)
+            if valor is not None:
+                candidatos.append((regra.confianca, m.start("num"), m.span("num"), regra.campo, valor))
+    candidatos.sort(key=lambda c: (-c[0], -c[1]))
+
+    usados = set()
+    for confianca, _, span, campo, valor in candidatos:
+        if campo in resultado.valores or span in usados:
+            continue
+        resultado.valores[campo] = valor
+        resultado.confianca[campo] = confianca
+        if confianca >= limiar:
+            usados.add(span)
+
+    for nome, padrao in RE_MODELOS:
+        if padrao.search(norm):
+            resultado.valores["modelo_llm"] = nome
+            resultado.confianca["modelo_llm"] = 0.95
+            break
+
+    tipo, confianca_tipo = _classifica_tipo(norm)
+    if tipo is not None:
+        resultado.valores["tipo_projeto"] = tipo
+        resultado.confianca["tipo_projeto"] = confianca_tipo
+
+    # Números que nenhuma regra aceita consumiu (ignora os que fazem parte do nome do modelo)
+    nomes_modelo = [m.span() for _, p in RE_MODELOS for m in p.finditer(norm)]
+    for m in RE_NUMERO.finditer(norm):
+        dentro_modelo = any(a <= m.start() < b for a, b in nomes_modelo)
+        if m.span("num") not in usados and not dentro_modelo:
+            resultado.numeros_sem_campo.append(m.group(0))
+    return resultado
@@ -1,51 +1,31 @@
 # langchain_agent.py
 # Mavi.IA 5.0 - Orquestrador de Inteligência e Relatórios Executivos
 # ATUALIZADO: Sintaxe LCEL corrigida para estabilidade do pipeline
+# Módulo pesado (langchain_core + SDK do Gemini): quem só calcula deve importar calc_logic/calc_batch;
+# a interface importa este módulo sob demanda (ver aquecimento em app_streamlit.py).
 
-from dotenv import load_dotenv
-load_dotenv()
-
-from typing import Optional, Dict, Any, Literal
-from pydantic import BaseModel, Field
-from langchain_core.runnables import RunnableLambda, RunnableSequence
+import time
+from typing import Optional, Dict, Any, Iterator, AsyncIterator, List
+from langchain_core.runnables import RunnableLambda, RunnableSequence, RunnableConfig
+from langchain_core.messages import AIMessageChunk
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain_core.callbacks.manager import dispatch_custom_event, adispatch_custom_event
 
 import calc_logic
 import config_mavi
+import provedor_custos
+import cache_relatorios
+import renderizador_relatorio
+import registro_llm
+import telemetria
+from transporte_resiliente import ErroTransporte
 
 # ==========================================
 # 1. DEFINIÇÃO DO SCHEMA DE DADOS
 # ==========================================
 
-class MaviParameters(BaseModel):
-    """
-    Schema unificado para extração de dados do chat.
-    """
-    # Classificador Principal
-    tipo_projeto: Literal['automacao', 'faq'] = Field(
-        ..., 
-        description="Classificação do projeto: 'automacao' (substituir tarefa manual) ou 'faq' (chatbot de atendimento)."
-    )
-    
-    # Bloco 1
-    volume_mensal: Optional[int] = Field(None, description="Quantidade total de execuções ou atendimentos por mês.")
-    tempo_por_unidade_min: Optional[float] = Field(None, description="Tempo manual gasto por unidade (apenas para automação).")
-    salario_hora_brl: Optional[float] = Field(None, description="Custo hora do colaborador (apenas para automação).")
-    custo_por_ticket_brl: Optional[float] = Field(None, description="Custo médio de um ticket/chamado humano (apenas para FAQ).")
-    taxa_retencao_ia_percentual: Optional[float] = Field(None, description="% de chamados que a IA deve resolver sozinha (apenas para FAQ).")
-
-    # Bloco 2
-    modelo_llm: Optional[str] = Field(None, description="Modelo de IA sugerido (ex: gpt-4o, gemini-2.5-flash).")
-    custo_infra_mensal_brl: Optional[float] = Field(None, description="Custo fixo mensal de infra (n8n Enterprise, Vector DB, Hosting).")
-    custo_implementacao_capex_brl: Optional[float] = Field(None, description="Custo único de implementação (Dev Hours) para cálculo de Payback.")
-    tokens_input_por_unidade: Optional[int] = Field(None, description="Estimativa de tokens de entrada.")
-    tokens_output_por_unidade: Optional[int] = Field(None, description="Estimativa de tokens de saída.")
-
-    # Bloco 3
-    taxa_erro_percentual: Optional[float] = Field(None, description="Risco estimado de alucinação/erro.")
-    taxa_revisao_percentual: Optional[float] = Field(None, description="% do volume que passará por revisão humana.")
-    tempo_revisao_min: Optional[float] = Field(None, description="Tempo gasto pelo humano para revisar/corrigir a IA.")
+# Os schemas moram em schema_mavi (só pydantic); reexportados aqui por compatibilidade
+from schema_mavi import MaviParameters
 
 
 # ==========================================
@@ -53,23 +33,15 @@ class MaviParameters(BaseModel):
 # ==========================================
 
 def lookup_dynamic_costs(inputs: dict) -> dict:
-    """Simula a busca em tempo real de custos e câmbio."""
-    TAXA_ATUAL_USD_BRL = 6.10 
-    
-    global_cost_data = {
-        "TAXA_CONVERSAO_BRL_USD": TAXA_ATUAL_USD_BRL,
-        "CUSTOS_API_USD": {
-            "gpt-4o": {"input": 2.50, "output": 10.00},
-            "gpt-4o-mini": {"input": 0.15, "output": 0.60},
-            "gemini-2.5-flash": {"input": 0.075, "output": 0.30}, 
-        },
-        "CUSTOS_BASE_FIXOS_BRL": config_mavi.CUSTO_DINAMICO_DUMMY["CUSTOS_BASE_FIXOS_BRL"]
+    """
+    Anexa a tabela de custos e câmbio vigente (provedor_custos) ao payload.
+    A tabela é imutável e compartilhada; o dict de entrada não é alterado.
+    """
+    return {
+        **inputs,
+        "global_cost_data": provedor_custos.obter_tabela_custos(),
+        "system_prompt_final": config_mavi.SYSTEM_PROMPT_NARRATIVA,
     }
-    
-    inputs["global_cost_data"] = global_cost_data
-    inputs["system_prompt_final"] = config_mavi.SYSTEM_PROMPT 
-    
-    return inputs
 
 
 # ==========================================
@@ -78,12 +50,13 @@ def lookup_dynamic_costs(inputs: dict) -> dict:
 
 def criar_agente_extrator():
     """
-    Cria o 'Mavi Analyst' para conversar com o usuário.
+    Retorna o 'Mavi Analyst' para conversar com o usuário.
+    A chain é montada uma vez por processo (registro_llm) e reutilizada em todos os turnos.
     """
-    llm_chat = ChatGoogleGenerativeAI(
-        model="gemini-2.5-flash", 
-        temperature=0.3
-    )
+    return registro_llm.registro_padrao().obter(("chain", "agente_chat"), _montar_agente_chat)
+
+def _montar_agente_chat():
+    llm_chat = registro_llm.registro_padrao().cliente("gemini-2.5-flash", 0.3, politica="chat")
 
     prompt_chat = ChatPromptTemplate.from_messages([
         ("system", """
@@ -108,16 +81,18 @@ def criar_agente_extrator():
         ("user", "{input}")
     ])
     
-    return prompt_chat | llm_chat
+    return (prompt_chat.with_config(run_name="render_prompt") | llm_chat).with_config(run_name="agente_chat")
 
-def extrair_dados_conversa(historico_texto: str) -> Dict[str, Any]:
-    """
-    Extrai o JSON estruturado da conversa.
-    """
-    llm_extractor = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0)
-    structured_llm = llm_extractor.with_structured_output(MaviParameters)
-    
-    prompt_extraction = f"""
+def _extrator_estruturado(schema=MaviParameters):
+    registro = registro_llm.registro_padrao()
+    return registro.obter(
+        ("extrator", schema.__name__),
+        lambda: registro.cliente("gemini-2.5-flash", 0, politica="extracao").with_structured_output(schema).with_config(
+            run_name="extrator_estruturado"),
+    )
+
+def _prompt_extracao(historico_texto: str) -> str:
+    return f"""
     Analise a conversa técnica abaixo.
     Classifique o projeto (automacao ou faq) e extraia os parâmetros.
     Retorne NULL para campos não mencionados.
@@ -125,7 +100,34 @@ def extrair_dados_conversa(historico_texto: str) -> Dict[str, Any]:
     --- CONVERSA ---
     {historico_texto}
     """
-    return structured_llm.invoke(prompt_extraction)
+
+def extrair_dados_conversa(historico_texto: str) -> Dict[str, Any]:
+    """
+    Extrai o JSON estruturado da conversa.
+    """
+    return _extrator_estruturado().invoke(_prompt_extracao(historico_texto), telemetria.config_execucao("extracao"))
+
+async def aextrair_dados_conversa(historico_texto: str) -> Dict[str, Any]:
+    """Versão assíncrona de extrair_dados_conversa (usada pelo orquestrador de chat)."""
+    return await _extrator_estruturado().ainvoke(_prompt_extracao(historico_texto),
+                                                 telemetria.config_execucao("extracao"))
+
+
+async def aresumir_conversa(resumo_atual: str, trecho: str) -> str:
+    """Dobra um trecho antigo do chat no resumo acumulado (usado pela memoria_chat, em segundo plano)."""
+    prompt = f"""
+    Atualize o resumo de uma consultoria de ROI de IA incorporando o trecho abaixo.
+    Mantenha decisões, números citados, dúvidas em aberto e preferências do usuário.
+    Responda só com o resumo, em até 120 palavras.
+
+    --- RESUMO ATUAL ---
+    {resumo_atual or "(vazio)"}
+
+    --- TRECHO A INCORPORAR ---
+    {trecho}
+    """
+    llm = registro_llm.registro_padrao().cliente("gemini-2.5-flash", 0, politica="resumo")
+    return texto_do_chunk(await llm.ainvoke(prompt, telemetria.config_execucao("resumo")))
 
 
 # ==========================================
@@ -177,20 +179,38 @@ def formatar_dados_para_prompt(x: dict) -> dict:
         "modelo": original_context["bloco_2"]["modelo_llm"]
     }
 
+def _narrativa_de_falha(partes: List[str]) -> str:
+    """
+    Fecho da narrativa quando o transporte desiste: sem nada recebido, a narrativa local;
+    com trecho parcial, o aviso de incompleto (ambos contêm AVISO_INDISPONIVEL, então lote
+    e recálculo não tratam o relatório como pronto).
+    """
+    if partes:
+        return renderizador_relatorio.NARRATIVA_INTERROMPIDA
+    return renderizador_relatorio.NARRATIVA_INDISPONIVEL
+
+
 def gerar_relatorio_tecnico():
     """
     Pipeline principal Mavi 5.0:
-    Lookup -> Cálculo KPIs -> Formatação Executiva -> Prompt -> Geração LLM.
+    Lookup -> Cálculo KPIs -> Formatação Executiva -> [Cache] -> Prompt -> Narrativa LLM -> Costura.
+
+    Renderização híbrida: tabelas, gráfico e LaTeX vêm de renderizador_relatorio; o LLM
+    escreve só veredito, resumo, stack e riscos. O cache guarda a narrativa; a costura
+    com as seções numéricas é refeita a cada chamada (é local e barata).
     """
+    modelo_writer = "gemini-2.5-flash"
+    temperatura_writer = 0.2
     
-    llm_writer = ChatGoogleGenerativeAI(
-        model="gemini-2.5-flash", 
-        temperature=0.2,
+    llm_writer = registro_llm.registro_padrao().cliente(
+        modelo_writer,
+        temperatura_writer,
+        politica="relatorio",
         convert_system_message_to_human=True
     )
 
     user_prompt_template = """
-    Gere o Relatório Executivo Mavi 5.0.
+    Escreva a narrativa do Relatório Executivo Mavi 5.0 (apenas as seções com marcador).
     
     CONTEXTO:
     - Tipo: {tipo_projeto_label}
@@ -218,19 +238,123 @@ def gerar_relatorio_tecnico():
         ("user", user_prompt_template)
     ])
     
+    gerador = (prompt_relatorio.with_config(run_name="render_prompt") | llm_writer).with_config(run_name="geracao_llm")
+    cache = cache_relatorios.cache_padrao()
+
+    # Geradores: .stream()/.astream() repassam o relatório costurado à medida que a
+    # narrativa chega e .invoke() recebe a soma. A narrativa só vai para o cache se o stream terminar.
+    # Se o transporte desistir (prazo, erros, disjuntor), o relatório sai com as seções locais e
+    # NARRATIVA_INDISPONIVEL (ou o trecho já recebido + NARRATIVA_INTERROMPIDA); nada disso é cacheado.
+    def narrativa_com_cache(dados: dict, config: RunnableConfig) -> Iterator[str]:
+        """Narrativa já gerada para as mesmas variáveis volta do disco, sem chamar o LLM."""
+        chave = cache.chave(dados, modelo_writer, temperatura_writer)
+        conteudo = cache.obter(chave)
+        if telemetria.ativa():
+            dispatch_custom_event(telemetria.EVENTO_CACHE, {"hit": conteudo is not None}, config=config)
+        if conteudo is not None:
+            yield conteudo
+            return
+        partes = []
+        try:
+            for chunk in gerador.stream(dados, config):
+                partes.append(texto_do_chunk(chunk))
+                yield partes[-1]
+        except ErroTransporte:
+            yield _narrativa_de_falha(partes)
+            return
+        cache.guardar(chave, "".join(partes))
+
+    async def anarrativa_com_cache(dados: dict, config: RunnableConfig) -> AsyncIterator[str]:
+        chave = cache.chave(dados, modelo_writer, temperatura_writer)
+        conteudo = cache.obter(chave)
+        if telemetria.ativa():
+            await adispatch_custom_event(telemetria.EVENTO_CACHE, {"hit": conteudo is not None}, config=config)
+        if conteudo is not None:
+            yield conteudo
+            return
+        partes = []
+        try:
+            async for chunk in gerador.astream(dados, config):
+                partes.append(texto_do_chunk(chunk))
+                yield partes[-1]
+        except ErroTransporte:
+            yield _narrativa_de_falha(partes)
+            return
+        cache.guardar(chave, "".join(partes))
+
+    def gerar_com_cache(dados: dict, config: RunnableConfig) -> Iterator[AIMessageChunk]:
+        for texto in renderizador_relatorio.costurar(dados, narrativa_com_cache(dados, config)):
+            yield AIMessageChunk(content=texto)
+
+    async def agerar_com_cache(dados: dict, config: RunnableConfig) -> AsyncIterator[AIMessageChunk]:
+        async for texto in renderizador_relatorio.acosturar(dados, anarrativa_com_cache(dados, config)):
+            yield AIMessageChunk(content=texto)
+    
     # Montagem da Chain usando Pipe Syntax (LCEL Puro)
     # Isso evita erros de "Runnable vs String"
+    # Os nomes das etapas são os rótulos dos spans de telemetria
     chain = (
-        RunnableLambda(lookup_dynamic_costs)
+        RunnableLambda(lookup_dynamic_costs, name="lookup_custos")
         | RunnableLambda(lambda x: {
             "metrics": calc_logic.calcula_metricas_genai(
                 x["bloco_1"], x["bloco_2"], x["bloco_3"], x["global_cost_data"]
             ),
             "original_context": x 
-        })
-        | RunnableLambda(formatar_dados_para_prompt) # Passo isolado de formatação
-        | prompt_relatorio
-        | llm_writer
+        }, name="calculo_kpis")
+        | RunnableLambda(formatar_dados_para_prompt, name="formatacao") # Passo isolado de formatação
+        | RunnableLambda(gerar_com_cache, afunc=agerar_com_cache, name="narrativa")
     )
     
-    return chain
+    return chain.with_config(run_name="pipeline_relatorio")
+
+def pipeline_relatorio():
+    """Pipeline de relatório compartilhado pelo processo (sessões do Streamlit, lote, API)."""
+    return registro_llm.registro_padrao().obter(("chain", "relatorio"), gerar_relatorio_tecnico)
+
+
+# ==========================================
+# 5. STREAMING PARA A INTERFACE
+# ==========================================
+
+def texto_do_chunk(chunk: Any) -> str:
+    """Texto de um chunk de mensagem (content pode vir como string ou lista de partes)."""
+    conteudo = getattr(chunk, "content", chunk)
+    if isinstance(conteudo, str):
+        return conteudo
+    return "".join(p.get("text", "") if isinstance(p, dict) else str(p) for p in conteudo)
+
+
+def stream_texto(runnable, entrada: Any, metricas: Optional[Dict[str, float]] = None,
+                 pipeline: str = "relatorio") -> Iterator[str]:
+    """
+    Itera o texto gerado por `runnable.stream(entrada)` (chat ou relatório).
+    Registra em `metricas` o tempo até o primeiro token (ttft_s) e o tempo total (total_s);
+    as etapas vão para a telemetria sob o rótulo `pipeline`.
+    """
+    metricas = metricas if metricas is not None else {}
+    inicio = time.perf_counter()
+    for chunk in runnable.stream(entrada, telemetria.config_execucao(pipeline)):
+        texto = texto_do_chunk(chunk)
+        if not texto:
+            continue
+        if "ttft_s" not in metricas:
+            metricas["ttft_s"] = time.perf_counter() - inicio
+        yield texto
+    metricas.setdefault("ttft_s", time.perf_counter() - inicio)
+    metricas["total_s"] = time.perf_counter() - inicio
+
+
+async def astream_texto(runnable, entrada: Any, metricas: Optional[Dict[str, float]] = None,
+                        pipeline: str = "relatorio") -> AsyncIterator[str]:
+    """Versão assíncrona de stream_texto (usa runnable.astream)."""
+    metricas = metricas if metricas is not None else {}
+    inicio = time.perf_counter()
+    async for chunk in runnable.astream(entrada, telemetria.config_execucao(pipeline)):
+        texto = texto_do_chunk(chunk)
+        if not texto:
+            continue
+        if "ttft_s" not in metricas:
+            metricas["ttft_s"] = time.perf_counter() - inicio
+        yield texto
+    metricas.setdefault("ttft_s", time.perf_counter() - inicio)
+    metricas["total_s"] = time.perf_counter() - inicio
@@ -0,0 +1,295 @@
+# llm_fake.py
+# Mavi.IA 5.0 - Modelo de Chat Determinístico para Benchmarks
+# Mesma interface dos clientes do registro (invoke/stream/astream), latência configurável e sem rede;
+# ServidorLLMFake + ChatHTTPFake fazem o mesmo via HTTP local, com latência de cauda e erros injetados
+
+import asyncio
+import json
+import random
+import threading
+import time
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import Runnable, RunnableLambda
+
+# Narrativa no formato de SYSTEM_PROMPT_NARRATIVA (todas as seções com marcador)
+NARRATIVA_PADRAO = (
+    "@@PROJETO@@\nAutomação de Análise de Contratos\n"
+    "@@VEREDITO@@\nAPROVADO\n"
+    "@@RESUMO@@\nO projeto reduz o custo operacional mensal e libera horas da equipe para atividades "
+    "de maior valor, com retorno do investimento dentro do primeiro ano.\n"
+    "@@COMPLIANCE@@\nDados sensíveis permanecem no ambiente corporativo, com trilha de auditoria completa.\n"
+    "@@FERRAMENTA@@\nn8n com banco vetorial gerenciado\n"
+    "@@POR_QUE@@\nOrquestração visual, conectores nativos e custo previsível por execução.\n"
+    "@@MODELO@@\nEquilíbrio entre custo por token e qualidade para textos longos.\n"
+    "@@RISCOS@@\n* Alucinação em cláusulas atípicas: mitigada pela revisão humana amostral.\n"
+    "* Variação de preço dos tokens: acompanhada pela tabela versionada de custos.\n"
+)
+
+
+def _dividir(resposta: str, palavras_por_chunk: int) -> List[str]:
+    # Divide preservando espaços e quebras de linha (a costura depende dos marcadores intactos)
+    palavras = resposta.split(" ")
+    passo = max(1, palavras_por_chunk)
+    return [" ".join(palavras[i:i + passo]) + (" " if i + passo < len(palavras) else "")
+            for i in range(0, len(palavras), passo)]
+
+
+class ChatFake(BaseChatModel):
+    """
+    Devolve sempre `resposta`, em chunks de `palavras_por_chunk` palavras.
+
+    A latência imita um provedor real: `latencia_primeiro_token_s` antes do primeiro chunk
+    e `latencia_por_chunk_s` entre os seguintes (invoke espera o total). Na saída estruturada
+    (extração), devolve `estruturado` validado pelo schema pedido, após o primeiro token.
+    Com `falhar_apos_chunks`, o stream cai (ConnectionResetError) depois desse número de chunks.
+    """
+
+    resposta: str = NARRATIVA_PADRAO
+    estruturado: Dict[str, Any] = {}
+    latencia_primeiro_token_s: float = 0.0
+    latencia_por_chunk_s: float = 0.0
+    palavras_por_chunk: int = 3
+    falhar_apos_chunks: Optional[int] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "mavi-fake"
+
+    def _chunks(self) -> List[str]:
+        return _dividir(self.resposta, self.palavras_por_chunk)
+
+    def _conferir_queda(self, i: int) -> None:
+        if self.falhar_apos_chunks is not None and i >= self.falhar_apos_chunks:
+            raise ConnectionResetError("conexão derrubada no meio do stream (fake)")
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        chunks = self._chunks()
+        time.sleep(self.latencia_primeiro_token_s + self.latencia_por_chunk_s * (len(chunks) - 1))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.resposta))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        for i, texto in enumerate(self._chunks()):
+            self._conferir_queda(i)
+            time.sleep(self.latencia_primeiro_token_s if i == 0 else self.latencia_por_chunk_s)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=texto))
+            if run_manager:
+                run_manager.on_llm_new_token(texto, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+                       **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        for i, texto in enumerate(self._chunks()):
+            self._conferir_queda(i)
+            await asyncio.sleep(self.latencia_primeiro_token_s if i == 0 else self.latencia_por_chunk_s)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=texto))
+            if run_manager:
+                await run_manager.on_llm_new_token(texto, chunk=chunk)
+            yield chunk
+
+    def with_structured_output(self, schema: Any, **kwargs: Any) -> Runnable:
+        def extrair(_entrada: Any) -> Any:
+            time.sleep(self.latencia_primeiro_token_s)
+            return schema.model_validate(self.estruturado)
+
+        async def aextrair(_entrada: Any) -> Any:
+            await asyncio.sleep(self.latencia_primeiro_token_s)
+            return schema.model_validate(self.estruturado)
+
+        return RunnableLambda(extrair, afunc=aextrair)
+
+
+def fabrica_fake(**config) -> Callable[..., ChatFake]:
+    """
+    Fábrica para `registro_llm.configurar_fabrica_cliente`: ignora modelo/temperatura/opções
+    pedidos pelo pipeline e devolve um ChatFake com `config`.
+    """
+    def fabricar(**_opcoes) -> ChatFake:
+        return ChatFake(**config)
+    return fabricar
+
+
+# ==========================================
+# PROVEDOR HTTP LOCAL COM FALHAS INJETADAS
+# ==========================================
+
+class ServidorLLMFake:
+    """
+    Servidor HTTP local que imita um provedor de LLM para testar a política de transporte.
+
+    POST /stream devolve `resposta` em linhas JSON ({"texto": ...}). Cada requisição sorteia
+    (com `semente`, reprodutível) um comportamento: erro HTTP 503 (`taxa_erro`), cauda lenta
+    de `lentidao_s` antes do primeiro chunk (`taxa_lentidao`) ou travamento de `travamento_s`
+    seguido de conexão fechada sem resposta (`taxa_travamento`).
+    """
+
+    def __init__(self, resposta: str = NARRATIVA_PADRAO, latencia_primeiro_token_s: float = 0.05,
+                 latencia_por_chunk_s: float = 0.0, palavras_por_chunk: int = 3,
+                 taxa_erro: float = 0.0, taxa_lentidao: float = 0.0, lentidao_s: float = 2.0,
+                 taxa_travamento: float = 0.0, travamento_s: float = 30.0,
+                 semente: int = 0, host: str = "127.0.0.1", porta: int = 0):
+        self.chunks = _dividir(resposta, palavras_por_chunk)
+        self.latencia_primeiro_token_s = latencia_primeiro_token_s
+        self.latencia_por_chunk_s = latencia_por_chunk_s
+        self.taxa_erro = taxa_erro
+        self.taxa_lentidao = taxa_lentidao
+        self.lentidao_s = lentidao_s
+        self.taxa_travamento = taxa_travamento
+        self.travamento_s = travamento_s
+        self.contagem = {"requisicoes": 0, "erro": 0, "lento": 0, "travado": 0}
+        self._sorteio = random.Random(semente)
+        self._lock = threading.Lock()
+        self._parado = threading.Event()
+        self._servidor = ThreadingHTTPServer((host, porta), self._handler())
+        self._servidor.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        host, porta = self._servidor.server_address[:2]
+        return f"http://{host}:{porta}/stream"
+
+    def _comportamento(self) -> str:
+        with self._lock:
+            self.contagem["requisicoes"] += 1
+            sorteio = self._sorteio.random()
+            for nome, taxa in (("erro", self.taxa_erro), ("travado", self.taxa_travamento),
+                               ("lento", self.taxa_lentidao)):
+                if sorteio < taxa:
+                    self.contagem[nome] += 1
+                    return nome
+                sorteio -= taxa
+            return "normal"
+
+    def _handler(self):
+        servidor = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                comportamento = servidor._comportamento()
+                if comportamento == "erro":
+                    self.send_error(503, "falha injetada")
+                    return
+                if comportamento == "travado":
+                    servidor._parado.wait(servidor.travamento_s)
+                    self.close_connection = True
+                    return
+                espera = servidor.latencia_primeiro_token_s + (servidor.lentidao_s if comportamento == "lento" else 0)
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.end_headers()
+                try:
+                    for i, texto in enumerate(servidor.chunks):
+                        if servidor._parado.wait(espera if i == 0 else servidor.latencia_por_chunk_s):
+                            return
+                        self.wfile.write(json.dumps({"texto": texto}).encode("utf-8") + b"\n")
+                        self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # Cliente desistiu (prazo ou hedge vencido)
+
+            def log_message(self, *args):
+                pass
+
+        return _Handler
+
+    def iniciar(self) -> "ServidorLLMFake":
+        threading.Thread(target=self._servidor.serve_forever, name="mavi-llm-fake", daemon=True).start()
+        return self
+
+    def parar(self) -> None:
+        self._parado.set()
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+    def __enter__(self) -> "ServidorLLMFake":
+        return self.iniciar()
+
+    def __exit__(self, *exc) -> None:
+        self.parar()
+
+
+class ChatHTTPFake(BaseChatModel):
+    """Cliente do ServidorLLMFake: cada chamada é uma requisição HTTP real (urllib), com `timeout_s` de socket."""
+
+    url: str
+    timeout_s: float = 60.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "mavi-fake-http"
+
+    def _textos(self) -> Iterator[str]:
+        requisicao = urllib.request.Request(self.url, data=b"{}", method="POST",
+                                            headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(requisicao, timeout=self.timeout_s) as resposta:
+            for linha in resposta:
+                yield json.loads(linha)["texto"]
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        texto = "".join(self._textos())
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=texto))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        for texto in self._textos():
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=texto))
+            if run_manager:
+                run_manager.on_llm_new_token(texto, chunk=chunk)
+            yield chunk
+
+    async def _atextos(self) -> AsyncIterator[str]:
+        # HTTP/1.0 direto sobre asyncio: sem threads, e cancelar a tarefa fecha o socket na hora
+        destino = urllib.parse.urlsplit(self.url)
+        leitor, escritor = await asyncio.wait_for(
+            asyncio.open_connection(destino.hostname, destino.port), self.timeout_s)
+        try:
+            escritor.write(f"POST {destino.path} HTTP/1.0\r\nHost: {destino.netloc}\r\n"
+                           f"Content-Type: application/json\r\nContent-Length: 2\r\n\r\n{{}}".encode("ascii"))
+            await escritor.drain()
+            status = await asyncio.wait_for(leitor.readline(), self.timeout_s)
+            if not status:
+                raise ConnectionError("conexão fechada sem resposta")
+            codigo = int(status.split()[1])
+            if codigo != 200:
+                raise ConnectionError(f"HTTP {codigo}")
+            while (await asyncio.wait_for(leitor.readline(), self.timeout_s)).strip():
+                pass  # Cabeçalhos
+            while True:
+                linha = await asyncio.wait_for(leitor.readline(), self.timeout_s)
+                if not linha:
+                    return
+                yield json.loads(linha)["texto"]
+        finally:
+            escritor.close()
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        texto = "".join([texto async for texto in self._atextos()])
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=texto))])
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+                       **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        async for texto in self._atextos():
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=texto))
+            if run_manager:
+                await run_manager.on_llm_new_token(texto, chunk=chunk)
+            yield chunk
+
+
+def fabrica_http_fake(url: str, **config) -> Callable[..., ChatHTTPFake]:
+    """Como fabrica_fake, mas os clientes falam com um ServidorLLMFake em `url`."""
+    def fabricar(**_opcoes) -> ChatHTTPFake:
+        return ChatHTTPFake(url=url, **config)
+    return fabricar
@@ -0,0 +1,145 @@
+# memoria_chat.py
+# Mavi.IA 5.0 - Memória Limitada do Chat
+# Últimos turnos na íntegra + resumo acumulado dos antigos + parâmetros fixados, dentro de um orçamento de tokens
+
+import math
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import config_mavi
+
+CARACTERES_POR_TOKEN = 4.0   # Média de tokenizadores BPE/SentencePiece em português
+TOKENS_POR_MENSAGEM = 4      # Papel + delimitadores de cada mensagem
+
+Mensagem = Dict[str, str]
+Resumidor = Callable[[str, str], Awaitable[str]]  # (resumo atual, trecho novo) -> resumo novo
+
+
+def estimar_tokens(texto: str) -> int:
+    """Estimativa local (sem tokenizador): ~4 caracteres por token, nunca menos que o nº de palavras."""
+    if not texto:
+        return 0
+    return max(math.ceil(len(texto) / CARACTERES_POR_TOKEN), len(texto.split()))
+
+
+def tokens_mensagens(mensagens: List[Mensagem]) -> int:
+    return sum(estimar_tokens(m["content"]) + TOKENS_POR_MENSAGEM for m in mensagens)
+
+
+def _cortar_tokens(texto: str, limite: int) -> str:
+    """Mantém o fim do texto (o resumo mais recente) dentro de `limite` tokens estimados."""
+    if estimar_tokens(texto) <= limite:
+        return texto
+    return "…" + texto[-int(limite * CARACTERES_POR_TOKEN):]
+
+
+def _texto_mensagens(mensagens: List[Mensagem]) -> str:
+    return "\n".join(f"{m['role']}: {m['content']}" for m in mensagens)
+
+
+class MemoriaChat:
+    """
+    Monta o `chat_history` do agente com tamanho limitado, por sessão.
+
+    * As últimas `turnos_verbatim` trocas (usuário + Mavi) vão na íntegra;
+    * as anteriores são dobradas num resumo acumulado, gerado em segundo plano
+      (fora do caminho do turno) a cada `min_mensagens_resumo` mensagens novas;
+    * os parâmetros já extraídos entram como contexto estruturado fixo;
+    * o total respeita `orcamento_tokens` (estimativa local): se não couber, as
+      mensagens mais antigas saem primeiro e o resumo é cortado em `max_tokens_resumo`.
+
+    Enquanto um resumo não fica pronto, as mensagens ainda não resumidas continuam
+    sendo enviadas na íntegra (até o orçamento), então nada se perde no intervalo.
+    """
+
+    def __init__(self,
+                 resumidor: Optional[Resumidor] = None,
+                 turnos_verbatim: int = config_mavi.MEMORIA_TURNOS_VERBATIM,
+                 orcamento_tokens: int = config_mavi.MEMORIA_ORCAMENTO_TOKENS,
+                 max_tokens_resumo: int = config_mavi.MEMORIA_MAX_TOKENS_RESUMO,
+                 min_mensagens_resumo: int = config_mavi.MEMORIA_MIN_MENSAGENS_RESUMO):
+        self._resumidor = resumidor
+        self.turnos_verbatim = turnos_verbatim
+        self.orcamento_tokens = orcamento_tokens
+        self.max_tokens_resumo = max_tokens_resumo
+        self.min_mensagens_resumo = min_mensagens_resumo
+        self.resumo = ""
+        self.resumidas = 0            # Quantas mensagens do início já estão no resumo
+        self.resumos_gerados = 0
+        self.ultimo_erro: Optional[str] = None
+        self.ultimo_uso: Dict[str, int] = {}
+        self._pendente: Optional[Future] = None
+        self._lock = threading.Lock()
+
+    @property
+    def resumidor(self) -> Resumidor:
+        if self._resumidor is None:
+            from langchain_agent import aresumir_conversa  # Import tardio: só no primeiro resumo
+            self._resumidor = aresumir_conversa
+        return self._resumidor
+
+    def historico(self, mensagens: List[Mensagem], parametros: Optional[str] = None) -> List[Mensagem]:
+        """`chat_history` para o agente, a partir das mensagens anteriores ao turno atual."""
+        with self._lock:
+            resumo, resumidas = self.resumo, self.resumidas
+
+        contexto = []
+        if parametros and parametros != "(vazio)":
+            contexto.append("Parâmetros já coletados (não pergunte de novo):\n" + parametros)
+        if resumo:
+            contexto.append("Resumo da conversa anterior:\n" + _cortar_tokens(resumo, self.max_tokens_resumo))
+        fixo = [{"role": "system", "content": "\n\n".join(contexto)}] if contexto else []
+
+        # Do mais novo para o mais antigo, só o que ainda não está no resumo, até o orçamento
+        disponivel = self.orcamento_tokens - tokens_mensagens(fixo)
+        recentes: List[Mensagem] = []
+        for mensagem in reversed(mensagens[resumidas:]):
+            custo = estimar_tokens(mensagem["content"]) + TOKENS_POR_MENSAGEM
+            if custo > disponivel:
+                break
+            recentes.append(mensagem)
+            disponivel -= custo
+        recentes.reverse()
+
+        saida = fixo + recentes
+        self.ultimo_uso = {"tokens": tokens_mensagens(saida), "mensagens_integrais": len(recentes),
+                           "mensagens_resumidas": resumidas, "mensagens_fora": len(mensagens) - resumidas - len(recentes)}
+        return saida
+
+    def agendar_resumo(self, mensagens: List[Mensagem],
+                       agendar: Optional[Callable[[Awaitable[Any]], Future]] = None) -> Optional[Future]:
+        """
+        Depois do turno: se já há `min_mensagens_resumo` mensagens fora da janela íntegra
+        e ainda não resumidas, dobra-as no resumo em segundo plano. Retorna o Future (ou None).
+        `agendar` recebe a corrotina; o padrão é o loop do orquestrador de chat.
+        """
+        limite_janela = max(0, len(mensagens) - 2 * self.turnos_verbatim)
+        with self._lock:
+            if self._pendente is not None and not self._pendente.done():
+                return None
+            if limite_janela - self.resumidas < self.min_mensagens_resumo:
+                return None
+            inicio, resumo_base = self.resumidas, self.resumo
+            trecho = _texto_mensagens(mensagens[inicio:limite_janela])
+
+            async def resumir():
+                novo = await self.resumidor(resumo_base, trecho)
+                with self._lock:
+                    if self.resumidas == inicio:  # Ninguém dobrou esse trecho antes
+                        self.resumo = _cortar_tokens(novo.strip(), self.max_tokens_resumo)
+                        self.resumidas = limite_janela
+                        self.resumos_gerados += 1
+                        self.ultimo_erro = None
+                return novo
+
+            if agendar is None:
+                from orquestrador_chat import orquestrador_padrao
+                agendar = orquestrador_padrao().agendar
+            self._pendente = agendar(resumir())
+            self._pendente.add_done_callback(self._registrar_erro)
+            return self._pendente
+
+    def _registrar_erro(self, futuro: Future) -> None:
+        if not futuro.cancelled() and futuro.exception() is not None:
+            self.ultimo_erro = f"{type(futuro.exception()).__name__}: {futuro.exception()}"
@@ -0,0 +1,230 @@
+# orquestrador_chat.py
+# Mavi.IA 5.0 - Orquestrador Assíncrono do Turno de Chat
+# Resposta conversacional e extração de parâmetros em paralelo, com cancelamento por turno
+
+import asyncio
+import queue
+import re
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional
+
+import telemetria
+from transporte_resiliente import ErroTransporte
+
+
+Extrator = Callable[[str], Awaitable[Any]]
+
+MAX_CONCORRENCIA_PADRAO = 8
+# Respostas locais quando o transporte do LLM desiste (prazo, erros seguidos ou disjuntor aberto)
+RESPOSTA_INDISPONIVEL = ("⚠️ O modelo de linguagem está instável no momento e não consegui responder. "
+                         "Os parâmetros que você já informou foram mantidos; tente de novo em instantes "
+                         "ou use o formulário para gerar o relatório.")
+AVISO_RESPOSTA_INTERROMPIDA = "\n\n_(resposta interrompida: o modelo de linguagem parou de responder)_"
+_FIM = object()  # Sentinela da fila de chunks
+
+
+# ==========================================
+# 1. LOOP DE EVENTOS COMPARTILHADO
+# ==========================================
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_lock_loop = threading.Lock()
+
+
+def loop_background() -> asyncio.AbstractEventLoop:
+    """Loop asyncio único do processo, rodando numa thread daemon (o Streamlit é síncrono)."""
+    global _loop
+    with _lock_loop:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="mavi-async", daemon=True).start()
+        return _loop
+
+
+# ==========================================
+# 2. RECONCILIAÇÃO
+# ==========================================
+
+_RE_NUMERO = re.compile(r"\d+(?:[.,]\d+)*")
+
+
+def _numeros(texto: str) -> set:
+    return {n.replace(".", "").replace(",", ".") for n in _RE_NUMERO.findall(texto or "")}
+
+
+def numeros_novos(resposta: str, referencia: str) -> set:
+    """Números citados na resposta do assistente que o usuário não mencionou."""
+    return _numeros(resposta) - _numeros(referencia)
+
+
+def mesclar_parametros(principal: Any, complemento: Any) -> Any:
+    """
+    Preenche apenas os campos vazios de `principal` com os de `complemento`.
+    O que o usuário disse tem prioridade sobre números sugeridos pela Mavi.
+    """
+    if principal is None:
+        return complemento
+    if complemento is None:
+        return principal
+    preenchidos = {k: v for k, v in complemento.model_dump().items()
+                   if v is not None and getattr(principal, k, None) is None}
+    return principal.model_copy(update=preenchidos)
+
+
+# ==========================================
+# 3. TURNO DE CHAT
+# ==========================================
+
+class TurnoChat:
+    """
+    Handle de um turno em andamento.
+    `chunks()` entrega o texto da resposta em streaming (para st.write_stream) e
+    `extracao()` espera os parâmetros já reconciliados.
+    """
+
+    def __init__(self, futuro: Future, fila: "queue.Queue[Any]", metricas: Dict[str, float]):
+        self._futuro = futuro
+        self._fila = fila
+        self.metricas = metricas
+
+    def chunks(self) -> Iterator[str]:
+        while True:
+            item = self._fila.get()
+            if item is _FIM:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+    def extracao(self, timeout: Optional[float] = None) -> Any:
+        _, dados = self._futuro.result(timeout=timeout)
+        return dados
+
+    def cancelar(self) -> None:
+        """Cancela a resposta e a extração se ainda estiverem em andamento."""
+        if not self._futuro.done():
+            self._futuro.cancel()
+
+    @property
+    def concluido(self) -> bool:
+        return self._futuro.done()
+
+
+class OrquestradorChat:
+    """
+    Roda, para cada turno, a resposta do agente (astream) e a extração do histórico
+    do usuário (ainvoke) ao mesmo tempo. Um semáforo limita as chamadas de LLM
+    simultâneas do processo inteiro (todas as sessões do Streamlit).
+    """
+
+    def __init__(self,
+                 extrator: Optional[Extrator] = None,
+                 max_concorrencia: int = MAX_CONCORRENCIA_PADRAO):
+        self._extrator = extrator
+        self.max_concorrencia = max_concorrencia
+        self._loop = loop_background()
+        self._semaforo = asyncio.Semaphore(max_concorrencia)
+
+    @property
+    def extrator(self) -> Extrator:
+        """Sem extrator explícito, usa o de langchain_agent (importado só no primeiro turno)."""
+        if self._extrator is None:
+            from langchain_agent import aextrair_dados_conversa
+            self._extrator = aextrair_dados_conversa
+        return self._extrator
+
+    async def _limitado(self, coro: Awaitable[Any]) -> Any:
+        async with self._semaforo:
+            return await coro
+
+    async def _responder(self, agente_chat, entrada: Dict[str, Any], fila: "queue.Queue[Any]",
+                         metricas: Dict[str, float]) -> str:
+        from langchain_agent import texto_do_chunk
+        inicio = time.perf_counter()
+        partes = []
+        try:
+            async with self._semaforo:
+                async for chunk in agente_chat.astream(entrada, telemetria.config_execucao("chat")):
+                    texto = texto_do_chunk(chunk)
+                    if not texto:
+                        continue
+                    metricas.setdefault("ttft_s", time.perf_counter() - inicio)
+                    partes.append(texto)
+                    fila.put(texto)
+        except ErroTransporte:
+            partes.append(AVISO_RESPOSTA_INTERROMPIDA if partes else RESPOSTA_INDISPONIVEL)
+            fila.put(partes[-1])
+            metricas["transporte_falhou"] = 1.0
+        except Exception as e:
+            fila.put(e)  # Repassado a quem consome chunks()
+            raise
+        finally:
+            fila.put(_FIM)
+        metricas["total_s"] = time.perf_counter() - inicio
+        return "".join(partes)
+
+    async def _turno(self, agente_chat, entrada: Dict[str, Any], historico_usuario: str,
+                     fila: "queue.Queue[Any]", metricas: Dict[str, float],
+                     extrator: Extrator, extrator_reconciliacao: Extrator, referencia_numeros: str):
+        extracao = asyncio.ensure_future(self._limitado(extrator(historico_usuario)))
+        try:
+            resposta = await self._responder(agente_chat, entrada, fila, metricas)
+            try:
+                dados = await extracao
+            except ErroTransporte:
+                dados = None  # Extrator padrão sem LLM disponível: o turno segue sem parâmetros novos
+        finally:
+            if not extracao.done():
+                extracao.cancel()
+
+        # Passo extra (barato) só se a resposta trouxe números que o usuário não citou
+        if "transporte_falhou" not in metricas and numeros_novos(resposta, referencia_numeros):
+            inicio = time.perf_counter()
+            complemento = await self._limitado(extrator_reconciliacao(f"AI: {resposta}"))
+            dados = mesclar_parametros(dados, complemento)
+            metricas["reconciliacao_s"] = time.perf_counter() - inicio
+        return resposta, dados
+
+    def iniciar_turno(self, agente_chat, entrada: Dict[str, Any], historico_usuario: str,
+                      extrator: Optional[Extrator] = None,
+                      extrator_reconciliacao: Optional[Extrator] = None,
+                      referencia_numeros: Optional[str] = None) -> TurnoChat:
+        """
+        Agenda o turno no loop de background e retorna imediatamente.
+        `extrator`/`extrator_reconciliacao` substituem o extrator padrão neste turno
+        (ex: o ExtratorIncremental da sessão).
+        `referencia_numeros` é tudo o que o usuário já disse na sessão: a reconciliação só roda
+        se a resposta citar número fora dele (recapitular turnos anteriores não conta).
+        Sem ela, vale só `historico_usuario`.
+        """
+        if referencia_numeros is None:
+            referencia_numeros = historico_usuario
+        else:
+            referencia_numeros = historico_usuario + "\n" + referencia_numeros
+        extrator = extrator or self.extrator
+        fila: "queue.Queue[Any]" = queue.Queue()
+        metricas: Dict[str, float] = {}
+        futuro = asyncio.run_coroutine_threadsafe(
+            self._turno(agente_chat, entrada, historico_usuario, fila, metricas,
+                        extrator, extrator_reconciliacao or extrator, referencia_numeros),
+            self._loop,
+        )
+        return TurnoChat(futuro, fila, metricas)
+
+    def agendar(self, coro: Awaitable[Any]) -> Future:
+        """Trabalho de fundo fora do turno (ex: resumo da memória), sob o mesmo limite de concorrência."""
+        return asyncio.run_coroutine_threadsafe(self._limitado(coro), self._loop)
+
+
+_orquestrador: Optional[OrquestradorChat] = None
+_lock_orquestrador = threading.Lock()
+
+
+def orquestrador_padrao() -> OrquestradorChat:
+    global _orquestrador
+    with _lock_orquestrador:
+        if _orquestrador is None:
+            _orquestrador = OrquestradorChat()
+        return _orquestrador
@@ -0,0 +1,136 @@
+# otimizador_modelos.py
+# Mavi.IA 5.0 - Otimizador de Modelo, Revisão Humana e Orçamento de Tokens
+# Varre Modelo x Taxa de Revisão x Orçamento de Tokens numa única passada e extrai a Fronteira de Pareto
+
+from typing import Dict, Any, Optional, Sequence, Tuple, List
+
+import numpy as np
+
+import calc_batch
+
+TAXAS_REVISAO_PADRAO = tuple(range(0, 101, 10))
+FATORES_TOKENS_PADRAO = (0.5, 0.75, 1.0, 1.5, 2.0)
+TAMANHO_BLOCO_PARETO = 1024
+
+
+# ==========================================
+# 1. FRONTEIRA DE PARETO (VETORIZADA EM BLOCOS)
+# ==========================================
+
+def fronteira_pareto(objetivos: np.ndarray, tamanho_bloco: int = TAMANHO_BLOCO_PARETO) -> np.ndarray:
+    """
+    Índices dos pontos não dominados de `objetivos` (n, d), todos a minimizar.
+
+    Os pontos são ordenados lexicograficamente; assim um ponto só pode ser dominado
+    por pontos anteriores. Cada bloco é comparado de uma vez contra a fronteira já
+    encontrada e contra si mesmo (matrizes booleanas), sem laço Python por ponto.
+    """
+    objetivos = np.asarray(objetivos, dtype=float)
+    ordem = np.lexsort(objetivos.T[::-1])
+    ordenados = objetivos[ordem]
+
+    fronteira = np.empty((0, objetivos.shape[1]))
+    indices: List[np.ndarray] = []
+    for inicio in range(0, len(ordenados), tamanho_bloco):
+        bloco = ordenados[inicio:inicio + tamanho_bloco]
+        indices_bloco = ordem[inicio:inicio + tamanho_bloco]
+        # Primeiro contra a fronteira (pequena), depois só os sobreviventes entre si
+        vivos = ~_domina(fronteira, bloco).any(axis=1)
+        bloco, indices_bloco = bloco[vivos], indices_bloco[vivos]
+        vivos = ~_domina(bloco, bloco).any(axis=1)
+        fronteira = np.vstack([fronteira, bloco[vivos]])
+        indices.append(indices_bloco[vivos])
+    return np.concatenate(indices) if indices else np.empty(0, dtype=int)
+
+
+def _domina(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Matriz (len(b), len(a)): [i, j] = a[j] domina b[i]."""
+    menor_igual = (a[None, :, :] <= b[:, None, :]).all(axis=-1)
+    estrito = (a[None, :, :] < b[:, None, :]).any(axis=-1)
+    return menor_igual & estrito
+
+
+# ==========================================
+# 2. VARREDURA DO GRID
+# ==========================================
+
+def otimiza_modelos(inputs_bloco_1: Dict[str, Any],
+                    inputs_bloco_2: Dict[str, Any],
+                    inputs_bloco_3: Dict[str, Any],
+                    global_cost_data: Dict[str, Any],
+                    modelos: Optional[Sequence[str]] = None,
+                    taxas_revisao: Sequence[float] = TAXAS_REVISAO_PADRAO,
+                    orcamentos_tokens: Optional[Sequence[Tuple[float, float]]] = None,
+                    roi_alvo: Optional[float] = None,
+                    payback_alvo_meses: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Avalia todas as combinações Modelo x Taxa de Revisão (%) x Orçamento de Tokens
+    (pares input/output por unidade) mantendo o resto do cenário fixo.
+
+    Objetivos da fronteira: menor custo mensal da IA, maior ROI e mais horas de
+    revisão humana (cobertura de supervisão HITL). Sem o terceiro eixo a fronteira
+    colapsaria no modelo mais barato com revisão zero. No modo FAQ a revisão não entra
+    no cálculo, então o eixo é fixado na taxa do cenário (senão a fronteira repetiria
+    cada linha uma vez por taxa).
+
+    A recomendação é a configuração mais barata que atende `roi_alvo` (%) e/ou
+    `payback_alvo_meses`; None se nenhuma atende.
+    """
+    custos_api = global_cost_data["CUSTOS_API_USD"]
+    modelos = list(modelos) if modelos is not None else list(custos_api.keys())
+    if orcamentos_tokens is None:
+        tin = inputs_bloco_2.get("tokens_input_por_unidade", 0) or 0
+        tout = inputs_bloco_2.get("tokens_output_por_unidade", 0) or 0
+        orcamentos_tokens = [(tin * f, tout * f) for f in FATORES_TOKENS_PADRAO]
+
+    automacao = inputs_bloco_1.get("tipo_projeto", calc_batch.TIPO_PADRAO) == "automacao"
+    if not automacao:
+        taxas_revisao = (inputs_bloco_3.get("taxa_revisao_percentual", 0.0) or 0.0,)
+
+    preco_in, preco_out = calc_batch.precos_por_modelo(np.array(modelos), custos_api)
+    revisao = np.asarray(taxas_revisao, dtype=float)
+    tokens = np.asarray(orcamentos_tokens, dtype=float)
+
+    # Eixos do grid via broadcasting: (modelos, revisões, orçamentos)
+    valores = calc_batch.valores_pontuais(inputs_bloco_1, inputs_bloco_2, inputs_bloco_3, global_cost_data)
+    valores["taxa_revisao_percentual"] = revisao[None, :, None]
+    valores["tokens_input_por_unidade"] = tokens[None, None, :, 0]
+    valores["tokens_output_por_unidade"] = tokens[None, None, :, 1]
+    m = calc_batch.metricas_de_valores(automacao, preco_in[:, None, None], preco_out[:, None, None], valores)
+
+    forma = (len(modelos), len(revisao), len(tokens))
+    grid = {chave: np.broadcast_to(m[chave], forma).ravel()
+            for chave in ("total_ia", "roi", "payback", "horas_revisao", "saving_liquido")}
+    i_modelo, i_revisao, i_tokens = np.unravel_index(np.arange(np.prod(forma)), forma)
+
+    objetivos = np.column_stack([grid["total_ia"], -grid["roi"], -grid["horas_revisao"]])
+    pareto = fronteira_pareto(objetivos)
+    pareto = pareto[np.argsort(grid["total_ia"][pareto], kind="stable")]
+
+    def configuracao(i: int) -> Dict[str, Any]:
+        return {
+            "modelo_llm": modelos[i_modelo[i]],
+            "taxa_revisao_percentual": float(revisao[i_revisao[i]]),
+            "tokens_input_por_unidade": float(tokens[i_tokens[i], 0]),
+            "tokens_output_por_unidade": float(tokens[i_tokens[i], 1]),
+            "custo_total_ia": round(float(grid["total_ia"][i]), 2),
+            "roi": round(float(grid["roi"][i]), 1),
+            "payback": round(float(grid["payback"][i]), 1),
+            "horas_hitl": round(float(grid["horas_revisao"][i]), 1),
+        }
+
+    atende = np.ones(grid["total_ia"].size, dtype=bool)
+    if roi_alvo is not None:
+        atende &= grid["roi"] >= roi_alvo
+    if payback_alvo_meses is not None:
+        atende &= (grid["saving_liquido"] > 0) & (grid["payback"] <= payback_alvo_meses)
+    candidatos = np.flatnonzero(atende)
+    recomendacao = None
+    if candidatos.size:
+        recomendacao = configuracao(int(candidatos[np.argmin(grid["total_ia"][candidatos])]))
+
+    return {
+        "n_configuracoes": int(grid["total_ia"].size),
+        "fronteira": [configuracao(int(i)) for i in pareto],
+        "recomendacao": recomendacao,
+    }
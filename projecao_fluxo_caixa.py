@@ -0,0 +1,150 @@
+# projecao_fluxo_caixa.py
+# Mavi.IA 5.0 - Projeção de Fluxo de Caixa Multi-Mês
+# Payback exato, VPL e TIR com curvas de adoção, sazonalidade, queda do HITL e caminho de câmbio
+
+from typing import Dict, Any, Optional
+
+import numpy as np
+
+PAYBACK_NUNCA = 999.0  # Mesmo sentinela de calc_logic para "não se paga no horizonte"
+MESES_PADRAO = 36
+
+# ==========================================
+# 1. CURVAS MENSAIS (FATORES MULTIPLICATIVOS)
+# ==========================================
+
+def curva_rampa(meses: int, inicio: float = 0.2, meses_rampa: int = 6) -> np.ndarray:
+    """Adoção linear: começa em `inicio` do volume e atinge 100% após `meses_rampa` meses."""
+    t = np.arange(meses)
+    if meses_rampa <= 0:
+        return np.ones(meses)
+    return np.minimum(inicio + (1.0 - inicio) * t / meses_rampa, 1.0)
+
+
+def curva_sazonal(meses: int, fatores_mensais, mes_inicial: int = 0) -> np.ndarray:
+    """Repete um perfil de 12 fatores (jan..dez) a partir de `mes_inicial` (0 = janeiro)."""
+    fatores = np.asarray(fatores_mensais, dtype=float)
+    return fatores[(np.arange(meses) + mes_inicial) % fatores.size]
+
+
+def curva_decaimento(meses: int, inicial: float = 1.0, final: float = 0.5, meia_vida_meses: float = 6.0) -> np.ndarray:
+    """Queda exponencial até um piso; usada para a taxa de revisão à medida que o HITL melhora a IA."""
+    t = np.arange(meses)
+    return final + (inicial - final) * 0.5 ** (t / meia_vida_meses)
+
+
+def _como_matriz(curva: Optional[Any], n: int, meses: int, padrao: float = 1.0) -> np.ndarray:
+    """Aceita None, um perfil (meses,) comum a todos os cenários ou uma matriz (n, meses)."""
+    if curva is None:
+        return np.full((1, meses), padrao)
+    curva = np.asarray(curva, dtype=float)
+    if curva.shape[-1] != meses:
+        raise ValueError(f"Curva com {curva.shape[-1]} meses; esperado {meses}.")
+    return np.broadcast_to(curva, (n, meses)) if curva.ndim == 2 else curva[None, :]
+
+
+# ==========================================
+# 2. PROJEÇÃO
+# ==========================================
+
+def projeta_fluxo_caixa(metrics: Dict[str, Any],
+                        custo_capex: Any,
+                        meses: int = MESES_PADRAO,
+                        curva_volume: Optional[Any] = None,
+                        curva_revisao: Optional[Any] = None,
+                        caminho_cambio: Optional[Any] = None,
+                        taxa_cambio_base: Optional[float] = None,
+                        taxa_desconto_anual: float = 0.12) -> Dict[str, Any]:
+    """
+    Projeta o fluxo de caixa mês a mês a partir do breakdown mensal já calculado.
+
+    `metrics` é a saída de calc_logic.calcula_metricas_genai (um cenário) ou de
+    calc_batch.calcula_metricas_batch (n cenários). O mês em regime de cada item é
+    escalado pelas curvas:
+      * Valor gerado, tokens e HITL acompanham `curva_volume`;
+      * HITL também acompanha `curva_revisao` (fator sobre a taxa de revisão atual);
+      * Tokens acompanham `caminho_cambio / taxa_cambio_base` (câmbio BRL/USD por mês);
+      * Infra é fixa.
+    As curvas podem ser (meses,) ou (n, meses). O CAPEX sai no mês 0.
+    """
+    to_be = metrics["to_be"]
+    resultado = metrics["resultado"]
+
+    valor = np.atleast_1d(np.asarray(resultado["valor_gerado"], dtype=float))[:, None]
+    infra = np.atleast_1d(np.asarray(to_be["infra"], dtype=float))[:, None]
+    tokens = np.atleast_1d(np.asarray(to_be["tokens"], dtype=float))[:, None]
+    hitl = np.atleast_1d(np.asarray(to_be["humano_hitl"], dtype=float))[:, None]
+    n = valor.shape[0]
+    capex = np.broadcast_to(np.asarray(custo_capex, dtype=float), (n,))
+
+    fator_volume = _como_matriz(curva_volume, n, meses)
+    fator_revisao = _como_matriz(curva_revisao, n, meses)
+    fator_cambio = np.ones((1, meses))
+    if caminho_cambio is not None:
+        if not taxa_cambio_base:
+            raise ValueError("Informe taxa_cambio_base para usar caminho_cambio.")
+        fator_cambio = _como_matriz(caminho_cambio, n, meses) / taxa_cambio_base
+
+    # --- Fluxo mensal (n, meses) ---
+    custo_mensal = infra + tokens * fator_volume * fator_cambio + hitl * fator_volume * fator_revisao
+    fluxo = valor * fator_volume - custo_mensal
+    acumulado = np.cumsum(fluxo, axis=1) - capex[:, None]
+
+    # --- Payback exato (interpolação linear dentro do mês em que o acumulado vira positivo) ---
+    positivo = acumulado >= 0
+    alcancou = positivo.any(axis=1)
+    idx = positivo.argmax(axis=1)
+    linhas = np.arange(n)
+    acumulado_anterior = np.where(idx > 0, acumulado[linhas, np.maximum(idx - 1, 0)], -capex)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fracao = np.clip(np.nan_to_num(-acumulado_anterior / fluxo[linhas, idx], nan=0.0), 0.0, 1.0)
+    payback = np.where(alcancou, idx + fracao, PAYBACK_NUNCA)
+
+    # --- VPL e TIR ---
+    taxa_mensal = (1 + taxa_desconto_anual) ** (1 / 12) - 1
+    t = np.arange(1, meses + 1)
+    vpl = fluxo @ ((1 + taxa_mensal) ** -t) - capex
+    tir_mensal = _tir_vetorizada(fluxo, capex)
+
+    return {
+        "meses": meses,
+        "fluxo_mensal": fluxo,
+        "fluxo_acumulado": acumulado,
+        "payback_mes": payback,
+        "vpl": vpl,
+        "tir_mensal": tir_mensal,
+        "tir_anual": (1 + tir_mensal) ** 12 - 1,
+        "taxa_desconto_mensal": taxa_mensal,
+    }
+
+
+def _vpl_polinomio(fluxo: np.ndarray, capex: np.ndarray, taxa: np.ndarray) -> np.ndarray:
+    """VPL de cada linha na sua própria taxa mensal (Horner em v = 1/(1+r), sem matriz de potências)."""
+    v = 1.0 / (1.0 + taxa)
+    acumulado = np.zeros_like(taxa)
+    for mes in range(fluxo.shape[1] - 1, -1, -1):
+        acumulado = (acumulado + fluxo[:, mes]) * v
+    return acumulado - capex
+
+
+def _tir_vetorizada(fluxo: np.ndarray, capex: np.ndarray,
+                    taxa_min: float = -0.99, taxa_max: float = 100.0, iteracoes: int = 64) -> np.ndarray:
+    """
+    TIR mensal de todos os cenários em paralelo, por bisseção no intervalo [taxa_min, taxa_max].
+    Retorna NaN onde não há troca de sinal do VPL no intervalo (TIR inexistente).
+    """
+    n = fluxo.shape[0]
+    baixo = np.full(n, taxa_min)
+    alto = np.full(n, taxa_max)
+    vpl_baixo = _vpl_polinomio(fluxo, capex, baixo)
+    existe = (capex > 0) & (np.sign(vpl_baixo) != np.sign(_vpl_polinomio(fluxo, capex, alto)))
+
+    for _ in range(iteracoes):
+        meio = (baixo + alto) / 2
+        vpl_meio = _vpl_polinomio(fluxo, capex, meio)
+        mesmo_sinal = np.sign(vpl_meio) == np.sign(vpl_baixo)
+        baixo = np.where(mesmo_sinal, meio, baixo)
+        vpl_baixo = np.where(mesmo_sinal, vpl_meio, vpl_baixo)
+        alto = np.where(mesmo_sinal, alto, meio)
+
+    return np.where(existe, (baixo + alto) / 2, np.nan)
@@ -0,0 +1,180 @@
+# provedor_custos.py
+# Mavi.IA 5.0 - Provedor de Custos e Câmbio (Cache com TTL)
+# Tabela de preços/câmbio imutável, compartilhada pelo processo, com stale-while-revalidate
+
+import json
+import threading
+import time
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Mapping, Optional
+
+import config_mavi
+
+Buscador = Callable[[], Dict[str, Any]]
+
+
+# ==========================================
+# 1. FONTES DA TABELA
+# ==========================================
+
+def carregar_snapshot(caminho: str) -> Dict[str, Any]:
+    """Lê o snapshot versionado (JSON ou TOML) com preços por modelo e câmbio."""
+    if caminho.endswith(".toml"):
+        import tomllib  # Python 3.11+
+        with open(caminho, "rb") as f:
+            return tomllib.load(f)
+    with open(caminho, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def buscador_http(url: str, timeout_s: float = 5.0) -> Buscador:
+    """Buscador que baixa a tabela em JSON de uma URL (API de preços ou stub local)."""
+    def buscar() -> Dict[str, Any]:
+        import urllib.request  # Import tardio: só quem busca da rede paga o custo
+        with urllib.request.urlopen(url, timeout=timeout_s) as resposta:
+            return json.loads(resposta.read().decode("utf-8"))
+    return buscar
+
+
+def _congelar(valor: Any) -> Any:
+    """Cópia profunda somente-leitura (dict -> MappingProxyType, list -> tuple)."""
+    if isinstance(valor, Mapping):
+        return MappingProxyType({k: _congelar(v) for k, v in valor.items()})
+    if isinstance(valor, (list, tuple)):
+        return tuple(_congelar(v) for v in valor)
+    return valor
+
+
+def _montar_tabela(bruta: Dict[str, Any]) -> Mapping[str, Any]:
+    """Normaliza a tabela bruta no formato `global_cost_data` esperado por calc_logic."""
+    return _congelar({
+        "versao": str(bruta.get("versao", "desconhecida")),
+        "TAXA_CONVERSAO_BRL_USD": bruta["TAXA_CONVERSAO_BRL_USD"],
+        "CUSTOS_API_USD": bruta["CUSTOS_API_USD"],
+        "CUSTOS_BASE_FIXOS_BRL": bruta.get("CUSTOS_BASE_FIXOS_BRL",
+                                           config_mavi.CUSTO_DINAMICO_DUMMY["CUSTOS_BASE_FIXOS_BRL"]),
+    })
+
+
+# ==========================================
+# 2. PROVEDOR COM CACHE
+# ==========================================
+
+class ProvedorCustos:
+    """
+    Cache da tabela de custos com TTL.
+
+    * A primeira leitura é síncrona: tenta o `buscador` e, se falhar, usa o snapshot local.
+    * Depois do TTL a tabela antiga continua sendo servida enquanto uma única thread
+      revalida em segundo plano (stale-while-revalidate); o pipeline nunca espera.
+      Se a revalidação falhar, a tabela atual é mantida (o snapshot só cobre a carga inicial)
+      e a próxima tentativa espera min(ttl, `espera_falha_segundos`).
+    * A tabela é imutável, então a mesma instância é compartilhada entre sessões.
+    """
+
+    def __init__(self,
+                 caminho_snapshot: str = config_mavi.CAMINHO_SNAPSHOT_CUSTOS,
+                 ttl_segundos: float = config_mavi.TTL_CUSTOS_SEGUNDOS,
+                 buscador: Optional[Buscador] = None,
+                 relogio: Callable[[], float] = time.monotonic,
+                 espera_falha_segundos: float = config_mavi.ESPERA_FALHA_CUSTOS_SEGUNDOS):
+        self.caminho_snapshot = caminho_snapshot
+        self.ttl_segundos = ttl_segundos
+        self.espera_falha_segundos = espera_falha_segundos
+        self.buscador = buscador
+        self._relogio = relogio
+        self._lock = threading.Lock()
+        self._tabela: Optional[Mapping[str, Any]] = None
+        self._carregado_em = 0.0
+        self._revalidando = False
+        self.ultimo_erro: Optional[Exception] = None
+
+    def _buscar(self) -> Mapping[str, Any]:
+        """Tabela da fonte configurada (buscador ou, sem ele, o snapshot); erros sobem."""
+        if self.buscador is not None:
+            return _montar_tabela(self.buscador())
+        return _montar_tabela(carregar_snapshot(self.caminho_snapshot))
+
+    def obter(self) -> Mapping[str, Any]:
+        """Retorna a tabela atual; dispara revalidação em background se estiver vencida."""
+        with self._lock:
+            tabela = self._tabela
+            vencida = tabela is not None and self._relogio() - self._carregado_em >= self.ttl_segundos
+            disparar = vencida and not self._revalidando
+            if disparar:
+                self._revalidando = True
+
+        if tabela is None:
+            return self._atualizar_sincrono()
+        if disparar:
+            threading.Thread(target=self._revalidar, name="mavi-revalida-custos", daemon=True).start()
+        return tabela
+
+    def _atualizar_sincrono(self) -> Mapping[str, Any]:
+        with self._lock:
+            if self._tabela is None:
+                try:
+                    self._tabela = self._buscar()
+                except Exception as e:
+                    if self.buscador is None:
+                        raise
+                    self.ultimo_erro = e
+                    self._tabela = _montar_tabela(carregar_snapshot(self.caminho_snapshot))
+                self._carregado_em = self._relogio()
+            return self._tabela
+
+    def _revalidar(self) -> None:
+        try:
+            nova = self._buscar()
+            with self._lock:
+                self._tabela = nova
+                self._carregado_em = self._relogio()
+        except Exception as e:
+            # Mantém a tabela antiga; ela volta a vencer só depois da espera (fonte fora do ar não é martelada)
+            with self._lock:
+                espera = min(self.ttl_segundos, self.espera_falha_segundos)
+                self._carregado_em = self._relogio() + espera - self.ttl_segundos
+                self.ultimo_erro = e
+        finally:
+            with self._lock:
+                self._revalidando = False
+
+    def invalidar(self, descartar: bool = False) -> None:
+        """
+        Marca a tabela como vencida (a próxima leitura revalida em background).
+        Com `descartar=True` a próxima leitura recarrega de forma síncrona.
+        """
+        with self._lock:
+            if descartar:
+                self._tabela = None
+            self._carregado_em = float("-inf")
+
+
+# ==========================================
+# 3. INSTÂNCIA COMPARTILHADA DO PROCESSO
+# ==========================================
+
+_provedor_padrao: Optional[ProvedorCustos] = None
+_lock_provedor = threading.Lock()
+
+
+def provedor_padrao() -> ProvedorCustos:
+    """Provedor único do processo (compartilhado entre sessões do Streamlit)."""
+    global _provedor_padrao
+    with _lock_provedor:
+        if _provedor_padrao is None:
+            buscador = buscador_http(config_mavi.URL_CUSTOS) if config_mavi.URL_CUSTOS else None
+            _provedor_padrao = ProvedorCustos(buscador=buscador)
+        return _provedor_padrao
+
+
+def configurar_provedor(provedor: ProvedorCustos) -> None:
+    """Substitui o provedor do processo (ex: buscador customizado ou TTL diferente)."""
+    global _provedor_padrao
+    with _lock_provedor:
+        _provedor_padrao = provedor
+
+
+def obter_tabela_custos() -> Mapping[str, Any]:
+    """Atalho: tabela `global_cost_data` atual do provedor do processo."""
+    return provedor_padrao().obter()
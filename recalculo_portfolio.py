@@ -0,0 +1,207 @@
+# recalculo_portfolio.py
+# Mavi.IA 5.0 - Recálculo Incremental do Portfólio
+# Quando preços de modelo ou câmbio mudam, recalcula só os cenários que dependem deles e marca os vereditos alterados
+#
+# Uso:
+#   python recalculo_portfolio.py [--simular] [--limiar-payback 12] [--regenerar --max-concorrencia 4]
+#   (--regenerar refaz a narrativa só dos cenários cujo veredito mudou; os demais mantêm o relatório salvo)
+
+import argparse
+import asyncio
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Mapping, Optional
+
+import numpy as np
+
+import calc_batch
+import config_mavi
+import provedor_custos
+import renderizador_relatorio
+import repositorio_cenarios
+import telemetria
+from repositorio_cenarios import RepositorioCenarios
+
+# Campos numéricos de calcula_metricas_batch mesclados de volta nas métricas salvas (os textos ficam)
+SECOES_METRICAS = ("as_is", "to_be", "resultado")
+
+
+# ==========================================
+# 1. GRAFO DE DEPENDÊNCIAS
+# ==========================================
+
+def grupo_afetado(grupo: Mapping[str, Any], tabela_custos: Mapping[str, Any]) -> bool:
+    """
+    O grupo (modelo, preço input, preço output, câmbio) está desatualizado se a tabela atual dá
+    outros valores para o modelo. Cenários sem dependências registradas (NULL) sempre entram.
+    """
+    registrado = (grupo["preco_input_usd"], grupo["preco_output_usd"], grupo["taxa_cambio"])
+    return registrado != repositorio_cenarios.dependencias_custos(grupo["modelo_llm"], tabela_custos)
+
+
+def grupos_afetados(repositorio: RepositorioCenarios, tabela_custos: Mapping[str, Any]) -> List[Dict[str, Any]]:
+    return [grupo for grupo in repositorio.grupos_dependencia() if grupo_afetado(grupo, tabela_custos)]
+
+
+def vereditos_alterados(roi_antes: np.ndarray, payback_antes: np.ndarray, roi_depois: np.ndarray,
+                        payback_depois: np.ndarray, limiar_payback: float) -> np.ndarray:
+    """Máscara dos cenários cujo ROI cruzou zero ou cujo payback cruzou o limiar (em meses)."""
+    return (((roi_antes > 0) != (roi_depois > 0))
+            | ((payback_antes < limiar_payback) != (payback_depois < limiar_payback)))
+
+
+# ==========================================
+# 2. RECÁLCULO VETORIZADO
+# ==========================================
+
+@dataclass
+class ResumoRecalculo:
+    versao_custos: str
+    grupos: int = 0
+    grupos_afetados: int = 0
+    recalculados: int = 0
+    vereditos_alterados: List[int] = field(default_factory=list)
+    duracao_s: float = 0.0
+
+
+def _mesclar(metricas: Dict[str, Any], novas: Mapping[str, Mapping[str, np.ndarray]], i: int) -> Dict[str, Any]:
+    for secao in SECOES_METRICAS:
+        destino = metricas.setdefault(secao, {})
+        for campo, valores in novas[secao].items():
+            if valores.dtype.kind == "f":
+                destino[campo] = float(valores[i])
+    return metricas
+
+
+def recalcular_bloco(linhas: List[Dict[str, Any]], tabela_custos: Mapping[str, Any],
+                     limiar_payback: float) -> List[Dict[str, Any]]:
+    """
+    Uma passada de calc_batch sobre um bloco de cenários (já carregados do repositório).
+    Devolve as atualizações no formato de RepositorioCenarios.atualizar_metricas.
+    """
+    novas = calc_batch.calcula_metricas_batch(
+        calc_batch.payloads_para_colunas([linha["entradas"] for linha in linhas]), tabela_custos)
+    alterados = vereditos_alterados(
+        np.array([linha["roi"] for linha in linhas], dtype=float),
+        np.array([linha["payback"] for linha in linhas], dtype=float),
+        novas["resultado"]["roi"], novas["resultado"]["payback"], limiar_payback)
+    versao = tabela_custos.get("versao")
+    atualizacoes = []
+    for i, linha in enumerate(linhas):
+        modelo = linha["entradas"]["bloco_2"]["modelo_llm"]
+        preco_input, preco_output, cambio = repositorio_cenarios.dependencias_custos(modelo, tabela_custos)
+        atualizacoes.append({"id": linha["id"], "metricas": _mesclar(linha["metricas"], novas, i),
+                             "versao_custos": versao, "preco_input_usd": preco_input,
+                             "preco_output_usd": preco_output, "taxa_cambio": cambio,
+                             "veredito_alterado": bool(alterados[i])})
+    return atualizacoes
+
+
+def recalcular_portfolio(repositorio: Optional[RepositorioCenarios] = None,
+                         tabela_custos: Optional[Mapping[str, Any]] = None,
+                         limiar_payback: float = config_mavi.RECALCULO_LIMIAR_PAYBACK_MESES,
+                         tamanho_bloco: int = config_mavi.RECALCULO_TAMANHO_BLOCO,
+                         simular: bool = False) -> ResumoRecalculo:
+    """
+    Recalcula os cenários cujas dependências de preço/câmbio não batem com `tabela_custos`
+    (padrão: a tabela atual do provedor), em blocos de `tamanho_bloco` por grupo, uma transação
+    por bloco. Os demais cenários nem são lidos. Com `simular`, só conta (nada é gravado).
+    """
+    repositorio = repositorio or repositorio_cenarios.repositorio_padrao()
+    tabela_custos = tabela_custos or provedor_custos.obter_tabela_custos()
+    inicio = time.perf_counter()
+    grupos = repositorio.grupos_dependencia()
+    afetados = [grupo for grupo in grupos if grupo_afetado(grupo, tabela_custos)]
+    resumo = ResumoRecalculo(versao_custos=str(tabela_custos.get("versao")), grupos=len(grupos),
+                             grupos_afetados=len(afetados))
+    for grupo in afetados:
+        apos_id = 0
+        while True:
+            linhas = repositorio.carregar_grupo(grupo, apos_id, tamanho_bloco)
+            if not linhas:
+                break
+            atualizacoes = recalcular_bloco(linhas, tabela_custos, limiar_payback)
+            if not simular:
+                repositorio.atualizar_metricas(atualizacoes)
+            resumo.recalculados += len(atualizacoes)
+            resumo.vereditos_alterados.extend(a["id"] for a in atualizacoes if a["veredito_alterado"])
+            apos_id = linhas[-1]["id"]
+    resumo.duracao_s = round(time.perf_counter() - inicio, 3)
+    if telemetria.ativa():
+        telemetria.metricas_padrao().contar("recalculo", evento="cenarios", valor=resumo.recalculados)
+        telemetria.metricas_padrao().contar("recalculo", evento="vereditos_alterados",
+                                            valor=len(resumo.vereditos_alterados))
+    return resumo
+
+
+# ==========================================
+# 3. REGERAÇÃO DAS NARRATIVAS
+# ==========================================
+
+async def regenerar_relatorios(repositorio: RepositorioCenarios, ids: Optional[List[int]] = None,
+                               chain=None, max_concorrencia: int = 4) -> Dict[str, int]:
+    """
+    Refaz o relatório dos cenários marcados (padrão: todos com veredito alterado). Cada relatório
+    novo baixa a marca; os que voltam só com a saída local continuam marcados para a próxima rodada.
+    """
+    if chain is None:
+        from langchain_agent import pipeline_relatorio  # Import tardio: o recálculo em si não precisa do LLM
+        chain = pipeline_relatorio()
+    from langchain_agent import texto_do_chunk
+    ids = repositorio.vereditos_alterados() if ids is None else ids
+    semaforo = asyncio.Semaphore(max_concorrencia)
+    contagem = {"ok": 0, "erro": 0}
+
+    async def regenerar(cenario_id: int) -> None:
+        cenario = repositorio.obter(cenario_id)
+        if cenario is None:
+            return
+        async with semaforo:
+            try:
+                relatorio = texto_do_chunk(await chain.ainvoke(cenario["entradas"],
+                                                               telemetria.config_execucao("recalculo")))
+            except Exception as e:
+                print(f"cenário #{cenario_id}: {type(e).__name__}: {e}", file=sys.stderr)
+                contagem["erro"] += 1
+                return
+        if renderizador_relatorio.AVISO_INDISPONIVEL in relatorio:
+            contagem["erro"] += 1
+            return
+        repositorio.anexar_relatorio(cenario_id, relatorio)
+        contagem["ok"] += 1
+
+    await asyncio.gather(*(regenerar(cenario_id) for cenario_id in ids))
+    return contagem
+
+
+# ==========================================
+# 4. LINHA DE COMANDO
+# ==========================================
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Recalcula o portfólio salvo após mudança de preços/câmbio (Mavi 5.0).")
+    parser.add_argument("--simular", action="store_true", help="Só conta os cenários afetados; não grava nada")
+    parser.add_argument("--limiar-payback", type=float, default=config_mavi.RECALCULO_LIMIAR_PAYBACK_MESES,
+                        help="Payback (meses) cujo cruzamento conta como veredito alterado")
+    parser.add_argument("--tamanho-bloco", type=int, default=config_mavi.RECALCULO_TAMANHO_BLOCO)
+    parser.add_argument("--regenerar", action="store_true",
+                        help="Refaz a narrativa dos cenários com veredito alterado (chama o LLM)")
+    parser.add_argument("--max-concorrencia", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    repositorio = repositorio_cenarios.repositorio_padrao()
+    resumo = recalcular_portfolio(repositorio, limiar_payback=args.limiar_payback,
+                                  tamanho_bloco=args.tamanho_bloco, simular=args.simular)
+    print(f"Tabela de custos {resumo.versao_custos}: {resumo.grupos_afetados}/{resumo.grupos} grupo(s) afetado(s), "
+          f"{resumo.recalculados} cenário(s) {'a recalcular' if args.simular else 'recalculado(s)'} "
+          f"em {resumo.duracao_s}s · {len(resumo.vereditos_alterados)} veredito(s) alterado(s)")
+    if args.regenerar and not args.simular:
+        contagem = asyncio.run(regenerar_relatorios(repositorio, max_concorrencia=args.max_concorrencia))
+        print(f"Relatórios refeitos: {contagem['ok']} | Falhas (continuam marcados): {contagem['erro']}")
+        return 1 if contagem["erro"] else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
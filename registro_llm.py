@@ -0,0 +1,135 @@
+# registro_llm.py
+# Mavi.IA 5.0 - Registro de Clientes LLM e Chains Compiladas
+# Cada cliente/chain é construído uma vez por processo e compartilhado entre sessões do Streamlit
+
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, TypeVar
+
+import config_mavi
+
+T = TypeVar("T")
+FabricaCliente = Callable[..., Any]
+
+
+_env_carregado = False
+
+
+def _carregar_env() -> None:
+    """Lê o .env (GOOGLE_API_KEY) uma vez, na construção do primeiro cliente real."""
+    global _env_carregado
+    if not _env_carregado:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _env_carregado = True
+
+
+def _fabrica_gemini(**opcoes) -> Any:
+    # Import tardio: o SDK do Gemini é o módulo mais pesado do pipeline
+    _carregar_env()
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    # Retries ficam com transporte_resiliente (1 = só a requisição inicial no SDK do Google)
+    opcoes.setdefault("max_retries", 1)
+    return ChatGoogleGenerativeAI(**opcoes)
+
+
+class RegistroLLM:
+    """
+    Cache de objetos caros de construir (clientes de chat e chains LCEL), por chave.
+
+    * A mesma instância de cliente mantém o transporte HTTP/gRPC aberto, então as
+      conexões são reaproveitadas entre turnos e sessões.
+    * Thread-safe: um lock por chave garante construção única mesmo com várias sessões
+      pedindo o mesmo objeto ao mesmo tempo, sem serializar chaves diferentes.
+    * `estatisticas()` mostra quantas vezes cada objeto foi construído e acessado e o
+      tempo gasto construindo (que deixa de aparecer nos turnos seguintes).
+    """
+
+    def __init__(self, fabrica_cliente: FabricaCliente = _fabrica_gemini):
+        self.fabrica_cliente = fabrica_cliente
+        self._objetos: Dict[Hashable, Any] = {}
+        self._locks: Dict[Hashable, threading.Lock] = {}
+        self._stats: Dict[Hashable, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def obter(self, chave: Hashable, construtor: Callable[[], T]) -> T:
+        """Retorna o objeto da chave, construindo-o na primeira chamada."""
+        with self._lock:
+            stats = self._stats.setdefault(chave, {"construcoes": 0, "acessos": 0, "tempo_construcao_s": 0.0})
+            stats["acessos"] += 1
+            if chave in self._objetos:
+                return self._objetos[chave]
+            lock_chave = self._locks.setdefault(chave, threading.Lock())
+
+        with lock_chave:
+            if chave in self._objetos:  # Outra thread construiu enquanto esperávamos
+                return self._objetos[chave]
+            inicio = time.perf_counter()
+            objeto = construtor()
+            duracao = time.perf_counter() - inicio
+            with self._lock:
+                self._objetos[chave] = objeto
+                stats["construcoes"] += 1
+                stats["tempo_construcao_s"] += duracao
+            return objeto
+
+    def cliente(self, modelo: str, temperatura: float, politica: Optional[str] = "padrao", **opcoes) -> Any:
+        """
+        Cliente de chat configurado, compartilhado por (modelo, temperatura, política, opções).
+        `politica` nomeia a política de transporte (config_mavi.POLITICAS_TRANSPORTE) aplicada
+        às chamadas; None devolve o cliente cru, sem prazos nem retries.
+        """
+        chave = ("cliente", modelo, temperatura, politica, tuple(sorted(opcoes.items())))
+        return self.obter(chave, lambda: self._construir_cliente(modelo, temperatura, politica, opcoes))
+
+    def _construir_cliente(self, modelo: str, temperatura: float, politica: Optional[str], opcoes: Dict[str, Any]) -> Any:
+        cliente = self.fabrica_cliente(model=modelo, temperature=temperatura, **opcoes)
+        if politica is None:
+            return cliente
+        import transporte_resiliente
+        from cliente_resiliente import ClienteResiliente  # Import tardio: depende do langchain_core
+        transporte = transporte_resiliente.Transporte(transporte_resiliente.politica(politica),
+                                                      transporte_resiliente.disjuntor_padrao(), politica)
+        return ClienteResiliente(cliente, transporte)
+
+    def estatisticas(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {" / ".join(map(str, chave)) if isinstance(chave, tuple) else str(chave): dict(stats)
+                    for chave, stats in self._stats.items()}
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._objetos.clear()
+            self._locks.clear()
+            self._stats.clear()
+
+
+_registro_padrao: Optional[RegistroLLM] = None
+_lock_registro = threading.Lock()
+
+
+def _fabrica_inicial() -> FabricaCliente:
+    """Gemini, ou a fita de gravação/reprodução pedida em MAVI_LLM_MODO (config_mavi.LLM_MODO)."""
+    if config_mavi.LLM_MODO == "real":
+        return _fabrica_gemini
+    import transporte_replay  # Import tardio: depende do langchain_core
+    return transporte_replay.fabrica_do_ambiente(_fabrica_gemini)
+
+
+def registro_padrao() -> RegistroLLM:
+    """Registro único do processo."""
+    global _registro_padrao
+    with _lock_registro:
+        if _registro_padrao is None:
+            _registro_padrao = RegistroLLM(_fabrica_inicial())
+        return _registro_padrao
+
+
+def configurar_fabrica_cliente(fabrica: FabricaCliente) -> None:
+    """
+    Troca a fábrica de clientes do processo (ex: modelo fake em benchmarks) e descarta
+    tudo o que foi construído com a fábrica anterior.
+    """
+    registro = registro_padrao()
+    registro.limpar()
+    registro.fabrica_cliente = fabrica
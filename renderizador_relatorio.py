@@ -0,0 +1,266 @@
+# renderizador_relatorio.py
+# Mavi.IA 5.0 - Renderização Híbrida do Relatório Executivo
+# Tabelas, gráfico ASCII e LaTeX saem direto das métricas; o LLM escreve só a narrativa
+
+import datetime
+import re
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple
+
+LARGURA_GRAFICO = 20
+RE_MARCADOR = re.compile(r"@@([A-Z_]+)@@[ \t]*\r?\n?")
+RE_MARCADOR_INCOMPLETO = re.compile(r"@(?:@[A-Z_]*@?)?$")  # Cauda que ainda pode virar marcador
+
+EMOJIS_VEREDITO = {"APROVADO": "🟢", "ATENÇÃO": "🟡", "ATENCAO": "🟡", "REPROVADO": "🔴"}
+
+# Texto usado quando o LLM não entrega uma seção
+PADROES_NARRATIVA = {
+    "PROJETO": "Projeto de IA Generativa",
+    "VEREDITO": "ATENÇÃO",
+    "RESUMO": "—",
+    "COMPLIANCE": "—",
+    "FERRAMENTA": "—",
+    "POR_QUE": "—",
+    "MODELO": "",
+    "RISCOS": "* —",
+}
+
+# Narrativa local quando o provedor do LLM falha (prazo, erros seguidos ou disjuntor aberto)
+AVISO_INDISPONIVEL = "Narrativa indisponível no momento (falha no provedor de LLM)."
+NARRATIVA_INDISPONIVEL = (
+    "@@RESUMO@@\n" + AVISO_INDISPONIVEL + " As tabelas, o gráfico e as fórmulas abaixo foram calculados localmente e seguem válidos; "
+    "gere o relatório de novo para obter a análise qualitativa.\n"
+)
+# Anexada quando o provedor cai no meio da narrativa: o trecho recebido fica, marcado como incompleto
+NARRATIVA_INTERROMPIDA = (
+    "\n\n" + AVISO_INDISPONIVEL + " A narrativa acima ficou incompleta; gere o relatório de novo.\n"
+)
+
+
+# ==========================================
+# 1. SEÇÕES DETERMINÍSTICAS
+# ==========================================
+
+def _valor(texto_formatado: str) -> float:
+    """'12,345.67' (formato de formatar_dados_para_prompt) -> 12345.67"""
+    return float(str(texto_formatado).replace(",", ""))
+
+
+def tabela_kpis(dados: Dict[str, Any]) -> str:
+    return "\n".join([
+        "| Indicador (KPI) | Cenário Atual (AS-IS) | Cenário Projetado (TO-BE) | Impacto / Ganho |",
+        "| :--- | :--- | :--- | :--- |",
+        f"| **Custo Operacional Mensal** | R$ {dados['custo_as_is']} | **R$ {dados['custo_total_ia']}** "
+        f"| 📉 {dados['saving_percentual']}% (Saving) |",
+        f"| **{dados['label_kpi_horas']}** | 0 horas | **{dados['horas_liberadas']} horas/mês** "
+        f"| 🧑‍💼 Aumento de Capacidade |",
+        f"| **Retorno Financeiro** | - | **ROI: {dados['roi']}%** | 💰 Payback: {dados['payback']} meses |",
+    ])
+
+
+def grafico_barras_ascii(dados: Dict[str, Any], largura: int = LARGURA_GRAFICO) -> str:
+    """Barras horizontais proporcionais (a maior ocupa `largura`; valor positivo nunca some)."""
+    manual, ia = _valor(dados["custo_as_is"]), _valor(dados["custo_total_ia"])
+    maior = max(manual, ia)
+
+    def barra(valor: float) -> str:
+        if maior <= 0 or valor <= 0:
+            return ""
+        return "█" * max(1, round(largura * valor / maior))
+
+    return "\n".join([
+        f"* Manual: R$ {dados['custo_as_is']} | {barra(manual)}",
+        f"* IA Gen: R$ {dados['custo_total_ia']} | {barra(ia)}",
+    ])
+
+
+def bloco_latex(dados: Dict[str, Any]) -> str:
+    return f"$$C_{{as\\_is}} = R\\$ {dados['custo_as_is']} \\quad (100\\% \\text{{ Desperdício}})$$"
+
+
+def tabela_opex(dados: Dict[str, Any]) -> str:
+    return "\n".join([
+        "| Item de Custo | Detalhe Técnico | Valor Mensal (R$) |",
+        "| :--- | :--- | :--- |",
+        f"| **Infraestrutura** | Licenças n8n / Vector DB | R$ {dados['custo_infra']} |",
+        f"| **Consumo Tokens** | Modelo {dados['modelo']} | R$ {dados['custo_tokens']} |",
+        f"| **Revisão Humana** | Custo da Incerteza (HITL) | R$ {dados['custo_humano_ia']} |",
+        f"| **TOTAL MENSAL** | -- | **R$ {dados['custo_total_ia']}** |",
+    ])
+
+
+def _formata_veredito(texto: str) -> str:
+    veredito = texto.strip().strip("*[]").upper() or PADROES_NARRATIVA["VEREDITO"]
+    emoji = next((e for chave, e in EMOJIS_VEREDITO.items() if chave in veredito), "🟡")
+    return f"**{emoji} VEREDITO FINAL:** {veredito}"
+
+
+# ==========================================
+# 2. LAYOUT (MESMA ESTRUTURA DO SYSTEM_PROMPT)
+# ==========================================
+
+# Cada parte é ("texto", str) ou ("narrativa", MARCADOR)
+Parte = Tuple[str, str]
+
+
+def layout_relatorio(dados: Dict[str, Any], data: Optional[datetime.date] = None) -> List[Parte]:
+    data = data or datetime.date.today()
+    return [
+        ("texto", "🤖 **RELATÓRIO DE VIABILIDADE M.A.V.I.**\n**Projeto:** "),
+        ("narrativa", "PROJETO"),
+        ("texto", f"\n**Data:** {data.strftime('%d/%m/%Y')}\n\n---\n\n"
+                  "## 📊 PARTE 1: ONE-PAGER EXECUTIVO (Visão Diretoria)\n\n"),
+        ("narrativa", "VEREDITO"),
+        ("texto", "\n**Resumo Estratégico:** "),
+        ("narrativa", "RESUMO"),
+        ("texto", "\n\n### 🚀 Painel de KPIs (Indicadores de Sucesso)\n"
+                  f"{tabela_kpis(dados)}\n\n"
+                  "### 📉 Gráfico de Economia Financeira (Mensal)\n"
+                  f"{grafico_barras_ascii(dados)}\n\n"
+                  "### 🧠 Insights de Governança\n"
+                  "* **Compliance:** "),
+        ("narrativa", "COMPLIANCE"),
+        ("texto", f"\n* **Mitigação de Risco (HIL):** O projeto prevê um investimento de **R$ {dados['custo_humano_ia']}** "
+                  "mensais em revisão humana (Human-in-the-Loop) para garantir a qualidade.\n\n---\n\n"
+                  "## 📑 PARTE 2: RELATÓRIO DE PROFUNDIDADE TÉCNICA (Visão Engenharia)\n\n"
+                  "### 1. Detalhamento Financeiro (Breakdown)\n"
+                  "**A. O Custo do Problema ($C_{humano}$)**\n"
+                  "O custo atual baseia-se na ineficiência operacional manual.\n"
+                  f"{bloco_latex(dados)}\n\n"
+                  "**B. O Custo da Solução ($C_{IA}$)**\n"
+                  "Composição do OPEX mensal da solução proposta:\n"
+                  f"{tabela_opex(dados)}\n\n"
+                  "### 2. Veredito Arquitetural & Stack\n"
+                  "**Ferramenta Recomendada:** "),
+        ("narrativa", "FERRAMENTA"),
+        ("texto", "\n\n**Matriz de Decisão:**\n* **Por que essa ferramenta?** "),
+        ("narrativa", "POR_QUE"),
+        ("texto", f"\n* **Modelo Escolhido:** {dados['modelo']}. "),
+        ("narrativa", "MODELO"),
+        ("texto", "\n\n### 3. Mapa de Riscos Técnicos\n"),
+        ("narrativa", "RISCOS"),
+        ("texto", "\n\n---\n*Relatório gerado por Mavi.IA Framework 5.0*\n"),
+    ]
+
+
+# Seções curtas que só são emitidas completas (precisam de formatação)
+SECOES_BUFFERIZADAS = {"VEREDITO": _formata_veredito, "PROJETO": lambda t: t.strip().splitlines()[0] if t.strip() else ""}
+
+
+# ==========================================
+# 3. COSTURA EM STREAMING
+# ==========================================
+
+class CosturaRelatorio:
+    """
+    Intercala o layout fixo com a narrativa do LLM à medida que ela chega.
+
+    As partes fixas até a próxima seção narrativa saem imediatamente; a seção em curso
+    é repassada em streaming (sem espaços finais até fechar). Seções que chegam fora de
+    ordem ficam guardadas até a vez delas; as que não chegam recebem um texto padrão.
+    """
+
+    def __init__(self, dados: Dict[str, Any], data: Optional[datetime.date] = None):
+        self.partes = layout_relatorio(dados, data)
+        self.secoes: Dict[str, str] = {}
+        self.fechadas = set()
+        self._indice = 0
+        self._emitido = 0        # Caracteres já emitidos da seção corrente do layout
+        self._escrevendo: Optional[str] = None
+        self._pendente = ""
+
+    def _anexar(self, texto: str) -> None:
+        if self._escrevendo is not None and texto:
+            self.secoes[self._escrevendo] = self.secoes.get(self._escrevendo, "") + texto
+
+    def _fechar_atual(self) -> None:
+        if self._escrevendo is not None:
+            self.fechadas.add(self._escrevendo)
+        self._escrevendo = None
+
+    def alimentar(self, texto: str) -> str:
+        """Recebe um pedaço da narrativa; retorna o texto do relatório que já pode ser exibido."""
+        self._pendente += texto
+        while True:
+            m = RE_MARCADOR.search(self._pendente)
+            if m is None:
+                break
+            self._anexar(self._pendente[:m.start()])
+            self._fechar_atual()
+            marcador = m.group(1)
+            self._escrevendo = marcador if marcador in PADROES_NARRATIVA and marcador not in self.fechadas else None
+            self._pendente = self._pendente[m.end():]
+        # Segura uma possível abertura de marcador no fim do buffer
+        incompleto = RE_MARCADOR_INCOMPLETO.search(self._pendente)
+        corte = incompleto.start() if incompleto else len(self._pendente)
+        self._anexar(self._pendente[:corte])
+        self._pendente = self._pendente[corte:]
+        return self._emitir()
+
+    def finalizar(self) -> str:
+        self._anexar(self._pendente)
+        self._pendente = ""
+        self._fechar_atual()
+        for marcador in PADROES_NARRATIVA:
+            if not self.secoes.get(marcador, "").strip():
+                self.secoes[marcador] = PADROES_NARRATIVA[marcador]
+            self.fechadas.add(marcador)
+        return self._emitir()
+
+    def _emitir(self) -> str:
+        saida = []
+        while self._indice < len(self.partes):
+            tipo, valor = self.partes[self._indice]
+            if tipo == "texto":
+                saida.append(valor)
+                self._indice += 1
+                continue
+            conteudo = self.secoes.get(valor, "").strip()
+            if valor in self.fechadas:
+                if valor in SECOES_BUFFERIZADAS:
+                    saida.append(SECOES_BUFFERIZADAS[valor](conteudo))
+                else:
+                    saida.append(conteudo[self._emitido:])
+                self._indice += 1
+                self._emitido = 0
+                continue
+            if valor == self._escrevendo and valor not in SECOES_BUFFERIZADAS:
+                parcial = self.secoes.get(valor, "").lstrip().rstrip()
+                saida.append(parcial[self._emitido:])
+                self._emitido = len(parcial)
+            break
+        return "".join(saida)
+
+
+def costurar(dados: Dict[str, Any], narrativa: Iterable[str], data: Optional[datetime.date] = None) -> Iterator[str]:
+    """Relatório completo em pedaços, a partir dos pedaços de texto da narrativa."""
+    costura = CosturaRelatorio(dados, data)
+    primeiro = costura.alimentar("")
+    if primeiro:
+        yield primeiro
+    for pedaco in narrativa:
+        texto = costura.alimentar(pedaco)
+        if texto:
+            yield texto
+    final = costura.finalizar()
+    if final:
+        yield final
+
+
+async def acosturar(dados: Dict[str, Any], narrativa: AsyncIterable[str],
+                    data: Optional[datetime.date] = None) -> AsyncIterator[str]:
+    costura = CosturaRelatorio(dados, data)
+    primeiro = costura.alimentar("")
+    if primeiro:
+        yield primeiro
+    async for pedaco in narrativa:
+        texto = costura.alimentar(pedaco)
+        if texto:
+            yield texto
+    final = costura.finalizar()
+    if final:
+        yield final
+
+
+def renderizar_relatorio(dados: Dict[str, Any], narrativa: str, data: Optional[datetime.date] = None) -> str:
+    """Versão não-streaming: narrativa completa -> relatório completo."""
+    return "".join(costurar(dados, [narrativa], data))
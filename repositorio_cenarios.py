@@ -0,0 +1,378 @@
+# repositorio_cenarios.py
+# Mavi.IA 5.0 - Repositório Persistente de Cenários e Relatórios
+# SQLite (WAL) com entradas dos blocos, métricas, versão da tabela de preços e relatório; consultas de portfólio paginadas
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Set, Tuple
+
+import config_mavi
+
+VERSAO_SCHEMA = 3
+
+# Colunas de ordenação aceitas (nome exposto -> coluna); todas têm índice terminando em id
+ORDENACOES = {"recentes": "id", "roi": "roi", "payback": "payback", "saving": "saving_liquido"}
+
+_COLUNAS_LISTAGEM = ("id", "criado_em", "origem", "id_externo", "tipo_projeto", "modelo_llm", "volume_mensal",
+                     "roi", "payback", "saving_liquido", "custo_total_ia", "versao_custos", "veredito_alterado")
+
+# Dependências de preço de cada cenário (valores usados no último cálculo; NULL = desconhecido)
+COLUNAS_DEPENDENCIA = ("modelo_llm", "preco_input_usd", "preco_output_usd", "taxa_cambio")
+
+# Colunas acrescentadas depois da versão 1 do schema (migradas com ALTER TABLE)
+_COLUNAS_V2 = {"preco_input_usd": "REAL", "preco_output_usd": "REAL", "taxa_cambio": "REAL",
+               "veredito_alterado": "INTEGER NOT NULL DEFAULT 0"}
+
+_SCHEMA_TABELAS = """
+CREATE TABLE IF NOT EXISTS cenarios (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    criado_em REAL NOT NULL,
+    origem TEXT NOT NULL,
+    id_externo TEXT,
+    tipo_projeto TEXT NOT NULL,
+    modelo_llm TEXT NOT NULL,
+    volume_mensal REAL,
+    roi REAL NOT NULL,
+    payback REAL NOT NULL,
+    saving_liquido REAL NOT NULL,
+    custo_total_ia REAL,
+    versao_custos TEXT,
+    preco_input_usd REAL,
+    preco_output_usd REAL,
+    taxa_cambio REAL,
+    veredito_alterado INTEGER NOT NULL DEFAULT 0,  -- 1 = recálculo de preços mudou o veredito; relatório a refazer
+    entradas TEXT NOT NULL,
+    metricas TEXT NOT NULL
+);
+-- O relatório (alguns KB) fica fora da tabela principal: listagens e agregados não o leem
+CREATE TABLE IF NOT EXISTS relatorios_cenario (
+    cenario_id INTEGER PRIMARY KEY REFERENCES cenarios (id) ON DELETE CASCADE,
+    relatorio TEXT NOT NULL
+);
+"""
+
+_SCHEMA_INDICES = """
+CREATE INDEX IF NOT EXISTS idx_cenarios_tipo_payback ON cenarios (tipo_projeto, payback, id);
+CREATE INDEX IF NOT EXISTS idx_cenarios_tipo_roi ON cenarios (tipo_projeto, roi, id);
+CREATE INDEX IF NOT EXISTS idx_cenarios_modelo_roi ON cenarios (modelo_llm, roi, id);
+CREATE INDEX IF NOT EXISTS idx_cenarios_roi ON cenarios (roi, id);
+CREATE INDEX IF NOT EXISTS idx_cenarios_payback ON cenarios (payback, id);
+CREATE INDEX IF NOT EXISTS idx_cenarios_saving ON cenarios (saving_liquido, id);
+-- Um cenário por id externo em cada origem: o lote regravado depois de uma interrupção atualiza a linha
+CREATE UNIQUE INDEX IF NOT EXISTS idx_cenarios_externo_unico ON cenarios (origem, id_externo);
+-- Cobre o resumo do portfólio: o GROUP BY lê só o índice, nunca as linhas com JSON
+CREATE INDEX IF NOT EXISTS idx_cenarios_portfolio ON cenarios (tipo_projeto, modelo_llm, roi, payback, saving_liquido);
+-- Grafo de dependências do recálculo: cenários por (modelo, linha de preço, câmbio) usados no cálculo
+CREATE INDEX IF NOT EXISTS idx_cenarios_dependencia
+    ON cenarios (modelo_llm, preco_input_usd, preco_output_usd, taxa_cambio, id);
+CREATE INDEX IF NOT EXISTS idx_cenarios_veredito ON cenarios (id) WHERE veredito_alterado = 1;
+"""
+
+
+@dataclass(frozen=True)
+class FiltroCenarios:
+    """Filtros de portfólio (None = sem filtro). Hashable: serve de chave para st.cache_data."""
+    tipo_projeto: Optional[str] = None
+    modelo_llm: Optional[str] = None
+    roi_min: Optional[float] = None
+    roi_max: Optional[float] = None
+    payback_min: Optional[float] = None
+    payback_max: Optional[float] = None   # Exclusivo: "payback < 6 meses"
+    origem: Optional[str] = None
+
+    def sql(self) -> Tuple[str, List[Any]]:
+        condicoes, parametros = [], []
+        for coluna, operador, valor in (("tipo_projeto", "=", self.tipo_projeto), ("modelo_llm", "=", self.modelo_llm),
+                                        ("roi", ">=", self.roi_min), ("roi", "<=", self.roi_max),
+                                        ("payback", ">=", self.payback_min), ("payback", "<", self.payback_max),
+                                        ("origem", "=", self.origem)):
+            if valor is not None:
+                condicoes.append(f"{coluna} {operador} ?")
+                parametros.append(valor)
+        return (" AND ".join(condicoes) or "1"), parametros
+
+
+@dataclass
+class PaginaCenarios:
+    itens: List[Dict[str, Any]]
+    proximo: Optional[Tuple[Any, int]] = None   # Cursor para a página seguinte (None = última)
+    ordenar_por: str = "recentes"
+    decrescente: bool = True
+    filtro: FiltroCenarios = field(default_factory=FiltroCenarios)
+
+
+def dependencias_custos(modelo: str, tabela_custos: Mapping[str, Any]) -> Tuple[float, float, float]:
+    """(preço input, preço output, câmbio) que o cálculo de `modelo` lê da tabela (mesmos defaults do calc_logic)."""
+    precos = tabela_custos["CUSTOS_API_USD"].get(modelo, {"input": 0.0, "output": 0.0})
+    return float(precos["input"]), float(precos["output"]), float(tabela_custos.get("TAXA_CONVERSAO_BRL_USD", 6.0) or 6.0)
+
+
+def registro_cenario(entradas: Mapping[str, Any], metricas: Mapping[str, Any], versao_custos: Optional[str] = None,
+                     relatorio: Optional[str] = None, origem: str = "app", id_externo: Optional[str] = None,
+                     tabela_custos: Optional[Mapping[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Um cenário no formato de `salvar`/`salvar_lote` (entradas = blocos 1-3, métricas = calcula_metricas_genai).
+    Com `tabela_custos` (a usada no cálculo) ficam registradas as dependências de preço e câmbio
+    do cenário; sem ela, o próximo recálculo de portfólio o recalcula por precaução.
+    """
+    return {"entradas": entradas, "metricas": metricas,
+            "versao_custos": versao_custos or (tabela_custos or {}).get("versao"),
+            "relatorio": relatorio, "origem": origem, "id_externo": id_externo, "tabela_custos": tabela_custos}
+
+
+def _linha(registro: Mapping[str, Any], agora: float) -> Tuple[Any, ...]:
+    entradas, metricas = registro["entradas"], registro["metricas"]
+    resultado = metricas["resultado"]
+    modelo = entradas["bloco_2"]["modelo_llm"]
+    tabela = registro.get("tabela_custos")
+    dependencias = dependencias_custos(modelo, tabela) if tabela is not None else (None, None, None)
+    return (agora, registro.get("origem") or "app", registro.get("id_externo"),
+            entradas["bloco_1"]["tipo_projeto"], modelo, entradas["bloco_1"].get("volume_mensal"),
+            resultado["roi"], resultado["payback"], resultado["saving_liquido"],
+            metricas.get("to_be", {}).get("total_ia"), registro.get("versao_custos"), *dependencias,
+            json.dumps(entradas, ensure_ascii=False, sort_keys=True, default=str),
+            json.dumps(metricas, ensure_ascii=False, sort_keys=True, default=str))
+
+
+class RepositorioCenarios:
+    """
+    Histórico de análises (interface e lote) consultável como portfólio.
+
+    * WAL: leitores (a interface) não bloqueiam o escritor (o lote) e vice-versa;
+    * colunas de filtro/ordenação desnormalizadas e indexadas (tipo, modelo, ROI,
+      payback, saving); entradas e métricas completas em JSON;
+    * paginação por cursor (keyset): a página N custa o mesmo que a primeira,
+      independente do tamanho do histórico;
+    * `salvar_lote` grava muitos cenários numa única transação.
+    """
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        self._lock = threading.Lock()
+        if caminho != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+        self._conn = sqlite3.connect(caminho, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")  # Seguro com WAL; fsync só no checkpoint
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(_SCHEMA_TABELAS)
+        self._migrar()
+        self._conn.executescript(_SCHEMA_INDICES)
+        self._conn.execute(f"PRAGMA user_version={VERSAO_SCHEMA}")
+        self._conn.commit()
+
+    def _migrar(self) -> None:
+        """
+        Acrescenta as colunas que um arquivo de versão anterior do schema ainda não tem e,
+        antes do índice único de (origem, id_externo), mantém só a linha mais recente de cada id repetido.
+        """
+        existentes = {linha["name"] for linha in self._conn.execute("PRAGMA table_info(cenarios)")}
+        for coluna, tipo in _COLUNAS_V2.items():
+            if coluna not in existentes:
+                self._conn.execute(f"ALTER TABLE cenarios ADD COLUMN {coluna} {tipo}")
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] < 3:
+            self._conn.execute("DROP INDEX IF EXISTS idx_cenarios_externo")
+            self._conn.execute(
+                "DELETE FROM cenarios WHERE id_externo IS NOT NULL AND id NOT IN "
+                "(SELECT MAX(id) FROM cenarios WHERE id_externo IS NOT NULL GROUP BY origem, id_externo)")
+
+    # --- Escrita ---
+
+    def salvar(self, entradas: Mapping[str, Any], metricas: Mapping[str, Any], versao_custos: Optional[str] = None,
+               relatorio: Optional[str] = None, origem: str = "app", id_externo: Optional[str] = None,
+               tabela_custos: Optional[Mapping[str, Any]] = None) -> int:
+        """Grava um cenário; retorna o id."""
+        return self.salvar_lote([registro_cenario(entradas, metricas, versao_custos, relatorio, origem, id_externo,
+                                                  tabela_custos)])[0]
+
+    def salvar_lote(self, registros: Iterable[Mapping[str, Any]]) -> List[int]:
+        """
+        Grava vários cenários (ver `registro_cenario`) numa transação; retorna os ids na mesma ordem.
+        Um (origem, id_externo) já gravado é atualizado no lugar (mesmo id, relatório substituído).
+        """
+        agora = time.time()
+        ids = []
+        with self._lock, self._conn:
+            cursor = self._conn.cursor()
+            relatorios = []
+            for registro in registros:
+                cursor.execute(
+                    "INSERT INTO cenarios (criado_em, origem, id_externo, tipo_projeto, modelo_llm, volume_mensal, "
+                    "roi, payback, saving_liquido, custo_total_ia, versao_custos, preco_input_usd, preco_output_usd, "
+                    "taxa_cambio, entradas, metricas) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (origem, id_externo) DO UPDATE SET tipo_projeto = excluded.tipo_projeto, "
+                    "modelo_llm = excluded.modelo_llm, volume_mensal = excluded.volume_mensal, roi = excluded.roi, "
+                    "payback = excluded.payback, saving_liquido = excluded.saving_liquido, "
+                    "custo_total_ia = excluded.custo_total_ia, versao_custos = excluded.versao_custos, "
+                    "preco_input_usd = excluded.preco_input_usd, preco_output_usd = excluded.preco_output_usd, "
+                    "taxa_cambio = excluded.taxa_cambio, veredito_alterado = 0, entradas = excluded.entradas, "
+                    "metricas = excluded.metricas RETURNING id", _linha(registro, agora))
+                cenario_id = cursor.fetchone()[0]
+                ids.append(cenario_id)
+                if registro.get("relatorio"):
+                    relatorios.append((cenario_id, registro["relatorio"]))
+            cursor.executemany("INSERT OR REPLACE INTO relatorios_cenario (cenario_id, relatorio) VALUES (?, ?)",
+                               relatorios)
+        return ids
+
+    def ids_externos(self, origem: str, candidatos: Iterable[str]) -> Set[str]:
+        """Quais `candidatos` já têm cenário gravado com esta origem (consulta pelo índice único)."""
+        candidatos = list(candidatos)
+        encontrados: Set[str] = set()
+        with self._lock:
+            for inicio in range(0, len(candidatos), 500):
+                bloco = candidatos[inicio:inicio + 500]
+                encontrados.update(linha[0] for linha in self._conn.execute(
+                    f"SELECT id_externo FROM cenarios WHERE origem = ? AND id_externo IN ({', '.join('?' * len(bloco))})",
+                    (origem, *bloco)))
+        return encontrados
+
+    def anexar_relatorio(self, cenario_id: int, relatorio: str) -> None:
+        """Grava (ou substitui) o relatório do cenário; um relatório novo baixa a marca de veredito alterado."""
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO relatorios_cenario (cenario_id, relatorio) VALUES (?, ?)",
+                               (cenario_id, relatorio))
+            self._conn.execute("UPDATE cenarios SET veredito_alterado = 0 WHERE id = ?", (cenario_id,))
+
+    # --- Recálculo de preços (ver recalculo_portfolio.py) ---
+
+    def grupos_dependencia(self) -> List[Dict[str, Any]]:
+        """Um grupo por (modelo, preço input, preço output, câmbio) usado no cálculo, com a contagem."""
+        colunas = ", ".join(COLUNAS_DEPENDENCIA)
+        with self._lock:
+            return [dict(linha) for linha in self._conn.execute(
+                f"SELECT {colunas}, COUNT(*) AS cenarios FROM cenarios GROUP BY {colunas}")]
+
+    def carregar_grupo(self, grupo: Mapping[str, Any], apos_id: int = 0, limite: int = 5000) -> List[Dict[str, Any]]:
+        """Próximo bloco (por id) dos cenários de um grupo de dependência, com entradas e métricas decodificadas."""
+        condicoes = " AND ".join(f"{coluna} IS ?" for coluna in COLUNAS_DEPENDENCIA)
+        with self._lock:
+            linhas = self._conn.execute(
+                f"SELECT id, roi, payback, entradas, metricas FROM cenarios WHERE {condicoes} AND id > ? "
+                f"ORDER BY id LIMIT ?", (*(grupo[c] for c in COLUNAS_DEPENDENCIA), apos_id, limite)).fetchall()
+        return [{"id": linha["id"], "roi": linha["roi"], "payback": linha["payback"],
+                 "entradas": json.loads(linha["entradas"]), "metricas": json.loads(linha["metricas"])}
+                for linha in linhas]
+
+    def atualizar_metricas(self, atualizacoes: Iterable[Mapping[str, Any]]) -> int:
+        """
+        Grava métricas recalculadas numa transação. Cada item: id, metricas, versao_custos,
+        preco_input_usd, preco_output_usd, taxa_cambio e veredito_alterado (bool; só liga a marca).
+        """
+        linhas = [(a["metricas"]["resultado"]["roi"], a["metricas"]["resultado"]["payback"],
+                   a["metricas"]["resultado"]["saving_liquido"], a["metricas"]["to_be"]["total_ia"],
+                   a["versao_custos"], a["preco_input_usd"], a["preco_output_usd"], a["taxa_cambio"],
+                   int(bool(a["veredito_alterado"])),
+                   json.dumps(a["metricas"], ensure_ascii=False, sort_keys=True, default=str), a["id"])
+                  for a in atualizacoes]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE cenarios SET roi = ?, payback = ?, saving_liquido = ?, custo_total_ia = ?, versao_custos = ?, "
+                "preco_input_usd = ?, preco_output_usd = ?, taxa_cambio = ?, "
+                "veredito_alterado = MAX(veredito_alterado, ?), metricas = ? WHERE id = ?", linhas)
+        return len(linhas)
+
+    def vereditos_alterados(self, limite: Optional[int] = None) -> List[int]:
+        """Ids marcados pelo recálculo cujo relatório ainda não foi refeito."""
+        with self._lock:
+            return [linha[0] for linha in self._conn.execute(
+                "SELECT id FROM cenarios WHERE veredito_alterado = 1 ORDER BY id LIMIT ?",
+                (-1 if limite is None else limite,))]
+
+    def remover(self, cenario_id: int) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM cenarios WHERE id = ?", (cenario_id,))
+
+    # --- Leitura ---
+
+    def consultar(self, filtro: FiltroCenarios = FiltroCenarios(), ordenar_por: str = "recentes",
+                  decrescente: bool = True, limite: int = 50,
+                  apos: Optional[Tuple[Any, int]] = None) -> PaginaCenarios:
+        """
+        Uma página de cenários. `apos` é o cursor `proximo` da página anterior; a ordem
+        é estável (desempate por id), então não há linhas repetidas nem puladas entre páginas.
+        """
+        coluna = ORDENACOES[ordenar_por]
+        onde, parametros = filtro.sql()
+        direcao, comparacao = ("DESC", "<") if decrescente else ("ASC", ">")
+        if apos is not None:
+            if coluna == "id":
+                onde += f" AND id {comparacao} ?"
+                parametros.append(apos[1])
+            else:
+                onde += f" AND ({coluna}, id) {comparacao} (?, ?)"
+                parametros.extend(apos)
+        ordem = "id" if coluna == "id" else f"{coluna} {direcao}, id"
+        sql = (f"SELECT {', '.join(_COLUNAS_LISTAGEM)}, "
+               f"EXISTS (SELECT 1 FROM relatorios_cenario r WHERE r.cenario_id = cenarios.id) AS tem_relatorio "
+               f"FROM cenarios WHERE {onde} ORDER BY {ordem} {direcao} LIMIT ?")
+        with self._lock:
+            linhas = self._conn.execute(sql, (*parametros, limite + 1)).fetchall()
+        itens = [dict(linha) for linha in linhas[:limite]]
+        proximo = None
+        if len(linhas) > limite:
+            ultimo = itens[-1]
+            proximo = (ultimo[coluna], ultimo["id"])
+        return PaginaCenarios(itens, proximo, ordenar_por, decrescente, filtro)
+
+    def contar(self, filtro: FiltroCenarios = FiltroCenarios()) -> int:
+        onde, parametros = filtro.sql()
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM cenarios WHERE {onde}", parametros).fetchone()[0]
+
+    def obter(self, cenario_id: int) -> Optional[Dict[str, Any]]:
+        """Cenário completo: entradas e métricas decodificadas e o relatório (se houver)."""
+        with self._lock:
+            linha = self._conn.execute(
+                "SELECT c.*, r.relatorio FROM cenarios c LEFT JOIN relatorios_cenario r ON r.cenario_id = c.id "
+                "WHERE c.id = ?", (cenario_id,)).fetchone()
+        if linha is None:
+            return None
+        cenario = dict(linha)
+        cenario["entradas"] = json.loads(cenario["entradas"])
+        cenario["metricas"] = json.loads(cenario["metricas"])
+        return cenario
+
+    def resumo_portfolio(self, filtro: FiltroCenarios = FiltroCenarios()) -> List[Dict[str, Any]]:
+        """Agregados por tipo de projeto e modelo: quantidade, ROI/payback médios e saving somado."""
+        onde, parametros = filtro.sql()
+        sql = (f"SELECT tipo_projeto, modelo_llm, COUNT(*) AS cenarios, ROUND(AVG(roi), 1) AS roi_medio, "
+               f"ROUND(AVG(payback), 1) AS payback_medio, ROUND(SUM(saving_liquido), 2) AS saving_total "
+               f"FROM cenarios WHERE {onde} GROUP BY tipo_projeto, modelo_llm ORDER BY cenarios DESC")
+        with self._lock:
+            return [dict(linha) for linha in self._conn.execute(sql, parametros)]
+
+    def valores_distintos(self, coluna: str) -> List[str]:
+        """Opções para os filtros da interface (lidas do índice, sem varrer a tabela)."""
+        if coluna not in ("tipo_projeto", "modelo_llm", "origem"):
+            raise ValueError(f"Coluna sem filtro: {coluna}")
+        with self._lock:
+            return [linha[0] for linha in self._conn.execute(f"SELECT DISTINCT {coluna} FROM cenarios ORDER BY 1")]
+
+    def plano_consulta(self, sql: str, parametros: Iterable[Any] = ()) -> List[str]:
+        """EXPLAIN QUERY PLAN (para o benchmark conferir que as consultas usam índice)."""
+        with self._lock:
+            return [linha[-1] for linha in self._conn.execute("EXPLAIN QUERY PLAN " + sql, tuple(parametros))]
+
+    def fechar(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_repositorio_padrao: Optional[RepositorioCenarios] = None
+_lock_repositorio = threading.Lock()
+
+
+def repositorio_padrao() -> RepositorioCenarios:
+    """Repositório único do processo, em `config_mavi.CAMINHO_REPOSITORIO_CENARIOS`."""
+    global _repositorio_padrao
+    with _lock_repositorio:
+        if _repositorio_padrao is None:
+            _repositorio_padrao = RepositorioCenarios(config_mavi.CAMINHO_REPOSITORIO_CENARIOS)
+        return _repositorio_padrao
@@ -0,0 +1,47 @@
+# schema_mavi.py
+# Mavi.IA 5.0 - Schema dos Parâmetros Extraídos do Chat
+# Separado de langchain_agent para ser importável sem a stack de LLM (só pydantic)
+
+from typing import Optional, Literal
+from pydantic import BaseModel, Field
+
+
+class MaviParameters(BaseModel):
+    """
+    Schema unificado para extração de dados do chat.
+    """
+    # Classificador Principal
+    tipo_projeto: Literal['automacao', 'faq'] = Field(
+        ..., 
+        description="Classificação do projeto: 'automacao' (substituir tarefa manual) ou 'faq' (chatbot de atendimento)."
+    )
+    
+    # Bloco 1
+    volume_mensal: Optional[int] = Field(None, description="Quantidade total de execuções ou atendimentos por mês.")
+    tempo_por_unidade_min: Optional[float] = Field(None, description="Tempo manual gasto por unidade (apenas para automação).")
+    salario_hora_brl: Optional[float] = Field(None, description="Custo hora do colaborador (apenas para automação).")
+    custo_por_ticket_brl: Optional[float] = Field(None, description="Custo médio de um ticket/chamado humano (apenas para FAQ).")
+    taxa_retencao_ia_percentual: Optional[float] = Field(None, description="% de chamados que a IA deve resolver sozinha (apenas para FAQ).")
+
+    # Bloco 2
+    modelo_llm: Optional[str] = Field(None, description="Modelo de IA sugerido (ex: gpt-4o, gemini-2.5-flash).")
+    custo_infra_mensal_brl: Optional[float] = Field(None, description="Custo fixo mensal de infra (n8n Enterprise, Vector DB, Hosting).")
+    custo_implementacao_capex_brl: Optional[float] = Field(None, description="Custo único de implementação (Dev Hours) para cálculo de Payback.")
+    tokens_input_por_unidade: Optional[int] = Field(None, description="Estimativa de tokens de entrada.")
+    tokens_output_por_unidade: Optional[int] = Field(None, description="Estimativa de tokens de saída.")
+
+    # Bloco 3
+    taxa_erro_percentual: Optional[float] = Field(None, description="Risco estimado de alucinação/erro.")
+    taxa_revisao_percentual: Optional[float] = Field(None, description="% do volume que passará por revisão humana.")
+    tempo_revisao_min: Optional[float] = Field(None, description="Tempo gasto pelo humano para revisar/corrigir a IA.")
+
+
+class MaviParametersDelta(MaviParameters):
+    """
+    Mesmo schema, com todos os campos opcionais: usado na extração incremental,
+    em que o LLM devolve apenas o que mudou no turno.
+    """
+    tipo_projeto: Optional[Literal['automacao', 'faq']] = Field(
+        None,
+        description="Classificação do projeto, apenas se foi definida ou mudou neste turno."
+    )
@@ -0,0 +1,149 @@
+# simulacao_monte_carlo.py
+# Mavi.IA 5.0 - Motor de Incerteza (Monte Carlo)
+# Transforma o ROI pontual em distribuição: percentis, P(ROI<0) e distribuição de Payback
+
+from typing import Dict, Any, Optional, Sequence
+
+import numpy as np
+
+import calc_batch
+
+# ==========================================
+# 1. DISTRIBUIÇÕES DE ENTRADA
+# ==========================================
+
+# Campos numéricos que aceitam distribuição + o câmbio da tabela de custos
+CAMPO_CAMBIO = calc_batch.CAMPO_CAMBIO
+CAMPOS_SIMULAVEIS = calc_batch.CAMPOS_NUMERICOS + (CAMPO_CAMBIO,)
+
+CAMPOS_PERCENTUAIS = ("taxa_revisao_percentual", "taxa_retencao_ia_percentual")
+
+# Exemplos de especificação:
+#   {"dist": "triangular", "min": 4000, "moda": 5000, "max": 8000}
+#   {"dist": "normal", "media": 5.0, "desvio": 1.0}
+#   {"dist": "uniforme", "min": 10, "max": 30}
+#   {"dist": "empirica", "valores": [1800, 2100, 2600, ...]}
+DISTRIBUICOES = ("triangular", "normal", "uniforme", "empirica")
+
+TAMANHO_LOTE_PADRAO = 250_000
+PERCENTIS_PADRAO = (5, 10, 25, 50, 75, 90, 95)
+LIMITES_HISTOGRAMA_PAYBACK = (0, 1, 2, 3, 6, 9, 12, 18, 24, 36, 48, 60)
+
+
+def _valida_distribuicoes(distribuicoes: Dict[str, Dict[str, Any]]) -> None:
+    for campo, spec in distribuicoes.items():
+        if campo not in CAMPOS_SIMULAVEIS:
+            raise ValueError(f"Campo não simulável: {campo}")
+        if spec.get("dist") not in DISTRIBUICOES:
+            raise ValueError(f"Distribuição desconhecida para {campo}: {spec.get('dist')}")
+
+
+def _amostra(rng: np.random.Generator, spec: Dict[str, Any], n: int) -> np.ndarray:
+    """Sorteia n valores de uma especificação de distribuição."""
+    dist = spec["dist"]
+    if dist == "triangular":
+        return rng.triangular(spec["min"], spec["moda"], spec["max"], n)
+    if dist == "normal":
+        return rng.normal(spec["media"], spec["desvio"], n)
+    if dist == "uniforme":
+        return rng.uniform(spec["min"], spec["max"], n)
+    return rng.choice(np.asarray(spec["valores"], dtype=float), n)
+
+
+# ==========================================
+# 2. SIMULAÇÃO EM LOTES
+# ==========================================
+
+def simula_monte_carlo(inputs_bloco_1: Dict[str, Any],
+                       inputs_bloco_2: Dict[str, Any],
+                       inputs_bloco_3: Dict[str, Any],
+                       global_cost_data: Dict[str, Any],
+                       distribuicoes: Dict[str, Dict[str, Any]],
+                       n_amostras: int = 100_000,
+                       semente: Optional[int] = None,
+                       tamanho_lote: int = TAMANHO_LOTE_PADRAO,
+                       percentis: Sequence[float] = PERCENTIS_PADRAO,
+                       limiar_payback_meses: float = 12.0) -> Dict[str, Any]:
+    """
+    Simula o cenário dos blocos com os campos de `distribuicoes` sorteados.
+    Campos sem distribuição ficam no valor pontual informado.
+
+    As amostras são geradas em lotes de `tamanho_lote`, então os intermediários
+    (um array por campo) ficam limitados ao tamanho do lote; só ROI, Payback e
+    Saving de cada sorteio são guardados para os percentis.
+    Com a mesma `semente` e o mesmo `tamanho_lote` o resultado é reproduzível.
+    """
+    _valida_distribuicoes(distribuicoes)
+    rng = np.random.default_rng(semente)
+
+    base = calc_batch.valores_pontuais(inputs_bloco_1, inputs_bloco_2, inputs_bloco_3, global_cost_data)
+
+    automacao = inputs_bloco_1.get("tipo_projeto", calc_batch.TIPO_PADRAO) == "automacao"
+    modelo = inputs_bloco_2.get("modelo_llm", calc_batch.MODELO_PADRAO)
+    preco_in, preco_out = calc_batch.precos_por_modelo(np.array([modelo]), global_cost_data["CUSTOS_API_USD"])
+
+    roi = np.empty(n_amostras)
+    payback = np.empty(n_amostras)
+    saving = np.empty(n_amostras)
+
+    for inicio in range(0, n_amostras, tamanho_lote):
+        k = min(tamanho_lote, n_amostras - inicio)
+        valores = dict(base)
+        for campo, spec in distribuicoes.items():
+            amostra = np.maximum(_amostra(rng, spec, k), 0.0)
+            if campo in CAMPOS_PERCENTUAIS:
+                amostra = np.minimum(amostra, 100.0)
+            valores[campo] = amostra
+
+        m = calc_batch.metricas_de_valores(automacao, preco_in[0], preco_out[0], valores)
+        fim = inicio + k
+        roi[inicio:fim] = m["roi"]
+        payback[inicio:fim] = m["payback"]
+        saving[inicio:fim] = m["saving_liquido"]
+
+    return _resume_distribuicoes(roi, payback, saving, percentis, limiar_payback_meses, semente)
+
+
+def _resume_distribuicoes(roi: np.ndarray,
+                          payback: np.ndarray,
+                          saving: np.ndarray,
+                          percentis: Sequence[float],
+                          limiar_payback_meses: float,
+                          semente: Optional[int]) -> Dict[str, Any]:
+    """Consolida os sorteios em estatísticas prontas para o relatório."""
+
+    def resumo(valores: np.ndarray) -> Dict[str, Any]:
+        if valores.size == 0:
+            return {"media": None, "desvio": None, "percentis": {f"p{p:g}": None for p in percentis}}
+        pcts = np.percentile(valores, percentis)
+        return {
+            "media": round(float(valores.mean()), 2),
+            "desvio": round(float(valores.std()), 2),
+            "percentis": {f"p{p:g}": round(float(v), 2) for p, v in zip(percentis, pcts)},
+        }
+
+    sem_payback = saving <= 0
+    # Payback 999 é o sentinela de "nunca se paga" do motor; fica fora das estatísticas
+    # e do histograma e é reportado à parte em `sem_payback`.
+    payback_valido = payback[~sem_payback]
+    limites = np.asarray(LIMITES_HISTOGRAMA_PAYBACK, dtype=float)
+    contagens, _ = np.histogram(payback_valido, bins=np.append(limites, np.inf))
+
+    return {
+        "n_amostras": int(roi.size),
+        "semente": semente,
+        "roi": resumo(roi),
+        "saving_liquido": resumo(saving),
+        "payback": {
+            **resumo(payback_valido),
+            "prob_ate_limiar": round(float(np.mean(payback <= limiar_payback_meses)), 4),
+            "limiar_meses": limiar_payback_meses,
+            "histograma": {
+                "limites_meses": list(LIMITES_HISTOGRAMA_PAYBACK) + ["inf"],
+                "contagens": contagens.tolist(),
+                "sem_payback": int(sem_payback.sum()),
+            },
+        },
+        "prob_roi_negativo": round(float(np.mean(roi < 0)), 4),
+        "prob_sem_payback": round(float(np.mean(sem_payback)), 4),
+    }
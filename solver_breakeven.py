@@ -0,0 +1,166 @@
+# solver_breakeven.py
+# Mavi.IA 5.0 - Solver de Break-even e Limiares
+# Responde "a partir de qual volume se paga?" e "qual revisão mata o ROI?" sem rodar o LLM
+
+from typing import Dict, Any, Optional
+
+import numpy as np
+
+import calc_batch
+
+# Campos resolvidos: todos os numéricos dos blocos + câmbio
+CAMPOS_SOLVER = calc_batch.CAMPOS_NUMERICOS + (calc_batch.CAMPO_CAMBIO,)
+CAMPOS_PERCENTUAIS = ("taxa_revisao_percentual", "taxa_retencao_ia_percentual")
+
+TOLERANCIA_LINEAR = 1e-9
+ITERACOES_BISSECAO = 80
+
+
+# ==========================================
+# 1. AVALIAÇÃO EM LOTE DE CENÁRIOS PERTURBADOS
+# ==========================================
+
+def _avalia_perturbacoes(base: Dict[str, float],
+                         campos: np.ndarray,
+                         valores: np.ndarray,
+                         automacao: bool,
+                         preco_in: float,
+                         preco_out: float) -> Dict[str, np.ndarray]:
+    """
+    Avalia, numa única chamada vetorizada, uma linha por (campo, valor):
+    o cenário base com `campos[i]` substituído por `valores[i]`.
+    """
+    colunas = {}
+    for campo in CAMPOS_SOLVER:
+        coluna = np.full(valores.shape, base[campo])
+        mascara = campos == campo
+        coluna[mascara] = valores[mascara]
+        colunas[campo] = coluna
+    m = calc_batch.metricas_de_valores(automacao, preco_in, preco_out, colunas)
+    m["capex"] = colunas["custo_implementacao_capex_brl"]
+    return m
+
+
+def _criterio(m: Dict[str, np.ndarray], roi_alvo: float, payback_alvo_meses: Optional[float]) -> np.ndarray:
+    """
+    Função cujo zero é o limiar procurado:
+      * ROI alvo:      saving - roi_alvo% * custo_ia
+      * Payback alvo:  saving - capex / payback_alvo
+    Ambas são afins em cada campo, porque saving, custo e capex são.
+    """
+    if payback_alvo_meses:
+        return m["saving_liquido"] - m["capex"] / payback_alvo_meses
+    return m["saving_liquido"] - (roi_alvo / 100) * m["total_ia"]
+
+
+# ==========================================
+# 2. SOLVER
+# ==========================================
+
+def resolve_limiares(inputs_bloco_1: Dict[str, Any],
+                     inputs_bloco_2: Dict[str, Any],
+                     inputs_bloco_3: Dict[str, Any],
+                     global_cost_data: Dict[str, Any],
+                     roi_alvo: float = 0.0,
+                     payback_alvo_meses: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Calcula, para cada campo dos blocos, o valor que leva o cenário ao limiar
+    (ROI = `roi_alvo`, ou Payback = `payback_alvo_meses` se informado), mantendo os demais fixos.
+
+    As fórmulas de calc_logic são lineares por trechos em cada campo; dentro do modo do
+    projeto, saving e custo são afins. O solver amostra cada campo em 3 pontos (uma única
+    chamada batch), resolve a reta analiticamente e confirma a linearidade. Campos em que a
+    confirmação falha caem numa bisseção vetorizada sobre o motor batch.
+
+    Retorno por campo:
+      * valor_atual / limiar (None se o campo não influencia ou o limiar sai do domínio);
+      * sentido: "minimo" (precisa ser >= limiar) ou "maximo" (precisa ser <= limiar);
+      * elasticidade_roi: variação % do ROI para +1% no campo;
+      * metodo: "analitico" ou "bissecao".
+    """
+    base = calc_batch.valores_pontuais(inputs_bloco_1, inputs_bloco_2, inputs_bloco_3, global_cost_data)
+    automacao = inputs_bloco_1.get("tipo_projeto", calc_batch.TIPO_PADRAO) == "automacao"
+    modelo = inputs_bloco_2.get("modelo_llm", calc_batch.MODELO_PADRAO)
+    preco_in, preco_out = calc_batch.precos_por_modelo(np.array([modelo]), global_cost_data["CUSTOS_API_USD"])
+    avalia = lambda campos, valores: _avalia_perturbacoes(base, campos, valores, automacao, preco_in[0], preco_out[0])
+
+    # --- Amostragem em 0, h, 2h para cada campo (passo h na escala do valor atual) ---
+    campos = np.array(CAMPOS_SOLVER, dtype=object)
+    atual = np.array([base[c] for c in CAMPOS_SOLVER])
+    passo = np.maximum(np.abs(atual), 1.0)
+    sondas = avalia(np.repeat(campos, 3), (np.array([0.0, 1.0, 2.0]) * passo[:, None]).ravel())
+
+    g = _criterio(sondas, roi_alvo, payback_alvo_meses).reshape(-1, 3)
+    saving = sondas["saving_liquido"].reshape(-1, 3)
+    custo = sondas["total_ia"].reshape(-1, 3)
+
+    inclinacao = (g[:, 1] - g[:, 0]) / passo
+    escala = np.maximum(np.abs(g).max(axis=1), 1.0)
+    linear = np.abs(g[:, 2] - 2 * g[:, 1] + g[:, 0]) <= TOLERANCIA_LINEAR * escala
+    influencia = np.abs(inclinacao) * passo > TOLERANCIA_LINEAR * escala
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        limiar = np.where(influencia, -g[:, 0] / inclinacao, np.nan)
+
+    # --- Fallback: bisseção vetorizada para campos não lineares ---
+    bissecao = influencia & ~linear
+    if bissecao.any():
+        limiar[bissecao] = _bissecao(avalia, campos[bissecao], atual[bissecao], roi_alvo, payback_alvo_meses)
+
+    # --- Elasticidade do ROI no ponto atual: d ln ROI / d ln x ---
+    ds = (saving[:, 1] - saving[:, 0]) / passo
+    dc = (custo[:, 1] - custo[:, 0]) / passo
+    s0 = saving[:, 0] + ds * atual
+    c0 = custo[:, 0] + dc * atual
+    with np.errstate(divide="ignore", invalid="ignore"):
+        elasticidade = np.where((s0 != 0) & (c0 > 0), atual * (ds / s0 - dc / c0), np.nan)
+
+    resultado = {}
+    for i, campo in enumerate(CAMPOS_SOLVER):
+        valor_limiar = float(limiar[i])
+        dominio_max = 100.0 if campo in CAMPOS_PERCENTUAIS else np.inf
+        if not np.isfinite(valor_limiar) or valor_limiar < 0 or valor_limiar > dominio_max:
+            valor_limiar = None
+        resultado[campo] = {
+            "valor_atual": float(atual[i]),
+            "limiar": None if valor_limiar is None else round(valor_limiar, 4),
+            "sentido": None if not influencia[i] else ("minimo" if inclinacao[i] > 0 else "maximo"),
+            "elasticidade_roi": None if np.isnan(elasticidade[i]) else round(float(elasticidade[i]), 4),
+            "metodo": "bissecao" if bissecao[i] else "analitico",
+        }
+    return resultado
+
+
+def _bissecao(avalia, campos: np.ndarray, atual: np.ndarray, roi_alvo: float,
+              payback_alvo_meses: Optional[float]) -> np.ndarray:
+    """Bisseção simultânea de vários campos em [0, teto]; NaN onde não há troca de sinal."""
+    baixo = np.zeros(campos.size)
+    alto = np.array([100.0 if c in CAMPOS_PERCENTUAIS else max(a, 1.0) * 1e3 for c, a in zip(campos, atual)])
+    g_baixo = _criterio(avalia(campos, baixo), roi_alvo, payback_alvo_meses)
+    g_alto = _criterio(avalia(campos, alto), roi_alvo, payback_alvo_meses)
+    existe = np.sign(g_baixo) != np.sign(g_alto)
+
+    for _ in range(ITERACOES_BISSECAO):
+        meio = (baixo + alto) / 2
+        g_meio = _criterio(avalia(campos, meio), roi_alvo, payback_alvo_meses)
+        mesmo_sinal = np.sign(g_meio) == np.sign(g_baixo)
+        baixo = np.where(mesmo_sinal, meio, baixo)
+        g_baixo = np.where(mesmo_sinal, g_meio, g_baixo)
+        alto = np.where(mesmo_sinal, alto, meio)
+
+    return np.where(existe, (baixo + alto) / 2, np.nan)
+
+
+def descreve_limiar(info: Dict[str, Any], casas: int = 1) -> str:
+    """Texto curto para exibir ao lado do widget no formulário."""
+    partes = []
+    if info["limiar"] is not None:
+        sinal = "≥" if info["sentido"] == "minimo" else "≤"
+        partes.append(f"Break-even: {sinal} {info['limiar']:,.{casas}f}")
+    elif info["sentido"] is None:
+        partes.append("Não afeta o ROI neste modo")
+    else:
+        partes.append("Sem break-even no domínio")
+    if info["elasticidade_roi"]:
+        partes.append(f"Elasticidade do ROI: {info['elasticidade_roi']:+.2f}")
+    return " | ".join(partes)
@@ -0,0 +1,236 @@
+# telemetria.py
+# Mavi.IA 5.0 - Métricas por Etapa dos Pipelines (relatório, chat e extração)
+# Armazena spans e contadores, exporta em texto Prometheus ou JSONL; só stdlib (o coletor LangChain
+# fica em telemetria_callbacks.py e só é importado quando a telemetria está ativa)
+
+import json
+import threading
+import time
+from collections import defaultdict, deque
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import config_mavi
+
+# Limites dos buckets do histograma Prometheus (segundos)
+BUCKETS_DURACAO_S = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+AMOSTRAS_POR_ETAPA = 500  # Janela usada para p50/p95 do painel
+SPANS_RECENTES = 1000
+EVENTO_CACHE = "cache_relatorio"  # Evento customizado da narrativa_com_cache (data = {"hit": bool})
+
+
+@dataclass
+class Span:
+    """Uma etapa executada: lookup, cálculo, formatação, prompt, chamada ao LLM..."""
+    pipeline: str
+    trace_id: str
+    etapa: str
+    tipo: str                      # "chain" ou "llm"
+    duracao_s: float
+    inicio: float                  # epoch
+    ok: bool = True
+    modelo: Optional[str] = None
+    ttft_s: Optional[float] = None
+    tokens_entrada: Optional[int] = None
+    tokens_saida: Optional[int] = None
+    extras: Dict[str, Any] = field(default_factory=dict)
+
+
+Sink = Callable[[Dict[str, Any]], None]
+
+
+# ==========================================
+# 1. ARMAZENAMENTO
+# ==========================================
+
+def _percentil(valores: List[float], p: float) -> float:
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(p * len(ordenados)))]
+
+
+class MetricasTelemetria:
+    """
+    Agregados thread-safe do processo: histograma por (pipeline, etapa), contadores
+    rotulados (tokens, retries, cache, erros) e os spans mais recentes para o painel.
+    Cada span/evento também é repassado aos sinks (ex: SinkJSONL).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histogramas: Dict[Tuple[str, str], List[float]] = {}  # contagens por bucket + [soma, total]
+        self._amostras: Dict[Tuple[str, str], Deque[float]] = defaultdict(lambda: deque(maxlen=AMOSTRAS_POR_ETAPA))
+        self._contadores: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = defaultdict(float)
+        self._spans: Deque[Span] = deque(maxlen=SPANS_RECENTES)
+        self._ultimo_trace: Dict[str, str] = {}
+        self.sinks: List[Sink] = []
+
+    def registrar_span(self, span: Span) -> None:
+        chave = (span.pipeline, span.etapa)
+        with self._lock:
+            histograma = self._histogramas.setdefault(chave, [0.0] * (len(BUCKETS_DURACAO_S) + 2))
+            for i, limite in enumerate(BUCKETS_DURACAO_S):
+                if span.duracao_s <= limite:
+                    histograma[i] += 1
+            histograma[-2] += span.duracao_s
+            histograma[-1] += 1
+            self._amostras[chave].append(span.duracao_s)
+            self._spans.append(span)
+            self._ultimo_trace[span.pipeline] = span.trace_id
+            if not span.ok:
+                self._contadores[("erros", (("etapa", span.etapa), ("pipeline", span.pipeline)))] += 1
+            if span.tokens_entrada is not None:
+                self._contadores[("tokens", (("direcao", "entrada"), ("modelo", span.modelo or "")))] += span.tokens_entrada
+            if span.tokens_saida is not None:
+                self._contadores[("tokens", (("direcao", "saida"), ("modelo", span.modelo or "")))] += span.tokens_saida
+        self._emitir({"evento": "span", **asdict(span)})
+
+    def contar(self, nome: str, valor: float = 1, **rotulos: str) -> None:
+        with self._lock:
+            self._contadores[(nome, tuple(sorted(rotulos.items())))] += valor
+        self._emitir({"evento": "contador", "nome": nome, "valor": valor, "inicio": time.time(), **rotulos})
+
+    def _emitir(self, evento: Dict[str, Any]) -> None:
+        for sink in self.sinks:
+            try:
+                sink(evento)
+            except Exception:
+                pass  # Telemetria nunca derruba o pipeline
+
+    # --- Consultas ---
+
+    def resumo_etapas(self) -> List[Dict[str, Any]]:
+        """p50/p95 (janela recente) e total acumulado por etapa, para o painel."""
+        with self._lock:
+            itens = [(chave, list(amostras), self._histogramas[chave]) for chave, amostras in self._amostras.items()]
+        return [{"pipeline": pipeline, "etapa": etapa, "execucoes": int(histograma[-1]),
+                 "p50_ms": round(1000 * _percentil(amostras, 0.5), 2),
+                 "p95_ms": round(1000 * _percentil(amostras, 0.95), 2),
+                 "total_s": round(histograma[-2], 3)}
+                for (pipeline, etapa), amostras, histograma in sorted(itens)]
+
+    def contadores(self) -> Dict[str, float]:
+        with self._lock:
+            return {nome + ("{" + ",".join(f"{k}={v}" for k, v in rotulos) + "}" if rotulos else ""): valor
+                    for (nome, rotulos), valor in sorted(self._contadores.items())}
+
+    def ultimo_trace(self, pipeline: str) -> List[Span]:
+        """Spans da execução mais recente do pipeline, em ordem de início."""
+        with self._lock:
+            trace_id = self._ultimo_trace.get(pipeline)
+            spans = [s for s in self._spans if s.trace_id == trace_id]
+        return sorted(spans, key=lambda s: s.inicio)
+
+    def prometheus(self) -> str:
+        """Exposição no formato texto do Prometheus (0.0.4)."""
+        with self._lock:
+            histogramas = {chave: list(h) for chave, h in self._histogramas.items()}
+            contadores = dict(self._contadores)
+        linhas = ["# HELP mavi_etapa_duracao_segundos Duração de cada etapa dos pipelines.",
+                  "# TYPE mavi_etapa_duracao_segundos histogram"]
+        for (pipeline, etapa), h in sorted(histogramas.items()):
+            rotulos = f'pipeline="{pipeline}",etapa="{etapa}"'
+            for limite, contagem in zip(BUCKETS_DURACAO_S, h):
+                linhas.append(f'mavi_etapa_duracao_segundos_bucket{{{rotulos},le="{limite}"}} {contagem:.0f}')
+            linhas.append(f'mavi_etapa_duracao_segundos_bucket{{{rotulos},le="+Inf"}} {h[-1]:.0f}')
+            linhas.append(f"mavi_etapa_duracao_segundos_sum{{{rotulos}}} {h[-2]:.6f}")
+            linhas.append(f"mavi_etapa_duracao_segundos_count{{{rotulos}}} {h[-1]:.0f}")
+        nomes = sorted({nome for nome, _ in contadores})
+        for nome in nomes:
+            linhas.append(f"# TYPE mavi_{nome}_total counter")
+            for (n, rotulos), valor in sorted(contadores.items()):
+                if n == nome:
+                    texto_rotulos = ",".join(f'{k}="{v}"' for k, v in rotulos)
+                    linhas.append(f"mavi_{nome}_total{{{texto_rotulos}}} {valor:g}")
+        return "\n".join(linhas) + "\n"
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._histogramas.clear()
+            self._amostras.clear()
+            self._contadores.clear()
+            self._spans.clear()
+            self._ultimo_trace.clear()
+
+
+# ==========================================
+# 2. SINKS E ENDPOINT
+# ==========================================
+
+class SinkJSONL:
+    """Anexa cada span/contador como uma linha JSON (para ingestão em ferramenta de logs)."""
+
+    def __init__(self, caminho: str):
+        self._arquivo = open(caminho, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def __call__(self, evento: Dict[str, Any]) -> None:
+        linha = json.dumps(evento, ensure_ascii=False, default=str)
+        with self._lock:
+            self._arquivo.write(linha + "\n")
+            self._arquivo.flush()
+
+
+def iniciar_servidor_prometheus(metricas: MetricasTelemetria, porta: int, host: str = "0.0.0.0"):
+    """Serve GET /metrics numa thread daemon; retorna o servidor (use .shutdown() para parar)."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            corpo = metricas.prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+
+        def log_message(self, *args):
+            pass
+
+    servidor = ThreadingHTTPServer((host, porta), _Handler)
+    threading.Thread(target=servidor.serve_forever, name="mavi-prometheus", daemon=True).start()
+    return servidor
+
+
+# ==========================================
+# 3. ESTADO DO PROCESSO
+# ==========================================
+
+_ativa = config_mavi.TELEMETRIA_ATIVA
+_metricas_padrao: Optional[MetricasTelemetria] = None
+_lock_padrao = threading.Lock()
+
+
+def ativa() -> bool:
+    return _ativa
+
+
+def ativar(ligada: bool = True) -> None:
+    global _ativa
+    _ativa = ligada
+
+
+def metricas_padrao() -> MetricasTelemetria:
+    """Métricas únicas do processo; na criação liga o sink JSONL e o endpoint configurados."""
+    global _metricas_padrao
+    with _lock_padrao:
+        if _metricas_padrao is None:
+            _metricas_padrao = MetricasTelemetria()
+            if config_mavi.TELEMETRIA_JSONL:
+                _metricas_padrao.sinks.append(SinkJSONL(config_mavi.TELEMETRIA_JSONL))
+            if config_mavi.TELEMETRIA_PORTA_PROMETHEUS:
+                iniciar_servidor_prometheus(_metricas_padrao, config_mavi.TELEMETRIA_PORTA_PROMETHEUS)
+        return _metricas_padrao
+
+
+def config_execucao(pipeline: str) -> Dict[str, Any]:
+    """
+    RunnableConfig para uma execução (invoke/stream/astream) do `pipeline`.
+    Desligada, devolve {}: nenhum callback é registrado e o custo é nulo.
+    """
+    if not _ativa:
+        return {}
+    from telemetria_callbacks import ColetorTelemetria
+    return {"callbacks": [ColetorTelemetria(pipeline, metricas_padrao())]}
@@ -0,0 +1,96 @@
+# telemetria_callbacks.py
+# Mavi.IA 5.0 - Coletor de Telemetria (Callback do LangChain)
+# Transforma os eventos de cada Runnable nomeado e de cada chamada ao LLM em spans de telemetria.py
+
+import time
+import uuid
+from typing import Any, Dict, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from telemetria import EVENTO_CACHE, MetricasTelemetria, Span
+
+
+def _uso_tokens(response) -> Dict[str, Optional[int]]:
+    """Tokens de entrada/saída do usage_metadata da mensagem gerada (quando o provedor informa)."""
+    for geracoes in response.generations:
+        for geracao in geracoes:
+            uso = getattr(getattr(geracao, "message", None), "usage_metadata", None)
+            if uso:
+                return {"tokens_entrada": uso.get("input_tokens"), "tokens_saida": uso.get("output_tokens")}
+    uso = (response.llm_output or {}).get("token_usage") or {}
+    return {"tokens_entrada": uso.get("prompt_tokens"), "tokens_saida": uso.get("completion_tokens")}
+
+
+def _modelo(metadata: Optional[Dict[str, Any]], kwargs: Dict[str, Any]) -> Optional[str]:
+    return (metadata or {}).get("ls_model_name") or (kwargs.get("invocation_params") or {}).get("model")
+
+
+class ColetorTelemetria(BaseCallbackHandler):
+    """
+    Um coletor por execução (ver telemetria.config_execucao): mede o tempo de parede
+    de cada etapa, o TTFT e os tokens de cada chamada ao LLM, retries e hits de cache.
+    """
+
+    run_inline = True   # Roda no mesmo thread/loop do pipeline (sem executor extra)
+    raise_error = False
+
+    def __init__(self, pipeline: str, metricas: MetricasTelemetria):
+        self.pipeline = pipeline
+        self.metricas = metricas
+        self.trace_id = uuid.uuid4().hex[:12]
+        self._abertos: Dict[UUID, Dict[str, Any]] = {}
+
+    def _abrir(self, run_id: UUID, etapa: str, tipo: str, **extras) -> None:
+        self._abertos[run_id] = {"etapa": etapa, "tipo": tipo, "t0": time.perf_counter(), "inicio": time.time(), **extras}
+
+    def _fechar(self, run_id: UUID, ok: bool = True, **extras) -> None:
+        aberto = self._abertos.pop(run_id, None)
+        if aberto is None:
+            return
+        duracao = time.perf_counter() - aberto.pop("t0")
+        self.metricas.registrar_span(Span(pipeline=self.pipeline, trace_id=self.trace_id, duracao_s=duracao,
+                                          ok=ok, **aberto, **extras))
+
+    # --- Etapas (RunnableLambda, prompt, sequência) ---
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, tags=None, metadata=None, **kwargs):
+        nome = kwargs.get("name") or (serialized or {}).get("name") or "chain"
+        self._abrir(run_id, nome, "chain")
+
+    def on_chain_end(self, outputs, *, run_id, parent_run_id=None, **kwargs):
+        self._fechar(run_id)
+
+    def on_chain_error(self, error, *, run_id, parent_run_id=None, **kwargs):
+        self._fechar(run_id, ok=False)
+
+    # --- Chamada ao LLM ---
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, tags=None, metadata=None, **kwargs):
+        self._abrir(run_id, "llm", "llm", modelo=_modelo(metadata, kwargs))
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, tags=None, metadata=None, **kwargs):
+        self._abrir(run_id, "llm", "llm", modelo=_modelo(metadata, kwargs))
+
+    def on_llm_new_token(self, token, *, chunk=None, run_id, parent_run_id=None, **kwargs):
+        aberto = self._abertos.get(run_id)
+        if aberto is not None and "ttft_s" not in aberto:
+            aberto["ttft_s"] = time.perf_counter() - aberto["t0"]
+
+    def on_llm_end(self, response, *, run_id, parent_run_id=None, **kwargs):
+        self._fechar(run_id, **_uso_tokens(response))
+
+    def on_llm_error(self, error, *, run_id, parent_run_id=None, **kwargs):
+        self._fechar(run_id, ok=False)
+
+    # --- Eventos pontuais ---
+
+    def on_retry(self, retry_state, *, run_id, parent_run_id=None, **kwargs):
+        etapa = self._abertos.get(run_id, {}).get("etapa", "desconhecida")
+        self.metricas.contar("retries", pipeline=self.pipeline, etapa=etapa)
+
+    def on_custom_event(self, name, data, *, run_id, tags=None, metadata=None, **kwargs):
+        if name == EVENTO_CACHE:
+            self.metricas.contar("cache_relatorio", pipeline=self.pipeline,
+                                 resultado="hit" if data.get("hit") else "miss")
@@ -0,0 +1,387 @@
+# transporte_replay.py
+# Mavi.IA 5.0 - Gravação e Reprodução das Chamadas ao LLM (Fitas)
+# Backend de chat trocável: grava as interações reais numa fita JSONL e as reproduz offline com latência configurável
+#
+# Uso (pelo ambiente, sem mudar o código dos pipelines):
+#   MAVI_LLM_MODO=gravar      streamlit run app_streamlit.py   -> Gemini de verdade + fita em MAVI_LLM_FITA
+#   MAVI_LLM_MODO=reproduzir  streamlit run app_streamlit.py   -> só a fita, sem rede nem GOOGLE_API_KEY
+
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import Runnable, RunnableConfig
+
+import config_mavi
+
+TIPO_TEXTO = "texto"              # invoke/stream do cliente de chat
+TIPO_ESTRUTURADO = "estruturado"  # with_structured_output (extração)
+CARACTERES_ASSINATURA = 120       # Início da primeira mensagem: identifica o prompt (chat, extração, resumo, relatório)
+
+
+class InteracaoAusente(KeyError):
+    """A fita não tem interação para o prompt (reprodução estrita, ou fita sem nada do mesmo tipo)."""
+
+
+def _texto(conteudo: Any) -> str:
+    """Texto de um content de mensagem (string ou lista de partes)."""
+    if isinstance(conteudo, str):
+        return conteudo
+    return "".join(parte.get("text", "") if isinstance(parte, dict) else str(parte) for parte in conteudo or [])
+
+
+# ==========================================
+# 1. FITA
+# ==========================================
+
+def chave_interacao(mensagens: List[BaseMessage], modelo: str, temperatura: float,
+                    schema: Optional[str] = None) -> str:
+    """Hash exato do pedido: mensagens, modelo, temperatura e schema (saída estruturada)."""
+    material = {"mensagens": [(m.type, _texto(m.content)) for m in mensagens], "modelo": modelo,
+                "temperatura": temperatura, "schema": schema}
+    return hashlib.sha256(json.dumps(material, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def assinatura_interacao(mensagens: List[BaseMessage], schema: Optional[str] = None) -> str:
+    """
+    Família do pedido: o começo da primeira mensagem (system prompt do chat/relatório ou o
+    cabeçalho dos prompts de extração e resumo), que não muda com os números da conversa.
+    """
+    inicio = " ".join(_texto(mensagens[0].content).split())[:CARACTERES_ASSINATURA] if mensagens else ""
+    return hashlib.sha256(f"{schema}|{inicio}".encode("utf-8")).hexdigest()[:16]
+
+
+class FitaLLM:
+    """
+    Interações gravadas, uma por linha JSON (chave, assinatura, tipo, resposta, chunks e tempos).
+
+    `procurar` tenta a chave exata; com `aproximado`, cai para outra interação da mesma
+    assinatura e, por fim, do mesmo tipo (em rodízio), o que permite reproduzir sessões
+    com números diferentes dos gravados. `contagem` mostra quantas foram de cada jeito.
+    """
+
+    def __init__(self, caminho: str, semente: int = 0):
+        self.caminho = caminho
+        self._lock = threading.Lock()
+        self._indices: Dict[str, Dict[str, List[Dict[str, Any]]]] = {"chave": {}, "assinatura": {}, "tipo": {}}
+        self._rodizio: Dict[Tuple[str, str], int] = {}
+        self._sorteio = random.Random(semente)
+        self.total = 0
+        self.contagem = {"exatas": 0, "aproximadas": 0, "ausentes": 0, "gravadas": 0}
+        if os.path.exists(caminho):
+            with open(caminho, encoding="utf-8") as f:
+                for linha in f:
+                    if linha.strip():
+                        self._indexar(json.loads(linha))
+
+    def __len__(self) -> int:
+        return self.total
+
+    def _indexar(self, interacao: Dict[str, Any]) -> None:
+        for indice, valor in (("chave", interacao["chave"]), ("assinatura", interacao["assinatura"]),
+                              ("tipo", interacao["tipo"])):
+            self._indices[indice].setdefault(valor, []).append(interacao)
+        self.total += 1
+
+    def gravar(self, interacao: Dict[str, Any]) -> None:
+        linha = json.dumps(interacao, ensure_ascii=False)
+        with self._lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.caminho)), exist_ok=True)
+            with open(self.caminho, "a", encoding="utf-8") as f:
+                f.write(linha + "\n")
+            self._indexar(interacao)
+            self.contagem["gravadas"] += 1
+
+    def procurar(self, chave: str, assinatura: str, tipo: str, aproximado: bool = True) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if chave in self._indices["chave"]:
+                self.contagem["exatas"] += 1
+                return self._indices["chave"][chave][-1]
+            if aproximado:
+                for indice, valor in (("assinatura", assinatura), ("tipo", tipo)):
+                    candidatas = self._indices[indice].get(valor)
+                    if candidatas:
+                        posicao = self._rodizio.get((indice, valor), 0)
+                        self._rodizio[(indice, valor)] = posicao + 1
+                        self.contagem["aproximadas"] += 1
+                        return candidatas[posicao % len(candidatas)]
+            self.contagem["ausentes"] += 1
+            return None
+
+    def sortear(self, funcao: Callable[[random.Random], Any]) -> Any:
+        """Roda `funcao` com o gerador da fita (reprodutível com a mesma semente)."""
+        with self._lock:
+            return funcao(self._sorteio)
+
+
+# ==========================================
+# 2. LATÊNCIA DA REPRODUÇÃO
+# ==========================================
+
+@dataclass(frozen=True)
+class LatenciaReplay:
+    modo: str = "gravada"      # "gravada" (tempos da fita x fator), "lognormal" ou "fixa"
+    fator: float = 1.0
+    ttft_s: float = 0.8        # Até o primeiro chunk: mediana (lognormal) ou valor (fixa)
+    sigma: float = 0.5         # Dispersão da lognormal (0.5 ~ p95 2.3x a mediana)
+    por_chunk_s: float = 0.02  # Intervalo entre chunks (lognormal e fixa)
+
+    def tempos(self, interacao: Dict[str, Any], sorteio: random.Random) -> Tuple[float, float]:
+        """(espera até o primeiro chunk, intervalo entre os chunks seguintes)."""
+        if self.modo == "gravada":
+            ttft = interacao.get("ttft_s") or 0.0
+            restantes = max(1, len(interacao.get("chunks") or []) - 1)
+            return ttft * self.fator, max(0.0, (interacao.get("duracao_s") or ttft) - ttft) / restantes * self.fator
+        if self.modo == "lognormal":
+            return sorteio.lognormvariate(math.log(max(self.ttft_s, 1e-6)), self.sigma), self.por_chunk_s
+        if self.modo == "fixa":
+            return self.ttft_s, self.por_chunk_s
+        raise ValueError(f"Modo de latência desconhecido: {self.modo}")
+
+
+def latencia_padrao() -> LatenciaReplay:
+    return LatenciaReplay(**config_mavi.REPLAY_LATENCIA)
+
+
+# ==========================================
+# 3. GRAVAÇÃO
+# ==========================================
+
+class ChatGravador(BaseChatModel):
+    """
+    Repassa cada chamada ao cliente real (`interno`) e grava pedido, resposta, chunks e
+    tempos na fita. Streams só são gravados quando terminam (resposta completa).
+    """
+
+    interno: Any
+    fita: Any
+    modelo: str = ""
+    temperatura: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "mavi-gravador"
+
+    def _registrar(self, mensagens: List[BaseMessage], tipo: str, resposta: Any, chunks: List[str],
+                   inicio: float, ttft_s: Optional[float], schema: Optional[str] = None) -> None:
+        duracao = time.perf_counter() - inicio
+        self.fita.gravar({
+            "chave": chave_interacao(mensagens, self.modelo, self.temperatura, schema),
+            "assinatura": assinatura_interacao(mensagens, schema), "tipo": tipo, "schema": schema,
+            "modelo": self.modelo, "resposta": resposta, "chunks": chunks,
+            "ttft_s": round(duracao if ttft_s is None else ttft_s, 4), "duracao_s": round(duracao, 4),
+            "gravado_em": time.time(),
+        })
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        inicio = time.perf_counter()
+        texto = _texto(self.interno.invoke(messages, stop=stop, **kwargs).content)
+        self._registrar(messages, TIPO_TEXTO, texto, [texto], inicio, None)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=texto))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        inicio = time.perf_counter()
+        texto = _texto((await self.interno.ainvoke(messages, stop=stop, **kwargs)).content)
+        self._registrar(messages, TIPO_TEXTO, texto, [texto], inicio, None)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=texto))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        inicio, ttft, chunks = time.perf_counter(), None, []
+        for original in self.interno.stream(messages, stop=stop, **kwargs):
+            texto = _texto(original.content)
+            ttft = ttft if ttft is not None else time.perf_counter() - inicio
+            chunks.append(texto)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=texto))
+            if run_manager:
+                run_manager.on_llm_new_token(texto, chunk=chunk)
+            yield chunk
+        self._registrar(messages, TIPO_TEXTO, "".join(chunks), chunks, inicio, ttft)
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+                       **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        inicio, ttft, chunks = time.perf_counter(), None, []
+        async for original in self.interno.astream(messages, stop=stop, **kwargs):
+            texto = _texto(original.content)
+            ttft = ttft if ttft is not None else time.perf_counter() - inicio
+            chunks.append(texto)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=texto))
+            if run_manager:
+                await run_manager.on_llm_new_token(texto, chunk=chunk)
+            yield chunk
+        self._registrar(messages, TIPO_TEXTO, "".join(chunks), chunks, inicio, ttft)
+
+    def with_structured_output(self, schema: Any, **kwargs: Any) -> Runnable:
+        return _GravadorEstruturado(self.interno.with_structured_output(schema, **kwargs), self, schema)
+
+
+def _nome_schema(schema: Any) -> str:
+    return getattr(schema, "__name__", None) or str(schema)
+
+
+class _GravadorEstruturado(Runnable):
+    """with_structured_output do ChatGravador: chama o extrator real e grava o objeto devolvido."""
+
+    def __init__(self, interno: Runnable, gravador: ChatGravador, schema: Any):
+        self.interno = interno
+        self.gravador = gravador
+        self.schema = schema
+
+    def _gravar(self, entrada: Any, resultado: Any, inicio: float) -> None:
+        dados = resultado.model_dump() if hasattr(resultado, "model_dump") else resultado
+        self.gravador._registrar(self.gravador._convert_input(entrada).to_messages(), TIPO_ESTRUTURADO,
+                                 dados, [], inicio, None, _nome_schema(self.schema))
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        inicio = time.perf_counter()
+        resultado = self.interno.invoke(input, config, **kwargs)
+        self._gravar(input, resultado, inicio)
+        return resultado
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        inicio = time.perf_counter()
+        resultado = await self.interno.ainvoke(input, config, **kwargs)
+        self._gravar(input, resultado, inicio)
+        return resultado
+
+
+# ==========================================
+# 4. REPRODUÇÃO
+# ==========================================
+
+class ChatReplay(BaseChatModel):
+    """
+    Responde com as interações da fita, sem rede, no ritmo de `latencia` (padrão:
+    config_mavi.REPLAY_LATENCIA). Com `aproximado=False`, prompt sem gravação exata
+    levanta InteracaoAusente.
+    """
+
+    fita: Any
+    latencia: Any = None
+    modelo: str = ""
+    temperatura: float = 0.0
+    aproximado: bool = True
+
+    @property
+    def _llm_type(self) -> str:
+        return "mavi-replay"
+
+    def interacao(self, mensagens: List[BaseMessage], tipo: str, schema: Optional[str] = None) -> Dict[str, Any]:
+        achada = self.fita.procurar(chave_interacao(mensagens, self.modelo, self.temperatura, schema),
+                                    assinatura_interacao(mensagens, schema), tipo, self.aproximado)
+        if achada is None:
+            raise InteracaoAusente(f"fita sem interação {tipo} para o prompt ({len(self.fita)} gravadas)")
+        return achada
+
+    def tempos(self, interacao: Dict[str, Any]) -> Tuple[float, float]:
+        latencia = self.latencia or latencia_padrao()
+        return self.fita.sortear(lambda sorteio: latencia.tempos(interacao, sorteio))
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        interacao = self.interacao(messages, TIPO_TEXTO)
+        ttft, intervalo = self.tempos(interacao)
+        time.sleep(ttft + intervalo * max(0, len(interacao["chunks"]) - 1))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=interacao["resposta"]))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        interacao = self.interacao(messages, TIPO_TEXTO)
+        ttft, intervalo = self.tempos(interacao)
+        await asyncio.sleep(ttft + intervalo * max(0, len(interacao["chunks"]) - 1))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=interacao["resposta"]))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        interacao = self.interacao(messages, TIPO_TEXTO)
+        ttft, intervalo = self.tempos(interacao)
+        for i, texto in enumerate(interacao["chunks"]):
+            time.sleep(ttft if i == 0 else intervalo)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=texto))
+            if run_manager:
+                run_manager.on_llm_new_token(texto, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+                       **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        interacao = self.interacao(messages, TIPO_TEXTO)
+        ttft, intervalo = self.tempos(interacao)
+        for i, texto in enumerate(interacao["chunks"]):
+            await asyncio.sleep(ttft if i == 0 else intervalo)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=texto))
+            if run_manager:
+                await run_manager.on_llm_new_token(texto, chunk=chunk)
+            yield chunk
+
+    def with_structured_output(self, schema: Any, **kwargs: Any) -> Runnable:
+        return _ReplayEstruturado(self, schema)
+
+
+class _ReplayEstruturado(Runnable):
+    """with_structured_output do ChatReplay: devolve o objeto gravado validado pelo schema pedido."""
+
+    def __init__(self, replay: ChatReplay, schema: Any):
+        self.replay = replay
+        self.schema = schema
+
+    def _resultado(self, input: Any) -> Tuple[Any, float]:
+        interacao = self.replay.interacao(self.replay._convert_input(input).to_messages(), TIPO_ESTRUTURADO,
+                                          _nome_schema(self.schema))
+        dados = interacao["resposta"]
+        resultado = self.schema.model_validate(dados) if hasattr(self.schema, "model_validate") else dados
+        return resultado, self.replay.tempos(interacao)[0]
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        resultado, espera = self._resultado(input)
+        time.sleep(espera)
+        return resultado
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        resultado, espera = self._resultado(input)
+        await asyncio.sleep(espera)
+        return resultado
+
+
+# ==========================================
+# 5. FÁBRICAS (registro_llm.configurar_fabrica_cliente)
+# ==========================================
+
+def fabrica_gravacao(fita: FitaLLM, fabrica: Callable[..., Any]) -> Callable[..., ChatGravador]:
+    """Clientes de `fabrica` (ex: o Gemini do registro) com cada interação gravada em `fita`."""
+    def fabricar(**opcoes) -> ChatGravador:
+        return ChatGravador(interno=fabrica(**opcoes), fita=fita, modelo=str(opcoes.get("model", "")),
+                            temperatura=float(opcoes.get("temperature") or 0.0))
+    return fabricar
+
+
+def fabrica_replay(fita: FitaLLM, latencia: Optional[LatenciaReplay] = None,
+                   aproximado: bool = True) -> Callable[..., ChatReplay]:
+    """Clientes que só leem `fita`: nenhuma chamada de rede, nenhuma chave de API."""
+    def fabricar(**opcoes) -> ChatReplay:
+        return ChatReplay(fita=fita, latencia=latencia, modelo=str(opcoes.get("model", "")),
+                          temperatura=float(opcoes.get("temperature") or 0.0), aproximado=aproximado)
+    return fabricar
+
+
+def fabrica_do_ambiente(fabrica_real: Callable[..., Any]) -> Callable[..., Any]:
+    """Fábrica para config_mavi.LLM_MODO ("gravar" ou "reproduzir") com a fita config_mavi.LLM_FITA."""
+    if config_mavi.LLM_MODO == "gravar":
+        return fabrica_gravacao(FitaLLM(config_mavi.LLM_FITA), fabrica_real)
+    if config_mavi.LLM_MODO == "reproduzir":
+        return fabrica_replay(FitaLLM(config_mavi.LLM_FITA), latencia_padrao(), config_mavi.REPLAY_APROXIMADO)
+    raise ValueError(f"MAVI_LLM_MODO desconhecido: {config_mavi.LLM_MODO} (use real, gravar ou reproduzir)")
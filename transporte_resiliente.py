@@ -0,0 +1,302 @@
+# transporte_resiliente.py
+# Mavi.IA 5.0 - Política de Transporte das Chamadas ao LLM
+# Prazos por chamada, retries com jitter, requisições hedged, disjuntor e limite de concorrência (só stdlib)
+
+import asyncio
+import random
+import threading
+import time
+import weakref
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import config_mavi
+import telemetria
+
+
+class ErroTransporte(Exception):
+    """Chamada ao LLM que não completou dentro da política (após retries)."""
+
+
+class PrazoEsgotado(ErroTransporte):
+    """Primeiro chunk, inatividade do stream ou prazo total estourado."""
+
+
+class CircuitoAberto(ErroTransporte):
+    """Disjuntor aberto: a chamada nem é feita (falha rápida para a saída local)."""
+
+
+# Erros de programação/validação não melhoram repetindo a chamada
+ERROS_NAO_RETENTAVEIS = (TypeError, KeyError, AttributeError, NotImplementedError)
+
+
+# ==========================================
+# 1. POLÍTICA E BACKOFF
+# ==========================================
+
+@dataclass(frozen=True)
+class PoliticaTransporte:
+    prazo_total_s: float = 60.0              # Teto da chamada inteira, retries incluídos
+    timeout_primeiro_chunk_s: float = 20.0   # Por tentativa (no invoke, tempo até a resposta)
+    timeout_inatividade_s: float = 20.0      # Maior intervalo aceito entre chunks de um stream
+    tentativas: int = 3
+    backoff_base_s: float = 0.5
+    backoff_max_s: float = 8.0
+    hedge_apos_s: Optional[float] = None     # Sem resposta nesse tempo, dispara uma cópia e fica com a primeira
+    max_concorrencia: int = config_mavi.TRANSPORTE_MAX_CONCORRENCIA
+
+
+def politica(nome: str) -> PoliticaTransporte:
+    """Política nomeada de config_mavi.POLITICAS_TRANSPORTE ("chat", "extracao", "relatorio"...)."""
+    return PoliticaTransporte(**config_mavi.POLITICAS_TRANSPORTE.get(nome, {}))
+
+
+def espera_backoff(tentativa: int, base_s: float, maximo_s: float) -> float:
+    """Backoff exponencial com jitter completo: U(0, min(max, base * 2^tentativa))."""
+    return random.uniform(0, min(maximo_s, base_s * 2 ** tentativa))
+
+
+# ==========================================
+# 2. DISJUNTOR
+# ==========================================
+
+class Disjuntor:
+    """
+    Circuit breaker por provedor.
+
+    Fechado: tudo passa. Após `limiar_falhas` tentativas seguidas com erro, abre e recusa
+    chamadas por `tempo_aberto_s`. Depois disso fica meio-aberto: uma única chamada de
+    sonda passa; sucesso fecha o circuito, falha o reabre. Sonda que termina sem veredito
+    (cancelada, erro de programação) só devolve a vaga para a próxima.
+    """
+
+    def __init__(self, limiar_falhas: int = config_mavi.DISJUNTOR_LIMIAR_FALHAS,
+                 tempo_aberto_s: float = config_mavi.DISJUNTOR_TEMPO_ABERTO_S,
+                 relogio: Callable[[], float] = time.monotonic):
+        self.limiar_falhas = limiar_falhas
+        self.tempo_aberto_s = tempo_aberto_s
+        self._relogio = relogio
+        self._lock = threading.Lock()
+        self._falhas = 0
+        self._aberto_em: Optional[float] = None
+        self._sonda_em_voo = False
+
+    @property
+    def estado(self) -> str:
+        with self._lock:
+            if self._aberto_em is None:
+                return "fechado"
+            return "meio_aberto" if self._relogio() - self._aberto_em >= self.tempo_aberto_s else "aberto"
+
+    def permitir(self) -> bool:
+        return self.autorizar() is not None
+
+    def autorizar(self) -> Optional[str]:
+        """None (recusada), "normal" (circuito fechado) ou "sonda" (a única chamada do meio-aberto)."""
+        with self._lock:
+            if self._aberto_em is None:
+                return "normal"
+            if self._relogio() - self._aberto_em < self.tempo_aberto_s or self._sonda_em_voo:
+                return None
+            self._sonda_em_voo = True
+            return "sonda"
+
+    def liberar_sonda(self) -> None:
+        """A sonda acabou sem dizer nada sobre o provedor: o circuito segue meio-aberto."""
+        with self._lock:
+            self._sonda_em_voo = False
+
+    def registrar_sucesso(self) -> None:
+        with self._lock:
+            self._falhas = 0
+            self._aberto_em = None
+            self._sonda_em_voo = False
+
+    def registrar_falha(self) -> None:
+        with self._lock:
+            self._falhas += 1
+            if self._sonda_em_voo or self._falhas >= self.limiar_falhas:
+                self._aberto_em = self._relogio()
+            self._sonda_em_voo = False
+
+
+_disjuntores: Dict[str, Disjuntor] = {}
+_lock_disjuntores = threading.Lock()
+
+
+def disjuntor_padrao(provedor: str = "gemini") -> Disjuntor:
+    """Um disjuntor por provedor, compartilhado por chat, extração e relatório."""
+    with _lock_disjuntores:
+        if provedor not in _disjuntores:
+            _disjuntores[provedor] = Disjuntor()
+        return _disjuntores[provedor]
+
+
+# ==========================================
+# 3. EXECUÇÃO (ASSÍNCRONA)
+# ==========================================
+
+def _contar(nome_politica: str, evento: str) -> None:
+    if telemetria.ativa():
+        telemetria.metricas_padrao().contar("transporte", politica=nome_politica, evento=evento)
+
+
+class Transporte:
+    """
+    Aplica uma PoliticaTransporte a chamadas assíncronas de um provedor.
+
+    `executar(iniciar)` serve para invoke: `iniciar()` devolve a corrotina da chamada.
+    `executar_stream(abrir)` serve para stream: `abrir()` devolve um async iterator; os
+    retries e o hedge valem até o primeiro chunk (depois dele o texto já foi exibido); um
+    erro no meio do stream conta no disjuntor e chega a quem consome como ErroTransporte.
+    """
+
+    def __init__(self, politica_transporte: PoliticaTransporte, disjuntor: Optional[Disjuntor] = None,
+                 nome: str = "padrao"):
+        self.politica = politica_transporte
+        self.disjuntor = disjuntor or disjuntor_padrao()
+        self.nome = nome
+        self._semaforos: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = \
+            weakref.WeakKeyDictionary()
+
+    def _semaforo(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if loop not in self._semaforos:
+            self._semaforos[loop] = asyncio.Semaphore(self.politica.max_concorrencia)
+        return self._semaforos[loop]
+
+    async def _corrida(self, iniciar: Callable[[], Awaitable[Any]], timeout_s: float,
+                       descartar: Optional[Callable[[Any], Awaitable[Any]]] = None) -> Any:
+        """
+        Primeira resposta entre a chamada original e (após hedge_apos_s) uma cópia.
+        A cópia ocupa uma vaga do semáforo (sem vaga livre, não há hedge), e o resultado
+        de quem terminou junto e perdeu passa por `descartar` (ex: fechar o stream aberto).
+        """
+        tarefas: List[asyncio.Task] = [asyncio.ensure_future(iniciar())]
+        limite = time.monotonic() + timeout_s
+        hedge = self.politica.hedge_apos_s
+        ultimo_erro: Optional[BaseException] = None
+        perdedoras: List[asyncio.Task] = []
+        try:
+            while tarefas:
+                espera = limite - time.monotonic()
+                if hedge is not None and len(tarefas) == 1 and ultimo_erro is None:
+                    espera = min(espera, hedge)
+                if espera <= 0:
+                    raise PrazoEsgotado(f"sem resposta em {timeout_s:.1f}s")
+                concluidas, _ = await asyncio.wait(tarefas, timeout=espera, return_when=asyncio.FIRST_COMPLETED)
+                if not concluidas:
+                    if hedge is not None and len(tarefas) == 1 and time.monotonic() < limite:
+                        hedge = None
+                        semaforo = self._semaforo()
+                        if semaforo.locked():
+                            _contar(self.nome, "hedge_sem_vaga")
+                            continue
+                        await semaforo.acquire()  # Livre: não espera
+                        _contar(self.nome, "hedge")
+                        copia = asyncio.ensure_future(iniciar())
+                        copia.add_done_callback(lambda _tarefa: semaforo.release())
+                        tarefas.append(copia)
+                        continue
+                    raise PrazoEsgotado(f"sem resposta em {timeout_s:.1f}s")
+                vencedora = None
+                for tarefa in concluidas:
+                    tarefas.remove(tarefa)
+                    if tarefa.exception() is not None:
+                        ultimo_erro = tarefa.exception()
+                    elif vencedora is None:
+                        vencedora = tarefa
+                    else:
+                        perdedoras.append(tarefa)
+                if vencedora is not None:
+                    return vencedora.result()
+            raise ultimo_erro
+        finally:
+            for tarefa in tarefas:
+                tarefa.cancel()
+            if descartar is not None:
+                for tarefa in perdedoras:
+                    await descartar(tarefa.result())
+
+    async def _tentativas(self, tentar: Callable[[float], Awaitable[Any]]) -> Any:
+        """Retry com backoff e jitter dentro do prazo total; cada falha conta no disjuntor."""
+        p = self.politica
+        prazo = time.monotonic() + p.prazo_total_s
+        ultimo_erro: Optional[BaseException] = None
+        for tentativa in range(p.tentativas):
+            if tentativa:
+                _contar(self.nome, "retry")
+                espera = espera_backoff(tentativa - 1, p.backoff_base_s, p.backoff_max_s)
+                if time.monotonic() + espera >= prazo:
+                    break
+                await asyncio.sleep(espera)
+            modo = self.disjuntor.autorizar()
+            if modo is None:
+                _contar(self.nome, "circuito_aberto")
+                raise CircuitoAberto(f"disjuntor aberto ({self.nome})") from ultimo_erro
+            restante = prazo - time.monotonic()
+            try:
+                resultado = await tentar(min(p.timeout_primeiro_chunk_s, restante))
+            except ERROS_NAO_RETENTAVEIS:
+                if modo == "sonda":
+                    self.disjuntor.liberar_sonda()
+                raise
+            except Exception as e:
+                self.disjuntor.registrar_falha()
+                _contar(self.nome, "prazo" if isinstance(e, PrazoEsgotado) else "erro")
+                ultimo_erro = e
+                continue
+            except BaseException:  # CancelledError (ex: TurnoChat.cancelar): sem veredito
+                if modo == "sonda":
+                    self.disjuntor.liberar_sonda()
+                raise
+            self.disjuntor.registrar_sucesso()
+            return resultado
+        raise ErroTransporte(f"{self.nome}: {p.tentativas} tentativa(s) sem sucesso: {ultimo_erro!r}") from ultimo_erro
+
+    async def executar(self, iniciar: Callable[[], Awaitable[Any]]) -> Any:
+        async with self._semaforo():
+            return await self._tentativas(lambda timeout_s: self._corrida(iniciar, timeout_s))
+
+    async def executar_stream(self, abrir: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        async def fechar(iterador: AsyncIterator[Any]) -> None:
+            if hasattr(iterador, "aclose"):
+                await iterador.aclose()
+
+        async def primeiro_chunk() -> Tuple[Any, AsyncIterator[Any]]:
+            iterador = abrir().__aiter__()
+            try:
+                return await iterador.__anext__(), iterador
+            except BaseException:  # Perdeu a corrida (cancelada) ou falhou: não deixa o stream aberto
+                await fechar(iterador)
+                raise
+
+        async def descartar(resultado: Tuple[Any, AsyncIterator[Any]]) -> None:
+            await fechar(resultado[1])
+
+        async with self._semaforo():
+            inicio = time.monotonic()
+            primeiro, iterador = await self._tentativas(
+                lambda timeout_s: self._corrida(primeiro_chunk, timeout_s, descartar))
+            prazo = inicio + self.politica.prazo_total_s
+            try:
+                yield primeiro
+                while True:
+                    timeout_s = min(self.politica.timeout_inatividade_s, prazo - time.monotonic())
+                    try:
+                        chunk = await asyncio.wait_for(iterador.__anext__(), max(0.0, timeout_s))
+                    except StopAsyncIteration:
+                        return
+                    except asyncio.TimeoutError:
+                        self.disjuntor.registrar_falha()
+                        _contar(self.nome, "prazo")
+                        raise PrazoEsgotado(f"{self.nome}: stream parado por {timeout_s:.1f}s") from None
+                    except ERROS_NAO_RETENTAVEIS:
+                        raise
+                    except Exception as e:
+                        self.disjuntor.registrar_falha()
+                        _contar(self.nome, "erro")
+                        raise ErroTransporte(f"{self.nome}: stream interrompido: {e!r}") from e
+                    yield chunk
+            finally:
+                await fechar(iterador)